@@ -21,6 +21,8 @@ import logging
 import urlparse
 import urllib
 import hashlib
+import threading
+from time import time
 from base64 import b64encode
 from copy import copy
 
@@ -31,7 +33,9 @@ except ImportError:
 
 from astakosclient.utils import \
     retry_dec, scheme_to_class, parse_request, check_input, join_urls, \
-    render_overlimit_exception
+    render_overlimit_exception, get_retry_budget
+from astakosclient.pool import DEFAULT_IDLE_TIMEOUT, \
+    STALE_CONNECTION_ERRORS, IDEMPOTENT_METHODS, is_stale_connection_error
 from astakosclient.errors import \
     AstakosClientException, Unauthorized, BadRequest, NotFound, Forbidden, \
     NoUserName, NoUUID, BadValue, QuotaLimit, InvalidResponse, NoEndpoints, \
@@ -67,16 +71,20 @@ class AstakosClient(object):
     # Too many local variables. pylint: disable-msg=R0914
     # Too many statements. pylint: disable-msg=R0915
     def __init__(self, token, auth_url,
-                 retry=0, use_pool=False, pool_size=8, logger=None):
+                 retry=0, use_pool=False, pool_size=8, logger=None,
+                 pool_idle_timeout=DEFAULT_IDLE_TIMEOUT, retry_budget=None):
         """Initialize AstakosClient Class
 
         Keyword arguments:
         token       -- user's/service's token (string)
         auth_url    -- i.e https://accounts.example.com/identity/v2.0
         retry       -- how many time to retry (integer)
-        use_pool    -- use objpool for http requests (boolean)
+        use_pool    -- keep connections alive in a pool (boolean)
         pool_size   -- if using pool, define the pool size
         logger      -- pass a different logger
+        pool_idle_timeout -- if using pool, seconds to keep idle connections
+        retry_budget -- RetryBudget limiting the retries, by default shared
+                        by the clients of the same host
 
         """
 
@@ -93,8 +101,8 @@ class AstakosClient(object):
 
         # Initialize connection class
         parsed_auth_url = urlparse.urlparse(auth_url)
-        conn_class = \
-            scheme_to_class(parsed_auth_url.scheme, use_pool, pool_size)
+        conn_class = scheme_to_class(parsed_auth_url.scheme, use_pool,
+                                     pool_size, pool_idle_timeout)
         if conn_class is None:
             msg = "Unsupported scheme: %s" % parsed_auth_url.scheme
             logger.error(msg)
@@ -102,6 +110,9 @@ class AstakosClient(object):
 
         # Save astakos base url, logger, connection class etc in our class
         self.retry = retry
+        if retry_budget is None:
+            retry_budget = get_retry_budget(parsed_auth_url.netloc)
+        self.retry_budget = retry_budget
         self.logger = logger
         self.token = token
         self.astakos_base_url = parsed_auth_url.netloc
@@ -213,6 +224,10 @@ class AstakosClient(object):
     def api_commissions_action(self):
         return join_urls(self.api_commissions, "action")
 
+    @property
+    def api_commissions_bulk(self):
+        return join_urls(self.api_commissions, "bulk")
+
     @property
     def api_feedback(self):
         return join_urls(self.account_prefix, "feedback")
@@ -271,22 +286,19 @@ class AstakosClient(object):
                                      len(body) if body else 0)
 
         try:
-            # Get the connection object
-            with self.conn_class(self.astakos_base_url) as conn:
-                # Log the request so other clients (like kamaki)
-                # can use them to produce their own log messages.
-                self.log_request = dict(method=method, path=request_path)
-                self.log_request.update(kwargs)
-
-                # Send request
-                # Used * or ** magic. pylint: disable-msg=W0142
-                (message, data, status) = \
-                    _do_request(conn, method, request_path, **kwargs)
-
-                # Log the response so other clients (like kamaki)
-                # can use them to produce their own log messages.
-                self.log_response = dict(
-                    status=status, message=message, data=data)
+            # Log the request so other clients (like kamaki)
+            # can use them to produce their own log messages.
+            self.log_request = dict(method=method, path=request_path)
+            self.log_request.update(kwargs)
+
+            # Send request
+            (message, data, status) = \
+                self._send_request(method, request_path, kwargs)
+
+            # Log the response so other clients (like kamaki)
+            # can use them to produce their own log messages.
+            self.log_response = dict(
+                status=status, message=message, data=data)
         except Exception as err:
             self.logger.error("Failed to send request: %r", err)
             raise ConnectionError(err)
@@ -315,6 +327,29 @@ class AstakosClient(object):
             self.logger.error(msg % (data, str(err)))
             raise InvalidResponse(message=str(err), response=data)
 
+    def _send_request(self, method, request_path, kwargs):
+        """Send a request, reconnecting if a kept-alive connection is stale
+
+        Only idempotent requests are sent again, and only if Astakos closed
+        the connection without responding. Otherwise, the error goes to
+        retry_dec, which obeys the retries and the retry budget.
+
+        """
+        while True:
+            # Get the connection object
+            with self.conn_class(self.astakos_base_url) as conn:
+                try:
+                    # Used * or ** magic. pylint: disable-msg=W0142
+                    return _do_request(conn, method, request_path, **kwargs)
+                except STALE_CONNECTION_ERRORS as err:
+                    if not getattr(conn, "reused", False) or \
+                            method not in IDEMPOTENT_METHODS or \
+                            not is_stale_connection_error(err):
+                        raise
+                    # Astakos has closed the idle connection
+                    self.logger.debug("Reconnecting after %r", err)
+                    conn.close()
+
     # ----------------------------------
     # do a POST to ``API_USERCATALOGS`` (or ``API_SERVICE_USERCATALOGS``)
     #   with {'uuids': uuids}
@@ -534,7 +569,8 @@ class AstakosClient(object):
 
     # ----------------------------------
     # do a GET to ``API_SERVICE_QUOTAS``
-    def service_get_quotas(self, user=None, project_id=None, project=None):
+    def service_get_quotas(self, user=None, project_id=None, project=None,
+                           marker=None, limit=None):
         """Get all quotas for resources associated with the service
 
         Keyword arguments:
@@ -542,6 +578,8 @@ class AstakosClient(object):
         project_id -- optionally, the uuid of a specific project, or a list
                    thereof
         project -- backwards compatibility (replaced by "project_id")
+        marker  -- optionally, return only users with a greater uuid
+        limit   -- optionally, return at most that many users
 
         In case of success return a dict of dicts of dicts with current quotas
         for all users, or of a specified user, if user argument is set.
@@ -555,18 +593,50 @@ class AstakosClient(object):
             filters['user'] = self._join_if_list(user)
         if project_id is not None:
             filters['project'] = self._join_if_list(project_id)
+        if marker is not None:
+            filters['marker'] = marker
+        if limit is not None:
+            filters['limit'] = limit
         if filters:
             query += "?" + urllib.urlencode(filters)
         return self._call_astakos(query)
 
+    def iter_service_quotas(self, user=None, project_id=None, limit=1000):
+        """Iterate over the quotas of the users of the service in pages
+
+        Keyword arguments:
+        user    -- optionally, the uuid of a specific user, or a list thereof
+        project_id -- optionally, the uuid of a specific project, or a list
+                   thereof
+        limit   -- the number of users per page
+
+        Yield one dict per page of users, in the format of
+        service_get_quotas, so that the quotas of all users are never held
+        in memory at once.
+
+        """
+        marker = None
+        while True:
+            page = self.service_get_quotas(user=user, project_id=project_id,
+                                           marker=marker, limit=limit)
+            if not page:
+                return
+            yield page
+            if len(page) < limit:
+                return
+            marker = max(page.keys())
+
     # ----------------------------------
     # do a GET to ``API_SERVICE_PROJECT_QUOTAS``
-    def service_get_project_quotas(self, project_id=None, project=None):
+    def service_get_project_quotas(self, project_id=None, project=None,
+                                   marker=None, limit=None):
         """Get all project quotas for resources associated with the service
 
         Keyword arguments:
         project    -- optionally, the uuid of a specific project, or a list
                       thereof
+        marker     -- optionally, return only projects with a greater uuid
+        limit      -- optionally, return at most that many projects
 
         In case of success return a dict of dicts with current quotas
         for all projects, or of a specified project, if project argument is
@@ -578,6 +648,10 @@ class AstakosClient(object):
         filters = {}
         if project_id is not None:
             filters['project'] = self._join_if_list(project_id)
+        if marker is not None:
+            filters['marker'] = marker
+        if limit is not None:
+            filters['limit'] = limit
         if filters:
             query += "?" + urllib.urlencode(filters)
         return self._call_astakos(query)
@@ -694,6 +768,12 @@ class AstakosClient(object):
         check_input("issue_one_commission", self.logger,
                     holder=holder, provisions=provisions)
 
+        request = self._mk_one_commission_request(
+            holder, provisions, name, force, auto_accept)
+        return self._issue_commission(request)
+
+    def _mk_one_commission_request(self, holder, provisions,
+                                   name, force, auto_accept):
         request = {}
         request["force"] = force
         request["auto_accept"] = auto_accept
@@ -706,8 +786,64 @@ class AstakosClient(object):
         except Exception as err:
             self.logger.error(str(err))
             raise BadValue(str(err))
+        return request
 
-        return self._issue_commission(request)
+    # ----------------------------------
+    # do a POST to ``API_COMMISSIONS_BULK``
+    def issue_commissions_bulk(self, requests):
+        """Issue many commissions with a single request
+
+        Keyword arguments:
+        requests -- commission requests, as the ones of _issue_commission
+                    (list of dicts)
+
+        Return a list with the result of each commission, in the order of
+        the requests: either the commission's id (int) or the
+        AstakosClientException that the commission would have raised if
+        issued alone.
+
+        """
+        check_input("issue_commissions_bulk", self.logger, requests=requests)
+
+        req_headers = {'content-type': 'application/json'}
+        req_body = parse_request({"commissions": requests}, self.logger)
+        response = self._call_astakos(self.api_commissions_bulk,
+                                      headers=req_headers,
+                                      body=req_body,
+                                      method="POST")
+        try:
+            results = response["commissions"]
+            if len(results) != len(requests):
+                raise ValueError("expected %s results, got %s" %
+                                 (len(requests), len(results)))
+        except Exception as err:
+            msg = "issue_commissions_bulk request returned %r: %s" % \
+                (response, err)
+            self.logger.error(msg)
+            raise InvalidResponse(message=msg, response=response)
+        return [r["serial"] if "serial" in r else self._commission_fault(r)
+                for r in results]
+
+    def _commission_fault(self, fault):
+        """Return the exception that corresponds to a commission fault"""
+        if "overLimit" in fault:
+            response = json.dumps(fault)
+            try:
+                msg, details = render_overlimit_exception(response,
+                                                          self.logger)
+            except Exception as err:
+                self.logger.error("Could not parse overLimit fault %r: %s",
+                                  fault, str(err))
+                msg, details = fault["overLimit"].get("message", ""), ""
+            return QuotaLimit(message=msg, details=details, response=response)
+        if "itemNotFound" in fault:
+            return NotFound(fault["itemNotFound"].get("message", ""),
+                            response=fault)
+        if "badRequest" in fault:
+            return BadRequest(fault["badRequest"].get("message", ""),
+                              response=fault)
+        return AstakosClientException(message="Unknown commission fault",
+                                      response=fault)
 
     def issue_resource_reassignment(self, holder, provisions, name="",
                                     force=False, auto_accept=False):
@@ -1084,6 +1220,132 @@ def parse_endpoints(endpoints, ep_name=None, ep_type=None,
         raise NoEndpoints(ep_name, ep_type, ep_region, ep_version_id)
 
 
+# --------------------------------------------------------------------
+# Commission batching
+
+class _PendingCall(object):
+    """A call waiting in a batch for its result"""
+    def __init__(self, args):
+        self.args = args
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _Coalescer(object):
+    """Coalesce concurrent calls into batches
+
+    The first call of a batch waits for at most 'window' seconds, or until
+    'max_size' calls have joined the batch, and then passes the arguments of
+    all the calls to 'send', which must return a result for each of them.
+    A result that is an exception is raised to its caller.
+
+    """
+    def __init__(self, send, window, max_size):
+        self.send = send
+        self.window = window
+        self.max_size = max_size
+        self.cond = threading.Condition(threading.Lock())
+        self.pending = []
+
+    def call(self, args):
+        call = _PendingCall(args)
+        with self.cond:
+            self.pending.append(call)
+            leader = len(self.pending) == 1
+            if leader:
+                deadline = time() + self.window
+                while len(self.pending) < self.max_size:
+                    remaining = deadline - time()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+                batch, self.pending = self.pending, []
+            elif len(self.pending) >= self.max_size:
+                self.cond.notify()
+
+        if leader:
+            self._send(batch)
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def _send(self, batch):
+        try:
+            results = self.send([call.args for call in batch])
+            for call, result in zip(batch, results):
+                if isinstance(result, Exception):
+                    call.error = result
+                else:
+                    call.result = result
+        except Exception as err:
+            for call in batch:
+                call.error = err
+        finally:
+            for call in batch:
+                call.done.set()
+
+
+class CommissionBatcher(object):
+    """Coalesce the commissions of concurrent threads
+
+    Commissions issued, accepted or rejected through the batcher by
+    different threads within 'window' seconds are sent to Astakos with a
+    single request, of at most 'max_size' commissions. Each thread blocks
+    until the request of its batch completes and gets the same result, or
+    exception, as if it had called the AstakosClient itself.
+
+    """
+    def __init__(self, client, window=0.01, max_size=100):
+        """Initialize CommissionBatcher
+
+        Keyword arguments:
+        client      -- the AstakosClient to send the requests with
+        window      -- seconds to wait for other commissions (float)
+        max_size    -- maximum number of commissions per request (integer)
+
+        """
+        self.client = client
+        self.issue_batch = _Coalescer(self._issue, window, max_size)
+        self.resolve_batch = _Coalescer(self._resolve, window, max_size)
+
+    def issue_one_commission(self, holder, provisions,
+                             name="", force=False, auto_accept=False):
+        """Issue one commission (see AstakosClient.issue_one_commission)"""
+        check_input("issue_one_commission", self.client.logger,
+                    holder=holder, provisions=provisions)
+        request = self.client._mk_one_commission_request(
+            holder, provisions, name, force, auto_accept)
+        return self.issue_batch.call(request)
+
+    def accept_commission(self, serial):
+        """Accept a commission (see AstakosClient.accept_commission)"""
+        self.resolve_batch.call((serial, True))
+
+    def reject_commission(self, serial):
+        """Reject a commission (see AstakosClient.reject_commission)"""
+        self.resolve_batch.call((serial, False))
+
+    def _issue(self, requests):
+        if len(requests) == 1:
+            try:
+                return [self.client._issue_commission(requests[0])]
+            except AstakosClientException as err:
+                return [err]
+        return self.client.issue_commissions_bulk(requests)
+
+    def _resolve(self, actions):
+        accept = sorted(serial for serial, accepted in actions if accepted)
+        reject = sorted(serial for serial, accepted in actions
+                        if not accepted)
+        response = self.client.resolve_commissions(accept, reject)
+        failed = {}
+        for serial, fault in response.get("failed", []):
+            failed[serial] = self.client._commission_fault(fault)
+        return [failed.get(serial) for serial, accepted in actions]
+
+
 # --------------------------------------------------------------------
 # Private functions
 # We want _do_request to be a distinct function
@@ -0,0 +1,148 @@
+# Copyright (C) 2010-2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Keep-alive pools of HTTP connections
+"""
+
+import errno
+import socket
+import threading
+from time import time
+from httplib import HTTPConnection, HTTPSConnection, BadStatusLine
+from contextlib import contextmanager
+
+# Seconds a connection may stay idle in the pool. Keep it below the
+# keep-alive timeout of the web server in front of Astakos, so that
+# connections are evicted before the server closes them.
+DEFAULT_IDLE_TIMEOUT = 4
+
+# Errors of a kept-alive connection that the server has closed
+STALE_CONNECTION_ERRORS = (BadStatusLine, socket.error)
+
+# Methods of the requests that may be sent again on a new connection
+IDEMPOTENT_METHODS = frozenset(["GET", "HEAD", "PUT", "DELETE", "OPTIONS"])
+
+
+def is_stale_connection_error(err):
+    """Whether the server closed the connection before any response
+
+    The server does so when it closes a kept-alive connection that has been
+    idle, before it reads the request.
+
+    """
+    if isinstance(err, BadStatusLine):
+        # No status line at all, not a malformed one
+        return err.line in ("", "''") or \
+            err.line.startswith("No status line received")
+    if isinstance(err, socket.error):
+        return err.errno in (errno.ECONNRESET, errno.EPIPE)
+    return False
+
+
+class HTTPConnectionPool(object):
+    """A pool of keep-alive connections to a single host
+
+    At most 'size' idle connections are kept, each one for at most
+    'idle_timeout' seconds. More connections are opened when needed, but
+    closed after use.
+
+    """
+    def __init__(self, scheme, netloc, size=8,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        if scheme == "https":
+            self.conn_class = HTTPSConnection
+        else:
+            self.conn_class = HTTPConnection
+        self.netloc = netloc
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.lock = threading.Lock()
+        # Idle connections with the time they were last used, oldest first
+        self.idle = []
+        self.created = 0
+        self.reused = 0
+
+    def get(self):
+        """Get an idle connection, or a new one"""
+        conn = None
+        expired = []
+        now = time()
+        with self.lock:
+            while self.idle and now - self.idle[0][1] > self.idle_timeout:
+                expired.append(self.idle.pop(0)[0])
+            if self.idle:
+                conn = self.idle.pop()[0]
+                self.reused += 1
+            else:
+                self.created += 1
+        for c in expired:
+            c.close()
+
+        if conn is None:
+            conn = self.conn_class(self.netloc)
+            conn.reused = False
+        else:
+            conn.reused = True
+        return conn
+
+    def put(self, conn):
+        """Return a connection to the pool"""
+        if conn.sock is None:
+            # Closed, e.g. because the server asked so
+            return
+        with self.lock:
+            if len(self.idle) < self.size:
+                self.idle.append((conn, time()))
+                return
+        conn.close()
+
+    def clear(self):
+        """Close all idle connections"""
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for conn, used in idle:
+            conn.close()
+
+    @contextmanager
+    def connection(self):
+        """Use a connection of the pool
+
+        The connection is returned to the pool, unless an exception is
+        raised while using it.
+
+        """
+        conn = self.get()
+        try:
+            yield conn
+        except:
+            conn.close()
+            raise
+        self.put(conn)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(scheme, netloc, size, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+    """Return the pool of the process for the given host and parameters"""
+    key = (scheme, netloc, size, idle_timeout)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = HTTPConnectionPool(
+                scheme, netloc, size=size, idle_timeout=idle_timeout)
+    return pool
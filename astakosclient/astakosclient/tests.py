@@ -23,7 +23,13 @@ the astakos client library
 """
 
 import re
+import copy
+import urlparse
 import sys
+import threading
+import BaseHTTPServer
+import SocketServer
+from time import sleep
 
 try:
     import simplejson as json
@@ -31,8 +37,9 @@ except ImportError:
     import json
 
 import astakosclient
-from astakosclient import AstakosClient
-from astakosclient.utils import join_urls
+from astakosclient import AstakosClient, CommissionBatcher
+from astakosclient.utils import join_urls, RetryBudget
+from astakosclient.pool import get_pool, DEFAULT_IDLE_TIMEOUT
 from astakosclient.errors import \
     AstakosClientException, Unauthorized, BadRequest, NotFound, \
     NoUserName, NoUUID, BadValue, QuotaLimit
@@ -46,6 +53,10 @@ except ImportError:
     import unittest
 
 
+# The actual request function, before it is mocked
+_real_do_request = astakosclient._do_request
+
+
 # --------------------------------------------------------------------
 # Helper functions
 auth_url = "https://example.org/identity/v2.0"
@@ -56,6 +67,7 @@ api_tokens = "/identity/v2.0/tokens"
 api_usercatalogs = join_urls(account_prefix, "user_catalogs")
 api_resources = join_urls(account_prefix, "resources")
 api_quotas = join_urls(account_prefix, "quotas")
+api_service_quotas = join_urls(account_prefix, "service_quotas")
 api_commissions = join_urls(account_prefix, "commissions")
 
 # --------------------------------------
@@ -164,8 +176,12 @@ commission_failure_response = {
             "limit": 600000000,
             "usage": 180000000}}}
 
+service_quotas = dict(("%02d-uuid" % i, quotas) for i in range(5))
+
 pending_commissions = [100, 200]
 
+bulk_requests = []
+
 commission_description = {
     "serial": 57,
     "issue_time": "2013-04-08T10:19:15.0373+00:00",
@@ -254,6 +270,8 @@ def _mock_request(conn, method, url, **kwargs):
         return _req_resources(conn, method, url, **kwargs)
     elif api_quotas == url:
         return _req_quotas(conn, method, url, **kwargs)
+    elif url.startswith(api_service_quotas):
+        return _req_service_quotas(conn, method, url, **kwargs)
     elif url.startswith(api_commissions):
         return _req_commission(conn, method, url, **kwargs)
     else:
@@ -346,6 +364,29 @@ def _req_quotas(conn, method, url, **kwargs):
     return ("", json.dumps(quotas), 200)
 
 
+def _req_service_quotas(conn, method, url, **kwargs):
+    """Return a page of the quotas of the service users"""
+    global token, service_quotas
+
+    # Check input
+    if conn.__class__.__name__ != "HTTPSConnection":
+        return _request_status_302(conn, method, url, **kwargs)
+    if method != "GET":
+        return _request_status_400(conn, method, url, **kwargs)
+    req_token = kwargs['headers'].get('X-Auth-Token')
+    if req_token != token['id']:
+        return _request_status_401(conn, method, url, **kwargs)
+
+    # Return
+    params = urlparse.parse_qs(urlparse.urlparse(url).query)
+    marker = params.get('marker', [""])[0]
+    uuids = sorted(u for u in service_quotas if u > marker)
+    if 'limit' in params:
+        uuids = uuids[:int(params['limit'][0])]
+    page = dict((u, service_quotas[u]) for u in uuids)
+    return ("", json.dumps(page), 200)
+
+
 def _req_commission(conn, method, url, **kwargs):
     """Perform a commission for user_1"""
     global token, pending_commissions, \
@@ -373,7 +414,17 @@ def _req_commission(conn, method, url, **kwargs):
         else:
             # Issue commission action
             serial = url.split('/')[3]
-            if serial == "action":
+            if serial == "bulk":
+                # Issue many commissions
+                bulk_requests.append(body)
+                results = []
+                for i, request in enumerate(body['commissions']):
+                    if request['provisions'][1]['quantity'] > 420000000:
+                        results.append(commission_failure_response)
+                    else:
+                        results.append({"serial": 100 + i})
+                return ("", json.dumps({"commissions": results}), 201)
+            elif serial == "action":
                 # Resolve multiple actions
                 if body == resolve_commissions_req:
                     return ("", json.dumps(resolve_commissions_rep), 200)
@@ -404,6 +455,79 @@ def _req_commission(conn, method, url, **kwargs):
         return _request_status_400(conn, method, url, **kwargs)
 
 
+# --------------------------------------------------------------------
+# An in-process HTTP server, for testing the actual connections
+
+class _FakeAstakosHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Answer every request with an empty JSON object"""
+    protocol_version = "HTTP/1.1"
+    # Send each response at once, as real servers do, and not in small
+    # writes that would wait for delayed ACKs of the client
+    wbufsize = -1
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):  # noqa
+        server = self.server
+        length = int(self.headers.get("content-length") or 0)
+        if length:
+            self.rfile.read(length)
+        with server.lock:
+            server.requests += 1
+        if server.delay:
+            sleep(server.delay)
+        body = json.dumps({})
+        self.send_response(server.status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        if server.drop_connections:
+            # Close the connection without telling the client
+            self.close_connection = 1
+
+    do_POST = do_GET
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeAstakosServer(SocketServer.ThreadingMixIn,
+                        BaseHTTPServer.HTTPServer):
+    """An HTTP server, running in a thread, that counts connections"""
+    daemon_threads = True
+
+    def __init__(self):
+        BaseHTTPServer.HTTPServer.__init__(self, ("127.0.0.1", 0),
+                                           _FakeAstakosHandler)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.status = 200
+        self.delay = 0
+        self.drop_connections = False
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+
+    @property
+    def netloc(self):
+        return "127.0.0.1:%s" % self.server_port
+
+    @property
+    def auth_url(self):
+        return "http://%s/identity/v2.0" % self.netloc
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
 # --------------------------------------------------------------------
 # The actual tests
 
@@ -753,6 +877,137 @@ class TestQuotas(unittest.TestCase):
             self.fail("Should have raised Unauthorized Exception")
 
 
+class TestServiceQuotas(unittest.TestCase):
+    """Test cases for function iter_service_quotas"""
+
+    # Patch astakosclient's _do_request function
+    def setUp(self):  # noqa
+        astakosclient._do_request = _mock_request
+
+    # ----------------------------------
+    def test_iter_service_quotas(self):
+        """Test function call of iter_service_quotas"""
+        global service_quotas, token, auth_url
+        try:
+            client = AstakosClient(token['id'], auth_url)
+            pages = list(client.iter_service_quotas(limit=2))
+        except Exception as err:
+            self.fail("Shouldn't raise Exception %s" % err)
+        self.assertEqual([sorted(p.keys()) for p in pages],
+                         [["00-uuid", "01-uuid"], ["02-uuid", "03-uuid"],
+                          ["04-uuid"]])
+        result = {}
+        for page in pages:
+            result.update(page)
+        self.assertEqual(result, service_quotas)
+
+
+class TestCommissionBatcher(unittest.TestCase):
+    """Test cases for coalescing commissions"""
+
+    # Patch astakosclient's _do_request function
+    def setUp(self):  # noqa
+        astakosclient._do_request = _mock_request
+        del bulk_requests[:]
+
+    def _provisions(self, ram):
+        return {("system", "cyclades.vm"): 1,
+                ("system", "cyclades.ram"): ram}
+
+    # ----------------------------------
+    def test_issue_commissions_bulk(self):
+        """Test function call of issue_commissions_bulk"""
+        global token, commission_request, auth_url
+        failing_request = copy.deepcopy(commission_request)
+        failing_request['provisions'][1]['quantity'] = 520000000
+        client = AstakosClient(token['id'], auth_url)
+        results = client.issue_commissions_bulk(
+            [commission_request, failing_request, commission_request])
+        self.assertEqual(results[0], 100)
+        self.assertTrue(isinstance(results[1], QuotaLimit))
+        self.assertEqual(results[2], 102)
+        self.assertEqual(len(bulk_requests), 1)
+
+    # ----------------------------------
+    def test_batcher_coalesces(self):
+        """Test that concurrent commissions are sent with one request"""
+        global token, auth_url
+        client = AstakosClient(token['id'], auth_url)
+        batcher = CommissionBatcher(client, window=5, max_size=4)
+        results = {}
+
+        def issue(i):
+            ram = 520000000 if i == 3 else 30000
+            try:
+                results[i] = batcher.issue_one_commission(
+                    "c02f315b-7d84-45bc-a383-552a3f97d2ad",
+                    self._provisions(ram))
+            except QuotaLimit as err:
+                results[i] = err
+
+        threads = [threading.Thread(target=issue, args=(i,))
+                   for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        # The batch is sent as soon as it is full, not after the window
+        self.assertEqual(len(bulk_requests), 1)
+        self.assertEqual(len(bulk_requests[0]['commissions']), 4)
+        self.assertTrue(isinstance(results[3], QuotaLimit))
+        serials = set(results[i] for i in range(3))
+        self.assertEqual(len(serials), 3)
+        self.assertTrue(serials <= set([100, 101, 102, 103]))
+
+    # ----------------------------------
+    def test_batcher_single(self):
+        """Test that a lone commission is issued without the bulk request"""
+        global token, commission_successful_response, auth_url
+        client = AstakosClient(token['id'], auth_url)
+        batcher = CommissionBatcher(client, window=0)
+        serial = batcher.issue_one_commission(
+            "c02f315b-7d84-45bc-a383-552a3f97d2ad", self._provisions(30000))
+        self.assertEqual(serial, commission_successful_response['serial'])
+        self.assertEqual(bulk_requests, [])
+        self.assertRaises(QuotaLimit, batcher.issue_one_commission,
+                          "c02f315b-7d84-45bc-a383-552a3f97d2ad",
+                          self._provisions(520000000))
+
+    # ----------------------------------
+    def test_batcher_resolve(self):
+        """Test accepting and rejecting commissions through the batcher"""
+        global token, auth_url
+        client = AstakosClient(token['id'], auth_url)
+        batcher = CommissionBatcher(client, window=5, max_size=5)
+        actions = [(batcher.accept_commission, 56),
+                   (batcher.accept_commission, 57),
+                   (batcher.reject_commission, 56),
+                   (batcher.reject_commission, 58),
+                   (batcher.reject_commission, 59)]
+        results = {}
+
+        def resolve(i):
+            action, serial = actions[i]
+            try:
+                results[i] = action(serial)
+            except AstakosClientException as err:
+                results[i] = err
+
+        threads = [threading.Thread(target=resolve, args=(i,))
+                   for i in range(len(actions))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertTrue(isinstance(results[0], BadRequest))
+        self.assertEqual(results[1], None)
+        self.assertTrue(isinstance(results[2], BadRequest))
+        self.assertTrue(isinstance(results[3], NotFound))
+        self.assertEqual(results[4], None)
+
+
 class TestCommissions(unittest.TestCase):
     """Test cases for quota commissions"""
 
@@ -914,6 +1169,129 @@ class TestCommissions(unittest.TestCase):
         self.assertEqual(result, resolve_commissions_rep)
 
 
+class TestConnectionPool(unittest.TestCase):
+    """Test cases for the keep-alive connections and the retry budget"""
+
+    path = join_urls(account_prefix, "resources")
+
+    def setUp(self):  # noqa
+        astakosclient._do_request = _real_do_request
+        self.server = FakeAstakosServer()
+        self.server.start()
+
+    def tearDown(self):  # noqa
+        self.server.stop()
+
+    def _pool(self, size=8, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        return get_pool("http", self.server.netloc, size, idle_timeout)
+
+    def _client(self, **kwargs):
+        global token
+        return AstakosClient(token['id'], self.server.auth_url, **kwargs)
+
+    def _call(self, client, times=1):
+        for i in range(times):
+            self.assertEqual(client._call_astakos(self.path), {})
+
+    # ----------------------------------
+    def test_keep_alive(self):
+        """Test that the pool reuses a connection"""
+        self._call(self._client(use_pool=True), 5)
+        self.assertEqual(self.server.requests, 5)
+        self.assertEqual(self.server.connections, 1)
+        self._pool().clear()
+
+    # ----------------------------------
+    def test_without_pool(self):
+        """Test that without a pool each request has its own connection"""
+        self._call(self._client(), 3)
+        self.assertEqual(self.server.connections, 3)
+
+    # ----------------------------------
+    def test_idle_timeout(self):
+        """Test that idle connections are evicted"""
+        client = self._client(use_pool=True, pool_idle_timeout=0.05)
+        self._call(client)
+        sleep(0.1)
+        self._call(client)
+        self.assertEqual(self.server.connections, 2)
+        self._pool(idle_timeout=0.05).clear()
+
+    # ----------------------------------
+    def test_pool_size(self):
+        """Test that at most pool_size idle connections are kept"""
+        client = self._client(use_pool=True, pool_size=2)
+        self.server.delay = 0.1
+        threads = [threading.Thread(target=self._call, args=(client,))
+                   for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(self.server.connections, 4)
+        pool = self._pool(size=2)
+        self.assertEqual(len(pool.idle), 2)
+
+        self.server.delay = 0
+        self._call(client, 3)
+        self.assertEqual(self.server.connections, 4)
+        pool.clear()
+
+    # ----------------------------------
+    def test_stale_connection(self):
+        """Test reconnecting when Astakos closes a kept-alive connection"""
+        self.server.drop_connections = True
+        self._call(self._client(use_pool=True), 3)
+        self.assertEqual(self.server.requests, 3)
+        self.assertEqual(self.server.connections, 3)
+        self._pool().clear()
+
+    # ----------------------------------
+    def test_stale_connection_post(self):
+        """Test that a POST is not sent again on a stale connection"""
+        self.server.drop_connections = True
+        client = self._client(use_pool=True, retry=0)
+        client._call_astakos(self.path, method="POST")
+        self.assertRaises(AstakosClientException, client._call_astakos,
+                          self.path, method="POST")
+        self.assertEqual(self.server.requests, 1)
+        self._pool().clear()
+
+    # ----------------------------------
+    def test_retry_budget(self):
+        """Test that retries stop when the budget is exhausted"""
+        self.server.status = 500
+        client = self._client(retry=5,
+                              retry_budget=RetryBudget(capacity=2, rate=0))
+        self.assertRaises(AstakosClientException,
+                          client._call_astakos, self.path)
+        self.assertEqual(self.server.requests, 3)
+        self.assertRaises(AstakosClientException,
+                          client._call_astakos, self.path)
+        self.assertEqual(self.server.requests, 4)
+
+
+class TestRetryBudget(unittest.TestCase):
+    """Test cases for the token bucket of retries"""
+
+    def test_refill(self):
+        now = [0.0]
+        budget = RetryBudget(capacity=2, rate=0.5, clock=lambda: now[0])
+        self.assertTrue(budget.acquire())
+        self.assertTrue(budget.acquire())
+        self.assertFalse(budget.acquire())
+        now[0] = 1.0
+        self.assertFalse(budget.acquire())
+        now[0] = 2.0
+        self.assertTrue(budget.acquire())
+        self.assertFalse(budget.acquire())
+        # The bucket does not fill above its capacity
+        now[0] = 100.0
+        self.assertTrue(budget.acquire())
+        self.assertTrue(budget.acquire())
+        self.assertFalse(budget.acquire())
+
+
 # ----------------------------
 # Run tests
 if __name__ == "__main__":
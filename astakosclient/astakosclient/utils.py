@@ -17,11 +17,13 @@
 Astakos Client utility module
 """
 
+import threading
+from time import time
 from httplib import HTTPConnection, HTTPSConnection
 from contextlib import closing
 
-from objpool.http import PooledHTTPConnection
 from astakosclient.errors import AstakosClientException, BadValue
+from astakosclient.pool import get_pool, DEFAULT_IDLE_TIMEOUT
 
 try:
     import simplejson as json
@@ -48,17 +50,71 @@ def retry_dec(func):
                     # or Not Found or Request Entity Too Large
                     # return immediately
                     raise err
+                if not self.retry_budget.acquire():
+                    self.logger.warning("AstakosClient request failed and the"
+                                        " retry budget is exhausted")
+                    raise err
                 self.logger.warning("AstakosClient request failed..retrying")
                 attemps += 1
     return decorator
 
 
-def scheme_to_class(scheme, use_pool, pool_size):
+# Retries allowed in a burst, and retries allowed per second afterwards, by
+# the retry budget that the clients of a host share by default
+DEFAULT_RETRY_BUDGET_CAPACITY = 10
+DEFAULT_RETRY_BUDGET_RATE = 1.0
+
+
+class RetryBudget(object):
+    """A token bucket that limits the rate of retries
+
+    Each retry takes a token from the bucket, which holds at most
+    'capacity' tokens and is refilled with 'rate' tokens per second. When
+    the bucket is empty, failed requests are not retried, so that a slow
+    Astakos is not flooded with retries.
+
+    """
+    def __init__(self, capacity=DEFAULT_RETRY_BUDGET_CAPACITY,
+                 rate=DEFAULT_RETRY_BUDGET_RATE, clock=time):
+        self.capacity = float(capacity)
+        self.rate = float(rate)
+        self.clock = clock
+        self.tokens = self.capacity
+        self.last = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token, if there is one"""
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(self.capacity,
+                              self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+_retry_budgets = {}
+_retry_budgets_lock = threading.Lock()
+
+
+def get_retry_budget(netloc):
+    """Return the default retry budget of the process for a host"""
+    with _retry_budgets_lock:
+        budget = _retry_budgets.get(netloc)
+        if budget is None:
+            budget = _retry_budgets[netloc] = RetryBudget()
+    return budget
+
+
+def scheme_to_class(scheme, use_pool, pool_size,
+                    idle_timeout=DEFAULT_IDLE_TIMEOUT):
     """Return the appropriate conn class for given scheme"""
-    def _objpool(netloc):
-        """Helper function to return a PooledHTTPConnection object"""
-        return PooledHTTPConnection(
-            netloc=netloc, scheme=scheme, size=pool_size)
+    def _pooled_connection(netloc):
+        """Helper function to use a connection of the keep-alive pool"""
+        return get_pool(scheme, netloc, pool_size, idle_timeout).connection()
 
     def _http_connection(netloc):
         """Helper function to return an HTTPConnection object"""
@@ -70,12 +126,12 @@ def scheme_to_class(scheme, use_pool, pool_size):
 
     if scheme == "http":
         if use_pool:
-            return _objpool
+            return _pooled_connection
         else:
             return _http_connection
     elif scheme == "https":
         if use_pool:
-            return _objpool
+            return _pooled_connection
         else:
             return _https_connection
     else:
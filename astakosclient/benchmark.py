@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2010-2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Measure the cost of the connections of astakosclient.
+
+Issue sequential and concurrent requests to an in-process HTTP server, with
+and without the keep-alive pool, and report the mean time per request and
+the number of connections the server accepted. Alternatively, measure the
+requests to a real Astakos with --auth-url and --token.
+
+"""
+
+import threading
+from optparse import OptionParser
+from time import time
+
+from astakosclient import AstakosClient
+from astakosclient.utils import join_urls
+from astakosclient.pool import get_pool
+from astakosclient.tests import FakeAstakosServer
+
+
+def run(client, path, requests, threads):
+    def worker(count):
+        for i in xrange(count):
+            client._call_astakos(path)
+
+    per_thread = requests // threads
+    workers = [threading.Thread(target=worker, args=(per_thread,))
+               for i in xrange(threads)]
+    start = time()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return (time() - start) / (per_thread * threads)
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('--requests',
+                      dest='requests',
+                      default=2000,
+                      help="Number of requests per run (default=2000)")
+    parser.add_option('--threads',
+                      dest='threads',
+                      default=8,
+                      help="Number of threads of the concurrent runs"
+                           " (default=8)")
+    parser.add_option('--auth-url',
+                      dest='auth_url',
+                      default=None,
+                      help="Measure against this Astakos instead")
+    parser.add_option('--token',
+                      dest='token',
+                      default="token",
+                      help="Token to use with --auth-url")
+
+    (options, args) = parser.parse_args()
+    requests = int(options.requests)
+    threads = int(options.threads)
+
+    server = None
+    auth_url = options.auth_url
+    if auth_url is None:
+        server = FakeAstakosServer()
+        server.start()
+        auth_url = server.auth_url
+    path = join_urls("/account/v1.0", "resources")
+
+    print "%-12s %8s %14s %12s" % ("mode", "threads", "per call (ms)",
+                                   "connections")
+    for use_pool in (False, True):
+        for n in (1, threads):
+            client = AstakosClient(options.token, auth_url,
+                                   use_pool=use_pool, pool_size=threads)
+            connections = server.connections if server else 0
+            t = run(client, path, requests, n)
+            connections = (server.connections - connections
+                           if server else "-")
+            print "%-12s %8s %14.3f %12s" % (
+                "pool" if use_pool else "no pool", n, t * 1000, connections)
+            if use_pool:
+                client_pool = get_pool(client.scheme, client.astakos_base_url,
+                                       threads)
+                client_pool.clear()
+
+    if server is not None:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
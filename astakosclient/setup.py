@@ -41,7 +41,6 @@ CLASSIFIERS = []
 
 # Package requirements
 INSTALL_REQUIRES = [
-    "objpool>=0.3",
 ]
 
 EXTRAS_REQUIRES = {
@@ -0,0 +1,284 @@
+# Copyright (C) 2010-2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Apply admin actions on many items concurrently.
+
+The action of a request is applied to its items by a bounded pool of
+ADMIN_ACTION_WORKERS threads. Actions of modules that define `wait_action`
+are first applied to all items and then waited for, as before.
+
+The outcome of each item is classified the same way as when the items were
+processed one by one, and the outcomes are combined in the order of the
+items, so that the response of a request is the same. An unknown or
+unimplemented operation fails the whole request and the items that have not
+started yet are skipped.
+
+A request can also run as an ActionJob in the background, whose progress is
+polled by the UI. A job that stops updating its heartbeat, e.g. because its
+process died, is marked as failed when it is polled.
+"""
+
+import logging
+import threading
+from datetime import datetime, timedelta
+from multiprocessing.pool import ThreadPool
+
+from django.db import close_connection
+from django.db.models import Q
+
+from snf_django.lib.api import faults
+
+from synnefo_admin import admin_settings
+from synnefo_admin.admin import exceptions
+from synnefo_admin.admin.models import ActionJob, ActionJobItem
+
+logger = logging.getLogger(__name__)
+
+SUCCESS_MSG = "All actions finished successfully."
+NOT_PERMITTED_MSG = "You are not allowed to do this operation."
+UNKNOWN_MSG = "You have requested an unknown operation."
+NOT_IMPLEMENTED_MSG = "You have requested an unimplemented action."
+CANNOT_APPLY_MSG = """
+                You have requested an action that cannot apply to a target.
+                """
+STALE_JOB_MSG = "The action stopped before it finished."
+
+
+class ActionResult(object):
+
+    """The outcome of an action on an item."""
+
+    def __init__(self, id, status=200, message="", fatal=False,
+                 skipped=False):
+        self.id = id
+        self.status = status
+        self.message = message
+        # A fatal error applies to the whole request, not to the item
+        self.fatal = fatal
+        self.skipped = skipped
+
+    @property
+    def failed(self):
+        return self.status != 200
+
+    @property
+    def state(self):
+        if self.skipped:
+            return ActionJobItem.SKIPPED
+        if self.failed:
+            return ActionJobItem.FAILED
+        return ActionJobItem.SUCCEEDED
+
+
+def classify(id, e):
+    """Return the outcome of an action on an item that raised `e`."""
+    if isinstance(e, faults.BadRequest):
+        return ActionResult(id, 400, e.message)
+    elif isinstance(e, (exceptions.AdminActionNotPermitted,
+                        faults.NotAllowed)):
+        return ActionResult(id, 403, NOT_PERMITTED_MSG)
+    elif isinstance(e, exceptions.AdminActionUnknown):
+        return ActionResult(id, 404, UNKNOWN_MSG, fatal=True)
+    elif isinstance(e, exceptions.AdminActionNotImplemented):
+        return ActionResult(id, 501, NOT_IMPLEMENTED_MSG, fatal=True)
+    elif isinstance(e, exceptions.AdminActionCannotApply):
+        return ActionResult(id, 400, CANNOT_APPLY_MSG)
+    else:
+        return ActionResult(id, 500, e.message)
+
+
+def summarize(results):
+    """Combine the outcomes of the items of a request.
+
+    Return the status and the body of the response. The results must be in
+    the order of the items of the request.
+    """
+    status = 200
+    response = {
+        'result': SUCCESS_MSG,
+        'error_ids': [],
+    }
+    for result in results:
+        if result.skipped or not result.failed:
+            continue
+        status = result.status
+        response['result'] = result.message
+        if result.fatal:
+            break
+        response['error_ids'].append(result.id)
+    return status, response
+
+
+def execute(request, mod, op, ids, workers=None, callback=None):
+    """Apply an action on items concurrently and return their outcomes.
+
+    `callback` is called in this thread with the outcome of each item, as
+    soon as the item is done.
+    """
+    if workers is None:
+        workers = admin_settings.ADMIN_ACTION_WORKERS
+    results = dict((id, ActionResult(id, skipped=True)) for id in ids)
+    if callback is None:
+        def callback(result):
+            pass
+    aborted = threading.Event()
+    wait = getattr(mod, 'wait_action', None)
+
+    def do_action(id):
+        if aborted.is_set():
+            return ActionResult(id, skipped=True)
+        try:
+            mod.do_action(request, op, id)
+            return ActionResult(id)
+        except Exception as e:
+            result = classify(id, e)
+            if result.status == 500:
+                logger.exception("Uncaught exception")
+            if result.fatal:
+                aborted.set()
+            return result
+        finally:
+            close_connection()
+
+    def wait_action(id):
+        try:
+            wait(request, op, id)
+            return ActionResult(id)
+        except Exception as e:
+            logger.exception("Failed to wait for action '%s' on %s", op, id)
+            return classify(id, e)
+        finally:
+            close_connection()
+
+    pool = ThreadPool(max(1, min(workers, len(ids))))
+    try:
+        done = []
+        for result in pool.imap_unordered(do_action, ids):
+            results[result.id] = result
+            if wait is None or result.failed or result.skipped:
+                callback(result)
+            else:
+                done.append(result.id)
+        if wait is not None and done:
+            for result in pool.imap_unordered(wait_action, done):
+                results[result.id] = result
+                callback(result)
+    finally:
+        pool.close()
+        pool.join()
+    return [results[id] for id in ids]
+
+
+def create_job(request, target, op, ids):
+    """Record a job for an action on the given items."""
+    job = ActionJob.objects.create(
+        target=target, op=op, owner=request.user_uniq,
+        heartbeat=datetime.now())
+    ActionJobItem.objects.bulk_create([ActionJobItem(job=job, item_id=id)
+                                       for id in ids])
+    return job
+
+
+def run_job(job, request, mod, ids, workers=None):
+    """Apply the action of a job and record the outcome of each item."""
+    def record(result):
+        job.items.filter(item_id=result.id).update(
+            state=result.state, status=result.status,
+            message=result.message)
+
+    try:
+        results = execute(request, mod, job.op, ids, workers=workers,
+                          callback=record)
+        job.status, response = summarize(results)
+        job.result = response['result']
+    except Exception as e:
+        logger.exception("Job %s failed", job.id)
+        job.status = 500
+        job.result = e.message
+    job.state = ActionJob.FINISHED
+    job.finished = datetime.now()
+    job.save()
+    return job
+
+
+def start_job(job, request, mod, ids):
+    """Run a job in a background thread.
+
+    Another thread updates the heartbeat of the job until it finishes.
+    """
+    finished = threading.Event()
+    interval = admin_settings.ADMIN_ACTION_JOB_TIMEOUT / 4.0
+
+    def heartbeat():
+        try:
+            while not finished.wait(interval):
+                ActionJob.objects.filter(id=job.id).update(
+                    heartbeat=datetime.now())
+        finally:
+            close_connection()
+
+    def run():
+        try:
+            run_job(job, request, mod, ids)
+        finally:
+            finished.set()
+            close_connection()
+
+    for target, name in ((run, "admin-job-%s"),
+                         (heartbeat, "admin-job-%s-heartbeat")):
+        thread = threading.Thread(target=target, name=name % job.id)
+        thread.daemon = True
+        thread.start()
+
+
+def fail_stale_job(job):
+    """Mark a running job whose heartbeat has stopped as failed.
+
+    Return the job as it is in the DB.
+    """
+    if job.state != ActionJob.RUNNING:
+        return job
+    now = datetime.now()
+    deadline = now - timedelta(seconds=admin_settings.ADMIN_ACTION_JOB_TIMEOUT)
+    stale = ActionJob.objects.filter(
+        Q(heartbeat__lt=deadline) |
+        Q(heartbeat__isnull=True, created__lt=deadline),
+        id=job.id, state=ActionJob.RUNNING)
+    if stale.update(state=ActionJob.FINISHED, status=500,
+                    result=STALE_JOB_MSG, finished=now):
+        logger.error("Job %s stopped before it finished", job.id)
+        job.items.filter(state=ActionJobItem.PENDING).update(
+            state=ActionJobItem.SKIPPED)
+        job = ActionJob.objects.get(id=job.id)
+    return job
+
+
+def job_dict(job):
+    """Return the progress of a job, to be polled by the UI."""
+    items = list(job.items.order_by('id'))
+    return {
+        'id': job.id,
+        'target': job.target,
+        'op': job.op,
+        'state': job.state,
+        'status': job.status,
+        'result': job.result,
+        'total': len(items),
+        'done': len([i for i in items if i.state != ActionJobItem.PENDING]),
+        'error_ids': [i.item_id for i in items
+                      if i.state == ActionJobItem.FAILED],
+        'results': [{'id': i.item_id, 'state': i.state, 'status': i.status,
+                     'message': i.message} for i in items],
+    }
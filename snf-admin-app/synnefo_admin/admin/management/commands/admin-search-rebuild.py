@@ -0,0 +1,74 @@
+# Copyright (C) 2010-2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from optparse import make_option
+
+from django.db import router, transaction
+
+from snf_django.management.commands import SynnefoCommand, CommandError
+from synnefo_admin.admin import search
+from synnefo_admin.admin.models import SearchToken
+
+
+class Command(SynnefoCommand):
+    help = """Rebuild the search index of the admin catalog filters.
+
+    Index the searchable fields of the given entities, or of all of them,
+    in chunks, each in its own transaction, so that the index stays usable
+    while it is rebuilt. Entries of entities that no longer exist are
+    removed.
+
+    """
+
+    option_list = SynnefoCommand.option_list + (
+        make_option("--entity",
+                    action="append",
+                    default=None,
+                    help="Rebuild the index only for this entity (one of: %s)."
+                         " Can be given more than once."
+                         % ", ".join(sorted(search.ENTITIES))),
+        make_option("--chunk-size",
+                    default=1000,
+                    help="Number of instances to index in each transaction"
+                         " (default: 1000)"),
+    )
+
+    def handle(self, *args, **options):
+        try:
+            chunk_size = int(options["chunk_size"])
+        except ValueError:
+            raise CommandError("Expecting a number.")
+        if chunk_size <= 0:
+            raise CommandError("Expecting a positive number.")
+
+        names = options["entity"] or sorted(search.ENTITIES)
+        for name in names:
+            if name not in search.ENTITIES:
+                raise CommandError("Unknown entity: %s" % name)
+
+        using = router.db_for_write(SearchToken)
+        for name in names:
+            count = 0
+            with transaction.commit_manually(using=using):
+                try:
+                    for indexed in search.rebuild(search.ENTITIES[name],
+                                                  chunk_size):
+                        transaction.commit(using=using)
+                        count += indexed
+                except:
+                    transaction.rollback(using=using)
+                    raise
+            self.stderr.write("Indexed %d instances of entity '%s'.\n"
+                              % (count, name))
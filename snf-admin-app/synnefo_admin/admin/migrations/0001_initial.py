@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+import datetime
+from south.db import db
+from south.v2 import SchemaMigration
+from django.db import models
+
+
+class Migration(SchemaMigration):
+
+    def forwards(self, orm):
+        # Adding model 'SearchToken'
+        db.create_table('admin_searchtoken', (
+            ('id', self.gf('django.db.models.fields.AutoField')(primary_key=True)),
+            ('token', self.gf('django.db.models.fields.CharField')(max_length=64, db_index=True)),
+            ('entity', self.gf('django.db.models.fields.CharField')(max_length=16)),
+            ('entity_id', self.gf('django.db.models.fields.BigIntegerField')()),
+            ('owner', self.gf('django.db.models.fields.CharField')(max_length=255, null=True)),
+        ))
+        db.send_create_signal('admin', ['SearchToken'])
+
+        # Adding unique constraint on 'SearchToken', fields ['entity', 'entity_id', 'token']
+        db.create_unique('admin_searchtoken', ['entity', 'entity_id', 'token'])
+
+    def backwards(self, orm):
+        # Removing unique constraint on 'SearchToken', fields ['entity', 'entity_id', 'token']
+        db.delete_unique('admin_searchtoken', ['entity', 'entity_id', 'token'])
+
+        # Deleting model 'SearchToken'
+        db.delete_table('admin_searchtoken')
+
+    models = {
+        'admin.searchtoken': {
+            'Meta': {'unique_together': "(('entity', 'entity_id', 'token'),)", 'object_name': 'SearchToken'},
+            'entity': ('django.db.models.fields.CharField', [], {'max_length': '16'}),
+            'entity_id': ('django.db.models.fields.BigIntegerField', [], {}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'owner': ('django.db.models.fields.CharField', [], {'max_length': '255', 'null': 'True'}),
+            'token': ('django.db.models.fields.CharField', [], {'max_length': '64', 'db_index': 'True'})
+        }
+    }
+
+    complete_apps = ['admin']
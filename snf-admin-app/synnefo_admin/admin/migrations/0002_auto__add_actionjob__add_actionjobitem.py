@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+import datetime
+from south.db import db
+from south.v2 import SchemaMigration
+from django.db import models
+
+
+class Migration(SchemaMigration):
+
+    def forwards(self, orm):
+        # Adding model 'ActionJob'
+        db.create_table('admin_actionjob', (
+            ('id', self.gf('django.db.models.fields.AutoField')(primary_key=True)),
+            ('target', self.gf('django.db.models.fields.CharField')(max_length=32)),
+            ('op', self.gf('django.db.models.fields.CharField')(max_length=64)),
+            ('owner', self.gf('django.db.models.fields.CharField')(max_length=255)),
+            ('state', self.gf('django.db.models.fields.CharField')(default='RUNNING', max_length=16)),
+            ('status', self.gf('django.db.models.fields.IntegerField')(null=True)),
+            ('result', self.gf('django.db.models.fields.TextField')(default='')),
+            ('created', self.gf('django.db.models.fields.DateTimeField')(auto_now_add=True, blank=True)),
+            ('finished', self.gf('django.db.models.fields.DateTimeField')(null=True)),
+        ))
+        db.send_create_signal('admin', ['ActionJob'])
+
+        # Adding model 'ActionJobItem'
+        db.create_table('admin_actionjobitem', (
+            ('id', self.gf('django.db.models.fields.AutoField')(primary_key=True)),
+            ('job', self.gf('django.db.models.fields.related.ForeignKey')(related_name='items', to=orm['admin.ActionJob'])),
+            ('item_id', self.gf('django.db.models.fields.CharField')(max_length=255)),
+            ('state', self.gf('django.db.models.fields.CharField')(default='PENDING', max_length=16)),
+            ('status', self.gf('django.db.models.fields.IntegerField')(null=True)),
+            ('message', self.gf('django.db.models.fields.TextField')(default='')),
+        ))
+        db.send_create_signal('admin', ['ActionJobItem'])
+
+        # Adding unique constraint on 'ActionJobItem', fields ['job', 'item_id']
+        db.create_unique('admin_actionjobitem', ['job_id', 'item_id'])
+
+    def backwards(self, orm):
+        # Removing unique constraint on 'ActionJobItem', fields ['job', 'item_id']
+        db.delete_unique('admin_actionjobitem', ['job_id', 'item_id'])
+
+        # Deleting model 'ActionJobItem'
+        db.delete_table('admin_actionjobitem')
+
+        # Deleting model 'ActionJob'
+        db.delete_table('admin_actionjob')
+
+    models = {
+        'admin.actionjob': {
+            'Meta': {'object_name': 'ActionJob'},
+            'created': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'blank': 'True'}),
+            'finished': ('django.db.models.fields.DateTimeField', [], {'null': 'True'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'op': ('django.db.models.fields.CharField', [], {'max_length': '64'}),
+            'owner': ('django.db.models.fields.CharField', [], {'max_length': '255'}),
+            'result': ('django.db.models.fields.TextField', [], {'default': "''"}),
+            'state': ('django.db.models.fields.CharField', [], {'default': "'RUNNING'", 'max_length': '16'}),
+            'status': ('django.db.models.fields.IntegerField', [], {'null': 'True'}),
+            'target': ('django.db.models.fields.CharField', [], {'max_length': '32'})
+        },
+        'admin.actionjobitem': {
+            'Meta': {'unique_together': "(('job', 'item_id'),)", 'object_name': 'ActionJobItem'},
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'item_id': ('django.db.models.fields.CharField', [], {'max_length': '255'}),
+            'job': ('django.db.models.fields.related.ForeignKey', [], {'related_name': "'items'", 'to': "orm['admin.ActionJob']"}),
+            'message': ('django.db.models.fields.TextField', [], {'default': "''"}),
+            'state': ('django.db.models.fields.CharField', [], {'default': "'PENDING'", 'max_length': '16'}),
+            'status': ('django.db.models.fields.IntegerField', [], {'null': 'True'})
+        },
+        'admin.searchtoken': {
+            'Meta': {'unique_together': "(('entity', 'entity_id', 'token'),)", 'object_name': 'SearchToken'},
+            'entity': ('django.db.models.fields.CharField', [], {'max_length': '16'}),
+            'entity_id': ('django.db.models.fields.BigIntegerField', [], {}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'owner': ('django.db.models.fields.CharField', [], {'max_length': '255', 'null': 'True'}),
+            'token': ('django.db.models.fields.CharField', [], {'max_length': '64', 'db_index': 'True'})
+        }
+    }
+
+    complete_apps = ['admin']
@@ -0,0 +1,89 @@
+# Copyright (C) 2010-2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from django.db import models
+
+
+class SearchToken(models.Model):
+
+    """A token of a searchable field of an entity.
+
+    The search index of the admin catalog filters. Each entity has one row
+    per distinct token of its searchable fields, along with the UUID of the
+    user that owns it. Users and projects are the owners of themselves, so
+    that the index can answer for their UUIDs as well.
+    """
+
+    token = models.CharField(max_length=64, db_index=True)
+    entity = models.CharField(max_length=16)
+    entity_id = models.BigIntegerField()
+    owner = models.CharField(max_length=255, null=True)
+
+    class Meta:
+        unique_together = (('entity', 'entity_id', 'token'),)
+
+    def __unicode__(self):
+        return u"%s %s: %s" % (self.entity, self.entity_id, self.token)
+
+
+class ActionJob(models.Model):
+
+    """An admin action on many items that runs in the background.
+
+    The outcome of the action on each item is kept in an ActionJobItem, so
+    that the progress of the job can be polled. The status and the result of
+    the job are set when it finishes, as in the response of a synchronous
+    action. The heartbeat is updated while the job runs, so that a job whose
+    process has died can be told apart.
+    """
+
+    RUNNING = "RUNNING"
+    FINISHED = "FINISHED"
+
+    target = models.CharField(max_length=32)
+    op = models.CharField(max_length=64)
+    owner = models.CharField(max_length=255)
+    state = models.CharField(max_length=16, default=RUNNING)
+    status = models.IntegerField(null=True)
+    result = models.TextField(default="")
+    created = models.DateTimeField(auto_now_add=True)
+    finished = models.DateTimeField(null=True)
+    heartbeat = models.DateTimeField(null=True)
+
+    def __unicode__(self):
+        return u"<ActionJob %s: %s %s>" % (self.id, self.op, self.target)
+
+
+class ActionJobItem(models.Model):
+
+    """The outcome of the action of a job on an item."""
+
+    PENDING = "PENDING"
+    SUCCEEDED = "SUCCEEDED"
+    FAILED = "FAILED"
+    SKIPPED = "SKIPPED"
+
+    job = models.ForeignKey(ActionJob, related_name="items")
+    item_id = models.CharField(max_length=255)
+    state = models.CharField(max_length=16, default=PENDING)
+    status = models.IntegerField(null=True)
+    message = models.TextField(default="")
+
+    class Meta:
+        unique_together = (('job', 'item_id'),)
+
+
+# Connect the hooks that keep the search index up to date
+from synnefo_admin.admin import search  # noqa
@@ -22,6 +22,7 @@ from django.core.exceptions import FieldError
 from django.conf import settings
 
 from synnefo_admin.admin.utils import model_dict
+from synnefo_admin.admin import search
 from synnefo_admin import admin_settings
 
 sign = admin_settings.ADMIN_FIELD_SIGN
@@ -64,6 +65,21 @@ def get_model_field(model, query, field):
     return list(ids)
 
 
+def search_model_field(model, queries, field, queryset):
+    """Get search results for a specific model field.
+
+    If the search index is enabled and can answer the queries, the results
+    are taken from the index, else they are computed by get_model_field().
+    The results are meant to filter `queryset` with an "IN" query. If it is
+    in the same database as the index, they are a subquery, else a list.
+    """
+    if admin_settings.ADMIN_SEARCH_INDEX:
+        ids = search.search(model, queries, field, using=queryset.db)
+        if ids is not None:
+            return ids
+    return get_model_field(model, query(model, queries), field)
+
+
 def model_filter(func):
     """Decorator to format query before passing it to a filter function.
 
@@ -20,28 +20,26 @@ from synnefo.db.models import IPAddressLog, VirtualMachine
 import django_filters
 
 from synnefo_admin.admin.queries_common import (query, model_filter,
-                                                get_model_field)
+                                                search_model_field)
 
 
 @model_filter
 def filter_user(queryset, queries):
-    q = query("user", queries)
-    user_ids = get_model_field("user", q, 'uuid')
-    vm_ids = VirtualMachine.objects.filter(userid__in=user_ids)
+    vms = VirtualMachine.objects.all()
+    user_ids = search_model_field("user", queries, 'uuid', vms)
+    vm_ids = vms.filter(userid__in=user_ids)
     return queryset.filter(server_id__in=vm_ids)
 
 
 @model_filter
 def filter_vm(queryset, queries):
-    q = query("vm", queries)
-    ids = get_model_field("vm", q, 'id')
+    ids = search_model_field("vm", queries, 'id', queryset)
     return queryset.filter(server_id__in=ids)
 
 
 @model_filter
 def filter_network(queryset, queries):
-    q = query("network", queries)
-    ids = get_model_field("network", q, 'id')
+    ids = search_model_field("network", queries, 'id', queryset)
     return queryset.filter(network_id__in=ids)
 
 
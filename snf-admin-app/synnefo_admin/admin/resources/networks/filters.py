@@ -20,7 +20,7 @@ from synnefo.db.models import Network
 import django_filters
 
 from synnefo_admin.admin.queries_common import (query, model_filter,
-                                                get_model_field)
+                                                search_model_field)
 
 
 @model_filter
@@ -31,29 +31,25 @@ def filter_network(queryset, queries):
 
 @model_filter
 def filter_user(queryset, queries):
-    q = query("user", queries)
-    ids = get_model_field("user", q, 'uuid')
+    ids = search_model_field("user", queries, 'uuid', queryset)
     return queryset.filter(userid__in=ids)
 
 
 @model_filter
 def filter_vm(queryset, queries):
-    q = query("vm", queries)
-    ids = get_model_field("vm", q, 'id')
+    ids = search_model_field("vm", queries, 'id', queryset)
     return queryset.filter(machines__id__in=ids)
 
 
 @model_filter
 def filter_ip(queryset, queries):
-    q = query("ip", queries)
-    ids = get_model_field("ip", q, 'nic__network__id')
+    ids = search_model_field("ip", queries, 'nic__network__id', queryset)
     return queryset.filter(id__in=ids)
 
 
 @model_filter
 def filter_project(queryset, queries):
-    q = query("project", queries)
-    ids = get_model_field("project", q, 'uuid')
+    ids = search_model_field("project", queries, 'uuid', queryset)
     return queryset.filter(project__in=ids)
 
 
@@ -19,7 +19,7 @@ from django.db.models import Q
 
 from astakos.im.models import Project, ProjectApplication
 from synnefo_admin.admin.queries_common import (query, model_filter,
-                                                get_model_field)
+                                                search_model_field)
 
 
 @model_filter
@@ -30,8 +30,7 @@ def filter_project(queryset, queries):
 
 @model_filter
 def filter_user(queryset, queries):
-    q = query("user", queries)
-    ids = get_model_field("user", q, 'uuid')
+    ids = search_model_field("user", queries, 'uuid', queryset)
     qor = Q(members__uuid__in=ids) | Q(owner__uuid__in=ids)
     # BIG FAT FIXME: The below two lines in theory should not be necessary, but
     # if they don't exist, the queryset will produce weird results with the
@@ -43,29 +42,25 @@ def filter_user(queryset, queries):
 
 @model_filter
 def filter_vm(queryset, queries):
-    q = query("vm", queries)
-    ids = get_model_field("vm", q, 'project')
+    ids = search_model_field("vm", queries, 'project', queryset)
     return queryset.filter(uuid__in=ids)
 
 
 @model_filter
 def filter_volume(queryset, queries):
-    q = query("volume", queries)
-    ids = get_model_field("volume", q, 'project')
+    ids = search_model_field("volume", queries, 'project', queryset)
     return queryset.filter(uuid__in=ids)
 
 
 @model_filter
 def filter_network(queryset, queries):
-    q = query("network", queries)
-    ids = get_model_field("network", q, 'project')
+    ids = search_model_field("network", queries, 'project', queryset)
     return queryset.filter(uuid__in=ids)
 
 
 @model_filter
 def filter_ip(queryset, queries):
-    q = query("ip", queries)
-    ids = get_model_field("ip", q, 'project')
+    ids = search_model_field("ip", queries, 'project', queryset)
     return queryset.filter(uuid__in=ids)
 
 
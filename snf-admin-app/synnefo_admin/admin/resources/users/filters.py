@@ -22,7 +22,7 @@ from astakos.im.models import AstakosUser, Project
 from astakos.im import auth_providers
 
 from synnefo_admin.admin.queries_common import (query, model_filter,
-                                                get_model_field)
+                                                search_model_field)
 
 from .utils import get_groups
 
@@ -45,37 +45,35 @@ def filter_user(queryset, queries):
 
 @model_filter
 def filter_vm(queryset, queries):
-    q = query("vm", queries)
-    ids = get_model_field("vm", q, 'userid')
+    ids = search_model_field("vm", queries, 'userid', queryset)
     return queryset.filter(uuid__in=ids)
 
 
 @model_filter
 def filter_volume(queryset, queries):
-    q = query("volume", queries)
-    ids = get_model_field("volume", q, 'userid')
+    ids = search_model_field("volume", queries, 'userid', queryset)
     return queryset.filter(uuid__in=ids)
 
 
 @model_filter
 def filter_network(queryset, queries):
-    q = query("network", queries)
-    ids = get_model_field("network", q, 'userid')
+    ids = search_model_field("network", queries, 'userid', queryset)
     return queryset.filter(uuid__in=ids)
 
 
 @model_filter
 def filter_ip(queryset, queries):
-    q = query("ip", queries)
-    ids = get_model_field("ip", q, 'userid')
+    ids = search_model_field("ip", queries, 'userid', queryset)
     return queryset.filter(uuid__in=ids)
 
 
 @model_filter
 def filter_project(queryset, queries):
-    q = query("project", queries)
-    member_ids = Project.objects.filter(q).values('members__uuid')
-    owner_ids = Project.objects.filter(q).values('owner__uuid')
+    projects = Project.objects.all()
+    ids = search_model_field("project", queries, 'id', projects)
+    projects = projects.filter(id__in=ids)
+    member_ids = projects.values('members__uuid')
+    owner_ids = projects.values('owner__uuid')
     qor = Q(uuid__in=member_ids) | Q(uuid__in=owner_ids)
     return queryset.filter(qor)
 
@@ -18,7 +18,7 @@ import django_filters
 
 from synnefo.db.models import VirtualMachine
 from synnefo_admin.admin.queries_common import (query, model_filter,
-                                                get_model_field)
+                                                search_model_field)
 
 
 @model_filter
@@ -29,36 +29,31 @@ def filter_vm(queryset, queries):
 
 @model_filter
 def filter_user(queryset, queries):
-    q = query("user", queries)
-    ids = get_model_field("user", q, 'uuid')
+    ids = search_model_field("user", queries, 'uuid', queryset)
     return queryset.filter(userid__in=ids)
 
 
 @model_filter
 def filter_volume(queryset, queries):
-    q = query("volume", queries)
-    ids = get_model_field("volume", q, 'machine__id')
+    ids = search_model_field("volume", queries, 'machine__id', queryset)
     return queryset.filter(id__in=ids)
 
 
 @model_filter
 def filter_network(queryset, queries):
-    q = query("network", queries)
-    ids = get_model_field("network", q, 'machines__id')
+    ids = search_model_field("network", queries, 'machines__id', queryset)
     return queryset.filter(id__in=ids)
 
 
 @model_filter
 def filter_ip(queryset, queries):
-    q = query("ip", queries)
-    ids = get_model_field("ip", q, 'machines__id')
+    ids = search_model_field("ip", queries, 'machines__id', queryset)
     return queryset.filter(id__in=ids)
 
 
 @model_filter
 def filter_project(queryset, queries):
-    q = query("project", queries)
-    ids = get_model_field("project", q, 'uuid')
+    ids = search_model_field("project", queries, 'uuid', queryset)
     return queryset.filter(project__in=ids)
 
 
@@ -24,7 +24,7 @@ from synnefo.db.models import Volume
 import django_filters
 
 from synnefo_admin.admin.queries_common import (query, model_filter,
-                                                get_model_field)
+                                                search_model_field)
 
 
 def get_disk_template_choices():
@@ -53,22 +53,19 @@ def filter_volume(queryset, queries):
 
 @model_filter
 def filter_user(queryset, queries):
-    q = query("user", queries)
-    ids = get_model_field("user", q, 'uuid')
+    ids = search_model_field("user", queries, 'uuid', queryset)
     return queryset.filter(userid__in=ids)
 
 
 @model_filter
 def filter_vm(queryset, queries):
-    q = query("vm", queries)
-    ids = get_model_field("vm", q, 'volumes__id')
+    ids = search_model_field("vm", queries, 'volumes__id', queryset)
     return queryset.filter(id__in=ids)
 
 
 @model_filter
 def filter_project(queryset, queries):
-    q = query("project", queries)
-    ids = get_model_field("project", q, 'uuid')
+    ids = search_model_field("project", queries, 'uuid', queryset)
     return queryset.filter(project__in=ids)
 
 
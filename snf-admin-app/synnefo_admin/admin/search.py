@@ -0,0 +1,265 @@
+# Copyright (C) 2010-2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Search index of the admin catalog filters.
+
+The catalog filters search the fields of an entity, e.g. the name of a VM,
+to find the entities, or their owners, that match some keywords. Searching
+the tables of the entities takes a `contains` query per field, which cannot
+use an index, and the results have to be fetched as lists of IDs whenever
+the entities live in another database than the one that is filtered.
+
+Instead, the searchable fields of each entity are split into lowercase
+tokens, which are stored in the SearchToken table along with the ID and the
+owner of the entity. A keyword matches an entity if it is the prefix of one
+of its tokens, and entities must match all the keywords of a query. The
+tokens are the parts of a value that start at each of its words, so that
+keywords match the beginning of any word and may span punctuation, e.g.
+"example.com" in an email or "1.42" in an IP address.
+
+The index is kept up to date by hooks on the saves and deletions of the
+entities in this process, and can be rebuilt with the 'admin-search-rebuild'
+management command.
+"""
+
+import re
+import logging
+
+from django.conf import settings
+from django.db import router
+from django.db.models.signals import post_init, post_save, post_delete
+
+from astakos.im.models import AstakosUser, Project
+from synnefo.db.models import VirtualMachine, Volume, Network, IPAddress
+from snf_django.utils.routers import get_primary
+
+from synnefo_admin import admin_settings
+from synnefo_admin.admin.models import SearchToken
+
+logger = logging.getLogger(__name__)
+
+TOKEN_MAX_LENGTH = SearchToken._meta.get_field('token').max_length
+
+find_words = re.compile(r'[^\W_]+', re.UNICODE).finditer
+starts_with_word = re.compile(r'[^\W_]', re.UNICODE).match
+
+
+def tokenize(value):
+    """Return the tokens of a field value.
+
+    The tokens are the whole value and its parts that start at each of its
+    words, in lowercase and truncated to TOKEN_MAX_LENGTH characters.
+    """
+    if value is None:
+        return set()
+    value = unicode(value).strip().lower()
+    if not value:
+        return set()
+    tokens = set([value])
+    tokens.update(value[word.start():] for word in find_words(value))
+    return set(token[:TOKEN_MAX_LENGTH] for token in tokens)
+
+
+class Entity(object):
+
+    """The searchable fields of a model and how they are indexed.
+
+    `fields` are the fields whose values are tokenized, `owner` is the field
+    that holds the UUID of the owner and `lookups` maps the fields that the
+    filters ask for to the columns of the index that hold them.
+    """
+
+    def __init__(self, name, model, fields, owner, lookups,
+                 extra_tokens=None):
+        self.name = name
+        self.model = model
+        self.fields = fields
+        self.owner = owner
+        self.lookups = lookups
+        self.extra_tokens = extra_tokens
+
+    def tokens(self, instance):
+        tokens = set()
+        for field in self.fields:
+            tokens |= tokenize(getattr(instance, field))
+        if self.extra_tokens is not None:
+            tokens |= set(self.extra_tokens(instance))
+        return tokens
+
+    def values(self, instance):
+        """Return the values of the indexed fields of an instance."""
+        return tuple(instance.__dict__.get(field)
+                     for field in self.fields + (self.owner,))
+
+    def rows(self, instance):
+        owner = getattr(instance, self.owner)
+        return [SearchToken(token=token, entity=self.name,
+                            entity_id=instance.pk, owner=owner)
+                for token in self.tokens(instance)]
+
+
+def vm_prefixed_id(vm):
+    return [(u"%s%s" % (settings.BACKEND_PREFIX_ID, vm.pk)).lower()]
+
+
+OWNED = {"id": "entity_id", "userid": "owner"}
+SELF_OWNED = {"id": "entity_id", "uuid": "owner"}
+
+ENTITIES = dict((entity.name, entity) for entity in [
+    Entity("user", AstakosUser, ("first_name", "last_name", "email", "uuid"),
+           owner="uuid", lookups=SELF_OWNED),
+    Entity("vm", VirtualMachine, ("name", "imageid", "id"),
+           owner="userid", lookups=OWNED, extra_tokens=vm_prefixed_id),
+    Entity("volume", Volume, ("name", "description", "id"),
+           owner="userid", lookups=OWNED),
+    Entity("network", Network, ("name", "id"),
+           owner="userid", lookups=OWNED),
+    Entity("ip", IPAddress, ("address",),
+           owner="userid", lookups=OWNED),
+    Entity("project", Project,
+           ("id", "realname", "description", "uuid", "homepage"),
+           owner="uuid", lookups=SELF_OWNED),
+])
+
+
+def index_instance(entity, instance):
+    """Replace the tokens of an instance in the index."""
+    unindex_instance(entity, instance)
+    SearchToken.objects.bulk_create(entity.rows(instance))
+
+
+def unindex_instance(entity, instance):
+    SearchToken.objects.filter(entity=entity.name,
+                               entity_id=instance.pk).delete()
+
+
+def rebuild(entity, chunk_size, marker=None):
+    """Rebuild the index of an entity, one chunk of instances at a time.
+
+    Yield the number of instances indexed in each chunk, after which the
+    caller may commit. Rows of instances that no longer exist are removed
+    along the way.
+    """
+    queryset = entity.model.objects.order_by("pk")
+    while True:
+        instances = queryset
+        if marker is not None:
+            instances = instances.filter(pk__gt=marker)
+        instances = list(instances[:chunk_size])
+        stale = SearchToken.objects.filter(entity=entity.name)
+        if marker is not None:
+            stale = stale.filter(entity_id__gt=marker)
+        if len(instances) == chunk_size:
+            stale = stale.filter(entity_id__lte=instances[-1].pk)
+        stale.delete()
+        rows = []
+        for instance in instances:
+            rows += entity.rows(instance)
+        SearchToken.objects.bulk_create(rows)
+        yield len(instances)
+        if len(instances) < chunk_size:
+            return
+        marker = instances[-1].pk
+
+
+def searchable(queries):
+    """Check if the index can answer the given keywords.
+
+    Nested queries (e.g. "name=foo") search specific fields. Keywords
+    longer than the tokens, or that do not start with a word, e.g. "@foo",
+    cannot be matched by prefix.
+    """
+    return all(admin_settings.ADMIN_FIELD_SIGN not in q and
+               len(q) <= TOKEN_MAX_LENGTH and starts_with_word(q)
+               for q in queries)
+
+
+def search(model, queries, field, using=None):
+    """Return the `field` of the `model` instances that match the queries.
+
+    Return None if the index cannot answer the query. The result is a query
+    of the index if `using` is the database of the index, or one of its
+    replicas, otherwise a list.
+    """
+    entity = ENTITIES.get(model)
+    if entity is None or not queries or not searchable(queries):
+        return None
+    column = entity.lookups.get(field)
+    if column is None:
+        return None
+
+    ids = None
+    for q in queries:
+        matches = SearchToken.objects.filter(entity=model,
+                                             token__startswith=q.lower())
+        if ids is not None:
+            matches = matches.filter(entity_id__in=ids)
+        ids = matches.values("entity_id")
+    result = SearchToken.objects.filter(entity=model, entity_id__in=ids)\
+                                .values_list(column, flat=True).distinct()
+    if get_primary(using) != get_primary(router.db_for_read(SearchToken)):
+        return list(result)
+    return result
+
+
+# ----------------- HOOKS --------------------#
+# Keep the index up to date when entities are saved or deleted. The indexed
+# values of an instance are recorded when it is loaded, so that saves that
+# do not change them, e.g. state updates, do not touch the index.
+
+def _record_values(sender, instance, **kwargs):
+    entity = _entities_by_model[sender]
+    instance._search_index_values = entity.values(instance)
+
+
+def _update_index(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    entity = _entities_by_model[sender]
+    values = entity.values(instance)
+    if not created and \
+            getattr(instance, "_search_index_values", None) == values:
+        return
+    index_instance(entity, instance)
+    instance._search_index_values = values
+
+
+def _remove_from_index(sender, instance, **kwargs):
+    unindex_instance(_entities_by_model[sender], instance)
+
+
+_entities_by_model = dict((entity.model, entity)
+                          for entity in ENTITIES.itervalues())
+
+
+def connect_signals():
+    for model in _entities_by_model:
+        uid = "synnefo_admin_search_%s" % model.__name__
+        post_init.connect(_record_values, sender=model, dispatch_uid=uid)
+        post_save.connect(_update_index, sender=model, dispatch_uid=uid)
+        post_delete.connect(_remove_from_index, sender=model,
+                            dispatch_uid=uid)
+
+
+def disconnect_signals():
+    for model in _entities_by_model:
+        uid = "synnefo_admin_search_%s" % model.__name__
+        post_init.disconnect(sender=model, dispatch_uid=uid)
+        post_save.disconnect(sender=model, dispatch_uid=uid)
+        post_delete.disconnect(sender=model, dispatch_uid=uid)
+
+
+if admin_settings.ADMIN_SEARCH_INDEX:
+    connect_signals()
@@ -11,7 +11,8 @@ snf = {
 			var data = {
 				op: $actionBtn.attr('data-op'),
 				target: $actionBtn.attr('data-target'),
-				ids: $actionBtn.attr('data-ids')
+				ids: $actionBtn.attr('data-ids'),
+				async: true
 			}
 			var contactAction = (data.op === 'contact' ? true : false);
 
@@ -39,6 +40,11 @@ snf = {
 					$notificationArea.find('.warning').fadeIn('slow');
 				},
 				success: function(response, statusText, jqXHR) {
+					// The action runs in the background, poll its job
+					if(jqXHR.status === 202) {
+						snf.modals.pollJob(response.url, this.success, this.error, Date.now() + snf.modals.maxJobPollTime);
+						return;
+					}
 					var successMsg = _.template(snf.modals.html.notifySuccess, ({actionName: actionName, removeBtn: snf.modals.html.removeLogLine, itemsCount: itemsCount}));
 					if($notificationArea.find('.warning').length === 0) {
 						$notificationArea.find('.container').append(warningMsg);
@@ -69,6 +75,34 @@ snf = {
                 }
 		    });
 	    },
+		// Milliseconds after which the UI stops polling a job
+		maxJobPollTime: 30 * 60 * 1000,
+		pollJob: function(url, success, error, deadline) {
+			$.ajax({
+				url: url,
+				type: 'GET',
+				dataType: 'json',
+				success: function(job, statusText, jqXHR) {
+					if(job.state !== 'FINISHED' && Date.now() > deadline) {
+						error({status: 504, statusText: 'Stopped waiting for the action to finish'});
+					}
+					else if(job.state !== 'FINISHED') {
+						setTimeout(function() {
+							snf.modals.pollJob(url, success, error, deadline);
+						}, 2000);
+					}
+					else if(job.status === 200) {
+						success(job, statusText, jqXHR);
+					}
+					else {
+						error({responseJSON: job, status: job.status, statusText: job.result});
+					}
+				},
+				error: function(jqXHR, statusText) {
+					error(jqXHR, statusText);
+				}
+			});
+		},
 		showBottomModal: function($modal) {
 			var height = -$modal.outerHeight(true);
 				$modal.css('bottom', height)
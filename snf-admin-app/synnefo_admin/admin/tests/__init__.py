@@ -19,3 +19,5 @@ from synnefo_admin.admin.tests.views import *
 from synnefo_admin.admin.tests.utils import *
 from synnefo_admin.admin.tests.users import *
 from synnefo_admin.admin.tests.projects import *
+from synnefo_admin.admin.tests.search import *
+from synnefo_admin.admin.tests.bulk import *
@@ -0,0 +1,158 @@
+# Copyright (C) 2010-2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+import threading
+import unittest
+from datetime import datetime, timedelta
+
+import django.test
+
+from snf_django.lib.api import faults
+
+from synnefo_admin.admin import bulk
+from synnefo_admin.admin import exceptions
+from synnefo_admin.admin.models import ActionJob, ActionJobItem
+
+
+class MockRequest(object):
+
+    user_uniq = "5edcb5aa-1111-4146-a8ed-2b6287824353"
+
+
+class StubActions(object):
+
+    """Action module whose actions take `latency` seconds."""
+
+    def __init__(self, latency=0, errors=None, wait=False):
+        self.latency = latency
+        self.errors = errors or {}
+        self.lock = threading.Lock()
+        self.done = []
+        self.waited = []
+        if wait:
+            self.wait_action = self._wait_action
+
+    def do_action(self, request, op, id):
+        time.sleep(self.latency)
+        if id in self.errors:
+            raise self.errors[id]
+        with self.lock:
+            self.done.append(id)
+
+    def _wait_action(self, request, op, id):
+        time.sleep(self.latency)
+        with self.lock:
+            self.waited.append(id)
+
+
+def timed_execute(mod, ids, workers):
+    start = time.time()
+    results = bulk.execute(MockRequest(), mod, "op", ids, workers=workers)
+    return results, time.time() - start
+
+
+class TestAdminBulkActions(unittest.TestCase):
+
+    """Test the concurrent execution of admin actions."""
+
+    def test_speedup(self):
+        ids = [str(i) for i in range(10)]
+        mod = StubActions(latency=0.05)
+        results, sequential = timed_execute(mod, ids, workers=1)
+        results, concurrent = timed_execute(mod, ids, workers=10)
+        self.assertTrue(concurrent < sequential / 3,
+                        "%.2fs vs %.2fs" % (concurrent, sequential))
+        self.assertEqual([r.id for r in results], ids)
+        self.assertEqual(bulk.summarize(results),
+                         (200, {'result': bulk.SUCCESS_MSG, 'error_ids': []}))
+
+    def test_errors(self):
+        errors = {
+            "2": faults.BadRequest("Bad request"),
+            "3": exceptions.AdminActionNotPermitted(),
+            "4": faults.NotAllowed(),
+            "5": exceptions.AdminActionCannotApply(),
+            "6": ValueError("Uncaught"),
+        }
+        ids = [str(i) for i in range(1, 8)]
+        mod = StubActions(latency=0.01, errors=errors)
+        results, _ = timed_execute(mod, ids, workers=4)
+        self.assertEqual([r.status for r in results],
+                         [200, 400, 403, 403, 400, 500, 200])
+        self.assertEqual(sorted(mod.done), ["1", "7"])
+        # The last error in the order of the items wins, as before
+        self.assertEqual(bulk.summarize(results),
+                         (500, {'result': "Uncaught",
+                                'error_ids': ["2", "3", "4", "5", "6"]}))
+
+    def test_fatal_error(self):
+        mod = StubActions(errors={"1": exceptions.AdminActionUnknown()})
+        results, _ = timed_execute(mod, ["1", "2", "3"], workers=1)
+        self.assertEqual(mod.done, [])
+        self.assertEqual([r.skipped for r in results], [False, True, True])
+        self.assertEqual(bulk.summarize(results),
+                         (404, {'result': bulk.UNKNOWN_MSG, 'error_ids': []}))
+
+    def test_wait_action(self):
+        mod = StubActions(latency=0.01, wait=True,
+                          errors={"2": faults.BadRequest("Bad request")})
+        outcomes = []
+        results, _ = timed_execute(mod, ["1", "2", "3"], workers=3)
+        self.assertEqual(sorted(mod.waited), ["1", "3"])
+        bulk.execute(MockRequest(), mod, "op", ["4"], callback=outcomes.append)
+        self.assertEqual(mod.waited[-1], "4")
+        self.assertEqual([(r.id, r.state) for r in outcomes],
+                         [("4", ActionJobItem.SUCCEEDED)])
+
+
+class TestAdminActionJobs(django.test.TestCase):
+
+    """Test the jobs of admin actions that run in the background."""
+
+    def test_job(self):
+        ids = ["1", "2", "3"]
+        job = bulk.create_job(MockRequest(), "vm", "shutdown", ids)
+        progress = bulk.job_dict(job)
+        self.assertEqual(progress['state'], ActionJob.RUNNING)
+        self.assertEqual((progress['done'], progress['total']), (0, 3))
+
+        mod = StubActions(errors={"2": faults.BadRequest("Bad request")})
+        bulk.run_job(job, MockRequest(), mod, ids, workers=2)
+        progress = bulk.job_dict(ActionJob.objects.get(id=job.id))
+        self.assertEqual(progress['state'], ActionJob.FINISHED)
+        self.assertEqual((progress['status'], progress['result']),
+                         (400, "Bad request"))
+        self.assertEqual((progress['done'], progress['total']), (3, 3))
+        self.assertEqual(progress['error_ids'], ["2"])
+        self.assertEqual([r['state'] for r in progress['results']],
+                         [ActionJobItem.SUCCEEDED, ActionJobItem.FAILED,
+                          ActionJobItem.SUCCEEDED])
+
+    def test_stale_job(self):
+        ids = ["1", "2"]
+        job = bulk.create_job(MockRequest(), "vm", "shutdown", ids)
+        # A running job with a recent heartbeat is left alone
+        self.assertEqual(bulk.fail_stale_job(job).state, ActionJob.RUNNING)
+
+        ActionJob.objects.filter(id=job.id).update(
+            heartbeat=datetime.now() - timedelta(hours=1))
+        job.items.filter(item_id="1").update(state=ActionJobItem.SUCCEEDED)
+        progress = bulk.job_dict(bulk.fail_stale_job(job))
+        self.assertEqual(progress['state'], ActionJob.FINISHED)
+        self.assertEqual((progress['status'], progress['result']),
+                         (500, bulk.STALE_JOB_MSG))
+        self.assertEqual([r['state'] for r in progress['results']],
+                         [ActionJobItem.SUCCEEDED, ActionJobItem.SKIPPED])
@@ -0,0 +1,120 @@
+# Copyright (C) 2010-2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import mock
+
+import django.test
+from django.conf import settings
+from django.core.management import call_command
+
+from astakos.im.models import AstakosUser
+from astakos.im.tests.common import get_local_user
+from synnefo.db import models_factory as mf
+from synnefo.db.models import VirtualMachine
+
+from synnefo_admin import admin_settings
+from synnefo_admin.admin import search
+from synnefo_admin.admin.models import SearchToken
+from synnefo_admin.admin.resources.users.filters import filter_vm
+
+
+class TestAdminSearch(django.test.TestCase):
+
+    """Test the search index of the catalog filters."""
+
+    def setUp(self):
+        search.connect_signals()
+
+    def tearDown(self):
+        search.disconnect_signals()
+
+    def search(self, model, queries, field):
+        return sorted(search.search(model, queries, field))
+
+    def test_tokenize(self):
+        self.assertEqual(search.tokenize(u"My-VM_01"),
+                         set([u"my-vm_01", u"vm_01", u"01"]))
+        self.assertEqual(search.tokenize(42), set([u"42"]))
+        self.assertEqual(search.tokenize(None), set())
+        self.assertEqual(search.tokenize(u"  "), set())
+        long_value = u"x" * (search.TOKEN_MAX_LENGTH + 1)
+        self.assertEqual(search.tokenize(long_value),
+                         set([long_value[:search.TOKEN_MAX_LENGTH]]))
+
+    def test_hooks(self):
+        vm = mf.VirtualMachineFactory(name=u"Web Server", userid="user1")
+        mf.VirtualMachineFactory(name=u"Web Cache", userid="user2")
+        self.assertEqual(self.search("vm", ["web"], "userid"),
+                         ["user1", "user2"])
+        self.assertEqual(self.search("vm", ["WEB", "serv"], "id"), [vm.id])
+        self.assertEqual(self.search("vm", ["web", "db"], "id"), [])
+        prefixed_id = "%s%s" % (settings.BACKEND_PREFIX_ID, vm.id)
+        self.assertEqual(self.search("vm", [prefixed_id], "id"), [vm.id])
+
+        # Saves that do not change the indexed fields keep the index as is
+        rows = list(SearchToken.objects.filter(entity="vm", entity_id=vm.id))
+        vm = VirtualMachine.objects.get(id=vm.id)
+        vm.operstate = "STOPPED"
+        vm.save()
+        self.assertEqual(
+            list(SearchToken.objects.filter(entity="vm", entity_id=vm.id)),
+            rows)
+
+        vm.name = u"Database"
+        vm.save()
+        self.assertEqual(self.search("vm", ["serv"], "id"), [])
+        self.assertEqual(self.search("vm", ["data"], "id"), [vm.id])
+
+        vm.delete()
+        self.assertEqual(self.search("vm", ["data"], "id"), [])
+
+    def test_unsupported_queries(self):
+        mf.VirtualMachineFactory(name=u"web")
+        self.assertIsNone(search.search("vm", ["name=web"], "id"))
+        self.assertIsNone(search.search("vm", ["web"], "project"))
+        self.assertIsNone(search.search("ip_log", ["web"], "id"))
+        long_query = "w" * (search.TOKEN_MAX_LENGTH + 1)
+        self.assertIsNone(search.search("vm", [long_query], "id"))
+        self.assertIsNone(search.search("vm", ["@web"], "id"))
+
+    def test_punctuation(self):
+        vm = mf.VirtualMachineFactory(name=u"db.example.com")
+        ip = mf.IPv4AddressFactory(address=u"10.0.1.42")
+        # Keywords may span punctuation, starting at any word
+        self.assertEqual(self.search("vm", ["example.com"], "id"), [vm.id])
+        self.assertEqual(self.search("vm", ["db.ex"], "id"), [vm.id])
+        self.assertEqual(self.search("ip", ["1.42"], "id"), [ip.id])
+        self.assertEqual(self.search("ip", ["0.1.4"], "id"), [ip.id])
+        self.assertEqual(self.search("ip", ["1.43"], "id"), [])
+
+    def test_rebuild(self):
+        vms = [mf.VirtualMachineFactory(name=u"rebuilt %d" % i)
+               for i in range(3)]
+        SearchToken.objects.filter(entity="vm").delete()
+        SearchToken.objects.create(token=u"stale", entity="vm",
+                                   entity_id=vms[-1].id + 1000)
+        call_command("admin-search-rebuild", entity=["vm"], chunk_size=2)
+        self.assertEqual(self.search("vm", ["rebuilt"], "id"),
+                         sorted(vm.id for vm in vms))
+        self.assertEqual(self.search("vm", ["stale"], "id"), [])
+
+    def test_filter(self):
+        user = get_local_user("search@synnefo.org")
+        mf.VirtualMachineFactory(name=u"Web Server", userid=user.uuid)
+        mf.VirtualMachineFactory(name=u"Mail Server")
+        users = AstakosUser.objects.all()
+        with mock.patch.object(admin_settings, "ADMIN_SEARCH_INDEX", True):
+            self.assertEqual(list(filter_vm(users, "web server")), [user])
+            self.assertEqual(list(filter_vm(users, "name=Web")), [user])
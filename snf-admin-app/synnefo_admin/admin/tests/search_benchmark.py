@@ -0,0 +1,137 @@
+# Copyright (C) 2010-2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Measure the catalog filters of the admin with and without the search index.
+
+Create many synthetic users, each owning a VM, build the search index and
+report the mean time of filtering the users by the names of their VMs,
+through `contains` queries and through the index. Run it with the settings
+of a test deployment, e.g.:
+
+    DJANGO_SETTINGS_MODULE=synnefo.settings python search_benchmark.py
+
+The synthetic users and VMs are removed at the end.
+
+"""
+
+import os
+from optparse import OptionParser
+from random import choice, randint
+from time import time
+from uuid import uuid4
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'synnefo.settings')
+
+from django.db import transaction
+
+from astakos.im.models import AstakosUser
+from synnefo.db import models_factory as mf
+from synnefo.db.models import VirtualMachine
+
+from synnefo_admin import admin_settings
+from synnefo_admin.admin import search
+from synnefo_admin.admin.models import SearchToken
+from synnefo_admin.admin.resources.users.filters import filter_vm
+
+CHUNK = 1000
+WORDS = ["web", "mail", "database", "cache", "build", "test", "proxy",
+         "backup", "worker", "gateway"]
+
+
+def create_users(domain, start, count):
+    uuids = []
+    with transaction.commit_on_success():
+        for i in xrange(start, start + count):
+            email = "user%d@%s" % (i, domain)
+            user = AstakosUser(username=email, email=email,
+                               first_name="First%d" % i,
+                               last_name="Last%d" % i)
+            user.save()
+            uuids.append(user.uuid)
+    return uuids
+
+
+def create_vms(uuids, flavor, backend):
+    with transaction.commit_on_success(using=VirtualMachine.objects.db):
+        VirtualMachine.objects.bulk_create(
+            [VirtualMachine(name="%s-%s %d" % (
+                                choice(WORDS), choice(WORDS), randint(0, 99)),
+                            userid=uuid, project=uuid, flavor=flavor,
+                            backend=backend, imageid=str(uuid4()),
+                            operstate="STARTED")
+             for uuid in uuids])
+
+
+def rebuild_index(entity):
+    using = SearchToken.objects.db
+    with transaction.commit_manually(using=using):
+        for indexed in search.rebuild(entity, CHUNK):
+            transaction.commit(using=using)
+
+
+def timed(queries, index):
+    admin_settings.ADMIN_SEARCH_INDEX = index
+    users = AstakosUser.objects.all()
+    start = time()
+    for query in queries:
+        filter_vm(users, query).count()
+    return (time() - start) / len(queries)
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('--users',
+                      dest='users',
+                      default=100000,
+                      help="Number of users and VMs (default=100000)")
+    parser.add_option('--lookups',
+                      dest='lookups',
+                      default=20,
+                      help="Number of filter queries per method"
+                           " (default=20)")
+
+    (options, args) = parser.parse_args()
+    count = int(options.users)
+    domain = "%s.bench.synnefo.org" % uuid4().hex[:8]
+    flavor = mf.FlavorFactory()
+    backend = mf.BackendFactory()
+    last_vm = list(VirtualMachine.objects.order_by("-id")
+                   .values_list("id", flat=True)[:1])
+    last_vm = last_vm[0] if last_vm else 0
+
+    start = time()
+    for i in xrange(0, count, CHUNK):
+        uuids = create_users(domain, i, min(CHUNK, count - i))
+        create_vms(uuids, flavor, backend)
+    print "created %s users and VMs in %.1f s" % (count, time() - start)
+
+    start = time()
+    rebuild_index(search.ENTITIES["vm"])
+    print "indexed the VMs in %.1f s" % (time() - start)
+
+    queries = ["%s %s" % (choice(WORDS), choice(WORDS)[:3])
+               for i in xrange(int(options.lookups))]
+    print "filter by contains: %8.3f ms" % (timed(queries, False) * 1000)
+    print "filter by index:    %8.3f ms" % (timed(queries, True) * 1000)
+
+    VirtualMachine.objects.filter(flavor=flavor).delete()
+    SearchToken.objects.filter(entity="vm", entity_id__gt=last_vm).delete()
+    AstakosUser.objects.filter(email__endswith="@" + domain).delete()
+    flavor.delete()
+    backend.delete()
+
+
+if __name__ == "__main__":
+    main()
@@ -31,6 +31,8 @@ urlpatterns = patterns(
         name='admin-stats-component'),
     url(r'^json/(?P<type>.*)$', 'json_list', name='admin-json'),
     url(r'^actions/$', 'admin_actions', name='admin-actions'),
+    url(r'^actions/(?P<job_id>\d+)$', 'admin_action_job',
+        name='admin-action-job'),
     url(r'^(?P<type>.*)/(?P<id>.*)$', 'details', name='admin-details'),
     url(r'^(?P<type>.*)$', 'catalog', name='admin-list'),
 )
@@ -23,13 +23,13 @@ from django.core.exceptions import PermissionDenied
 from django.http import Http404, HttpResponseRedirect, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.core.serializers.json import DjangoJSONEncoder
+from django.core.urlresolvers import reverse
 
 from urllib import unquote
 
 import astakosclient
 from snf_django.lib import astakos
 from synnefo_branding.utils import render_to_string
-from snf_django.lib.api import faults
 
 
 from astakos.im.messages import PLAIN_EMAIL_SUBJECT as sample_subject
@@ -40,7 +40,8 @@ from synnefo.admin import stats as cyclades_stats
 from synnefo_admin.admin.exceptions import AdminHttp404, AdminHttp405
 from synnefo_admin import admin_settings
 
-from synnefo_admin.admin import exceptions
+from synnefo_admin.admin import bulk
+from synnefo_admin.admin.models import ActionJob
 from synnefo_admin.admin.utils import (conditionally_gzip_page,
                                        customize_details_context, admin_log,
                                        default_view)
@@ -284,23 +285,28 @@ def catalog(request, type=default_view()):
     return direct_to_template(request, template, extra_context=context)
 
 
+def json_response(response, status=200):
+    return HttpResponse(json.dumps(response, cls=DjangoJSONEncoder),
+                        mimetype=JSON_MIMETYPE, status=status)
+
+
 @csrf_exempt
 @admin_user_required
 def admin_actions(request):
     """Entry-point for all admin actions.
 
     Expects a JSON with the following fields: <TODO>
+
+    The action is applied concurrently on the requested items. If the JSON
+    has a true "async" field, the action runs in the background and the
+    response (202) describes the job, which can be polled with the
+    admin_action_job view.
     """
     admin_log(request, json=request.REQUEST)
-    status = 200
-    response = {
-        'result': "All actions finished successfully.",
-        'error_ids': [],
-    }
 
     if request.method != "POST":
-        status = 405
-        response['result'] = "Only POST is allowed."
+        return json_response({'result': "Only POST is allowed.",
+                              'error_ids': []}, status=405)
 
     objs = json.loads(request.body)
     request.POST = objs
@@ -310,52 +316,43 @@ def admin_actions(request):
     ids = objs['ids']
     if type(ids) is not list:
         ids = ids.replace('[', '').replace(']', '').replace(' ', '').split(',')
+    # Apply the action once on each item
+    seen = set()
+    unique_ids = []
+    for id in ids:
+        if id not in seen:
+            seen.add(id)
+            unique_ids.append(id)
+    ids = unique_ids
 
     try:
         mod = get_view_module_or_404(target)
     except Http404:
-        status = 404
-        response['result'] = "You have requested an unknown operation."
+        return json_response({'result': bulk.UNKNOWN_MSG, 'error_ids': []},
+                             status=404)
 
-    for id in ids:
-        try:
-            mod.do_action(request, op, id)
-        except faults.BadRequest as e:
-            status = 400
-            response['result'] = e.message
-            response['error_ids'].append(id)
-        except exceptions.AdminActionNotPermitted:
-            status = 403
-            response['result'] = "You are not allowed to do this operation."
-            response['error_ids'].append(id)
-        except faults.NotAllowed:
-            status = 403
-            response['result'] = "You are not allowed to do this operation."
-            response['error_ids'].append(id)
-        except exceptions.AdminActionUnknown:
-            status = 404
-            response['result'] = "You have requested an unknown operation."
-            break
-        except exceptions.AdminActionNotImplemented:
-            status = 501
-            response['result'] = "You have requested an unimplemented action."
-            break
-        except exceptions.AdminActionCannotApply:
-            status = 400
-            response['result'] = """
-                You have requested an action that cannot apply to a target.
-                """
-            response['error_ids'].append(id)
-        except Exception as e:
-            logging.exception("Uncaught exception")
-            status = 500
-            response['result'] = e.message
-            response['error_ids'].append(id)
-
-    if hasattr(mod, 'wait_action'):
-        wait_ids = set(ids) - set(response['error_ids'])
-        for id in wait_ids:
-            mod.wait_action(request, op, id)
+    if objs.get('async'):
+        job = bulk.create_job(request, target, op, ids)
+        bulk.start_job(job, request, mod, ids)
+        response = bulk.job_dict(job)
+        response['url'] = reverse('admin-action-job', args=[job.id])
+        return json_response(response, status=202)
 
-    return HttpResponse(json.dumps(response, cls=DjangoJSONEncoder),
-                        mimetype=JSON_MIMETYPE, status=status)
+    results = bulk.execute(request, mod, op, ids)
+    status, response = bulk.summarize(results)
+    return json_response(response, status=status)
+
+
+@admin_user_required
+def admin_action_job(request, job_id):
+    """Return the progress of an admin action that runs in the background."""
+    if request.method != "GET":
+        raise AdminHttp405("Only GET is allowed.")
+    try:
+        job = ActionJob.objects.get(id=job_id)
+    except ActionJob.DoesNotExist:
+        raise AdminHttp404("No job found with this ID: %s" % job_id)
+    job = bulk.fail_stale_job(job)
+    response = bulk.job_dict(job)
+    response['url'] = reverse('admin-action-job', args=[job.id])
+    return json_response(response)
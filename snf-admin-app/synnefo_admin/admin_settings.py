@@ -142,3 +142,17 @@ ADMIN_LIMIT_SUSPENDED_VMS_IN_SUMMARY = getattr(
 
 # The sign that will indicate that a filter term concerns a model field.
 ADMIN_FIELD_SIGN = getattr(settings, 'ADMIN_FIELD_SIGN', '=')
+
+# Use the search index for the filters that search the fields of other
+# entities, e.g. the users that own VMs with a given name. The index is kept
+# up to date in every process that has this setting enabled and is built with
+# 'snf-manage admin-search-rebuild'.
+ADMIN_SEARCH_INDEX = getattr(settings, 'ADMIN_SEARCH_INDEX', False)
+
+# Number of threads that apply an admin action on the selected items
+# concurrently.
+ADMIN_ACTION_WORKERS = getattr(settings, 'ADMIN_ACTION_WORKERS', 8)
+
+# Seconds after which an admin action that runs in the background and has
+# not reported progress is considered dead and marked as failed.
+ADMIN_ACTION_JOB_TIMEOUT = getattr(settings, 'ADMIN_ACTION_JOB_TIMEOUT', 120)
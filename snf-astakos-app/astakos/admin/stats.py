@@ -18,6 +18,7 @@ from django.db.models import Sum, Count
 from astakos.im import settings
 from astakos.im.models import AstakosUser, Resource
 from astakos.quotaholder_app.models import Holding
+import astakos.quotaholder_app.callpoint as qh
 
 
 def get_public_stats():
@@ -40,20 +41,18 @@ def get_astakos_stats():
     stats["users"]["all"] = {"total": users.count(),
                              "verified": verified.count(),
                              "active": active.count()}
-    # Get all holdings from DB. Filter with 'source=None' in order to get
-    # only the (base and user) projects, and not the user per project holdings
-    holdings = Holding.objects.filter(source=None)\
-                              .values("resource")\
-                              .annotate(usage_sum=Sum("usage_max"),
-                                        limit_sum=Sum("limit"))
-    holdings = dict([(h["resource"], h) for h in holdings])
+    # Get the summary of the holdings with 'source=None', i.e. of the (base
+    # and user) projects, and not of the user per project holdings
+    holdings = qh.get_holding_summary(sources=[None])
+    holdings = dict((resource, counters)
+                    for (source, resource), counters in holdings.iteritems())
 
     resources_stats = {}
     for resource in Resource.objects.all():
-        res_holdings = holdings.get(resource.name, {})
+        limit, usage_min, usage_max = holdings.get(resource.name, (0, 0, 0))
         resources_stats[resource.name] = {
-            "used": res_holdings.get("usage_sum") or 0,
-            "allocated": res_holdings.get("limit_sum") or 0,
+            "used": usage_max,
+            "allocated": limit,
             "unit": resource.unit,
             "description": resource.desc
         }
@@ -58,6 +58,18 @@ def quotas(request):
     return json_response(result)
 
 
+def get_limit(request):
+    limit = request.GET.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if limit <= 0:
+            raise BadRequest("Invalid 'limit' parameter.")
+    return limit
+
+
 @api.api_method(http_method='GET', token_required=True, user_required=False)
 @component_from_token
 def service_quotas(request):
@@ -65,8 +77,10 @@ def service_quotas(request):
     users = userstr.split(",") if userstr is not None else None
     projectstr = request.GET.get('project')
     projects = projectstr.split(",") if projectstr is not None else None
+    marker = request.GET.get('marker')
+    limit = get_limit(request)
     result = service_get_quotas(request.component_instance, users=users,
-                                sources=projects)
+                                sources=projects, marker=marker, limit=limit)
 
     if userstr is not None and result == {}:
         raise ItemNotFound("No user with UUID '%s'" % userstr)
@@ -79,8 +93,11 @@ def service_quotas(request):
 def service_project_quotas(request):
     projectstr = request.GET.get('project')
     projects = projectstr.split(',') if projectstr is not None else None
+    marker = request.GET.get('marker')
+    limit = get_limit(request)
     result = service_get_project_quotas(request.component_instance,
-                                        projects=projects)
+                                        projects=projects, marker=marker,
+                                        limit=limit)
 
     if projectstr is not None and result == {}:
         raise ItemNotFound("No project with UUID '%s'" % projectstr)
@@ -131,14 +148,8 @@ def _provisions_to_list(provisions):
     return lst
 
 
-@csrf_exempt
-@api.api_method(http_method='POST', token_required=True, user_required=False)
-@component_from_token
-def issue_commission(request):
-    input_data = utils.get_json_body(request)
+def _commission_from_input(input_data):
     check_is_dict(input_data)
-
-    client_key = unicode(request.component_instance)
     provisions = input_data.get('provisions')
     if provisions is None:
         raise BadRequest("Provisions are missing.")
@@ -158,35 +169,59 @@ def issue_commission(request):
     if not isinstance(name, basestring):
         raise BadRequest("Commission name should be a string.")
 
-    try:
-        result = _issue_commission(clientkey=client_key,
-                                   provisions=provisions,
-                                   name=name,
-                                   force=force,
-                                   accept=auto_accept)
-        data = {"serial": result}
-        status_code = 201
-    except (qh_exception.NoCapacityError,
-            qh_exception.NoQuantityError) as e:
+    return {"provisions": provisions,
+            "name": name,
+            "force": force,
+            "auto_accept": auto_accept,
+            }
+
+
+def _commission_fault(e):
+    if isinstance(e, (qh_exception.NoCapacityError,
+                      qh_exception.NoQuantityError)):
         status_code = 413
         body = {"message": e.message,
                 "code": status_code,
                 "data": e.data,
                 }
-        data = {"overLimit": body}
-    except qh_exception.NoHoldingError as e:
+        return status_code, {"overLimit": body}
+    if isinstance(e, qh_exception.NoHoldingError):
         status_code = 404
         body = {"message": e.message,
                 "code": status_code,
                 "data": e.data,
                 }
-        data = {"itemNotFound": body}
-    except qh_exception.InvalidDataError as e:
+        return status_code, {"itemNotFound": body}
+    if isinstance(e, qh_exception.InvalidDataError):
         status_code = 400
         body = {"message": e.message,
                 "code": status_code,
                 }
-        data = {"badRequest": body}
+        return status_code, {"badRequest": body}
+    raise e
+
+
+@csrf_exempt
+@api.api_method(http_method='POST', token_required=True, user_required=False)
+@component_from_token
+def issue_commission(request):
+    input_data = utils.get_json_body(request)
+    commission = _commission_from_input(input_data)
+    client_key = unicode(request.component_instance)
+
+    try:
+        result = _issue_commission(clientkey=client_key,
+                                   provisions=commission["provisions"],
+                                   name=commission["name"],
+                                   force=commission["force"],
+                                   accept=commission["auto_accept"])
+        data = {"serial": result}
+        status_code = 201
+    except (qh_exception.NoCapacityError,
+            qh_exception.NoQuantityError,
+            qh_exception.NoHoldingError,
+            qh_exception.InvalidDataError) as e:
+        status_code, data = _commission_fault(e)
 
     return json_response(data, status_code=status_code)
 
@@ -203,6 +238,45 @@ def _issue_commission(clientkey, provisions, name, force, accept):
     return serial
 
 
+@csrf_exempt
+@api.api_method(http_method='POST', token_required=True, user_required=False)
+@component_from_token
+def issue_commissions_bulk(request):
+    input_data = utils.get_json_body(request)
+    check_is_dict(input_data)
+    commissions = input_data.get('commissions')
+    if not isinstance(commissions, list) or not commissions:
+        raise BadRequest('"commissions" should be a non-empty list.')
+    max_size = settings.COMMISSIONS_BULK_MAX_SIZE
+    if len(commissions) > max_size:
+        raise BadRequest("At most %s commissions can be issued at once."
+                         % max_size)
+
+    commissions = map(_commission_from_input, commissions)
+    client_key = unicode(request.component_instance)
+    results = _issue_commissions_bulk(client_key, commissions)
+
+    data = []
+    for result in results:
+        if isinstance(result, qh_exception.QuotaholderError):
+            data.append(_commission_fault(result)[1])
+        else:
+            data.append({"serial": result})
+    return json_response({"commissions": data}, status_code=201)
+
+
+@transaction.commit_on_success
+def _issue_commissions_bulk(clientkey, commissions):
+    results = qh.issue_commissions_bulk(clientkey=clientkey,
+                                        commissions=commissions)
+    accept = [serial for (commission, serial) in zip(commissions, results)
+              if commission["auto_accept"] and
+              not isinstance(serial, qh_exception.QuotaholderError)]
+    if accept:
+        qh.resolve_pending_commissions(clientkey=clientkey, accept_set=accept)
+    return results
+
+
 def notFoundCF(serial):
     body = {"code": 404,
             "message": "serial %s does not exist" % serial,
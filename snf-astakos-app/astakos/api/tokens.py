@@ -15,6 +15,7 @@
 
 from collections import defaultdict
 
+from django.http import HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 
 from snf_django.lib.api import faults, utils, api_method
@@ -22,6 +23,7 @@ from django.core.cache import cache
 
 from astakos.im import settings
 from astakos.im.models import Service, AstakosUser
+from astakos.im.auth_cache import auth_cache
 from astakos.oa2.backends.base import OA2Error
 from astakos.oa2.backends.djangobackend import DjangoBackend
 from .util import json_response, xml_response, validate_user,\
@@ -91,20 +93,23 @@ def authenticate(request):
         if token_id is None:
             raise faults.BadRequest('Malformed request: missing token')
 
+        cached = auth_cache.get(token_id, request.serialization)
+        if cached is not None:
+            user_uuid, content = cached
+            check_credentials(user_uuid, uuid, tenant)
+            response = HttpResponse(content)
+            response['Content-Length'] = len(content)
+            return response
+
+        users = AstakosUser.objects.filter(auth_token=token_id)
+        snapshot = auth_cache.snapshot(users)
         try:
-            user = AstakosUser.objects.get(auth_token=token_id)
+            user = users.get()
         except AstakosUser.DoesNotExist:
             raise faults.Unauthorized('Invalid token')
 
         validate_user(user)
-
-        if uuid is not None:
-            if user.uuid != uuid:
-                raise faults.Unauthorized('Invalid credentials')
-
-        if tenant:
-            if user.uuid != tenant:
-                raise faults.BadRequest('Not conforming tenantName')
+        check_credentials(user.uuid, uuid, tenant)
 
         d["access"]["token"] = {
             "id": user.auth_token,
@@ -119,9 +124,25 @@ def authenticate(request):
     d["access"]["serviceCatalog"] = get_endpoints()
 
     if request.serialization == 'xml':
-        return xml_response({'d': d}, 'api/access.xml')
+        response = xml_response({'d': d}, 'api/access.xml')
     else:
-        return json_response(d)
+        response = json_response(d)
+
+    if not public_mode:
+        auth_cache.set(token_id, request.serialization, snapshot,
+                       (user.uuid, response.content),
+                       expires=user.auth_token_expires)
+    return response
+
+
+def check_credentials(user_uuid, uuid, tenant):
+    if uuid is not None:
+        if user_uuid != uuid:
+            raise faults.Unauthorized('Invalid credentials')
+
+    if tenant:
+        if user_uuid != tenant:
+            raise faults.BadRequest('Not conforming tenantName')
 
 
 @api_method(http_method="GET", token_required=False, user_required=False,
@@ -26,6 +26,7 @@ astakos_account_v1_0 = patterns(
     url(r'^resources/?$', 'resources'),
     url(r'^commissions/?$', 'commissions'),
     url(r'^commissions/action/?$', 'resolve_pending_commissions'),
+    url(r'^commissions/bulk/?$', 'issue_commissions_bulk'),
     url(r'^commissions/(?P<serial>\d+)/?$', 'get_commission'),
     url(r'^commissions/(?P<serial>\d+)/action/?$', 'serial_action'),
 )
@@ -13,6 +13,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from copy import deepcopy
 from functools import wraps
 from time import time, mktime
 import datetime
@@ -22,6 +23,7 @@ from django.utils import simplejson as json
 from django.template.loader import render_to_string
 
 from astakos.im.models import AstakosUser, Component
+from astakos.im.auth_cache import auth_cache
 from snf_django.lib.api import faults
 from snf_django.lib.api.utils import isoformat
 
@@ -101,12 +103,21 @@ def user_from_token(func):
         if not token:
             raise faults.Unauthorized("Invalid X-Auth-Token")
 
-        try:
-            user = AstakosUser.objects.get(auth_token=token)
-        except AstakosUser.DoesNotExist:
-            raise faults.Unauthorized('Invalid X-Auth-Token')
-
-        validate_user(user)
+        user = auth_cache.get(token, "user")
+        if user is None:
+            users = AstakosUser.objects.filter(auth_token=token)
+            snapshot = auth_cache.snapshot(users)
+            try:
+                user = users.get()
+            except AstakosUser.DoesNotExist:
+                raise faults.Unauthorized('Invalid X-Auth-Token')
+
+            validate_user(user)
+            auth_cache.set(token, "user", snapshot, deepcopy(user),
+                           expires=user.auth_token_expires)
+        else:
+            # Every request gets its own copy of the cached user
+            user = deepcopy(user)
 
         request.user = user
         return func(request, *args, **kwargs)
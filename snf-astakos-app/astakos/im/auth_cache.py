@@ -0,0 +1,201 @@
+# Copyright (C) 2010-2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""In-process cache of user authentication results.
+
+Every request to the other Synnefo components is authenticated against
+Astakos, so the result of looking up a user by token is cached, for at most
+AUTH_CACHE_TIMEOUT seconds, keyed by a digest of the token.
+
+Each user has a generation number, which is bumped whenever the user is
+saved, e.g. when the token of the user is renewed or the user is deactivated,
+deleted, or added to or removed from a group, and again when the transaction
+that changed the user ends. A cached result is only valid for the generation
+of the user that was read before the user was looked up.
+
+The generations are kept in the cache backend of AUTH_CACHE_BACKEND, which
+must be shared by all the Astakos processes, e.g. memcached. The cache is
+disabled if no such backend is configured.
+
+"""
+
+import logging
+import threading
+from time import time, mktime
+from hashlib import sha256
+
+from django.core.cache import get_cache
+from django.core.signals import request_finished
+from django.db import transaction
+
+from synnefo.lib.ordereddict import OrderedDict
+from astakos.im import settings
+
+logger = logging.getLogger(__name__)
+
+GENERATION_KEY = "astakos:auth-generation:%s"
+
+
+def _get_generations(backend):
+    if not backend:
+        return None
+    if backend.startswith("dummy:"):
+        logger.warning("Authentication cache disabled: %s can not keep the"
+                       " user generations", backend)
+        return None
+    if backend.startswith("locmem:"):
+        logger.warning("Authentication cache backend %s is not shared"
+                       " between processes", backend)
+    return get_cache(backend)
+
+
+generations = _get_generations(settings.AUTH_CACHE_BACKEND)
+
+
+def token_digest(token):
+    if isinstance(token, unicode):
+        token = token.encode("utf-8")
+    return sha256(token).hexdigest()
+
+
+def get_generation(uuid):
+    return generations.get(GENERATION_KEY % uuid) or 0
+
+
+def bump_generation(uuid):
+    """Invalidate the cached authentication results of a user."""
+    if generations is None:
+        return
+    key = GENERATION_KEY % uuid
+    # The generation must outlive any result that was cached for it
+    timeout = max(10 * settings.AUTH_CACHE_TIMEOUT, 3600)
+    if generations.add(key, 1, timeout):
+        return
+    try:
+        generations.incr(key)
+    except ValueError:
+        # Key expired in between
+        generations.set(key, 1, timeout)
+
+
+_pending = threading.local()
+
+
+def bump_generation_on_commit(uuid, using):
+    """Invalidate the cached authentication results of a user now and after
+    the current transaction ends.
+
+    Another request may read the old state of the user and the new
+    generation before the transaction commits; the second bump, by
+    bump_pending_generations(), invalidates what it caches.
+
+    """
+    if generations is None:
+        return
+    bump_generation(uuid)
+    if transaction.is_managed(using=using):
+        if not hasattr(_pending, "uuids"):
+            _pending.uuids = set()
+        _pending.uuids.add(uuid)
+
+
+def bump_pending_generations(**kwargs):
+    """Bump the generations of the users changed by the transactions that
+    the current thread has ended.
+
+    Called by the Astakos transaction functions and at the end of each
+    request. Bumping after a rollback only costs a cache miss.
+
+    """
+    uuids = getattr(_pending, "uuids", None)
+    while uuids:
+        bump_generation(uuids.pop())
+
+
+request_finished.connect(bump_pending_generations)
+
+
+class AuthCache(object):
+    """A bounded cache of values with a time to live."""
+
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    @property
+    def enabled(self):
+        return (self.size > 0 and self.timeout > 0 and
+                generations is not None)
+
+    def get(self, token, namespace):
+        """Return the cached value of a token, or None."""
+        if not self.enabled:
+            return None
+        key = (token_digest(token), namespace)
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is None:
+            return None
+        deadline, uuid, generation, value = entry
+        if deadline < time() or generation != get_generation(uuid):
+            with self.lock:
+                if self.entries.get(key) is entry:
+                    del self.entries[key]
+            return None
+        return value
+
+    def snapshot(self, queryset, field="uuid"):
+        """Read the generation of the user that 'queryset' looks up.
+
+        Call before looking up the user and pass the result to set(). Return
+        None if there is no such user or the cache is disabled.
+
+        """
+        if not self.enabled:
+            return None
+        uuids = list(queryset.values_list(field, flat=True)[:1])
+        if not uuids:
+            return None
+        return uuids[0], get_generation(uuids[0])
+
+    def set(self, token, namespace, snapshot, value, expires=None):
+        """Cache the value of the token of the user of 'snapshot'.
+
+        The value will not be returned after the token expires at 'expires',
+        or after the generation of the user changes.
+
+        """
+        if not self.enabled or snapshot is None:
+            return
+        uuid, generation = snapshot
+        deadline = time() + self.timeout
+        if expires is not None:
+            deadline = min(deadline, mktime(expires.timetuple()))
+        key = (token_digest(token), namespace)
+        entry = (deadline, uuid, generation, value)
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = entry
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+auth_cache = AuthCache(settings.AUTH_CACHE_SIZE, settings.AUTH_CACHE_TIMEOUT)
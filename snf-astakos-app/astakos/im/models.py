@@ -28,7 +28,8 @@ from django.db import models
 from astakos.im import transaction
 from django.contrib.auth.models import User, UserManager, Group, Permission
 from django.utils.translation import ugettext as _
-from django.db.models.signals import pre_save, post_save
+from django.db.models.signals import pre_save, post_save, pre_delete, \
+    post_delete, m2m_changed
 from django.contrib.contenttypes.models import ContentType
 
 from django.db.models import Q
@@ -43,6 +44,7 @@ from synnefo.lib.utils import dict_merge
 
 from astakos.im import settings as astakos_settings
 from astakos.im import auth_providers as auth
+from astakos.im.auth_cache import bump_generation_on_commit
 
 import astakos.im.messages as astakos_messages
 from synnefo.lib.ordereddict import OrderedDict
@@ -554,6 +556,9 @@ class AstakosUser(User):
             self.updated = datetime.now()
 
         super(AstakosUser, self).save(**kwargs)
+        # The token, the state or the details of the user may have changed
+        if self.uuid:
+            bump_generation_on_commit(self.uuid, self._state.db)
 
     def renew_verification_code(self):
         self.verification_code = str(uuid.uuid4())
@@ -2215,3 +2220,36 @@ def renew_token(sender, instance, **kwargs):
     if not instance.auth_token:
         instance.renew_token()
 pre_save.connect(renew_token, sender=Component)
+
+
+# The cached authentication results include the groups of the user as roles
+def _bump_generations(users, using):
+    for user_uuid in users.using(using).values_list("uuid", flat=True):
+        if user_uuid:
+            bump_generation_on_commit(user_uuid, using)
+
+
+def user_groups_changed(sender, instance, action, reverse, pk_set, using,
+                        **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        users = AstakosUser.objects.filter(pk=instance.pk)
+    elif action == "pre_clear":
+        users = AstakosUser.objects.filter(groups=instance)
+    else:
+        users = AstakosUser.objects.filter(pk__in=pk_set)
+    _bump_generations(users, using)
+m2m_changed.connect(user_groups_changed, sender=User.groups.through)
+
+
+def group_changed(sender, instance, using, **kwargs):
+    _bump_generations(AstakosUser.objects.filter(groups=instance), using)
+post_save.connect(group_changed, sender=Group)
+pre_delete.connect(group_changed, sender=Group)
+
+
+def user_post_delete(sender, instance, using, **kwargs):
+    if instance.uuid:
+        bump_generation_on_commit(instance.uuid, using)
+post_delete.connect(user_post_delete, sender=AstakosUser)
@@ -18,6 +18,8 @@ from astakos.im.models import (
     Project, ProjectMembership, ProjectResourceQuota)
 import astakos.quotaholder_app.callpoint as qh
 from astakos.quotaholder_app.exception import NoCapacityError
+from astakos.im import settings
+from django.core.cache import cache
 from django.db.models import Q
 from collections import defaultdict
 
@@ -115,19 +117,94 @@ def get_user_quotas(user, resources=None, sources=None):
     return quotas.get(user.uuid, {})
 
 
-def service_get_quotas(component, users=None, sources=None):
-    name_values = Service.objects.filter(
-        component=component).values_list('name')
-    service_names = [t for (t,) in name_values]
-    resources = Resource.objects.filter(service_origin__in=service_names)
-    resource_names = [r.name for r in resources]
+COMPONENT_RESOURCES_KEY = "component-resources:%s"
+
+# Number of users whose quota is retrieved at once
+SERVICE_QUOTAS_CHUNK_SIZE = 500
+
+
+def get_component_resources(component):
+    """Return the names of the resources of the services of a component."""
+    key = COMPONENT_RESOURCES_KEY % component.id
+    resource_names = cache.get(key)
+    if resource_names is None:
+        service_names = Service.objects.filter(
+            component=component).values_list('name', flat=True)
+        resource_names = list(Resource.objects.filter(
+            service_origin__in=list(service_names)).values_list(
+            'name', flat=True))
+        cache.set(key, resource_names, settings.RESOURCE_CACHE_TIMEOUT)
+    return resource_names
+
+
+def invalidate_component_resources(component):
+    cache.delete(COMPONENT_RESOURCES_KEY % component.id)
+
+
+def iter_service_quotas(component, users=None, sources=None, marker=None,
+                        limit=None, chunk_size=SERVICE_QUOTAS_CHUNK_SIZE,
+                        include_empty=False):
+    """Iterate over the quota of users for the resources of a component.
+
+    Yield the quota of the verified users, optionally restricted to the
+    given user UUIDs and project sources, in chunks of at most 'chunk_size'
+    users. Users are ordered by UUID, starting after the UUID 'marker', and
+    at most 'limit' users are included. If 'include_empty' is set, users
+    without quota are included with an empty quota.
+
+    """
+    resource_names = get_component_resources(component)
     astakosusers = AstakosUser.objects.verified()
     if users is not None:
         astakosusers = astakosusers.filter(uuid__in=users)
+    astakosusers = astakosusers.order_by('uuid')
     if sources is not None:
         sources = [project_ref(s) for s in sources]
-    return get_users_quotas(astakosusers, resources=resource_names,
-                            sources=sources)
+
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = chunk_size if remaining is None else min(chunk_size, remaining)
+        page = astakosusers
+        if marker is not None:
+            page = page.filter(uuid__gt=marker)
+        uuids = list(page.values_list('uuid', flat=True)[:size])
+        if not uuids:
+            return
+        user_counters = qh.get_quota(holders=[user_ref(u) for u in uuids],
+                                     resources=resource_names,
+                                     sources=sources)
+        projects = get_related_sources(user_counters)
+        project_counters = qh.get_quota(holders=projects,
+                                        resources=resource_names)
+        quota = mk_quota_dict(strip_names(user_counters),
+                              strip_names(project_counters))
+        if include_empty:
+            for uuid in uuids:
+                quota.setdefault(uuid, {})
+        yield quota
+        if len(uuids) < size:
+            return
+        marker = uuids[-1]
+        if remaining is not None:
+            remaining -= len(uuids)
+
+
+def service_get_quotas(component, users=None, sources=None, marker=None,
+                       limit=None):
+    """Return the quota of users for the resources of a component.
+
+    If 'limit' is given, return the quota of at most 'limit' users, in the
+    order of their UUID, that come after the UUID 'marker'. In this case,
+    users without quota are included with an empty quota, so that the
+    greatest returned UUID is the marker of the next page.
+
+    """
+    quota = {}
+    for chunk in iter_service_quotas(component, users=users, sources=sources,
+                                     marker=marker, limit=limit,
+                                     include_empty=limit is not None):
+        quota.update(chunk)
+    return quota
 
 
 def mk_limits_dict(counters):
@@ -150,16 +227,29 @@ def get_projects_quota(projects, resources=None, sources=None):
     return mk_project_quota_dict(strip_names(project_counters))
 
 
-def service_get_project_quotas(component, projects=None):
-    name_values = Service.objects.filter(
-        component=component).values_list('name')
-    service_names = [t for (t,) in name_values]
-    resources = Resource.objects.filter(service_origin__in=service_names)
-    resource_names = [r.name for r in resources]
+def service_get_project_quotas(component, projects=None, marker=None,
+                               limit=None):
+    """Return the quota of projects for the resources of a component.
+
+    If 'limit' is given, return the quota of at most 'limit' projects, in
+    the order of their UUID, that come after the UUID 'marker'. In this
+    case, projects without quota are included with an empty quota, so that
+    the greatest returned UUID is the marker of the next page.
+
+    """
+    resource_names = get_component_resources(component)
     ps = Project.objects.initialized()
     if projects is not None:
         ps = ps.filter(uuid__in=projects)
-    return get_projects_quota(ps, resources=resource_names)
+    if marker is not None:
+        ps = ps.filter(uuid__gt=marker)
+    if limit is None:
+        return get_projects_quota(ps, resources=resource_names)
+    ps = list(ps.order_by('uuid')[:limit])
+    quota = get_projects_quota(ps, resources=resource_names)
+    for project in ps:
+        quota.setdefault(project.uuid, {})
+    return quota
 
 
 def get_project_quota(project, resources=None, sources=None):
@@ -282,10 +372,86 @@ def list_user_quotas(users, qhflt=None):
     return qh_quotas
 
 
+# Maximum number of holdings that are compared or set at once when syncing
+# the quota of projects
+SYNC_CHUNK_SIZE = 500
+
+
+def _chunks(lst, size):
+    for i in xrange(0, len(lst), size):
+        yield lst[i:i + size]
+
+
+def _changed_limits(limits, resources=None, sources=None):
+    """Return the limits that differ from the ones in the Quotaholder."""
+    holders = set(holder for (holder, source, resource) in limits)
+    counters = qh.get_quota(holders=holders, resources=resources,
+                            sources=sources)
+    changed = []
+    for key, limit in limits.iteritems():
+        counter = counters.get(key)
+        if counter is None or counter[0] != limit:
+            changed.append((key, limit))
+    return changed
+
+
+def _iter_changed_project_limits(project, grants, resources=None):
+    pr_ref = get_project_ref(project)
+    state = project.state
+
+    limits = {}
+    for grant in grants:
+        val = grant.project_capacity if state == Project.NORMAL else 0
+        limits[(pr_ref, None, grant.resource.name)] = val
+    for entry in _changed_limits(limits, resources=resources):
+        yield entry
+
+    members = ProjectMembership.objects.initialized([project]).\
+        values_list("person__uuid", "state")
+    chunk_size = max(SYNC_CHUNK_SIZE // len(grants), 1)
+    for chunk in _chunks(list(members), chunk_size):
+        limits = {}
+        for uuid, membership_state in chunk:
+            u_ref = user_ref(uuid)
+            is_active = (state == Project.NORMAL and membership_state in
+                         ProjectMembership.ACTUALLY_ACCEPTED)
+            for grant in grants:
+                val = grant.member_capacity if is_active else 0
+                limits[(u_ref, pr_ref, grant.resource.name)] = val
+        for entry in _changed_limits(limits, resources=resources,
+                                     sources=[pr_ref]):
+            yield entry
+
+
 def qh_sync_projects(projects, resource=None):
-    p_quota, u_quota = astakos_project_quotas(projects, resource=resource)
-    p_quota.update(u_quota)
-    set_quota(p_quota, resource=resource)
+    """Sync the Quotaholder limits of projects and their members.
+
+    Compare the limits that derive from the project grants with the ones in
+    the Quotaholder, one chunk of members at a time, and set only those that
+    have changed, in chunks of SYNC_CHUNK_SIZE holdings.
+
+    """
+    objs = ProjectResourceQuota.objects.select_related("resource")
+    flt = Q(resource__name=resource) if resource is not None else Q()
+    grants = objs.filter(project__in=projects).filter(flt)
+    grants_d = _partition_by(lambda g: g.project_id, grants)
+    resources = [resource] if resource is not None else None
+
+    changed = []
+    for project in projects:
+        if project.state not in Project.INITIALIZED_STATES:
+            continue
+        project_grants = grants_d.get(project.id)
+        if not project_grants:
+            continue
+        for entry in _iter_changed_project_limits(project, project_grants,
+                                                  resources=resources):
+            changed.append(entry)
+            if len(changed) >= SYNC_CHUNK_SIZE:
+                qh.set_quota(changed)
+                changed = []
+    if changed:
+        qh.set_quota(changed)
 
 
 def qh_sync_project(project):
@@ -317,11 +483,21 @@ def pick_limit_scheme(project, resource):
 
 
 def qh_sync_new_resource(resource):
-    projects = Project.objects.filter(state__in=Project.INITIALIZED_STATES).\
-        select_for_update()
+    """Grant a new resource to all initialized projects.
+
+    The projects are not locked; projects that already have a grant for the
+    resource, e.g. because they were modified in the meantime, keep it.
+
+    """
+    projects = Project.objects.filter(state__in=Project.INITIALIZED_STATES)
+    granted = ProjectResourceQuota.objects.filter(resource=resource).\
+        values_list("project", flat=True)
+    granted = set(granted)
 
     entries = []
     for project in projects:
+        if project.id in granted:
+            continue
         limit = pick_limit_scheme(project, resource)
         entries.append(
             ProjectResourceQuota(
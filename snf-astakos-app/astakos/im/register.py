@@ -87,6 +87,7 @@ def add_resource(resource_dict):
         raise RegisterException(m)
 
     r.save()
+    quotas.invalidate_component_resources(service.component)
     if not exists:
         quotas.qh_sync_new_resource(r)
 
@@ -178,4 +179,5 @@ def add_service(component, name, service_type, endpoints, out=None):
     for endpoint in endpoints:
         add_endpoint(component, service, endpoint, out=out)
 
+    quotas.invalidate_component_resources(component)
     return not created
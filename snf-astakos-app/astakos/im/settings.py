@@ -266,6 +266,25 @@ RESOURCE_CACHE_TIMEOUT = getattr(settings,
                                  'ASTAKOS_RESOURCE_CACHE_TIMEOUT',
                                  60)
 
+# Django cache backend that keeps the generations of the users for the
+# authentication cache. It must be shared by all Astakos processes; the
+# authentication cache is disabled if it is not set.
+AUTH_CACHE_BACKEND = getattr(settings, 'ASTAKOS_AUTH_CACHE_BACKEND', None)
+
+AUTH_CACHE_TIMEOUT = getattr(settings, 'ASTAKOS_AUTH_CACHE_TIMEOUT', 60)
+
+AUTH_CACHE_SIZE = getattr(settings, 'ASTAKOS_AUTH_CACHE_SIZE', 10000)
+
+PROVISIONLOG_ARCHIVE_DIR = getattr(settings,
+                                   'ASTAKOS_PROVISIONLOG_ARCHIVE_DIR',
+                                   '/var/lib/astakos/provisionlog')
+
+PROVISIONLOG_ARCHIVE_DAYS = getattr(settings,
+                                    'ASTAKOS_PROVISIONLOG_ARCHIVE_DAYS', 90)
+
+COMMISSIONS_BULK_MAX_SIZE = getattr(settings,
+                                    'ASTAKOS_COMMISSIONS_BULK_MAX_SIZE', 500)
+
 ADMIN_API_ENABLED = getattr(settings, 'ASTAKOS_ADMIN_API_ENABLED', False)
 
 _default_project_members_limit_choices = (
@@ -17,6 +17,8 @@
 from astakos.im.tests.common import *
 from astakos.im.settings import astakos_services, BASE_HOST
 from astakos.oa2.backends import DjangoBackend
+from astakos.oa2.backends.djangobackend import token_cache
+from astakos.im.auth_cache import AuthCache
 
 from synnefo.lib.services import get_service_path
 from synnefo.lib import join_urls
@@ -119,6 +121,25 @@ class QuotaAPITest(TestCase):
         self.assertEqual(r.status_code, 200)
         body = json.loads(r.content)
         assertIn(user.uuid, body)
+        all_quotas = body
+
+        # get service quota in pages
+        uuids = sorted(AstakosUser.objects.verified().values_list(
+            'uuid', flat=True))
+        r = client.get(u('service_quotas?limit=1'), **s1_headers)
+        self.assertEqual(r.status_code, 200)
+        body = json.loads(r.content)
+        self.assertEqual(body.keys(), uuids[:1])
+        r = client.get(u('service_quotas?limit=100&marker=' + uuids[0]),
+                       **s1_headers)
+        self.assertEqual(r.status_code, 200)
+        body = json.loads(r.content)
+        self.assertEqual(sorted(body.keys()), uuids[1:])
+        for uuid, quota in all_quotas.iteritems():
+            if uuid != uuids[0]:
+                self.assertEqual(body[uuid], quota)
+        r = client.get(u('service_quotas?limit=0'), **s1_headers)
+        self.assertEqual(r.status_code, 400)
 
         r = client.get(u('commissions'), **s1_headers)
         self.assertEqual(r.status_code, 200)
@@ -221,6 +242,25 @@ class QuotaAPITest(TestCase):
         self.assertEqual(r.status_code, 200)
         body = json.loads(r.content)
         assertIn(user.uuid, body)
+        all_project_quotas = body
+
+        # get project quota in pages
+        project_uuids = sorted(Project.objects.initialized().values_list(
+            'uuid', flat=True))
+        r = client.get(u('service_project_quotas?limit=1'), **s1_headers)
+        self.assertEqual(r.status_code, 200)
+        body = json.loads(r.content)
+        self.assertEqual(body.keys(), project_uuids[:1])
+        r = client.get(u('service_project_quotas?limit=100&marker=' +
+                         project_uuids[0]), **s1_headers)
+        self.assertEqual(r.status_code, 200)
+        body = json.loads(r.content)
+        self.assertEqual(sorted(body.keys()), project_uuids[1:])
+        for uuid, quota in all_project_quotas.iteritems():
+            if uuid != project_uuids[0]:
+                self.assertEqual(body[uuid], quota)
+        r = client.get(u('service_project_quotas?limit=0'), **s1_headers)
+        self.assertEqual(r.status_code, 400)
 
         # resolve pending commissions
         resolve_data = {
@@ -392,6 +432,46 @@ class QuotaAPITest(TestCase):
         self.assertEqual(r11['usage'], 102)
         self.assertEqual(r11['pending'], 101)
 
+        # bulk
+        release = {
+            "auto_accept": True,
+            "provisions": [
+                {
+                    "holder": "user:" + user.uuid,
+                    "source": "project:" + user.uuid,
+                    "resource": resource11['name'],
+                    "quantity": -1
+                }]}
+        missing = {
+            "provisions": [
+                {
+                    "holder": "user:" + user.uuid,
+                    "source": "project:" + user.uuid,
+                    "resource": "non existent",
+                    "quantity": 1
+                }]}
+        post_data = json.dumps({"commissions": [release, missing]})
+        r = client.post(u('commissions/bulk'), post_data,
+                        content_type='application/json', **s1_headers)
+        self.assertEqual(r.status_code, 201)
+        results = json.loads(r.content)["commissions"]
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[1]["itemNotFound"]["code"], 404)
+        # auto accepted
+        r = client.get(u('commissions/' + str(results[0]["serial"])),
+                       **s1_headers)
+        self.assertEqual(r.status_code, 404)
+
+        post_data = json.dumps({"commissions": [{"name": "no provisions"}]})
+        r = client.post(u('commissions/bulk'), post_data,
+                        content_type='application/json', **s1_headers)
+        self.assertEqual(r.status_code, 400)
+
+        post_data = json.dumps({"commissions": []})
+        r = client.post(u('commissions/bulk'), post_data,
+                        content_type='application/json', **s1_headers)
+        self.assertEqual(r.status_code, 400)
+
         # Bad Request
         r = client.head(u('commissions'))
         self.assertEqual(r.status_code, 405)
@@ -657,6 +737,103 @@ class TokensApiTest(TestCase):
         r = client.post(url, post_data, content_type='application/json')
         self.assertEqual(r.status_code, 401)
 
+    def test_authenticate_cache(self):
+        client = Client()
+        url = reverse('astakos.api.tokens.authenticate')
+        post_data = """{"auth":{"token":{"id":"%s"}}}"""
+
+        def authenticate(token):
+            return client.post(url, post_data % token,
+                               content_type='application/json')
+
+        r = authenticate(self.user1.auth_token)
+        self.assertEqual(r.status_code, 200)
+        body = json.loads(r.content)
+        # The result is cached
+        with self.assertNumQueries(0):
+            r = authenticate(self.user1.auth_token)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(json.loads(r.content), body)
+
+        # Renewing the token invalidates the cached result
+        old_token = self.user1.auth_token
+        self.user1.renew_token()
+        self.user1.save()
+        r = authenticate(old_token)
+        self.assertEqual(r.status_code, 401)
+        r = authenticate(self.user1.auth_token)
+        self.assertEqual(r.status_code, 200)
+
+        # And so does deactivating the user
+        backend = activation_backends.get_backend()
+        backend.deactivate_user(self.user1)
+        r = authenticate(self.user1.auth_token)
+        self.assertEqual(r.status_code, 401)
+
+    def test_authenticate_cache_roles(self):
+        client = Client()
+        url = reverse('astakos.api.tokens.authenticate')
+        post_data = """{"auth":{"token":{"id":"%s"}}}"""
+
+        def roles():
+            r = client.post(url, post_data % self.user2.auth_token,
+                            content_type='application/json')
+            self.assertEqual(r.status_code, 200)
+            body = json.loads(r.content)
+            return set(role["name"] for role in
+                       body["access"]["user"]["roles"])
+
+        initial = roles()
+        # Changing the groups of the user invalidates the cached result,
+        # from either side of the relation
+        group = Group.objects.create(name="cachedrole")
+        self.user2.groups.add(group)
+        self.assertEqual(roles(), initial | set(["cachedrole"]))
+        group.user_set.clear()
+        self.assertEqual(roles(), initial)
+        group.user_set.add(self.user2)
+        self.assertEqual(roles(), initial | set(["cachedrole"]))
+        group.name = "renamedrole"
+        group.save()
+        self.assertEqual(roles(), initial | set(["renamedrole"]))
+        group.delete()
+        self.assertEqual(roles(), initial)
+
+        # And so does deleting the user
+        token = self.user2.auth_token
+        self.user2.delete()
+        r = client.post(url, post_data % token,
+                        content_type='application/json')
+        self.assertEqual(r.status_code, 401)
+
+    def test_auth_cache_bounds(self):
+        cache = AuthCache(size=2, timeout=60)
+        snapshot = cache.snapshot(
+            AstakosUser.objects.filter(uuid=self.user2.uuid))
+        for token in ("a", "b", "c"):
+            cache.set(token, "user", snapshot, token)
+        self.assertEqual(cache.get("a", "user"), None)
+        self.assertEqual(cache.get("b", "user"), "b")
+        self.assertEqual(cache.get("c", "user"), "c")
+        # Values are not returned after the token has expired
+        cache.set("d", "user", snapshot, "d",
+                  expires=datetime.now() - timedelta(seconds=1))
+        self.assertEqual(cache.get("d", "user"), None)
+
+    def test_auth_cache_snapshot(self):
+        cache = AuthCache(size=2, timeout=60)
+        users = AstakosUser.objects.filter(auth_token=self.user2.auth_token)
+        snapshot = cache.snapshot(users)
+        # The user changes between reading the generation and caching the
+        # user, so the cached user is never returned
+        self.user2.renew_token()
+        self.user2.save()
+        cache.set(self.user2.auth_token, "user", snapshot, "stale")
+        self.assertEqual(cache.get(self.user2.auth_token, "user"), None)
+        # No generation can be read for a missing user
+        users = AstakosUser.objects.filter(auth_token="nosuchtoken")
+        self.assertEqual(cache.snapshot(users), None)
+
 
 class UserCatalogsTest(TestCase):
     def test_get_uuid_displayname_catalogs(self):
@@ -759,6 +936,7 @@ class WrongPathAPITest(TestCase):
 
 class ValidateAccessToken(TestCase):
     def setUp(self):
+        token_cache.clear()
         self.oa2_backend = DjangoBackend()
         self.user = get_local_user("user@synnefo.org")
         self.token = self.oa2_backend.token_model.create(
@@ -824,3 +1002,20 @@ class ValidateAccessToken(TestCase):
         url = reverse('astakos.api.tokens.validate_token',
                       kwargs={'token_id': self.user.auth_token})
         self.assertEqual(r.status_code, 404)
+
+    def test_validate_token_cache(self):
+        url = reverse('astakos.api.tokens.validate_token',
+                      kwargs={'token_id': self.token.code})
+        r = self.client.get(url)
+        self.assertEqual(r.status_code, 200)
+
+        # The validated token is served from the cache until it expires
+        self.oa2_backend.token_model.filter(id=self.token.id).delete()
+        r = self.client.get(url)
+        self.assertEqual(r.status_code, 200)
+        body = json.loads(r.content)
+        self.assertEqual(body['access']['user']['id'], self.user.uuid)
+
+        token_cache.clear()
+        r = self.client.get(url)
+        self.assertEqual(r.status_code, 404)
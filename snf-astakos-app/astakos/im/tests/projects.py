@@ -15,6 +15,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from astakos.im.tests.common import *
+from astakos.quotaholder_app.models import Holding
 
 
 NotFound = type('NotFound', (), {})
@@ -731,6 +732,36 @@ class ProjectAPITest(TestCase):
         self.assertEqual(admin_pa3, admin_pa2)
         self.assertEqual(owner_pa3, owner_pa2)
 
+    def test_sync_projects(self):
+        project = self.user1.base_project
+        holder = quotas.get_user_ref(self.user1)
+        source = quotas.get_project_ref(project)
+        key = (holder, source, u"σέρβις1.ρίσορς11")
+
+        calls = []
+        set_quota = quotas.qh.set_quota
+
+        def record_set_quota(q, resource=None):
+            calls.append(sorted(q))
+            return set_quota(q, resource=resource)
+
+        quotas.qh.set_quota = record_set_quota
+        try:
+            # Nothing has changed
+            quotas.qh_sync_projects([project])
+            self.assertEqual(calls, [])
+
+            # Only the changed limit is set
+            Holding.objects.filter(holder=holder, source=source,
+                                   resource=key[2]).update(limit=5)
+            quotas.qh_sync_projects([project])
+            self.assertEqual(calls, [[(key, 100)]])
+        finally:
+            quotas.qh.set_quota = set_quota
+
+        counters = quotas.qh.get_quota(holders=[holder], sources=[source])
+        self.assertEqual(counters[key][0], 100)
+
 
 class TestProjects(TestCase):
     """
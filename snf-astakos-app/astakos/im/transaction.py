@@ -23,15 +23,49 @@ functions:
  * rollback
 """
 
+from functools import wraps
+
 from django.db import transaction as django_transaction
 
 from snf_django.utils import transaction as snf_transaction
 from snf_django.utils.db import select_db
+from astakos.im.auth_cache import bump_pending_generations
+
+
+class _Transaction(object):
+    """Invalidate the cached authentication results of the users changed
+    by a transaction after the transaction ends."""
+
+    def __init__(self, transaction):
+        self.transaction = transaction
+
+    def __enter__(self):
+        return self.transaction.__enter__()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            return self.transaction.__exit__(exc_type, exc_value, traceback)
+        finally:
+            bump_pending_generations()
+
+    def __call__(self, func):
+        @wraps(func)
+        def inner(*args, **kwargs):
+            with self:
+                return func(*args, **kwargs)
+        return inner
+
+
+def _bump_pending_generations(method):
+    def wrapper(using=None):
+        return _Transaction(method(using=using))
+    return wrapper
 
 
 def commit(using=None):
     using = select_db("im") if using is None else using
     django_transaction.commit(using=using)
+    bump_pending_generations()
 
 
 def rollback(using=None):
@@ -40,10 +74,10 @@ def rollback(using=None):
 
 
 def commit_on_success(using=None):
-    method = django_transaction.commit_on_success
+    method = _bump_pending_generations(django_transaction.commit_on_success)
     return snf_transaction._transaction_func("im", method, using)
 
 
 def commit_manually(using=None):
-    method = django_transaction.commit_manually
+    method = _bump_pending_generations(django_transaction.commit_manually)
     return snf_transaction._transaction_func("im", method, using)
@@ -14,6 +14,8 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import astakos.oa2.models as oa2_models
+from astakos.oa2 import settings as oa2_settings
+from astakos.im.auth_cache import AuthCache, token_digest
 
 from astakos.oa2.backends import base as oa2base
 from astakos.oa2.backends import base as errors
@@ -36,6 +38,10 @@ import urllib
 import logging
 logger = logging.getLogger(__name__)
 
+# Validated access tokens, cached until they expire
+token_cache = AuthCache(oa2_settings.TOKEN_CACHE_SIZE,
+                        oa2_settings.TOKEN_CACHE_TIMEOUT)
+
 
 class DjangoViewsMixin(object):
 
@@ -71,13 +77,15 @@ class DjangoBackendORMMixin(object):
 
     def get_authorization_code(self, code):
         try:
-            return oa2_models.AuthorizationCode.objects.get(code=code)
+            return oa2_models.AuthorizationCode.objects.get(
+                code_digest=token_digest(code), code=code)
         except oa2_models.AuthorizationCode.DoesNotExist:
             raise errors.OA2Error("No such authorization code")
 
     def get_token(self, token):
         try:
-            return oa2_models.Token.objects.get(code=token)
+            return oa2_models.Token.objects.select_related("user").get(
+                code_digest=token_digest(token), code=token)
         except oa2_models.Token.DoesNotExist:
             raise errors.OA2Error("No such token")
 
@@ -101,6 +109,18 @@ class DjangoBackend(DjangoBackendORMMixin, oa2base.SimpleBackend,
     token_model = oa2_models.Token.objects
     client_model = oa2_models.Client.objects
 
+    def consume_token(self, token):
+        token_instance = token_cache.get(token, "oa2")
+        if token_instance is not None:
+            return token_instance
+        tokens = oa2_models.Token.objects.filter(
+            code_digest=token_digest(token), code=token)
+        snapshot = token_cache.snapshot(tokens, field="user__uuid")
+        token_instance = super(DjangoBackend, self).consume_token(token)
+        token_cache.set(token, "oa2", snapshot, token_instance,
+                        expires=token_instance.expires_at)
+        return token_instance
+
     def _build_response(self, oa2response):
         response = http.HttpResponse()
         response.status_code = oa2response.status
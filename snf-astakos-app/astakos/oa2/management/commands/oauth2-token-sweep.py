@@ -0,0 +1,70 @@
+# Copyright (C) 2010-2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from optparse import make_option
+import datetime
+
+from snf_django.management.commands import SynnefoCommand, CommandError
+from astakos.oa2 import settings
+from astakos.oa2 import sweeper
+
+
+class Command(SynnefoCommand):
+    help = """Delete expired oauth2 tokens and stale authorization codes.
+
+    Delete the access tokens that have expired and the authorization codes
+    that have not been exchanged for a token within
+    OAUTH2_AUTHORIZATION_CODE_MAX_AGE seconds, in small batches. Run it
+    periodically, e.g. from cron, optionally bounding the work of each run
+    with --max-rows.
+
+    """
+
+    option_list = SynnefoCommand.option_list + (
+        make_option("--batch-size",
+                    default=500,
+                    help="Number of rows to delete in each transaction"
+                         " (default: 500)"),
+        make_option("--max-rows",
+                    default=None,
+                    help="Maximum number of tokens and of codes to delete"
+                         " in this run"),
+        make_option("--pause",
+                    default=0,
+                    help="Seconds to pause between batches (default: 0)"),
+    )
+
+    def handle(self, *args, **options):
+        try:
+            batch_size = int(options["batch_size"])
+            max_rows = options["max_rows"]
+            if max_rows is not None:
+                max_rows = int(max_rows)
+            pause = float(options["pause"])
+        except ValueError:
+            raise CommandError("Expecting a number.")
+        if batch_size <= 0 or (max_rows is not None and max_rows < 0) or \
+                pause < 0:
+            raise CommandError("Expecting a positive number.")
+
+        now = datetime.datetime.now()
+        tokens = sweeper.sweep_tokens(now, batch_size=batch_size,
+                                      max_rows=max_rows, pause=pause)
+        before = now - datetime.timedelta(
+            seconds=settings.AUTHORIZATION_CODE_MAX_AGE)
+        codes = sweeper.sweep_authorization_codes(
+            before, batch_size=batch_size, max_rows=max_rows, pause=pause)
+        self.stderr.write("Deleted %s expired tokens and %s stale"
+                          " authorization codes.\n" % (tokens, codes))
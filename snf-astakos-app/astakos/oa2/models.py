@@ -19,6 +19,8 @@ from django.db import models
 from django.utils.translation import ugettext_lazy as _
 from django.core.exceptions import ValidationError
 
+from astakos.im.auth_cache import token_digest
+
 CLIENT_TYPES = (
     ('confidential', _('Confidential')),
     ('public', _('Public'))
@@ -82,10 +84,13 @@ class Client(models.Model):
 class AuthorizationCode(models.Model):
     user = models.ForeignKey('im.AstakosUser', on_delete=models.PROTECT)
     code = models.TextField()
+    # Codes are looked up by this digest of the code
+    code_digest = models.CharField(max_length=64, null=True, db_index=True)
     redirect_uri = models.TextField(null=True, default=None)
     client = models.ForeignKey('oa2.Client', on_delete=models.PROTECT)
     scope = models.TextField(null=True, default=None)
-    created_at = models.DateTimeField(default=datetime.datetime.now())
+    created_at = models.DateTimeField(default=datetime.datetime.now,
+                                      db_index=True)
 
     access_token = models.CharField(max_length=100, choices=ACCESS_TOKEN_TYPES,
                                     default='online')
@@ -93,6 +98,10 @@ class AuthorizationCode(models.Model):
     # not really useful
     state = models.TextField(null=True, default=None)
 
+    def save(self, **kwargs):
+        self.code_digest = token_digest(self.code)
+        super(AuthorizationCode, self).save(**kwargs)
+
     def client_id_is_valid(self, client_id):
         return self.client_id == client_id
 
@@ -111,8 +120,10 @@ class AuthorizationCode(models.Model):
 
 class Token(models.Model):
     code = models.TextField()
-    created_at = models.DateTimeField(default=datetime.datetime.now())
-    expires_at = models.DateTimeField()
+    # Tokens are looked up by this digest of the code
+    code_digest = models.CharField(max_length=64, null=True, db_index=True)
+    created_at = models.DateTimeField(default=datetime.datetime.now)
+    expires_at = models.DateTimeField(db_index=True)
     token_type = models.CharField(max_length=100, choices=TOKEN_TYPES,
                                   default='Bearer')
     grant_type = models.CharField(max_length=100, choices=GRANT_TYPES,
@@ -129,6 +140,10 @@ class Token(models.Model):
     # not really useful
     state = models.TextField(null=True, default=None)
 
+    def save(self, **kwargs):
+        self.code_digest = token_digest(self.code)
+        super(Token, self).save(**kwargs)
+
     def __repr__(self):
         return ("Token: %r (token_type: %r, grant_type: %r, "
                 "user: %r, client: %r, scope: %r)" % (
@@ -21,6 +21,17 @@ TOKEN_LENGTH = get_setting('TOKEN_LENGTH', 30)
 # Set the expiration time of newly created access tokens to 20 seconds
 TOKEN_EXPIRES = get_setting('TOKEN_EXPIRES', 20)
 
+# Set the number of validated access tokens that are cached in each process
+TOKEN_CACHE_SIZE = get_setting('TOKEN_CACHE_SIZE', 10000)
+
+# Set the maximum time in seconds that a validated access token is cached,
+# which is anyway bounded by the expiration time of the token
+TOKEN_CACHE_TIMEOUT = get_setting('TOKEN_CACHE_TIMEOUT', 60)
+
+# Set the time in seconds after which the authorization codes that have not
+# been exchanged for an access token are deleted by 'oauth2-token-sweep'
+AUTHORIZATION_CODE_MAX_AGE = get_setting('AUTHORIZATION_CODE_MAX_AGE', 3600)
+
 # Set the maximum allowed redirection endpoint URI length
 # Requests for a greater redirection endpoint URI will fail.
 MAXIMUM_ALLOWED_REDIRECT_URI_LENGTH = get_setting(
@@ -0,0 +1,74 @@
+# Copyright (C) 2010-2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Deletion of expired access tokens and stale authorization codes.
+
+Rows are deleted in small batches, each one in its own transaction, so that
+the sweeper never holds many locks or blocks the token endpoints for long.
+
+"""
+
+from time import sleep
+
+from astakos.im import transaction
+from astakos.oa2.models import Token, AuthorizationCode
+
+
+@transaction.commit_on_success
+def _sweep_batch(queryset, batch_size):
+    ids = list(queryset.order_by("id").values_list("id", flat=True)
+               [:batch_size])
+    if ids:
+        queryset.model.objects.filter(id__in=ids).delete()
+    return len(ids)
+
+
+def _sweep(queryset, batch_size, max_rows, pause):
+    total = 0
+    while max_rows is None or total < max_rows:
+        size = batch_size
+        if max_rows is not None:
+            size = min(size, max_rows - total)
+        count = _sweep_batch(queryset, size)
+        total += count
+        if count < size:
+            break
+        if pause:
+            sleep(pause)
+    return total
+
+
+def sweep_tokens(now, batch_size=500, max_rows=None, pause=0):
+    """Delete the access tokens that expired before 'now'.
+
+    Delete at most 'max_rows' tokens, in batches of 'batch_size' rows,
+    pausing for 'pause' seconds between batches. Return the number of
+    deleted tokens.
+
+    """
+    return _sweep(Token.objects.filter(expires_at__lt=now),
+                  batch_size, max_rows, pause)
+
+
+def sweep_authorization_codes(before, batch_size=500, max_rows=None,
+                              pause=0):
+    """Delete the authorization codes created before 'before'.
+
+    Batches are handled as in sweep_tokens. Return the number of deleted
+    codes.
+
+    """
+    return _sweep(AuthorizationCode.objects.filter(created_at__lt=before),
+                  batch_size, max_rows, pause)
@@ -29,7 +29,11 @@ from django.utils import simplejson as json
 from django.utils.encoding import smart_str, iri_to_uri
 
 from astakos.oa2 import settings
+from astakos.oa2 import sweeper
 from astakos.oa2.models import Client, AuthorizationCode, Token
+from astakos.oa2.backends import DjangoBackend
+from astakos.oa2.backends.base import OA2Error
+from astakos.im.auth_cache import token_digest
 from astakos.im.tests import common
 
 from synnefo.util.urltools import normalize
@@ -560,3 +564,57 @@ class TestOA2(TestCase, URLAssertionsMixin):
                     'scope': redirect_uri,
                     'state': None}
         self.assert_access_token_response(r, expected)
+
+
+class TestTokenSweep(TestCase):
+
+    def setUp(self):
+        self.user = common.get_local_user("user@synnefo.org")
+        self.oa2_client = Client.objects.create(identifier="client1",
+                                                secret="secret")
+        self.now = datetime.datetime.now()
+
+    def create_token(self, code, expires_in):
+        return Token.objects.create(
+            code=code, user=self.user, client=self.oa2_client,
+            redirect_uri="https://server.com/handle_code",
+            expires_at=self.now + datetime.timedelta(seconds=expires_in))
+
+    def create_code(self, code, age):
+        return AuthorizationCode.objects.create(
+            code=code, user=self.user, client=self.oa2_client,
+            created_at=self.now - datetime.timedelta(seconds=age))
+
+    def test_lookup(self):
+        token = self.create_token(u"τoken", 60)
+        self.assertEqual(token.code_digest, token_digest(u"τoken"))
+        code = self.create_code("code", 0)
+        self.assertEqual(code.code_digest, token_digest("code"))
+
+        backend = DjangoBackend()
+        self.assertEqual(backend.get_token(u"τoken").id, token.id)
+        self.assertEqual(backend.get_authorization_code("code").id, code.id)
+        self.assertRaises(OA2Error, backend.get_token, "other")
+        self.assertRaises(OA2Error, backend.get_authorization_code, "other")
+
+    def test_sweep(self):
+        for i in range(5):
+            self.create_token("expired%s" % i, -10)
+            self.create_code("stale%s" % i, 7200)
+        self.create_token("valid", 10)
+        self.create_code("fresh", 0)
+
+        # Bounded runs delete at most max_rows rows
+        self.assertEqual(sweeper.sweep_tokens(self.now, batch_size=2,
+                                              max_rows=3), 3)
+        self.assertEqual(sweeper.sweep_tokens(self.now, batch_size=2), 2)
+        self.assertEqual(sweeper.sweep_tokens(self.now, batch_size=2), 0)
+        self.assertEqual(list(Token.objects.values_list("code", flat=True)),
+                         ["valid"])
+
+        before = self.now - datetime.timedelta(seconds=3600)
+        self.assertEqual(sweeper.sweep_authorization_codes(before,
+                                                           batch_size=2), 5)
+        self.assertEqual(
+            list(AuthorizationCode.objects.values_list("code", flat=True)),
+            ["fresh"])
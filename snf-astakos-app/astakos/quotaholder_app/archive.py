@@ -0,0 +1,174 @@
+# Copyright (C) 2010-2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Archival of the provision log.
+
+Old ProvisionLog rows are moved out of the database to per-month archive
+files in a directory. Each file is named 'provisionlog-YYYY-MM.jsonl.gz',
+after the month of the 'log_time' of its rows, and holds one JSON object per
+row.
+
+Rows are first appended to the archive files and then deleted from the
+database, so an interrupted archival may leave a row in both places; readers
+skip rows that have already been read.
+
+"""
+
+import os
+import re
+import gzip
+from datetime import datetime
+
+from django.utils import simplejson as json
+
+from astakos.im import transaction
+from astakos.quotaholder_app.models import ProvisionLog
+from astakos.quotaholder_app.callpoint import format_datetime
+
+FIELDS = ["id", "serial", "name", "issue_time", "log_time", "holder",
+          "source", "resource", "limit", "usage_min", "usage_max",
+          "delta_quantity", "reason"]
+
+ARCHIVE_RE = re.compile(r"^provisionlog-(\d{4}-\d{2})\.jsonl\.gz$")
+
+
+def archive_path(directory, month):
+    return os.path.join(directory, "provisionlog-%s.jsonl.gz" % month)
+
+
+def _log_time(t):
+    if isinstance(t, datetime):
+        return format_datetime(t)
+    return t
+
+
+def _month(log_time):
+    return log_time[:7]
+
+
+@transaction.commit_on_success
+def _archive_batch(directory, before, batch_size):
+    logs = ProvisionLog.objects.filter(log_time__lt=before)
+    rows = list(logs.order_by("id").values(*FIELDS)[:batch_size])
+    if not rows:
+        return 0
+
+    months = {}
+    for row in rows:
+        months.setdefault(_month(row["log_time"]), []).append(row)
+
+    for month, month_rows in sorted(months.iteritems()):
+        with open(archive_path(directory, month), "ab") as raw:
+            f = gzip.GzipFile(fileobj=raw, mode="ab")
+            try:
+                for row in month_rows:
+                    f.write(json.dumps(row) + "\n")
+            finally:
+                f.close()
+            # Make sure the rows are on disk before deleting them
+            raw.flush()
+            os.fsync(raw.fileno())
+
+    ProvisionLog.objects.filter(id__in=[row["id"] for row in rows]).delete()
+    return len(rows)
+
+
+def archive_provision_logs(directory, before, batch_size=500):
+    """Move the provision log rows logged before 'before' to the archive.
+
+    Rows are moved in batches of 'batch_size' rows, each one in its own
+    transaction. Return the number of archived rows.
+
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    before = _log_time(before)
+    total = 0
+    while True:
+        count = _archive_batch(directory, before, batch_size)
+        if not count:
+            return total
+        total += count
+
+
+def archived_months(directory):
+    """Return the sorted months, as 'YYYY-MM', that have an archive file."""
+    if not os.path.isdir(directory):
+        return []
+    months = []
+    for name in os.listdir(directory):
+        m = ARCHIVE_RE.match(name)
+        if m is not None:
+            months.append(m.group(1))
+    return sorted(months)
+
+
+def _read_archive(path):
+    f = gzip.open(path, "rb")
+    try:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+    finally:
+        f.close()
+
+
+def get_provision_logs(directory, since=None, until=None, holder=None,
+                       resource=None, serial=None):
+    """Return the provision log, both archived and live.
+
+    Return an iterator over the provision log rows, as dictionaries, with
+    'log_time' in the range ['since', 'until'), optionally restricted to a
+    holder, resource or commission serial. Archived rows come first, in month
+    order, followed by the rows still in the database.
+
+    """
+    since = _log_time(since)
+    until = _log_time(until)
+
+    def matches(row):
+        return ((since is None or row["log_time"] >= since) and
+                (until is None or row["log_time"] < until) and
+                (holder is None or row["holder"] == holder) and
+                (resource is None or row["resource"] == resource) and
+                (serial is None or row["serial"] == serial))
+
+    seen = set()
+    for month in archived_months(directory):
+        if since is not None and month < _month(since):
+            continue
+        if until is not None and month > _month(until):
+            continue
+        for row in _read_archive(archive_path(directory, month)):
+            if row["id"] in seen or not matches(row):
+                continue
+            seen.add(row["id"])
+            yield row
+
+    logs = ProvisionLog.objects.all()
+    if since is not None:
+        logs = logs.filter(log_time__gte=since)
+    if until is not None:
+        logs = logs.filter(log_time__lt=until)
+    if holder is not None:
+        logs = logs.filter(holder=holder)
+    if resource is not None:
+        logs = logs.filter(resource=resource)
+    if serial is not None:
+        logs = logs.filter(serial=serial)
+    for row in logs.order_by("id").values(*FIELDS).iterator():
+        if row["id"] not in seen:
+            yield row
@@ -14,6 +14,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from datetime import datetime
+from django.db import connections, router, transaction
 from django.db.models import Q
 from astakos.quotaholder_app.exception import (
     QuotaholderError,
@@ -27,6 +28,7 @@ from astakos.quotaholder_app.commission import (
 
 from astakos.quotaholder_app.models import (
     Holding, Commission, Provision, ProvisionLog)
+from astakos.quotaholder_app import summary
 
 
 def format_datetime(d):
@@ -57,33 +59,153 @@ def get_quota(holders=None, sources=None, resources=None, flt=None):
     return quotas
 
 
+def get_holding_summary(sources=None, resources=None):
+    return summary.get_summary(sources=sources, resources=resources)
+
+
 def delete_quota(keys):
+    holdings = _get_holdings_for_update(keys).values()
+    summary.holdings_deleted(holdings)
+    Holding.objects.filter(id__in=[h.id for h in holdings]).delete()
+
+
+# Number of holding keys looked up by a single portable statement. Each key
+# takes up to three parameters, which must stay below the limit of SQLite on
+# the number of parameters.
+LOCK_CHUNK = 300
+
+
+def _holding_keys_where_pg(connection, keys):
+    qn = connection.ops.quote_name
+    holder, source, resource = qn("holder"), qn("source"), qn("resource")
+    with_source = [k for k in keys if k[1] is not None]
+    without_source = [k for k in keys if k[1] is None]
+    where = []
+    params = []
+    if with_source:
+        where.append("(%s, %s, %s) IN (%s)" % (
+            holder, source, resource,
+            ", ".join(["(%s, %s, %s)"] * len(with_source))))
+        for key in with_source:
+            params += key
+    if without_source:
+        where.append("(%s IS NULL AND (%s, %s) IN (%s))" % (
+            source, holder, resource,
+            ", ".join(["(%s, %s)"] * len(without_source))))
+        for h, s, r in without_source:
+            params += [h, r]
+    return "(%s)" % " OR ".join(where), params
+
+
+def _holding_keys_flt(keys):
+    holders = {}
     for holder, source, resource in keys:
-        Holding.objects.filter(holder=holder,
-                               source=source,
-                               resource=resource).delete()
+        holders.setdefault((source, resource), []).append(holder)
+    flt = None
+    for (source, resource), hs in holders.iteritems():
+        q = Q(resource=resource, holder__in=hs)
+        q &= Q(source__isnull=True) if source is None else Q(source=source)
+        flt = q if flt is None else flt | q
+    return flt
+
+
+def _get_holdings_for_update(holding_keys):
+    """Lock the holdings with the given keys.
+
+    All holdings are locked through here, always in the order of their keys,
+    so that concurrent commissions over the same holdings wait for each other
+    instead of deadlocking. On PostgreSQL, the holdings are fetched with a
+    single query on the (holder, source, resource) index; elsewhere, with a
+    query per chunk of keys.
+
+    Return a dictionary of the found holdings by key.
+
+    """
+    keys = sorted(set(holding_keys))
+    if not keys:
+        return {}
+    using = router.db_for_write(Holding)
+    connection = connections[using]
+    objs = Holding.objects.select_for_update().order_by(
+        "holder", "source", "resource")
+    if connection.vendor == "postgresql":
+        where, params = _holding_keys_where_pg(connection, keys)
+        queries = [objs.extra(where=[where], params=params)]
+    else:
+        queries = [objs.filter(_holding_keys_flt(keys[i:i + LOCK_CHUNK]))
+                   for i in xrange(0, len(keys), LOCK_CHUNK)]
+
+    holdings = {}
+    for query in queries:
+        for h in query:
+            holdings[(h.holder, h.source, h.resource)] = h
+    summary.snapshot(holdings.values())
+    return holdings
 
 
-def _get_holdings_for_update(holding_keys, resource=None, delete=False):
-    flt = Q(resource=resource) if resource is not None else Q()
-    holders = set(holder for (holder, source, resource) in holding_keys)
-    objs = Holding.objects.filter(flt, holder__in=holders).order_by('pk')
-    hs = objs.select_for_update()
+# Number of holdings updated by a single statement. The portable statement
+# takes seven parameters per holding, which must stay below the limit of
+# SQLite on the number of parameters.
+PG_UPDATE_CHUNK = 1000
+UPDATE_CHUNK = 100
+
+
+def _update_holdings_pg(cursor, table, limit, holdings):
+    values = ", ".join(["(%s, %s, %s, %s)"] * len(holdings))
+    params = []
+    for h in holdings:
+        params += [h.id, h.limit, h.usage_min, h.usage_max]
+    cursor.execute(
+        "UPDATE %s AS h SET %s = v.lim, usage_min = v.usage_min,"
+        " usage_max = v.usage_max"
+        " FROM (VALUES %s) AS v(id, lim, usage_min, usage_max)"
+        " WHERE h.id = v.id" % (table, limit, values), params)
+
+
+def _update_holdings(cursor, table, limit, holdings):
+    cases = " ".join(["WHEN %s THEN %s"] * len(holdings))
+    ids = ", ".join(["%s"] * len(holdings))
+    params = []
+    for field in ("limit", "usage_min", "usage_max"):
+        for h in holdings:
+            params += [h.id, getattr(h, field)]
+    params += [h.id for h in holdings]
+    cursor.execute(
+        "UPDATE %s SET %s = CASE id %s END,"
+        " usage_min = CASE id %s END, usage_max = CASE id %s END"
+        " WHERE id IN (%s)" % (table, limit, cases, cases, cases, ids),
+        params)
+
+
+def save_holdings(holdings):
+    """Save the limit and usage of the given holdings with set-based updates.
+
+    Commissions touch many holdings, which are locked until the transaction
+    ends; instead of one UPDATE per holding, write all of them with a single
+    statement per chunk of holdings.
+
+    """
+    holdings = sorted(holdings, key=lambda h: h.id)
+    if not holdings:
+        return
+    using = router.db_for_write(Holding)
+    connection = connections[using]
+    table = connection.ops.quote_name(Holding._meta.db_table)
+    limit = connection.ops.quote_name("limit")
+    if connection.vendor == "postgresql":
+        update, chunk = _update_holdings_pg, PG_UPDATE_CHUNK
+    else:
+        update, chunk = _update_holdings, UPDATE_CHUNK
 
-    keys = set(holding_keys)
-    holdings = {}
-    put_back = []
-    for h in hs:
-        key = h.holder, h.source, h.resource
-        if key in keys:
-            holdings[key] = h
-        else:
-            put_back.append(h)
+    cursor = connection.cursor()
+    for i in xrange(0, len(holdings), chunk):
+        update(cursor, table, limit, holdings[i:i + chunk])
+    summary.holdings_saved(holdings)
 
-    if delete:
-        objs.delete()
-        Holding.objects.bulk_create(put_back)
-    return holdings
+    if transaction.is_managed(using=using):
+        transaction.set_dirty(using=using)
+    else:
+        transaction.commit_unless_managed(using=using)
 
 
 def _mkProvision(key, quantity):
@@ -96,29 +218,27 @@ def _mkProvision(key, quantity):
 
 
 def set_quota(quotas, resource=None):
-    holding_keys = [key for (key, limit) in quotas]
-    holdings = _get_holdings_for_update(
-        holding_keys, resource=resource, delete=True)
-
-    new_holdings = {}
-    for key, limit in quotas:
-        holder, source, res = key
-        if resource is not None and resource != res:
-            continue
-        h = Holding(holder=holder,
-                    source=source,
-                    resource=res,
-                    limit=limit)
-        try:
-            h_old = holdings[key]
-            h.usage_min = h_old.usage_min
-            h.usage_max = h_old.usage_max
-            h.id = h_old.id
-        except KeyError:
-            pass
-        new_holdings[key] = h
-
-    Holding.objects.bulk_create(new_holdings.values())
+    quotas = dict((key, limit) for (key, limit) in quotas
+                  if resource is None or key[2] == resource)
+    holdings = _get_holdings_for_update(quotas.keys())
+
+    changed = []
+    new_holdings = []
+    for key, limit in quotas.iteritems():
+        h = holdings.get(key)
+        if h is None:
+            holder, source, res = key
+            new_holdings.append(Holding(holder=holder,
+                                        source=source,
+                                        resource=res,
+                                        limit=limit))
+        elif h.limit != limit:
+            h.limit = limit
+            changed.append(h)
+
+    save_holdings(changed)
+    Holding.objects.bulk_create(new_holdings)
+    summary.holdings_created(new_holdings)
 
 
 def _merge_same_keys(provisions):
@@ -129,13 +249,9 @@ def _merge_same_keys(provisions):
     return tuples
 
 
-def issue_commission(clientkey, provisions, name="", force=False):
+def _prepare_commission(holdings, provisions, force):
     operations = Operations()
     provisions_to_create = []
-
-    provisions = _merge_same_keys(provisions)
-    keys = [key for (key, value) in provisions]
-    holdings = _get_holdings_for_update(keys)
     try:
         for key, quantity in provisions:
             # Target
@@ -154,27 +270,78 @@ def issue_commission(clientkey, provisions, name="", force=False):
                 abs_quantity = -quantity
                 operations.prepare(Release, th, abs_quantity, False)
 
-            holdings[key] = th
             provisions_to_create.append((key, quantity))
     except QuotaholderError:
         operations.revert()
         raise
+    return provisions_to_create
+
 
+def _create_commission(clientkey, name, provisions):
     commission = Commission.objects.create(clientkey=clientkey,
                                            name=name,
                                            issue_datetime=datetime.now())
     ps = []
-    for (holder, source, resource), quantity in provisions_to_create:
+    for (holder, source, resource), quantity in provisions:
         ps.append(Provision(serial=commission,
                             holder=holder,
                             source=source,
                             resource=resource,
                             quantity=quantity))
+    return commission, ps
+
+
+def issue_commission(clientkey, provisions, name="", force=False):
+    provisions = _merge_same_keys(provisions)
+    keys = [key for (key, value) in provisions]
+    holdings = _get_holdings_for_update(keys)
+    provisions = _prepare_commission(holdings, provisions, force)
+
+    save_holdings(holdings.values())
+    commission, ps = _create_commission(clientkey, name, provisions)
     Provision.objects.bulk_create(ps)
 
     return commission.serial
 
 
+def issue_commissions_bulk(clientkey, commissions):
+    """Issue many commissions at once.
+
+    Each commission is a dictionary with the 'provisions' of the commission
+    and optionally its 'name' and 'force' flag. The commissions are checked
+    one after the other, as if they were issued separately, but the holdings
+    of all of them are locked and saved together.
+
+    Return a list with the serial of each commission, or the QuotaholderError
+    that made it fail. A failed commission does not affect the others.
+
+    """
+    commissions = [(_merge_same_keys(c["provisions"]),
+                    c.get("name", ""),
+                    c.get("force", False)) for c in commissions]
+    keys = set()
+    for provisions, name, force in commissions:
+        keys.update(key for (key, value) in provisions)
+    holdings = _get_holdings_for_update(keys)
+
+    results = []
+    ps = []
+    for provisions, name, force in commissions:
+        try:
+            provisions = _prepare_commission(holdings, provisions, force)
+        except QuotaholderError as e:
+            results.append(e)
+            continue
+        commission, commission_ps = _create_commission(
+            clientkey, name, provisions)
+        ps.extend(commission_ps)
+        results.append(commission.serial)
+
+    save_holdings(holdings.values())
+    Provision.objects.bulk_create(ps)
+    return results
+
+
 def _log_provision(commission, provision, holding, log_datetime, reason):
 
     kwargs = {
@@ -198,6 +365,7 @@ def _log_provision(commission, provision, holding, log_datetime, reason):
 def _get_commissions_for_update(clientkey, serials):
     cs = Commission.objects.filter(
         clientkey=clientkey, serial__in=serials).select_for_update()
+    cs = cs.order_by('serial')
 
     commissions = {}
     for c in cs:
@@ -237,13 +405,17 @@ def resolve_pending_commissions(clientkey, accept_set=None, reject_set=None,
     serials = actions.keys()
     commissions = _get_commissions_for_update(clientkey, serials)
     ps = Provision.objects.filter(serial__in=serials).select_for_update()
-    holding_keys = sorted(p.holding_key() for p in ps)
+    ps = ps.order_by('id')
+    holding_keys = [p.holding_key() for p in ps]
     holdings = _get_holdings_for_update(holding_keys)
     provisions = _partition_by(lambda p: p.serial_id, ps)
 
     log_datetime = datetime.now()
 
     accepted, rejected, notFound = [], [], []
+    resolved_holdings = {}
+    provision_ids = []
+    plog = []
     for serial, accept in actions.iteritems():
         commission = commissions.get(serial)
         if commission is None:
@@ -253,8 +425,6 @@ def resolve_pending_commissions(clientkey, accept_set=None, reject_set=None,
         accepted.append(serial) if accept else rejected.append(serial)
 
         ps = provisions.get(serial, [])
-        provision_ids = []
-        plog = []
         for pv in ps:
             key = pv.holding_key()
             h = holdings.get(key)
@@ -268,14 +438,17 @@ def resolve_pending_commissions(clientkey, accept_set=None, reject_set=None,
                 action(Import, h, quantity)
             else:  # release
                 action(Release, h, -quantity)
+            resolved_holdings[key] = h
 
             prefix = 'ACCEPT:' if accept else 'REJECT:'
             comm_reason = prefix + reason[-121:]
             plog.append(
                 _log_provision(commission, pv, h, log_datetime, comm_reason))
-        Provision.objects.filter(id__in=provision_ids).delete()
-        ProvisionLog.objects.bulk_create(plog)
-        commission.delete()
+
+    save_holdings(resolved_holdings.values())
+    Provision.objects.filter(id__in=provision_ids).delete()
+    ProvisionLog.objects.bulk_create(plog)
+    Commission.objects.filter(serial__in=accepted + rejected).delete()
     return accepted, rejected, notFound, conflicting
 
 
@@ -17,6 +17,12 @@ from astakos.quotaholder_app.exception import NoCapacityError, NoQuantityError
 
 
 class Operation(object):
+    """Operation on the usage of a holding.
+
+    Operations only modify the holding objects; the caller is responsible
+    for saving the modified holdings to the DB.
+
+    """
 
     @staticmethod
     def assertions(holding):
@@ -77,12 +83,10 @@ class Import(Operation):
                                   usage=usage_max)
 
         holding.usage_max = new_usage_max
-        holding.save()
 
     @classmethod
     def _finalize(cls, holding, quantity):
         holding.usage_min += quantity
-        holding.save()
 
 
 class Release(Operation):
@@ -104,12 +108,10 @@ class Release(Operation):
                                   usage=usage_min)
 
         holding.usage_min = new_usage_min
-        holding.save()
 
     @classmethod
     def _finalize(cls, holding, quantity):
         holding.usage_max -= quantity
-        holding.save()
 
 
 class Operations(object):
@@ -0,0 +1,50 @@
+# Copyright (C) 2010-2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from optparse import make_option
+
+from snf_django.management.utils import pprint_table
+from snf_django.management.commands import SynnefoCommand
+from astakos.quotaholder_app import summary
+
+
+class Command(SynnefoCommand):
+    help = """Check the holding summary against the holdings.
+
+    Recompute the summed limits and usages of the holdings per source and
+    resource and compare them with the holding summary. Commissions wait
+    while the check runs.
+
+    """
+
+    option_list = SynnefoCommand.option_list + (
+        make_option("--fix", dest="fix",
+                    default=False,
+                    action="store_true",
+                    help="Rebuild the holding summary from the holdings."),
+    )
+
+    def handle(self, *args, **options):
+        write = self.stderr.write
+        diffs = summary.check_summary()
+        if not diffs:
+            write("Holding summary is consistent.\n")
+            return
+
+        headers = ("Source", "Resource", "Summary", "Holdings")
+        pprint_table(self.stdout, diffs, headers, title="Inconsistencies")
+        if options["fix"]:
+            summary.rebuild_summary()
+            write("Rebuilt the holding summary.\n")
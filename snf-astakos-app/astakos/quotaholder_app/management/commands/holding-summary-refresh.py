@@ -0,0 +1,32 @@
+# Copyright (C) 2010-2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from snf_django.management.commands import SynnefoCommand
+from astakos.quotaholder_app import summary
+
+
+class Command(SynnefoCommand):
+    help = """Fold the pending changes of the holdings into their summary.
+
+    The holding summary, which is used for reporting, is kept up to date
+    with the changes of the holdings. Run this command periodically, e.g.
+    from cron, so that the pending changes stay few.
+
+    """
+
+    def handle(self, *args, **options):
+        count = summary.refresh_summary()
+        self.stderr.write("Folded %s changes into the holding summary.\n"
+                          % count)
@@ -0,0 +1,61 @@
+# Copyright (C) 2010-2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from optparse import make_option
+import datetime
+
+from snf_django.management.commands import SynnefoCommand, CommandError
+from astakos.im import settings
+from astakos.quotaholder_app import archive
+
+
+class Command(SynnefoCommand):
+    help = """Archive old entries of the provision log.
+
+    Move the provision log entries that are older than the given number of
+    days to compressed per-month files in the archive directory.
+
+    """
+
+    option_list = SynnefoCommand.option_list + (
+        make_option("--days",
+                    default=settings.PROVISIONLOG_ARCHIVE_DAYS,
+                    help="Archive entries older than this number of days"
+                         " (default: %s)" %
+                         settings.PROVISIONLOG_ARCHIVE_DAYS),
+        make_option("--directory",
+                    default=settings.PROVISIONLOG_ARCHIVE_DIR,
+                    help="Archive directory (default: %s)" %
+                         settings.PROVISIONLOG_ARCHIVE_DIR),
+        make_option("--batch-size",
+                    default=500,
+                    help="Number of entries to move in each transaction"
+                         " (default: 500)"),
+    )
+
+    def handle(self, *args, **options):
+        try:
+            days = int(options["days"])
+            batch_size = int(options["batch_size"])
+        except ValueError:
+            raise CommandError("Expecting an integer.")
+        if days < 0 or batch_size <= 0:
+            raise CommandError("Expecting a positive integer.")
+
+        before = datetime.datetime.now() - datetime.timedelta(days=days)
+        count = archive.archive_provision_logs(options["directory"], before,
+                                               batch_size=batch_size)
+        self.stderr.write("Archived %s provision log entries in '%s'.\n"
+                          % (count, options["directory"]))
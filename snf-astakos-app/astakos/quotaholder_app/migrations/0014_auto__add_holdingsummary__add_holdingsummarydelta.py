@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+import datetime
+from south.db import db
+from south.v2 import SchemaMigration
+from django.db import models
+
+
+class Migration(SchemaMigration):
+
+    def forwards(self, orm):
+        # Adding model 'HoldingSummary'
+        db.create_table('quotaholder_app_holdingsummary', (
+            ('id', self.gf('django.db.models.fields.AutoField')(primary_key=True)),
+            ('source', self.gf('django.db.models.fields.CharField')(max_length=4096, null=True)),
+            ('resource', self.gf('django.db.models.fields.CharField')(max_length=4096)),
+            ('holdings', self.gf('django.db.models.fields.BigIntegerField')(default=0)),
+            ('limit', self.gf('django.db.models.fields.BigIntegerField')(default=0)),
+            ('usage_min', self.gf('django.db.models.fields.BigIntegerField')(default=0)),
+            ('usage_max', self.gf('django.db.models.fields.BigIntegerField')(default=0)),
+        ))
+        db.send_create_signal('quotaholder_app', ['HoldingSummary'])
+
+        # Adding unique constraint on 'HoldingSummary', fields ['source', 'resource']
+        db.create_unique('quotaholder_app_holdingsummary', ['source', 'resource'])
+
+        # Adding model 'HoldingSummaryDelta'
+        db.create_table('quotaholder_app_holdingsummarydelta', (
+            ('id', self.gf('django.db.models.fields.AutoField')(primary_key=True)),
+            ('source', self.gf('django.db.models.fields.CharField')(max_length=4096, null=True)),
+            ('resource', self.gf('django.db.models.fields.CharField')(max_length=4096)),
+            ('holdings', self.gf('django.db.models.fields.BigIntegerField')(default=0)),
+            ('limit', self.gf('django.db.models.fields.BigIntegerField')(default=0)),
+            ('usage_min', self.gf('django.db.models.fields.BigIntegerField')(default=0)),
+            ('usage_max', self.gf('django.db.models.fields.BigIntegerField')(default=0)),
+        ))
+        db.send_create_signal('quotaholder_app', ['HoldingSummaryDelta'])
+
+    def backwards(self, orm):
+        # Removing unique constraint on 'HoldingSummary', fields ['source', 'resource']
+        db.delete_unique('quotaholder_app_holdingsummary', ['source', 'resource'])
+
+        # Deleting model 'HoldingSummary'
+        db.delete_table('quotaholder_app_holdingsummary')
+
+        # Deleting model 'HoldingSummaryDelta'
+        db.delete_table('quotaholder_app_holdingsummarydelta')
+
+    models = {
+        'quotaholder_app.commission': {
+            'Meta': {'object_name': 'Commission'},
+            'clientkey': ('django.db.models.fields.CharField', [], {'max_length': '4096'}),
+            'issue_datetime': ('django.db.models.fields.DateTimeField', [], {}),
+            'name': ('django.db.models.fields.CharField', [], {'default': "''", 'max_length': '4096'}),
+            'serial': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'})
+        },
+        'quotaholder_app.holding': {
+            'Meta': {'unique_together': "(('holder', 'source', 'resource'),)", 'object_name': 'Holding'},
+            'holder': ('django.db.models.fields.CharField', [], {'max_length': '4096', 'db_index': 'True'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'limit': ('django.db.models.fields.BigIntegerField', [], {}),
+            'resource': ('django.db.models.fields.CharField', [], {'max_length': '4096'}),
+            'source': ('django.db.models.fields.CharField', [], {'max_length': '4096', 'null': 'True'}),
+            'usage_max': ('django.db.models.fields.BigIntegerField', [], {'default': '0'}),
+            'usage_min': ('django.db.models.fields.BigIntegerField', [], {'default': '0'})
+        },
+        'quotaholder_app.holdingsummary': {
+            'Meta': {'unique_together': "(('source', 'resource'),)", 'object_name': 'HoldingSummary'},
+            'holdings': ('django.db.models.fields.BigIntegerField', [], {'default': '0'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'limit': ('django.db.models.fields.BigIntegerField', [], {'default': '0'}),
+            'resource': ('django.db.models.fields.CharField', [], {'max_length': '4096'}),
+            'source': ('django.db.models.fields.CharField', [], {'max_length': '4096', 'null': 'True'}),
+            'usage_max': ('django.db.models.fields.BigIntegerField', [], {'default': '0'}),
+            'usage_min': ('django.db.models.fields.BigIntegerField', [], {'default': '0'})
+        },
+        'quotaholder_app.holdingsummarydelta': {
+            'Meta': {'object_name': 'HoldingSummaryDelta'},
+            'holdings': ('django.db.models.fields.BigIntegerField', [], {'default': '0'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'limit': ('django.db.models.fields.BigIntegerField', [], {'default': '0'}),
+            'resource': ('django.db.models.fields.CharField', [], {'max_length': '4096'}),
+            'source': ('django.db.models.fields.CharField', [], {'max_length': '4096', 'null': 'True'}),
+            'usage_max': ('django.db.models.fields.BigIntegerField', [], {'default': '0'}),
+            'usage_min': ('django.db.models.fields.BigIntegerField', [], {'default': '0'})
+        },
+        'quotaholder_app.provision': {
+            'Meta': {'object_name': 'Provision'},
+            'holder': ('django.db.models.fields.CharField', [], {'max_length': '4096', 'db_index': 'True'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'quantity': ('django.db.models.fields.BigIntegerField', [], {}),
+            'resource': ('django.db.models.fields.CharField', [], {'max_length': '4096'}),
+            'serial': ('django.db.models.fields.related.ForeignKey', [], {'related_name': "'provisions'", 'to': "orm['quotaholder_app.Commission']"}),
+            'source': ('django.db.models.fields.CharField', [], {'max_length': '4096', 'null': 'True'})
+        },
+        'quotaholder_app.provisionlog': {
+            'Meta': {'object_name': 'ProvisionLog'},
+            'delta_quantity': ('django.db.models.fields.BigIntegerField', [], {}),
+            'holder': ('django.db.models.fields.CharField', [], {'max_length': '4096'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'issue_time': ('django.db.models.fields.CharField', [], {'max_length': '4096'}),
+            'limit': ('django.db.models.fields.BigIntegerField', [], {}),
+            'log_time': ('django.db.models.fields.CharField', [], {'max_length': '4096'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '4096'}),
+            'reason': ('django.db.models.fields.CharField', [], {'max_length': '4096'}),
+            'resource': ('django.db.models.fields.CharField', [], {'max_length': '4096'}),
+            'serial': ('django.db.models.fields.BigIntegerField', [], {}),
+            'source': ('django.db.models.fields.CharField', [], {'max_length': '4096', 'null': 'True'}),
+            'usage_max': ('django.db.models.fields.BigIntegerField', [], {}),
+            'usage_min': ('django.db.models.fields.BigIntegerField', [], {})
+        }
+    }
+
+    complete_apps = ['quotaholder_app']
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+import datetime
+from south.db import db
+from south.v2 import DataMigration
+from django.db import models
+from django.db.models import Sum, Count
+
+
+class Migration(DataMigration):
+
+    def forwards(self, orm):
+        sums = orm.Holding.objects.values("source", "resource").annotate(
+            holdings_sum=Count("id"), limit_sum=Sum("limit"),
+            usage_min_sum=Sum("usage_min"), usage_max_sum=Sum("usage_max"))
+        orm.HoldingSummary.objects.bulk_create(
+            [orm.HoldingSummary(source=s["source"],
+                                resource=s["resource"],
+                                holdings=s["holdings_sum"],
+                                limit=s["limit_sum"],
+                                usage_min=s["usage_min_sum"],
+                                usage_max=s["usage_max_sum"])
+             for s in sums])
+
+    def backwards(self, orm):
+        orm.HoldingSummary.objects.all().delete()
+        orm.HoldingSummaryDelta.objects.all().delete()
+
+    models = {
+        'quotaholder_app.commission': {
+            'Meta': {'object_name': 'Commission'},
+            'clientkey': ('django.db.models.fields.CharField', [], {'max_length': '4096'}),
+            'issue_datetime': ('django.db.models.fields.DateTimeField', [], {}),
+            'name': ('django.db.models.fields.CharField', [], {'default': "''", 'max_length': '4096'}),
+            'serial': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'})
+        },
+        'quotaholder_app.holding': {
+            'Meta': {'unique_together': "(('holder', 'source', 'resource'),)", 'object_name': 'Holding'},
+            'holder': ('django.db.models.fields.CharField', [], {'max_length': '4096', 'db_index': 'True'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'limit': ('django.db.models.fields.BigIntegerField', [], {}),
+            'resource': ('django.db.models.fields.CharField', [], {'max_length': '4096'}),
+            'source': ('django.db.models.fields.CharField', [], {'max_length': '4096', 'null': 'True'}),
+            'usage_max': ('django.db.models.fields.BigIntegerField', [], {'default': '0'}),
+            'usage_min': ('django.db.models.fields.BigIntegerField', [], {'default': '0'})
+        },
+        'quotaholder_app.holdingsummary': {
+            'Meta': {'unique_together': "(('source', 'resource'),)", 'object_name': 'HoldingSummary'},
+            'holdings': ('django.db.models.fields.BigIntegerField', [], {'default': '0'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'limit': ('django.db.models.fields.BigIntegerField', [], {'default': '0'}),
+            'resource': ('django.db.models.fields.CharField', [], {'max_length': '4096'}),
+            'source': ('django.db.models.fields.CharField', [], {'max_length': '4096', 'null': 'True'}),
+            'usage_max': ('django.db.models.fields.BigIntegerField', [], {'default': '0'}),
+            'usage_min': ('django.db.models.fields.BigIntegerField', [], {'default': '0'})
+        },
+        'quotaholder_app.holdingsummarydelta': {
+            'Meta': {'object_name': 'HoldingSummaryDelta'},
+            'holdings': ('django.db.models.fields.BigIntegerField', [], {'default': '0'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'limit': ('django.db.models.fields.BigIntegerField', [], {'default': '0'}),
+            'resource': ('django.db.models.fields.CharField', [], {'max_length': '4096'}),
+            'source': ('django.db.models.fields.CharField', [], {'max_length': '4096', 'null': 'True'}),
+            'usage_max': ('django.db.models.fields.BigIntegerField', [], {'default': '0'}),
+            'usage_min': ('django.db.models.fields.BigIntegerField', [], {'default': '0'})
+        },
+        'quotaholder_app.provision': {
+            'Meta': {'object_name': 'Provision'},
+            'holder': ('django.db.models.fields.CharField', [], {'max_length': '4096', 'db_index': 'True'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'quantity': ('django.db.models.fields.BigIntegerField', [], {}),
+            'resource': ('django.db.models.fields.CharField', [], {'max_length': '4096'}),
+            'serial': ('django.db.models.fields.related.ForeignKey', [], {'related_name': "'provisions'", 'to': "orm['quotaholder_app.Commission']"}),
+            'source': ('django.db.models.fields.CharField', [], {'max_length': '4096', 'null': 'True'})
+        },
+        'quotaholder_app.provisionlog': {
+            'Meta': {'object_name': 'ProvisionLog'},
+            'delta_quantity': ('django.db.models.fields.BigIntegerField', [], {}),
+            'holder': ('django.db.models.fields.CharField', [], {'max_length': '4096'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'issue_time': ('django.db.models.fields.CharField', [], {'max_length': '4096'}),
+            'limit': ('django.db.models.fields.BigIntegerField', [], {}),
+            'log_time': ('django.db.models.fields.CharField', [], {'max_length': '4096'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '4096'}),
+            'reason': ('django.db.models.fields.CharField', [], {'max_length': '4096'}),
+            'resource': ('django.db.models.fields.CharField', [], {'max_length': '4096'}),
+            'serial': ('django.db.models.fields.BigIntegerField', [], {}),
+            'source': ('django.db.models.fields.CharField', [], {'max_length': '4096', 'null': 'True'}),
+            'usage_max': ('django.db.models.fields.BigIntegerField', [], {}),
+            'usage_min': ('django.db.models.fields.BigIntegerField', [], {})
+        }
+    }
+
+    complete_apps = ['quotaholder_app']
+    symmetrical = True
@@ -31,6 +31,31 @@ class Holding(Model):
         unique_together = (('holder', 'source', 'resource'),)
 
 
+class HoldingSummary(Model):
+
+    source = CharField(max_length=4096, null=True)
+    resource = CharField(max_length=4096, null=False)
+
+    holdings = BigIntegerField(default=0)
+    limit = BigIntegerField(default=0)
+    usage_min = BigIntegerField(default=0)
+    usage_max = BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = (('source', 'resource'),)
+
+
+class HoldingSummaryDelta(Model):
+
+    source = CharField(max_length=4096, null=True)
+    resource = CharField(max_length=4096, null=False)
+
+    holdings = BigIntegerField(default=0)
+    limit = BigIntegerField(default=0)
+    usage_min = BigIntegerField(default=0)
+    usage_max = BigIntegerField(default=0)
+
+
 class Commission(Model):
 
     serial = AutoField(primary_key=True)
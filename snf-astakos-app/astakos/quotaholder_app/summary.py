@@ -0,0 +1,238 @@
+# Copyright (C) 2010-2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Summary of the holdings per source and resource.
+
+HoldingSummary keeps, for each (source, resource) pair, the number of
+holdings and the sums of their limits and usages. The rows with a null source
+sum the holdings of the projects; the rows with source 'project:<uuid>' sum
+the holdings of the members of the project.
+
+Updating the summary rows along with the holdings would serialize all
+commissions on the rows of each resource. Instead, the code that writes the
+holdings appends its changes to HoldingSummaryDelta, in the same transaction,
+and refresh_summary periodically folds them into the summary. Readers add the
+pending changes to the summary rows, so they always see the summary of the
+committed holdings.
+
+"""
+
+from django.db import connections, router
+from django.db.models import Q, Sum, Count
+
+from astakos.im import transaction
+from astakos.quotaholder_app.models import (
+    Holding, HoldingSummary, HoldingSummaryDelta)
+
+ZERO = (0, 0, 0, 0)
+
+
+def _counters(holding):
+    return (1, holding.limit, holding.usage_min, holding.usage_max)
+
+
+def snapshot(holdings):
+    """Remember the counters of holdings as loaded from the DB."""
+    for h in holdings:
+        h.summary_counters = _counters(h)
+
+
+def _record(changes):
+    deltas = {}
+    for key, old, new in changes:
+        delta = deltas.get(key, ZERO)
+        deltas[key] = tuple(d + n - o for d, o, n in zip(delta, old, new))
+
+    HoldingSummaryDelta.objects.bulk_create(
+        [HoldingSummaryDelta(source=source, resource=resource,
+                             holdings=holdings, limit=limit,
+                             usage_min=usage_min, usage_max=usage_max)
+         for (source, resource), (holdings, limit, usage_min, usage_max)
+         in deltas.iteritems()
+         if any((holdings, limit, usage_min, usage_max))])
+
+
+def holdings_saved(holdings):
+    changes = []
+    for h in holdings:
+        new = _counters(h)
+        changes.append(((h.source, h.resource), h.summary_counters, new))
+        h.summary_counters = new
+    _record(changes)
+
+
+def holdings_created(holdings):
+    _record([((h.source, h.resource), ZERO, _counters(h))
+             for h in holdings])
+    snapshot(holdings)
+
+
+def holdings_deleted(holdings):
+    _record([((h.source, h.resource), h.summary_counters, ZERO)
+             for h in holdings])
+
+
+def _filter(sources=None, resources=None):
+    flt = Q()
+    if sources is not None:
+        sources = list(sources)
+        source_flt = Q(source__in=[s for s in sources if s is not None])
+        if None in sources:
+            source_flt |= Q(source__isnull=True)
+        flt &= source_flt
+    if resources is not None:
+        flt &= Q(resource__in=resources)
+    return flt
+
+
+def _sums(queryset, count):
+    sums = queryset.values("source", "resource").annotate(
+        holdings_sum=count, limit_sum=Sum("limit"),
+        usage_min_sum=Sum("usage_min"), usage_max_sum=Sum("usage_max"))
+    # Sums of bigints may come as decimals
+    return dict(((s["source"], s["resource"]),
+                 (int(s["holdings_sum"]), int(s["limit_sum"]),
+                  int(s["usage_min_sum"]), int(s["usage_max_sum"])))
+                for s in sums)
+
+
+def _add(counters, delta):
+    return tuple(c + d for c, d in zip(counters, delta))
+
+
+def _stored_summary(flt):
+    summary = dict(((s.source, s.resource),
+                    (s.holdings, s.limit, s.usage_min, s.usage_max))
+                   for s in HoldingSummary.objects.filter(flt))
+    deltas = _sums(HoldingSummaryDelta.objects.filter(flt), Sum("holdings"))
+    for key, delta in deltas.iteritems():
+        summary[key] = _add(summary.get(key, ZERO), delta)
+    return summary
+
+
+def _computed_summary(flt):
+    return _sums(Holding.objects.filter(flt), Count("id"))
+
+
+def get_summary(sources=None, resources=None):
+    """Return the summed (limit, usage_min, usage_max) per source, resource.
+
+    Optionally restrict the summary to the given sources, where None stands
+    for the holdings of the projects, and to the given resources.
+
+    """
+    summary = _stored_summary(_filter(sources, resources))
+    return dict((key, counters[1:])
+                for key, counters in summary.iteritems() if counters[0])
+
+
+def _lock(model, mode):
+    using = router.db_for_write(model)
+    connection = connections[using]
+    if connection.vendor == "postgresql":
+        table = connection.ops.quote_name(model._meta.db_table)
+        cursor = connection.cursor()
+        cursor.execute("LOCK TABLE %s IN %s MODE" % (table, mode))
+
+
+def _lock_deltas():
+    # Wait for the transactions that have changed holdings to commit, and
+    # keep new ones from doing so, so that the holdings and the changes
+    # are read consistently.
+    _lock(HoldingSummaryDelta, "EXCLUSIVE")
+
+
+@transaction.commit_on_success
+def refresh_summary():
+    """Fold the pending changes into the summary.
+
+    Return the number of folded changes.
+
+    """
+    # Refreshes run one at a time, so that they do not both create the
+    # same summary row
+    _lock(HoldingSummary, "SHARE ROW EXCLUSIVE")
+    deltas = list(HoldingSummaryDelta.objects.select_for_update()
+                  .order_by("id"))
+    if not deltas:
+        return 0
+
+    sums = {}
+    for d in deltas:
+        key = (d.source, d.resource)
+        sums[key] = _add(sums.get(key, ZERO),
+                         (d.holdings, d.limit, d.usage_min, d.usage_max))
+
+    sources = set(source for (source, resource) in sums)
+    resources = set(resource for (source, resource) in sums)
+    rows = HoldingSummary.objects.filter(_filter(sources, resources))
+    rows = dict(((s.source, s.resource), s) for s in rows)
+    new_rows = []
+    for (source, resource), delta in sums.iteritems():
+        row = rows.get((source, resource))
+        if row is None:
+            row = HoldingSummary(source=source, resource=resource)
+            new_rows.append(row)
+        (row.holdings, row.limit, row.usage_min, row.usage_max) = _add(
+            (row.holdings, row.limit, row.usage_min, row.usage_max), delta)
+        if row.pk is not None:
+            if row.holdings:
+                row.save()
+            else:
+                row.delete()
+    HoldingSummary.objects.bulk_create(
+        [r for r in new_rows if r.holdings])
+
+    ids = [d.id for d in deltas]
+    for i in xrange(0, len(ids), 500):
+        HoldingSummaryDelta.objects.filter(id__in=ids[i:i + 500]).delete()
+    return len(deltas)
+
+
+@transaction.commit_on_success
+def check_summary(sources=None, resources=None):
+    """Compare the summary with the one computed from the holdings.
+
+    Return a list of (source, resource, stored, computed) tuples, with the
+    (holdings, limit, usage_min, usage_max) counters of the pairs that
+    differ.
+
+    """
+    _lock_deltas()
+    flt = _filter(sources, resources)
+    stored = _stored_summary(flt)
+    computed = _computed_summary(flt)
+    diffs = []
+    for key in sorted(set(stored) | set(computed)):
+        s = stored.get(key, ZERO)
+        c = computed.get(key, ZERO)
+        if s != c:
+            diffs.append(key + (s, c))
+    return diffs
+
+
+@transaction.commit_on_success
+def rebuild_summary():
+    """Recompute the summary from the holdings."""
+    _lock_deltas()
+    HoldingSummaryDelta.objects.all().delete()
+    HoldingSummary.objects.all().delete()
+    computed = _computed_summary(Q())
+    HoldingSummary.objects.bulk_create(
+        [HoldingSummary(source=source, resource=resource,
+                        holdings=holdings, limit=limit,
+                        usage_min=usage_min, usage_max=usage_max)
+         for (source, resource), (holdings, limit, usage_min, usage_max)
+         in computed.iteritems()])
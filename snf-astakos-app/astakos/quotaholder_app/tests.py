@@ -13,11 +13,19 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import os
+import shutil
+import tempfile
+from datetime import datetime
+
+from django.db import connections, router
 from django.test import TestCase
 
 from snf_django.utils.testing import assertGreater, assertIn, assertRaises
 from astakos.quotaholder_app import models
 import astakos.quotaholder_app.callpoint as qh
+from astakos.quotaholder_app import archive
+from astakos.quotaholder_app import summary
 from astakos.quotaholder_app.exception import (
     NoCommissionError,
     NoQuantityError,
@@ -260,3 +268,226 @@ class QuotaholderTest(TestCase):
         r = qh.get_quota(holders=[holder])
         self.assertEqual(r, {(holder, source, resource1): (limit2, 1, 1),
                              (holder, source, resource2): (22, 2, 2)})
+
+    def test_040_bulk_holdings(self):
+        source = 'system'
+        resource = 'r1'
+        count = 2 * qh.UPDATE_CHUNK + 1
+        holders = ['h%d' % i for i in range(count)]
+        qh.set_quota([((holder, source, resource), 10) for holder in holders])
+
+        connection = connections[router.db_for_write(models.Holding)]
+        table = models.Holding._meta.db_table
+        connection.use_debug_cursor = True
+        try:
+            start = len(connection.queries)
+            serial = self.issue_commission(
+                [((holder, source, resource), i % 3 + 1)
+                 for i, holder in enumerate(holders)])
+            updates = [q for q in connection.queries[start:]
+                       if q["sql"].startswith("UPDATE") and table in q["sql"]]
+        finally:
+            connection.use_debug_cursor = None
+        # The holdings are written in chunks, not one by one
+        self.assertEqual(len(updates), 3)
+
+        r = qh.get_quota(holders=holders)
+        for i, holder in enumerate(holders):
+            quantity = i % 3 + 1
+            self.assertEqual(r[(holder, source, resource)],
+                             (10, 0, quantity))
+
+        r = qh.resolve_pending_commission(self.client, serial)
+        self.assertEqual(r, True)
+        r = qh.get_quota(holders=holders)
+        for i, holder in enumerate(holders):
+            quantity = i % 3 + 1
+            self.assertEqual(r[(holder, source, resource)],
+                             (10, quantity, quantity))
+        self.assertEqual(models.ProvisionLog.objects.filter(
+            serial=serial).count(), count)
+
+        # A rejected commission leaves no trace on the holdings
+        serial = self.issue_commission(
+            [((holder, source, resource), -1) for holder in holders])
+        r = qh.get_quota(holders=holders)
+        self.assertEqual(r[(holders[0], source, resource)], (10, 0, 1))
+        qh.resolve_pending_commission(self.client, serial, accept=False)
+        r = qh.get_quota(holders=holders)
+        self.assertEqual(r[(holders[0], source, resource)], (10, 1, 1))
+        self.assertEqual(models.Commission.objects.count(), 0)
+
+    def test_050_bulk_commissions(self):
+        source = 'system'
+        resource = 'r1'
+        qh.set_quota([(('h1', source, resource), 3),
+                      (('h2', source, resource), 3)])
+
+        results = qh.issue_commissions_bulk(self.client, [
+            {"provisions": [(('h1', source, resource), 2)], "name": "c1"},
+            # Checked against the holdings as left by the first one
+            {"provisions": [(('h1', source, resource), 2),
+                            (('h2', source, resource), 1)]},
+            {"provisions": [(('h1', source, resource), 2)], "force": True},
+            {"provisions": [(('h3', source, resource), 1)]},
+            {"provisions": [(('h2', source, resource), 1)]},
+        ])
+        self.assertEqual(len(results), 5)
+        serial1, e2, serial3, e4, serial5 = results
+        assertIn(serial1, qh.get_pending_commissions(self.client))
+        self.assertTrue(isinstance(e2, NoCapacityError))
+        self.assertTrue(isinstance(e4, NoHoldingError))
+        self.assertEqual(qh.get_commission(self.client, serial1)["name"],
+                         "c1")
+
+        # The failed commissions left no trace
+        r = qh.get_quota(holders=['h1', 'h2'])
+        self.assertEqual(r[('h1', source, resource)], (3, 0, 4))
+        self.assertEqual(r[('h2', source, resource)], (3, 0, 1))
+        self.assertEqual(sorted(qh.get_pending_commissions(self.client)),
+                         sorted([serial1, serial3, serial5]))
+        self.assertEqual(models.Provision.objects.count(), 3)
+
+        qh.resolve_pending_commissions(self.client,
+                                       accept_set=[serial1, serial5],
+                                       reject_set=[serial3])
+        r = qh.get_quota(holders=['h1', 'h2'])
+        self.assertEqual(r[('h1', source, resource)], (3, 2, 2))
+        self.assertEqual(r[('h2', source, resource)], (3, 1, 1))
+
+    def test_060_lock_holdings(self):
+        count = qh.LOCK_CHUNK + 1
+        keys = [('h%d' % i, 'system', 'r1') for i in range(count)]
+        keys.append(('h0', None, 'r1'))
+        # Holdings of the same holders that are not asked for
+        others = [('h0', 'system', 'r2'), ('h1', 'other', 'r1'),
+                  ('h1', None, 'r2')]
+        qh.set_quota([(key, 10) for key in keys + others])
+
+        holdings = qh._get_holdings_for_update(
+            list(reversed(keys)) + [keys[0], ('h0', 'system', 'r3')])
+        self.assertEqual(sorted(holdings.keys()), sorted(keys))
+        for key, h in holdings.iteritems():
+            self.assertEqual((h.holder, h.source, h.resource), key)
+        self.assertEqual(qh._get_holdings_for_update([]), {})
+
+
+class ProvisionLogArchiveTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def log(self, log_time, holder='h0', serial=1):
+        return models.ProvisionLog.objects.create(
+            serial=serial, name='', issue_time=log_time, log_time=log_time,
+            holder=holder, source='system', resource='r1', limit=10,
+            usage_min=1, usage_max=1, delta_quantity=1, reason='ACCEPT:')
+
+    def test_archive(self):
+        self.log('2014-01-10T10:00:00.000', holder='h1')
+        self.log('2014-01-20T10:00:00.000', holder='h2')
+        self.log('2014-02-05T10:00:00.000', holder='h1')
+        self.log('2014-03-01T10:00:00.000', holder='h2')
+        count = archive.archive_provision_logs(self.directory,
+                                               datetime(2014, 2, 15),
+                                               batch_size=2)
+        self.assertEqual(count, 3)
+        self.assertEqual(archive.archived_months(self.directory),
+                         ['2014-01', '2014-02'])
+        self.assertTrue(os.path.exists(
+            archive.archive_path(self.directory, '2014-01')))
+        live = models.ProvisionLog.objects.all()
+        self.assertEqual([l.log_time for l in live],
+                         ['2014-03-01T10:00:00.000'])
+
+        logs = list(archive.get_provision_logs(self.directory))
+        self.assertEqual([l['log_time'][:10] for l in logs],
+                         ['2014-01-10', '2014-01-20', '2014-02-05',
+                          '2014-03-01'])
+        logs = archive.get_provision_logs(self.directory, holder='h1')
+        self.assertEqual([l['log_time'][:10] for l in logs],
+                         ['2014-01-10', '2014-02-05'])
+        logs = archive.get_provision_logs(self.directory,
+                                          since=datetime(2014, 1, 15),
+                                          until='2014-03-01')
+        self.assertEqual([l['holder'] for l in logs], ['h2', 'h1'])
+
+        # Nothing left to archive
+        count = archive.archive_provision_logs(self.directory,
+                                               datetime(2014, 2, 15))
+        self.assertEqual(count, 0)
+
+    def test_interrupted_archive(self):
+        log = self.log('2014-01-10T10:00:00.000')
+        archive.archive_provision_logs(self.directory, datetime(2014, 2, 1))
+        # A row that was archived, but not deleted
+        log.save()
+        other = self.log('2014-01-11T10:00:00.000')
+        logs = list(archive.get_provision_logs(self.directory))
+        self.assertEqual([l['id'] for l in logs], [log.id, other.id])
+
+        archive.archive_provision_logs(self.directory, datetime(2014, 2, 1))
+        self.assertEqual(models.ProvisionLog.objects.count(), 0)
+        logs = list(archive.get_provision_logs(self.directory))
+        self.assertEqual(len(logs), 2)
+
+
+class HoldingSummaryTest(TestCase):
+
+    def test_summary(self):
+        client = "summary"
+        qh.set_quota([(("project:p1", None, "r1"), 10),
+                      (("project:p2", None, "r1"), 20),
+                      (("user:u1", "project:p1", "r1"), 5),
+                      (("user:u2", "project:p1", "r1"), 5)])
+        r = qh.get_holding_summary()
+        self.assertEqual(r, {(None, "r1"): (30, 0, 0),
+                             ("project:p1", "r1"): (10, 0, 0)})
+
+        serial = qh.issue_commission(client, [
+            (("project:p1", None, "r1"), 3),
+            (("user:u1", "project:p1", "r1"), 3)])
+        qh.issue_commission(client, [(("project:p2", None, "r1"), 4)])
+        r = qh.get_holding_summary(sources=[None])
+        self.assertEqual(r, {(None, "r1"): (30, 0, 7)})
+
+        # A failed commission leaves the summary intact
+        with assertRaises(NoCapacityError):
+            qh.issue_commission(client, [(("project:p2", None, "r1"), 1),
+                                         (("user:u2", "project:p1", "r1"),
+                                          6)])
+        qh.resolve_pending_commission(client, serial)
+
+        assertGreater(summary.refresh_summary(), 0)
+        self.assertEqual(models.HoldingSummaryDelta.objects.count(), 0)
+        self.assertEqual(summary.refresh_summary(), 0)
+        r = qh.get_holding_summary(resources=["r1"])
+        self.assertEqual(r, {(None, "r1"): (30, 3, 7),
+                             ("project:p1", "r1"): (10, 3, 3)})
+
+        qh.delete_quota([("user:u1", "project:p1", "r1")])
+        qh.set_quota([(("user:u2", "project:p1", "r1"), 8)])
+        r = qh.get_holding_summary(sources=["project:p1"])
+        self.assertEqual(r, {("project:p1", "r1"): (8, 0, 0)})
+        self.assertEqual(summary.check_summary(), [])
+
+        qh.delete_quota([("user:u2", "project:p1", "r1")])
+        summary.refresh_summary()
+        self.assertEqual(qh.get_holding_summary(sources=["project:p1"]), {})
+
+    def test_check(self):
+        qh.set_quota([(("project:p1", None, "r1"), 10)])
+        summary.refresh_summary()
+        models.HoldingSummary.objects.update(limit=20)
+        models.HoldingSummaryDelta.objects.create(source=None, resource="r2",
+                                                  holdings=1, limit=1)
+        diffs = summary.check_summary()
+        self.assertEqual(diffs, [(None, "r1", (1, 20, 0, 0), (1, 10, 0, 0)),
+                                 (None, "r2", (1, 1, 0, 0), (0, 0, 0, 0))])
+        summary.rebuild_summary()
+        self.assertEqual(summary.check_summary(), [])
+        self.assertEqual(qh.get_holding_summary(),
+                         {(None, "r1"): (10, 0, 0)})
@@ -57,6 +57,7 @@ middlware_classes = [
     'synnefo.webproject.middleware.SecureMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'snf_django.utils.routers.ReplicaPinMiddleware',
     # 'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2010-2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Measure how long commissions keep the holdings locked.
+
+Issue and accept commissions of a growing number of provisions and report
+the time each transaction holds the row locks of the holdings, i.e. from the
+SELECT FOR UPDATE of the holdings to the commit.
+
+"""
+
+import os
+from optparse import OptionParser
+from time import time
+
+path = os.path.dirname(os.path.realpath(__file__))
+os.environ['SYNNEFO_SETTINGS_DIR'] = path + '/settings'
+os.environ['DJANGO_SETTINGS_MODULE'] = 'synnefo.settings'
+
+from django.db import router, transaction
+from astakos.quotaholder_app import callpoint as qh
+from astakos.quotaholder_app.models import Holding
+from astakos.quotaholder_app import summary
+
+CLIENTKEY = "bench"
+SOURCE = "system"
+RESOURCE = "bench.resource"
+
+
+def save_holdings_per_row(holdings):
+    for holding in holdings:
+        holding.save()
+    summary.holdings_saved(holdings)
+
+
+def timed(using, f, *args, **kwargs):
+    transaction.enter_transaction_management(using=using)
+    transaction.managed(True, using=using)
+    try:
+        start = time()
+        result = f(*args, **kwargs)
+        transaction.commit(using=using)
+        return time() - start, result
+    except:
+        transaction.rollback(using=using)
+        raise
+    finally:
+        transaction.leave_transaction_management(using=using)
+
+
+def bench(size, repeat):
+    using = router.db_for_write(Holding)
+    holders = ["bench:%s:%s" % (size, i) for i in xrange(size)]
+    keys = [(holder, SOURCE, RESOURCE) for holder in holders]
+    timed(using, qh.set_quota, [(key, size * repeat) for key in keys])
+
+    issue, accept = 0, 0
+    for i in xrange(repeat):
+        t, serial = timed(using, qh.issue_commission, CLIENTKEY,
+                          [(key, 1) for key in keys])
+        issue += t
+        t, _ = timed(using, qh.resolve_pending_commissions, CLIENTKEY,
+                     accept_set=[serial])
+        accept += t
+
+    timed(using, qh.delete_quota, keys)
+    return issue / repeat, accept / repeat
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('--sizes',
+                      dest='sizes',
+                      default="1,100,10000",
+                      help="Numbers of provisions per commission"
+                           " (default=1,100,10000)")
+    parser.add_option('--repeat',
+                      dest='repeat',
+                      default=5,
+                      help="Number of commissions per size (default=5)")
+    parser.add_option('--per-row',
+                      action='store_true',
+                      dest='per_row',
+                      default=False,
+                      help="Save each holding with a separate UPDATE,"
+                           " for comparison")
+
+    (options, args) = parser.parse_args()
+
+    if options.per_row:
+        qh.save_holdings = save_holdings_per_row
+
+    repeat = int(options.repeat)
+    print "%12s %12s %12s" % ("provisions", "issue (ms)", "accept (ms)")
+    for size in options.sizes.split(","):
+        issue, accept = bench(int(size), repeat)
+        print "%12s %12.2f %12.2f" % (size, issue * 1000, accept * 1000)
+
+
+if __name__ == "__main__":
+    main()
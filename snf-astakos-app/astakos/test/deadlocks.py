@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2010-2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Stress the locking of the holdings with concurrent commissions.
+
+Threads, each with its own database connection, issue commissions over random
+subsets of a shared set of holdings, given in random order, and resolve them
+in batches. Report the throughput and the number of transactions that failed
+with a deadlock, serialization or lock error and had to be retried.
+
+Run with --unordered to lock the holdings and the commissions as before they
+were locked in key order, for comparison.
+
+"""
+
+import os
+import threading
+from optparse import OptionParser
+from random import Random
+from time import time
+
+path = os.path.dirname(os.path.realpath(__file__))
+os.environ['SYNNEFO_SETTINGS_DIR'] = path + '/settings'
+os.environ['DJANGO_SETTINGS_MODULE'] = 'synnefo.settings'
+
+from django.db import connections, router, transaction, DatabaseError
+from astakos.quotaholder_app import callpoint as qh
+from astakos.quotaholder_app.models import Holding, Commission
+from astakos.quotaholder_app import summary
+
+CLIENTKEY = "stress"
+SOURCE = "system"
+RESOURCES = ["stress.cpu", "stress.ram", "stress.disk"]
+
+
+def get_holdings_for_update_unordered(holding_keys):
+    holders = set(holder for (holder, source, resource) in holding_keys)
+    hs = Holding.objects.filter(holder__in=holders).select_for_update()
+    keys = set(holding_keys)
+    holdings = {}
+    for h in hs:
+        key = h.holder, h.source, h.resource
+        if key in keys:
+            holdings[key] = h
+    summary.snapshot(holdings.values())
+    return holdings
+
+
+def get_commissions_for_update_unordered(clientkey, serials):
+    cs = Commission.objects.filter(
+        clientkey=clientkey, serial__in=serials).select_for_update()
+    return dict((c.serial, c) for c in cs)
+
+
+class Stats(object):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.commits = 0
+        self.retries = 0
+
+    def add(self, commits, retries):
+        with self.lock:
+            self.commits += commits
+            self.retries += retries
+
+
+def in_transaction(using, f, *args, **kwargs):
+    """Run f in a transaction, retrying it on deadlocks.
+
+    Return the result of f and the number of retries.
+
+    """
+    retries = 0
+    while True:
+        transaction.enter_transaction_management(using=using)
+        transaction.managed(True, using=using)
+        try:
+            result = f(*args, **kwargs)
+            transaction.commit(using=using)
+            return result, retries
+        except DatabaseError as e:
+            transaction.rollback(using=using)
+            message = str(e)
+            # SQLite reports its lock conflicts as "database is locked"
+            if not any(m in message
+                       for m in ("deadlock", "serialize", "locked")):
+                raise
+            retries += 1
+        finally:
+            transaction.leave_transaction_management(using=using)
+
+
+def worker(keys, size, commissions, batch, seed, stats):
+    using = router.db_for_write(Holding)
+    rnd = Random(seed)
+    commits, retries = 0, 0
+    pending = []
+    try:
+        for i in xrange(commissions):
+            provisions = [(key, 1) for key in rnd.sample(keys, size)]
+            serial, r = in_transaction(using, qh.issue_commission,
+                                       CLIENTKEY, provisions)
+            commits += 1
+            retries += r
+            pending.append(serial)
+            if len(pending) >= batch or i == commissions - 1:
+                rnd.shuffle(pending)
+                half = len(pending) // 2
+                _, r = in_transaction(using, qh.resolve_pending_commissions,
+                                      CLIENTKEY, accept_set=pending[:half],
+                                      reject_set=pending[half:])
+                commits += 1
+                retries += r
+                pending = []
+    finally:
+        connections[using].close()
+    stats.add(commits, retries)
+
+
+def stress(holders, threads, commissions, size, batch):
+    using = router.db_for_write(Holding)
+    keys = [("stress:%s" % i, SOURCE, resource)
+            for i in xrange(holders) for resource in RESOURCES]
+    in_transaction(using, qh.set_quota,
+                   [(key, threads * commissions) for key in keys])
+
+    stats = Stats()
+    workers = [threading.Thread(target=worker,
+                                args=(keys, size, commissions, batch, i,
+                                      stats))
+               for i in xrange(threads)]
+    start = time()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time() - start
+
+    in_transaction(using, qh.delete_quota, keys)
+    return stats.commits / elapsed, stats.retries
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('--holders',
+                      dest='holders',
+                      default=20,
+                      help="Number of holders (default=20)")
+    parser.add_option('--threads',
+                      dest='threads',
+                      default=8,
+                      help="Number of concurrent threads (default=8)")
+    parser.add_option('--commissions',
+                      dest='commissions',
+                      default=100,
+                      help="Number of commissions per thread (default=100)")
+    parser.add_option('--size',
+                      dest='size',
+                      default=10,
+                      help="Number of provisions per commission (default=10)")
+    parser.add_option('--batch',
+                      dest='batch',
+                      default=5,
+                      help="Number of commissions resolved together"
+                           " (default=5)")
+    parser.add_option('--unordered',
+                      action='store_true',
+                      dest='unordered',
+                      default=False,
+                      help="Lock in the order of the queries, for comparison")
+
+    (options, args) = parser.parse_args()
+
+    if options.unordered:
+        qh._get_holdings_for_update = get_holdings_for_update_unordered
+        qh._get_commissions_for_update = get_commissions_for_update_unordered
+
+    throughput, retries = stress(
+        int(options.holders), int(options.threads),
+        int(options.commissions), int(options.size), int(options.batch))
+    print "%16s %10s" % ("transactions/s", "retries")
+    print "%16.1f %10s" % (throughput, retries)
+
+
+if __name__ == "__main__":
+    main()
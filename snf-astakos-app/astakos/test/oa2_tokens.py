@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2010-2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Measure the lookup and the sweeping of oauth2 access tokens.
+
+Create many synthetic access tokens, half of them expired, and report the
+mean time to look up a token by its code, by the digest of its code and
+through the cache of validated tokens, and the time to sweep the expired
+tokens.
+
+"""
+
+import os
+import datetime
+from optparse import OptionParser
+from random import sample
+from time import time
+from uuid import uuid4
+
+path = os.path.dirname(os.path.realpath(__file__))
+os.environ['SYNNEFO_SETTINGS_DIR'] = path + '/settings'
+os.environ['DJANGO_SETTINGS_MODULE'] = 'synnefo.settings'
+
+from astakos.im import transaction
+from astakos.im.auth_cache import token_digest
+from astakos.oa2.models import Client, Token
+from astakos.oa2.backends import DjangoBackend
+from astakos.oa2 import sweeper
+from stress import new_user
+
+CHUNK = 10000
+
+
+@transaction.commit_on_success
+def new_tokens(user, client, prefix, count, expires_at):
+    codes = ["%s-%s" % (prefix, i) for i in xrange(count)]
+    Token.objects.bulk_create(
+        [Token(code=code, code_digest=token_digest(code), user=user,
+               client=client, redirect_uri="https://bench.synnefo.org/",
+               expires_at=expires_at)
+         for code in codes])
+    return codes
+
+
+def create_tokens(count):
+    user = new_user()
+    client = Client.objects.create(identifier="bench-%s" % uuid4().hex,
+                                   type="public")
+    now = datetime.datetime.now()
+    expired = now - datetime.timedelta(hours=1)
+    valid = now + datetime.timedelta(hours=1)
+    prefix = uuid4().hex
+    codes = []
+    for i in xrange(0, count, CHUNK):
+        size = min(CHUNK, count - i)
+        expires_at = expired if i % (2 * CHUNK) == 0 else valid
+        batch = new_tokens(user, client, "%s-%s" % (prefix, i), size,
+                           expires_at)
+        if expires_at is valid:
+            codes.extend(batch)
+    return client, codes
+
+
+def timed(f, codes):
+    start = time()
+    for code in codes:
+        f(code)
+    return (time() - start) / len(codes)
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('--tokens',
+                      dest='tokens',
+                      default=1000000,
+                      help="Number of tokens (default=1000000)")
+    parser.add_option('--lookups',
+                      dest='lookups',
+                      default=100,
+                      help="Number of lookups per method (default=100)")
+
+    (options, args) = parser.parse_args()
+
+    start = time()
+    client, codes = create_tokens(int(options.tokens))
+    print "created %s tokens in %.1f s" % (options.tokens, time() - start)
+    codes = sample(codes, min(int(options.lookups), len(codes)))
+
+    backend = DjangoBackend()
+    print "lookup by code:   %8.3f ms" % (
+        timed(lambda c: Token.objects.get(code=c), codes) * 1000)
+    print "lookup by digest: %8.3f ms" % (
+        timed(backend.get_token, codes) * 1000)
+    for code in codes:
+        backend.consume_token(code)
+    print "cached lookup:    %8.3f ms" % (
+        timed(backend.consume_token, codes) * 1000)
+
+    start = time()
+    swept = sweeper.sweep_tokens(datetime.datetime.now())
+    print "swept %s expired tokens in %.1f s" % (swept, time() - start)
+
+    Token.objects.filter(client=client).delete()
+    client.delete()
+
+
+if __name__ == "__main__":
+    main()
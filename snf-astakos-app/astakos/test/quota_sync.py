@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2010-2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Measure the quota sync of projects with many members.
+
+Create synthetic projects with the given number of members and time
+qh_sync_projects when all limits are new, when nothing has changed and when
+a single membership has changed.
+
+"""
+
+import os
+from optparse import OptionParser
+from time import time
+from uuid import uuid4
+
+path = os.path.dirname(os.path.realpath(__file__))
+os.environ['SYNNEFO_SETTINGS_DIR'] = path + '/settings'
+os.environ['DJANGO_SETTINGS_MODULE'] = 'synnefo.settings'
+
+from astakos.im import transaction
+from astakos.im.models import AstakosUser, Project, ProjectMembership
+from astakos.im import quotas
+from stress import new_user
+from views import submit, approve
+
+
+@transaction.commit_on_success
+def new_members(project, count):
+    prefix = uuid4().hex[:8]
+    users = []
+    for i in xrange(count):
+        uuid = str(uuid4())
+        users.append(AstakosUser(username=uuid, uuid=uuid,
+                                 email="%s-%s@bench.synnefo.org" % (prefix, i),
+                                 is_active=True, moderated=True,
+                                 accepted_policy="bench"))
+    AstakosUser.objects.bulk_create(users)
+    users = AstakosUser.objects.filter(email__startswith=prefix + "-")
+    ProjectMembership.objects.bulk_create(
+        [ProjectMembership(person=user, project=project,
+                           state=ProjectMembership.ACCEPTED, initialized=True)
+         for user in users])
+
+
+@transaction.commit_on_success
+def new_project(members):
+    owner = new_user()
+    app_id, project_id = submit("bench-%s" % uuid4().hex[:8], owner.id)
+    approve(app_id)
+    project = Project.objects.get(id=project_id)
+    new_members(project, members)
+    return project
+
+
+@transaction.commit_on_success
+def timed_sync(projects):
+    start = time()
+    quotas.qh_sync_projects(projects)
+    return time() - start
+
+
+@transaction.commit_on_success
+def suspend_member(project):
+    membership = ProjectMembership.objects.filter(
+        project=project, state=ProjectMembership.ACCEPTED)[0]
+    membership.state = ProjectMembership.USER_SUSPENDED
+    membership.save()
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('--projects',
+                      dest='projects',
+                      default=1,
+                      help="Number of projects (default=1)")
+    parser.add_option('--members',
+                      dest='members',
+                      default=10000,
+                      help="Number of members per project (default=10000)")
+
+    (options, args) = parser.parse_args()
+
+    projects = [new_project(int(options.members))
+                for i in range(int(options.projects))]
+
+    print "initial sync:    %8.2f ms" % (timed_sync(projects) * 1000)
+    print "unchanged sync:  %8.2f ms" % (timed_sync(projects) * 1000)
+    suspend_member(projects[0])
+    print "one member sync: %8.2f ms" % (timed_sync(projects) * 1000)
+
+
+if __name__ == "__main__":
+    main()
@@ -14,10 +14,30 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 
+"""A pool of psycopg2 connections, shared by the threads of a process.
+
+The pool is configured with the following options of the connection:
+
+synnefo_poolsize: the number of connections of the pool
+synnefo_pool_max_lifetime: seconds after which a connection is replaced
+synnefo_pool_max_idle: seconds after which an unused connection is replaced
+synnefo_pool_timeout: seconds to wait for a connection if all of them are in
+    use, before raising PoolTimeoutError
+
+The pool counts its checkouts, the checkouts that had to wait for a
+connection and their wait time, and the connections that were created,
+recycled or found broken. pool_stats() returns these counters.
+
+"""
+
 import psycopg2
-from objpool import ObjectPool
+from objpool import ObjectPool, PoolLimitError
 
+from bisect import bisect_left
+from os import getpid
 from select import select
+from threading import Lock
+from time import time, sleep
 import logging
 log = logging.getLogger(__name__)
 
@@ -30,6 +50,49 @@ _pool = None
 # from the pool, before giving up.
 RETRY_LIMIT = 1000
 
+# Upper bounds, in seconds, of the buckets of the histogram of wait times
+WAIT_BUCKETS = (0.001, 0.01, 0.1, 1, 10)
+
+
+class PoolTimeoutError(PoolLimitError):
+    pass
+
+
+class PoolStats(object):
+    """Thread-safe counters of a connection pool."""
+
+    COUNTERS = ("checkouts", "waits", "timeouts", "created", "recycled",
+                "broken")
+
+    def __init__(self):
+        self._lock = Lock()
+        for counter in self.COUNTERS:
+            setattr(self, counter, 0)
+        self.in_use = 0
+        self.wait_time = 0.0
+        self.wait_histogram = [0] * (len(WAIT_BUCKETS) + 1)
+
+    def incr(self, counter, value=1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + value)
+
+    def add_wait(self, seconds):
+        with self._lock:
+            self.waits += 1
+            self.wait_time += seconds
+            self.wait_histogram[bisect_left(WAIT_BUCKETS, seconds)] += 1
+
+    def as_dict(self):
+        with self._lock:
+            stats = dict((c, getattr(self, c)) for c in self.COUNTERS)
+            stats["in_use"] = self.in_use
+            stats["wait_time"] = self.wait_time
+            # Each bucket counts the waits up to its bound, the last one
+            # those above the largest bound
+            stats["wait_histogram"] = zip(WAIT_BUCKETS + (None,),
+                                          self.wait_histogram)
+        return stats
+
 
 class PooledConnection(object):
     """Thin wrapper around a psycopg2 connection for a pooled connection.
@@ -41,6 +104,7 @@ class PooledConnection(object):
         log.debug("INIT-POOLED: pool = %s, conn = %s", pool, conn)
         self._pool = pool
         self._conn = conn
+        self._created = self._released = time()
 
     def close(self):
         log.debug("CLOSE-POOLED: self._pool = %s", self._pool)
@@ -57,7 +121,7 @@ class PooledConnection(object):
         return getattr(self._conn, attr)
 
     def __setattr__(self, attr, val):
-        if attr not in ("_pool", "_conn"):
+        if attr not in ("_pool", "_conn", "_created", "_released"):
             setattr(self._conn, attr, val)
         object.__setattr__(self, attr, val)
 
@@ -71,17 +135,104 @@ class Psycopg2ConnectionPool(ObjectPool):
     """
 
     def __init__(self, **kw):
-        ObjectPool.__init__(self, size=kw["synnefo_poolsize"])
-        kw.pop("synnefo_poolsize")
+        ObjectPool.__init__(self, size=kw.pop("synnefo_poolsize"))
+        self.max_lifetime = kw.pop("synnefo_pool_max_lifetime", None)
+        self.max_idle = kw.pop("synnefo_pool_max_idle", None)
+        self.timeout = kw.pop("synnefo_pool_timeout", None)
+        self.stats = PoolStats()
         self._connection_args = kw
 
+    def pool_get(self, blocking=True, timeout=None, create=True, verify=True):
+        """Get a connection, waiting at most 'timeout' seconds for one.
+
+        The timeout of the pool applies if 'timeout' is None. Raise
+        PoolTimeoutError if no connection is available within it.
+
+        """
+        try:
+            conn = ObjectPool.pool_get(self, blocking=False, create=create,
+                                       verify=verify)
+        except PoolLimitError:
+            if not blocking:
+                raise
+            if timeout is None:
+                timeout = self.timeout
+            conn = self._pool_wait(timeout, create, verify)
+        self.stats.incr("checkouts")
+        self.stats.incr("in_use")
+        return conn
+
+    def _pool_wait(self, timeout, create, verify):
+        start = time()
+        try:
+            if timeout is None:
+                return ObjectPool.pool_get(self, blocking=True,
+                                           create=create, verify=verify)
+            # The semaphores of Python 2 cannot wait with a timeout, so poll
+            # like threading.Condition does
+            delay = 0.0005
+            while True:
+                try:
+                    return ObjectPool.pool_get(self, blocking=False,
+                                               create=create, verify=verify)
+                except PoolLimitError:
+                    remaining = start + timeout - time()
+                    if remaining <= 0:
+                        self.stats.incr("timeouts")
+                        raise PoolTimeoutError(
+                            "Timed out after %.3gs waiting for one of the %d"
+                            " connections of the pool" % (timeout, self.size))
+                    delay = min(delay * 2, remaining, 0.05)
+                    sleep(delay)
+        finally:
+            self.stats.add_wait(time() - start)
+
+    def pool_put(self, obj):
+        ObjectPool.pool_put(self, obj)
+        self.stats.incr("in_use", -1)
+
+    def pool_stats(self):
+        """Return the counters of the pool"""
+        stats = self.stats.as_dict()
+        with self._mutex:
+            stats["idle"] = len(self._set)
+        stats["size"] = self.size
+        stats["pid"] = getpid()
+        return stats
+
+    def _connect(self):
+        return psycopg2._original_connect(**self._connection_args)
+
     def _pool_create(self):
         log.info("CREATE: about to get a new connection from psycopg2")
-        conn = psycopg2._original_connect(**self._connection_args)
+        conn = self._connect()
         log.info("CREATED: got connection %s from psycopg2", conn)
+        self.stats.incr("created")
         return PooledConnection(self, conn)
 
+    def _pool_discard(self, conn):
+        # Close the psycopg2 connection, since closing the pooled one would
+        # put it back into the pool
+        try:
+            conn._conn.close()
+        except:
+            pass
+
     def _pool_verify(self, conn):
+        now = time()
+        if self.max_lifetime and now - conn._created >= self.max_lifetime:
+            log.info("VERIFY: Recycling connection older than %ss",
+                     self.max_lifetime)
+        elif self.max_idle and now - conn._released >= self.max_idle:
+            log.info("VERIFY: Recycling connection idle for %ss",
+                     self.max_idle)
+        else:
+            return self._pool_check(conn)
+        self._pool_discard(conn)
+        self.stats.incr("recycled")
+        return False
+
+    def _pool_check(self, conn):
         try:
             # Make sure that the connection is alive before using the fd
             res = conn.poll()
@@ -97,10 +248,8 @@ class Psycopg2ConnectionPool(ObjectPool):
             # Since we're not going to be putting the psycopg2 connection
             # back into the pool, close it uncoditionally.
             log.info("VERIFY: Detected dead connection")
-            try:
-                conn.close()
-            except:
-                pass
+            self._pool_discard(conn)
+            self.stats.incr("broken")
             return False
 
     def _pool_cleanup(self, pooledconn):
@@ -114,11 +263,10 @@ class Psycopg2ConnectionPool(ObjectPool):
             # back into the pool, close it uncoditionally.
             log.error("Detected dead connection, conn = %d, %s",
                       id(pooledconn), pooledconn)
-            try:
-                pooledconn._conn.close()
-            except:
-                pass
+            self._pool_discard(pooledconn)
+            self.stats.incr("broken")
             return True
+        pooledconn._released = time()
         return False
 
 
@@ -143,10 +291,18 @@ def _get_pool(kw):
     return _pool
 
 
+def pool_stats():
+    """Return the counters of the connection pool of this process, if any"""
+    if not _pool:
+        return None
+    return _pool.pool_stats()
+
+
 def _pooled_connect(**kw):
     poolsize = kw.get("synnefo_poolsize", 0)
     if not poolsize:
-        kw.pop("synnefo_poolsize", None)
+        for option in [k for k in kw if k.startswith("synnefo_")]:
+            kw.pop(option)
         return psycopg2._original_connect(**kw)
 
     pool = _get_pool(kw)
@@ -0,0 +1,158 @@
+# Copyright (C) 2010-2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Unit tests for the pool of psycopg2 connections"""
+
+import os
+import sys
+import threading
+from time import time
+
+import psycopg2
+from objpool import PoolLimitError
+
+from synnefo.lib.db.pooled_psycopg2 import (Psycopg2ConnectionPool,
+                                            PoolTimeoutError)
+
+# Use backported unittest functionality if Python < 2.7
+try:
+    import unittest2 as unittest
+except ImportError:
+    if sys.version_info < (2, 7):
+        raise Exception("The unittest2 package is required for Python < 2.7")
+    import unittest
+
+
+class FakeConnection(object):
+    """A psycopg2 connection with an idle file descriptor"""
+
+    def __init__(self):
+        self.dead = False
+        self.closed = False
+        self._rfd, self._wfd = os.pipe()
+
+    def poll(self):
+        if self.dead:
+            raise psycopg2.OperationalError("server closed the connection")
+        return psycopg2.extensions.POLL_OK
+
+    def fileno(self):
+        return self._rfd
+
+    def rollback(self):
+        if self.dead:
+            raise psycopg2.InterfaceError("connection already closed")
+
+    def close(self):
+        if not self.closed:
+            os.close(self._rfd)
+            os.close(self._wfd)
+            self.closed = True
+
+
+class FakeConnectionPool(Psycopg2ConnectionPool):
+    """A pool whose connections are created by a fake factory"""
+
+    def _connect(self):
+        return FakeConnection()
+
+
+def get_pool(size=2, **options):
+    options = dict(("synnefo_pool_%s" % k, v) for k, v in options.items())
+    return FakeConnectionPool(synnefo_poolsize=size, **options)
+
+
+class Psycopg2ConnectionPoolTestCase(unittest.TestCase):
+    def test_reuse(self):
+        pool = get_pool()
+        conn = pool.pool_get()
+        fake = conn._conn
+        stats = pool.pool_stats()
+        self.assertEqual((stats["created"], stats["checkouts"],
+                          stats["in_use"], stats["idle"]), (1, 1, 1, 0))
+        conn.close()
+        stats = pool.pool_stats()
+        self.assertEqual((stats["in_use"], stats["idle"]), (0, 1))
+        self.assertTrue(pool.pool_get()._conn is fake)
+        stats = pool.pool_stats()
+        self.assertEqual((stats["created"], stats["checkouts"],
+                          stats["waits"]), (1, 2, 0))
+
+    def test_max_lifetime(self):
+        pool = get_pool(max_lifetime=60)
+        conn = pool.pool_get()
+        fake = conn._conn
+        conn.close()
+        conn._created -= 59
+        conn = pool.pool_get()
+        self.assertTrue(conn._conn is fake)
+        conn.close()
+        conn._created -= 1
+        self.assertFalse(pool.pool_get()._conn is fake)
+        self.assertTrue(fake.closed)
+        stats = pool.pool_stats()
+        self.assertEqual((stats["created"], stats["recycled"]), (2, 1))
+
+    def test_max_idle(self):
+        pool = get_pool(max_idle=10)
+        conn = pool.pool_get()
+        fake = conn._conn
+        conn.close()
+        conn._released -= 10
+        self.assertFalse(pool.pool_get()._conn is fake)
+        self.assertTrue(fake.closed)
+        self.assertEqual(pool.pool_stats()["recycled"], 1)
+
+    def test_broken(self):
+        pool = get_pool(size=1)
+        conn = pool.pool_get()
+        conn.close()
+        conn._conn.dead = True
+        conn = pool.pool_get()
+        self.assertFalse(conn._conn.dead)
+        stats = pool.pool_stats()
+        self.assertEqual((stats["created"], stats["broken"]), (2, 1))
+        # The broken connection released its allocation only once
+        self.assertRaises(PoolLimitError, pool.pool_get, blocking=False)
+
+        # A connection that breaks while in use is not returned to the pool
+        conn._conn.dead = True
+        conn.close()
+        stats = pool.pool_stats()
+        self.assertEqual((stats["broken"], stats["in_use"], stats["idle"]),
+                         (2, 0, 0))
+
+    def test_timeout(self):
+        pool = get_pool(size=1, timeout=0.05)
+        conn = pool.pool_get()
+        start = time()
+        self.assertRaises(PoolTimeoutError, pool.pool_get)
+        self.assertTrue(time() - start >= 0.05)
+        stats = pool.pool_stats()
+        self.assertEqual((stats["checkouts"], stats["waits"],
+                          stats["timeouts"]), (1, 1, 1))
+        self.assertEqual(dict(stats["wait_histogram"])[0.1], 1)
+
+        # A connection that is returned within the timeout is used
+        threading.Timer(0.02, conn.close).start()
+        self.assertTrue(pool.pool_get(timeout=1)._conn is conn._conn)
+        stats = pool.pool_stats()
+        self.assertEqual((stats["checkouts"], stats["waits"],
+                          stats["timeouts"]), (2, 2, 1))
+        self.assertTrue(stats["wait_time"] >= 0.07)
+
+
+if __name__ == '__main__':
+    unittest.main()
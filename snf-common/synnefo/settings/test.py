@@ -8,6 +8,7 @@ TEMPLATE_DEBUG = False
 TEST = True
 
 CACHE_BACKEND = os.environ.get('SNF_TEST_CACHE_BACKEND', 'locmem://')
+ASTAKOS_AUTH_CACHE_BACKEND = CACHE_BACKEND
 
 DATABASES = {
     'default': {
@@ -118,9 +118,13 @@ def list_floating_ips(request):
     log.debug("list_floating_ips")
 
     userid = request.user_uniq
-    floating_ips = IPAddress.objects.filter(userid=userid, deleted=False,
-                                            floating_ip=True).order_by("id")\
-                                    .select_related("nic")
+    floating_ips = IPAddress.objects.filter(userid=userid, floating_ip=True)
+    etag = utils.get_changes_etag(request, floating_ips)
+    not_modified = utils.not_modified_response(request, etag)
+    if not_modified is not None:
+        return not_modified
+
+    floating_ips = floating_ips.order_by("id").select_related("nic")
     floating_ips = utils.filter_modified_since(request, objects=floating_ips)
 
     floating_ips = map(ip_to_dict, floating_ips)
@@ -128,7 +132,9 @@ def list_floating_ips(request):
     request.serialization = "json"
     data = json.dumps({"floatingips": floating_ips})
 
-    return HttpResponse(data, status=200)
+    response = HttpResponse(data, status=200)
+    response["ETag"] = etag
+    return response
 
 
 @api.api_method(http_method="GET", user_required=True, logger=log,
@@ -90,6 +90,10 @@ def list_networks(request, detail=True):
     user_networks = Network.objects.filter(Q(userid=request.user_uniq) |
                                            Q(public=True))\
                                    .order_by('id')
+    etag = api.utils.get_changes_etag(request, user_networks)
+    not_modified = api.utils.not_modified_response(request, etag)
+    if not_modified is not None:
+        return not_modified
 
     user_networks = api.utils.filter_modified_since(request,
                                                     objects=user_networks)
@@ -103,7 +107,9 @@ def list_networks(request, detail=True):
     else:
         data = json.dumps({'networks': network_dicts})
 
-    return HttpResponse(data, status=200)
+    response = HttpResponse(data, status=200)
+    response["ETag"] = etag
+    return response
 
 
 @api.api_method(http_method='POST', user_required=True, logger=log)
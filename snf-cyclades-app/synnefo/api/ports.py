@@ -25,7 +25,7 @@ from snf_django.lib import api
 from snf_django.lib.api import faults
 
 from synnefo.api import util
-from synnefo.db.models import NetworkInterface
+from synnefo.db.models import NetworkInterface, IPAddress
 from synnefo.logic import servers, ips
 
 from logging import getLogger
@@ -69,7 +69,15 @@ def list_ports(request, detail=True):
     log.debug('list_ports detail=%s', detail)
 
     user_ports = NetworkInterface.objects.filter(userid=request.user_uniq)
+    related = ()
+    if detail:
+        related = (IPAddress.objects.filter(nic__in=user_ports),)
+    etag = api.utils.get_changes_etag(request, user_ports, related=related)
+    not_modified = api.utils.not_modified_response(request, etag)
+    if not_modified is not None:
+        return not_modified
 
+    user_ports = api.utils.filter_modified_since(request, objects=user_ports)
     if detail:
         user_ports = user_ports.prefetch_related("ips")
 
@@ -82,7 +90,9 @@ def list_ports(request, detail=True):
     else:
         data = json.dumps({'ports': port_dicts})
 
-    return HttpResponse(data, status=200)
+    response = HttpResponse(data, status=200)
+    response["ETag"] = etag
+    return response
 
 
 @api.api_method(http_method='POST', user_required=True, logger=log)
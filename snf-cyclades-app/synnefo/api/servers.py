@@ -13,6 +13,8 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from urllib import urlencode
+
 from django.conf import settings
 from django.conf.urls import patterns
 
@@ -21,14 +23,18 @@ from django.http import HttpResponse
 from django.template.loader import render_to_string
 from django.utils import simplejson as json
 from django.core.urlresolvers import reverse
+from django.db.models import Max
 
 from snf_django.lib import api
 from snf_django.lib.api import faults, utils
 
 from synnefo.api import util
-from synnefo.db.models import (VirtualMachine, VirtualMachineMetadata)
+from synnefo.db.models import (VirtualMachine, VirtualMachineMetadata,
+                               VirtualMachineDiagnostic, Volume,
+                               NetworkInterface, IPAddress)
 from synnefo.logic import servers, utils as logic_utils, server_attachments
 from synnefo.volume.util import get_volume
+from synnefo.lib import join_urls
 
 from logging import getLogger
 log = getLogger(__name__)
@@ -183,7 +189,14 @@ def attachments_to_addresses(attachments):
     return addresses
 
 
-def vm_to_dict(vm, detail=False):
+def vm_to_dict(vm, detail=False, volumes=None, diagnostic=False):
+    """Convert a server to its API representation.
+
+    The IDs of the volumes and the latest diagnostic of the server can be
+    given, if they have been already retrieved, e.g. with get_servers_details.
+    Otherwise, they are retrieved from the DB.
+
+    """
     d = dict(id=vm.id, name=vm.name)
     d['links'] = util.vm_to_links(vm.id)
     if detail:
@@ -211,10 +224,14 @@ def vm_to_dict(vm, detail=False):
         d['attachments'] = attachments
         d['addresses'] = attachments_to_addresses(attachments)
 
-        d['volumes'] = [v.id for v in vm.volumes.filter(deleted=False).order_by('id')]
+        if volumes is None:
+            volumes = [v.id for v in
+                       vm.volumes.filter(deleted=False).order_by('id')]
+        d['volumes'] = volumes
 
         # include the latest vm diagnostic, if set
-        diagnostic = vm.get_last_diagnostic()
+        if diagnostic is False:
+            diagnostic = vm.get_last_diagnostic()
         if diagnostic:
             d['diagnostics'] = diagnostics_to_dict([diagnostic])
         else:
@@ -358,23 +375,110 @@ def list_servers(request, detail=False):
     #                       overLimit (413)
 
     log.debug('list_servers detail=%s', detail)
+    limit, marker = utils.get_paging_params(
+        request, max_limit=settings.CYCLADES_SERVERS_LIST_LIMIT)
+
     user_vms = VirtualMachine.objects.filter(userid=request.user_uniq)
+    related = ()
+    if detail:
+        # The details include the NICs, the IPs, the volumes and the latest
+        # diagnostic of each server
+        related = (
+            NetworkInterface.objects.filter(machine__in=user_vms),
+            IPAddress.objects.filter(nic__machine__in=user_vms),
+            Volume.objects.filter(machine__in=user_vms),
+            VirtualMachineDiagnostic.objects.filter(machine__in=user_vms))
+    etag = utils.get_changes_etag(request, user_vms, related=related)
+    not_modified = utils.not_modified_response(request, etag)
+    if not_modified is not None:
+        return not_modified
+
+    if marker is not None:
+        if not user_vms.filter(id=marker).exists():
+            raise faults.BadRequest("Marker '%s' not found." % marker)
+        user_vms = user_vms.filter(id__gt=marker)
     if detail:
         user_vms = user_vms.prefetch_related("nics__ips", "metadata")
 
     user_vms = utils.filter_modified_since(request, objects=user_vms)
 
-    servers_dict = [vm_to_dict(server, detail)
-                    for server in user_vms.order_by('id')]
+    # Clients that do not ask for pages get all their servers, as before
+    paged = "limit" in request.GET or "marker" in request.GET
+    user_vms = user_vms.order_by('id')
+    next_marker = None
+    if paged:
+        # Get one more server, to find out if there is a next page
+        user_vms = list(user_vms[:limit + 1])
+        if len(user_vms) > limit:
+            user_vms = user_vms[:limit]
+            next_marker = user_vms[-1].id if user_vms else None
+    else:
+        user_vms = list(user_vms)
+
+    if detail:
+        volumes, diagnostics = get_servers_details(user_vms)
+        servers_dict = [vm_to_dict(server, detail,
+                                   volumes=volumes.get(server.id, []),
+                                   diagnostic=diagnostics.get(server.id))
+                        for server in user_vms]
+    else:
+        servers_dict = [vm_to_dict(server, detail) for server in user_vms]
+
+    next_href = None
+    if next_marker is not None:
+        params = urlencode({"limit": limit, "marker": next_marker})
+        path = "servers/detail" if detail else "servers"
+        next_href = "%s?%s" % (join_urls(util.COMPUTE_URL, path), params)
 
     if request.serialization == 'xml':
         data = render_to_string('list_servers.xml', {
             'servers': servers_dict,
-            'detail': detail})
-    else:
-        data = json.dumps({'servers': servers_dict})
+            'detail': detail,
+            'next_href': next_href})
+        response = HttpResponse(data, status=200)
+        response["ETag"] = etag
+        return response
+
+    data = {'servers': servers_dict}
+    if next_href is not None:
+        data['servers_links'] = [{"rel": "next", "href": next_href}]
+    response = HttpResponse(utils.iterencode_json(data), status=200)
+    response.streaming = True
+    response["ETag"] = etag
+    return response
 
-    return HttpResponse(data, status=200)
+
+def get_servers_details(vms):
+    """Get the volumes and the latest diagnostic of servers in bulk.
+
+    Return two dictionaries, mapping the ID of each server to the IDs of its
+    volumes and to its latest diagnostic, so that rendering the servers does
+    not require any DB query per server.
+
+    """
+    vm_ids = [vm.id for vm in vms]
+    volumes = {}
+    diagnostics = {}
+    if not vm_ids:
+        return volumes, diagnostics
+
+    vm_volumes = Volume.objects.filter(machine_id__in=vm_ids, deleted=False)\
+                               .order_by("id")\
+                               .values_list("machine_id", "id")
+    for vm_id, volume_id in vm_volumes:
+        volumes.setdefault(vm_id, []).append(volume_id)
+
+    # Diagnostics are created in increasing ID order, so the latest diagnostic
+    # of each server is the one with the greatest ID.
+    latest = VirtualMachineDiagnostic.objects.filter(machine__in=vm_ids)\
+                                             .order_by()\
+                                             .values("machine")\
+                                             .annotate(latest=Max("id"))\
+                                             .values_list("latest", flat=True)
+    for diagnostic in VirtualMachineDiagnostic.objects\
+                                              .filter(id__in=list(latest)):
+        diagnostics[diagnostic.machine_id] = diagnostic
+    return volumes, diagnostics
 
 
 @api.api_method(http_method='POST', user_required=True, logger=log)
@@ -405,9 +509,19 @@ def create_server(request):
         if networks is not None:
             assert isinstance(networks, list)
         project = server.get("project")
-    except (KeyError, AssertionError):
+        # 'os-multiple-create' extension
+        count = int(server.get("max_count", 1))
+        min_count = int(server.get("min_count", count))
+        assert 1 <= min_count <= count
+    except (KeyError, AssertionError, TypeError, ValueError):
         raise faults.BadRequest("Malformed request")
 
+    # Reject too many servers before generating a password for each one
+    max_count = settings.CYCLADES_MAX_SERVERS_PER_REQUEST
+    if count > max_count:
+        raise faults.BadRequest("The number of servers must be between 1 and"
+                                " %s" % max_count)
+
     volumes = None
     dev_map = server.get("block_device_mapping_v2")
     if dev_map is not None:
@@ -421,6 +535,12 @@ def create_server(request):
         msg = ("It is not allowed to create a server from flavor with id '%d',"
                " see 'allow_create' flavor attribute")
         raise faults.Forbidden(msg % flavor.id)
+    if count > 1:
+        return create_servers(request, count, name, flavor, image_id,
+                              metadata=metadata, personality=personality,
+                              project=project, networks=networks,
+                              volumes=volumes)
+
     # Generate password
     password = util.random_password()
 
@@ -437,6 +557,28 @@ def create_server(request):
     return response
 
 
+def create_servers(request, count, name, flavor, image_id, **kwargs):
+    """Create multiple servers with a single request.
+
+    The servers are named '<name>-<index>' and each one of them gets its own
+    password. The response contains the list of the created servers.
+
+    """
+    passwords = [util.random_password() for _ in range(count)]
+    vms = servers.create_many(request.user_uniq, name, count, passwords,
+                              flavor, image_id, **kwargs)
+
+    servers_list = []
+    for vm, password in zip(vms, passwords):
+        server = vm_to_dict(vm, detail=True)
+        server['status'] = 'BUILD'
+        server['adminPass'] = password
+        servers_list.append(server)
+
+    data = json.dumps({'servers': servers_list})
+    return HttpResponse(data, status=202)
+
+
 def parse_block_device_mapping(dev_map):
     """Parse 'block_device_mapping_v2' attribute"""
     if not isinstance(dev_map, list):
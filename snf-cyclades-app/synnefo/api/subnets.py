@@ -197,8 +197,7 @@ def subnet_to_dict(subnet):
     dns = check_empty_lists(subnet.dns_nameservers)
     hosts = check_empty_lists(subnet.host_routes)
 
-    allocation_pools = [render_ip_pool(pool)
-                        for pool in subnet.ip_pools.all()]
+    allocation_pools = render_ip_pools(subnet.ip_pools.all())
 
     d = {'id': str(subnet.id),
          'network_id': str(subnet.network_id),
@@ -223,6 +222,24 @@ def subnet_to_dict(subnet):
     return d
 
 
+def render_ip_pools(pools):
+    """Render the allocation pools of a subnet.
+
+    IP pools are stored in fixed-size chunks, so contiguous chunks are merged
+    in a single allocation pool.
+
+    """
+    allocation_pools = []
+    last_end = None
+    for pool in sorted(pools, key=lambda p: p.offset):
+        if last_end is not None and pool.offset == last_end + 1:
+            allocation_pools[-1]["end"] = render_ip_pool(pool)["end"]
+        else:
+            allocation_pools.append(render_ip_pool(pool))
+        last_end = pool.offset + pool.size - 1
+    return allocation_pools
+
+
 def render_ip_pool(pool):
     network = ipaddr.IPNetwork(pool.base).network
     start = str(network + pool.offset)
@@ -13,6 +13,8 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from datetime import datetime, timedelta
+
 from django.conf import settings
 from snf_django.utils.testing import BaseAPITest, override_settings
 from django.utils import simplejson as json
@@ -21,6 +23,7 @@ from synnefo.lib.services import get_service_path
 from synnefo.lib import join_urls
 from mock import patch
 import synnefo.db.models_factory as dbmf
+from synnefo.db.models import NetworkInterface
 
 NETWORK_URL = get_service_path(cyclades_services, 'network',
                                version='v2.0')
@@ -35,6 +38,44 @@ class PortTest(BaseAPITest):
         ports = json.loads(response.content)
         self.assertEqual(ports, {"ports": []})
 
+    def test_get_ports_etag(self):
+        nic = dbmf.NetworkInterfaceFactory()
+        response = self.get(PORTS_URL, user=nic.userid)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        response = self.get(PORTS_URL, user=nic.userid,
+                            HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, "")
+        # The tag changes when a port is modified or deleted
+        nic.name = "renamed"
+        nic.save()
+        response = self.get(PORTS_URL, user=nic.userid,
+                            HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        new_etag = response["ETag"]
+        self.assertNotEqual(new_etag, etag)
+        dbmf.NetworkInterfaceFactory(userid=nic.userid)
+        response = self.get(PORTS_URL, user=nic.userid,
+                            HTTP_IF_NONE_MATCH=new_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(json.loads(response.content)["ports"]), 2)
+
+    def test_get_ports_changes_since(self):
+        old_nic = dbmf.NetworkInterfaceFactory()
+        NetworkInterface.objects.filter(id=old_nic.id)\
+                                .update(updated=datetime.now() -
+                                        timedelta(seconds=60))
+        since = (datetime.now() - timedelta(seconds=30)).isoformat()
+        url = "%s?changes-since=%sUTC" % (PORTS_URL, since)
+        response = self.get(url, user=old_nic.userid)
+        self.assertEqual(response.status_code, 304)
+        new_nic = dbmf.NetworkInterfaceFactory(userid=old_nic.userid)
+        response = self.get(url, user=old_nic.userid)
+        self.assertEqual(response.status_code, 200)
+        ports = json.loads(response.content)["ports"]
+        self.assertEqual([p["id"] for p in ports], [str(new_nic.id)])
+
     def test_get_port_unfound(self):
         url = join_urls(PORTS_URL, "123")
         response = self.get(url)
@@ -20,13 +20,15 @@ from copy import deepcopy
 from snf_django.utils.testing import (BaseAPITest, mocked_quotaholder,
                                       override_settings)
 from synnefo.db.models import (VirtualMachine, VirtualMachineMetadata,
-                               IPAddress, NetworkInterface, Volume)
+                               VirtualMachineDiagnostic, IPAddress,
+                               NetworkInterface, Volume)
 from synnefo.db import models_factory as mfactory
 from synnefo.logic.utils import get_rsapi_state
 from synnefo.cyclades_settings import cyclades_services
 from synnefo.lib.services import get_service_path
 from synnefo.lib import join_urls
 from django.conf import settings
+from django.db import connection
 from synnefo.logic.rapi import GanetiApiError
 
 from mock import patch, Mock
@@ -102,6 +104,121 @@ class ServerAPITest(ComputeAPITest):
             self.assertEqual(api_vm['status'], get_rsapi_state(db_vm))
             self.assertSuccess(response)
 
+    def test_server_list_paging(self):
+        """Test paging of the servers list with limit and marker."""
+        user = "user_paging"
+        vms = [mfactory.VirtualMachineFactory(userid=user) for _ in range(5)]
+        vm_ids = sorted(vm.id for vm in vms)
+
+        response = self.myget('servers/detail?limit=2', user)
+        self.assertSuccess(response)
+        data = json.loads(response.content)
+        self.assertEqual([s["id"] for s in data["servers"]], vm_ids[:2])
+        next_link = data["servers_links"][0]
+        self.assertEqual(next_link["rel"], "next")
+        self.assertTrue("marker=%d" % vm_ids[1] in next_link["href"])
+
+        response = self.myget('servers?limit=2&marker=%d' % vm_ids[3], user)
+        self.assertSuccess(response)
+        data = json.loads(response.content)
+        self.assertEqual([s["id"] for s in data["servers"]], vm_ids[4:])
+        self.assertFalse("servers_links" in data)
+
+        with override_settings(settings, CYCLADES_SERVERS_LIST_LIMIT=3):
+            response = self.myget('servers?limit=10', user)
+            servers = json.loads(response.content)["servers"]
+            self.assertEqual([s["id"] for s in servers], vm_ids[:3])
+            # Clients that do not page are not capped
+            response = self.myget('servers', user)
+            data = json.loads(response.content)
+            self.assertEqual([s["id"] for s in data["servers"]], vm_ids)
+            self.assertFalse("servers_links" in data)
+            # XML clients get the link to the next page too
+            response = self.myget('servers?limit=2', user,
+                                  HTTP_ACCEPT='application/xml')
+            self.assertSuccess(response)
+            self.assertTrue('rel="next"' in response.content)
+            self.assertTrue("marker=%d" % vm_ids[1] in response.content)
+
+        response = self.myget('servers?marker=%d' % self.vm2.id, user)
+        self.assertBadRequest(response)
+        response = self.myget('servers?limit=foo', user)
+        self.assertBadRequest(response)
+
+    def test_server_list_etag(self):
+        """Test conditional GET of the servers list."""
+        response = self.myget('servers/detail', self.user2)
+        self.assertSuccess(response)
+        etag = response["ETag"]
+        response = self.myget('servers/detail', self.user2,
+                              HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        # Each listing has its own tag
+        response = self.myget('servers', self.user2,
+                              HTTP_IF_NONE_MATCH=etag)
+        self.assertSuccess(response)
+        # Deleting a server changes the tag
+        self.vm2.deleted = True
+        self.vm2.save()
+        response = self.myget('servers/detail', self.user2,
+                              HTTP_IF_NONE_MATCH=etag)
+        self.assertSuccess(response)
+        servers = json.loads(response.content)['servers']
+        self.assertEqual([s["id"] for s in servers], [self.vm4.id])
+
+    def test_server_list_etag_diagnostics(self):
+        """Test that new diagnostics and NICs change the tag of details."""
+        response = self.myget('servers/detail', self.user2)
+        etag = response["ETag"]
+        # Insert the rows without touching the server
+        VirtualMachineDiagnostic.objects.create(
+            machine=self.vm4, level="DEBUG", source="image-helper",
+            message="Copying image")
+        response = self.myget('servers/detail', self.user2,
+                              HTTP_IF_NONE_MATCH=etag)
+        self.assertSuccess(response)
+        etag = response["ETag"]
+        mfactory.NetworkInterfaceFactory(machine=self.vm4)
+        response = self.myget('servers/detail', self.user2,
+                              HTTP_IF_NONE_MATCH=etag)
+        self.assertSuccess(response)
+
+    def test_server_list_detail_queries(self):
+        """Test that listing servers costs a constant number of queries."""
+        def detail_queries(user):
+            connection.use_debug_cursor = True
+            try:
+                response = self.myget('servers/detail', user)
+                self.assertSuccess(response)
+                return (json.loads(response.content)["servers"],
+                        len(connection.queries))
+            finally:
+                connection.use_debug_cursor = None
+
+        first_vm = mfactory.VirtualMachineFactory(userid="user_q1")
+        mfactory.VolumeFactory(userid="user_q1", machine=first_vm)
+        mfactory.VirtualMachineMetadataFactory(vm=first_vm)
+        VirtualMachineDiagnostic.objects.create_debug(first_vm,
+                                                      message="first",
+                                                      source="test")
+        one_vm_queries = detail_queries("user_q1")[1]
+
+        vms = [mfactory.VirtualMachineFactory(userid="user_q2")
+               for i in range(4)]
+        volumes = [mfactory.VolumeFactory(userid="user_q2", machine=vm)
+                   for vm in vms]
+        for vm in vms:
+            mfactory.VirtualMachineMetadataFactory(vm=vm)
+            for message in ("first", "second"):
+                VirtualMachineDiagnostic.objects.create_debug(
+                    vm, message=message, source="test")
+        servers, many_vms_queries = detail_queries("user_q2")
+        self.assertEqual(one_vm_queries, many_vms_queries)
+        for server, volume in zip(servers, volumes):
+            self.assertEqual(server["volumes"], [volume.id])
+            self.assertEqual(len(server["diagnostics"]), 1)
+            self.assertEqual(server["diagnostics"][0]["message"], "second")
+
     def test_server_detail(self):
         """Test if a server details are returned."""
         db_vm = self.vm2
@@ -370,6 +487,41 @@ class ServerCreateAPITest(ComputeAPITest):
         self.assertEqual(api_server['name'], u"Server in the \u2601")
         self.assertEqual(api_server['status'], db_vm.operstate)
 
+    def test_create_multiple_servers(self, mrapi):
+        mrapi().CreateInstance.side_effect = [12, 13, 14]
+        request = deepcopy(self.request)
+        request["server"]["max_count"] = 3
+        osettings = dict(self.network_settings,
+                         CYCLADES_BATCH_CREATE_WORKERS=1)
+        with override_settings(settings, **osettings):
+            with mocked_quotaholder() as m:
+                response = self.mypost('servers', 'test_user',
+                                       json.dumps(request), 'json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(len(m.issue_one_commission.mock_calls), 1)
+        self.assertEqual(mrapi().CreateInstance.call_count, 3)
+
+        api_servers = json.loads(response.content)['servers']
+        self.assertEqual([s["name"] for s in api_servers],
+                         [u"Server in the \u2601-%d" % i for i in (1, 2, 3)])
+        passwords = set(s["adminPass"] for s in api_servers)
+        self.assertEqual(len(passwords), 3)
+        self.assertEqual(VirtualMachine.objects.filter(userid='test_user')
+                                               .count(), 3)
+
+        # Invalid count
+        too_many = settings.CYCLADES_MAX_SERVERS_PER_REQUEST + 1
+        for count in [0, "foo", -1, too_many]:
+            request["server"]["max_count"] = count
+            response = self.mypost('servers', 'test_user',
+                                   json.dumps(request), 'json')
+            self.assertBadRequest(response)
+        request["server"]["max_count"] = 2
+        request["server"]["min_count"] = 3
+        response = self.mypost('servers', 'test_user',
+                               json.dumps(request), 'json')
+        self.assertBadRequest(response)
+
     def test_create_server_wrong_flavor(self, mrapi):
         # Test with a flavor that does not exist
         request = deepcopy(self.request)
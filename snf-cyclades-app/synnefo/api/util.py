@@ -265,18 +265,24 @@ def get_floating_ip_by_id(userid, floating_ip_id, for_update=False):
 
 
 def backend_has_free_public_ip(backend):
-    """Check if a backend has a free public IPv4 address."""
-    ip_pool_rows = IPPoolTable.objects.select_for_update()\
+    """Check if a backend has a free public IPv4 address.
+
+    The check uses the available counters of the IP pool rows without locking
+    them, so a concurrent allocation may still take the last free address.
+
+    """
+    ip_pool_rows = IPPoolTable.objects\
         .filter(subnet__network__public=True)\
         .filter(subnet__network__drained=False)\
         .filter(subnet__deleted=False)\
         .filter(subnet__network__backend_networks__backend=backend)
-    for pool_row in ip_pool_rows:
-        pool = pool_row.pool
-        if pool.empty():
-            continue
-        else:
+    if ip_pool_rows.filter(available_count__gt=0).exists():
+        return True
+    # Rows whose counter has not been computed yet
+    for pool_row in ip_pool_rows.filter(available_count__isnull=True):
+        if not pool_row.pool.empty():
             return True
+    return False
 
 
 def backend_public_networks(backend):
@@ -11,7 +11,7 @@ synnefo_web_apps = [
     'synnefo.volume',
 ]
 
-synnefo_web_middleware = []
+synnefo_web_middleware = ['snf_django.utils.routers.ReplicaPinMiddleware']
 synnefo_web_context_processors = \
     ['synnefo.webproject.context_processors.cloudbar']
 
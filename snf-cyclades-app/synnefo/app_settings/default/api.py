@@ -16,6 +16,19 @@ POLL_LIMIT = 3600
 # Astakos groups that have access to '/admin' views.
 ADMIN_STATS_PERMITTED_GROUPS = ["admin-stats"]
 
+# Maximum number of servers that can be created with a single request, using
+# the 'max_count' attribute of the POST /servers API call.
+CYCLADES_MAX_SERVERS_PER_REQUEST = 500
+
+# Number of threads used to send the OP_INSTANCE_CREATE jobs of the servers
+# that are created with a single request to the Ganeti backends.
+CYCLADES_BATCH_CREATE_WORKERS = 8
+
+# Maximum number of servers returned by a single GET /servers or
+# GET /servers/detail API call that is paged, i.e. has the 'limit' or the
+# 'marker' parameter. Requests without them return all the servers.
+CYCLADES_SERVERS_LIST_LIMIT = 1000
+
 # Enable/Disable the snapshots feature altogether at the API level.
 # If set to False, Cyclades will not expose the '/snapshots' API URL
 # of the 'volume' app.
@@ -53,6 +66,11 @@ CYCLADES_FORCED_SERVER_NETWORKS = []
 # Maximum allowed network size for private networks.
 MAX_CIDR_BLOCK = 22
 
+# Maximum number of IPv4 addresses in each row of an IP pool. The IP pools of
+# new subnets are split in chunks of this size, so that concurrent IP
+# allocations lock and update only one small chunk of the pool.
+CYCLADES_IP_POOL_CHUNK_SIZE = 1024
+
 # Default settings used by network flavors
 DEFAULT_MAC_PREFIX = 'aa:00:0'
 DEFAULT_BRIDGE = 'br0'
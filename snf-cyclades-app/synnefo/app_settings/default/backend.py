@@ -45,6 +45,9 @@ GANETI_DISKS_WAIT_FOR_SYNC = False
 BACKEND_ALLOCATOR_MODULE = "synnefo.logic.allocators.default_allocator"
 # Refresh backend statistics timeout, in minutes, used in backend allocation
 BACKEND_REFRESH_MIN = 15
+# If True, stale backend statistics are refreshed in a background thread,
+# outside of the request that triggered the refresh
+BACKEND_REFRESH_ASYNC = True
 
 # Maximum number of NICs per Ganeti instance. This value must be less or equal
 # than 'max:nic-count' option of Ganeti's ipolicy.
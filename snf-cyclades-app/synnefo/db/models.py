@@ -332,7 +332,7 @@ class VirtualMachine(models.Model):
                                 on_delete=models.PROTECT)
     backend_hash = models.CharField(max_length=128, null=True, editable=False)
     created = models.DateTimeField(auto_now_add=True)
-    updated = models.DateTimeField(auto_now=True)
+    updated = models.DateTimeField(auto_now=True, db_index=True)
     imageid = models.CharField(max_length=100, null=False)
     image_version = models.IntegerField(null=True)
     hostid = models.CharField(max_length=100)
@@ -548,7 +548,7 @@ class Network(models.Model):
     tags = models.CharField('Network Tags', max_length=128, null=True)
     public = models.BooleanField(default=False, db_index=True)
     created = models.DateTimeField(auto_now_add=True)
-    updated = models.DateTimeField(auto_now=True)
+    updated = models.DateTimeField(auto_now=True, db_index=True)
     deleted = models.BooleanField('Deleted', default=False, db_index=True)
     state = models.CharField(choices=OPER_STATES, max_length=32,
                              default='PENDING')
@@ -638,12 +638,25 @@ class Network(models.Model):
         return None
 
     def ip_count(self):
-        """Return the total and free IPv4 addresses of the network."""
+        """Return the total and free IPv4 addresses of the network.
+
+        The counts are computed from the maintained counters of the IP pools,
+        without decoding them. Only pools that have never been saved since
+        the counters were introduced are decoded.
+
+        """
         total, free = 0, 0
-        ip_pools = self.get_ip_pools(locked=False)
-        for ip_pool in ip_pools:
-            total += ip_pool.pool_size
-            free += ip_pool.count_available()
+        pool_rows = IPPoolTable.objects.filter(subnet__network=self,
+                                               subnet__ipversion=4,
+                                               subnet__deleted=False)
+        for size, count, pool_id in pool_rows.values_list("size",
+                                                          "available_count",
+                                                          "id"):
+            total += size
+            if count is None:
+                count = IPPoolTable.objects.get(id=pool_id).pool\
+                                           .count_available()
+            free += count
         return total, free
 
     class InvalidBackendIdError(ValueError):
@@ -800,7 +813,7 @@ class IPAddress(models.Model):
     floating_ip = models.BooleanField("Floating IP", null=False, default=False)
     ipversion = models.IntegerField("IP Version", null=False)
     created = models.DateTimeField(auto_now_add=True)
-    updated = models.DateTimeField(auto_now=True)
+    updated = models.DateTimeField(auto_now=True, db_index=True)
     deleted = models.BooleanField(default=False, null=False)
 
     serial = models.ForeignKey(QuotaHolderSerial,
@@ -884,7 +897,7 @@ class NetworkInterface(models.Model):
     network = models.ForeignKey(Network, related_name='nics',
                                 on_delete=models.PROTECT)
     created = models.DateTimeField(auto_now_add=True)
-    updated = models.DateTimeField(auto_now=True)
+    updated = models.DateTimeField(auto_now=True, db_index=True)
     index = models.IntegerField(null=True)
     mac = models.CharField(max_length=32, null=True, unique=True)
     firewall_profile = models.CharField(choices=FIREWALL_PROFILES,
@@ -945,6 +958,11 @@ class PoolTable(models.Model):
     base = models.CharField(null=True, max_length=32)
     offset = models.IntegerField(null=True)
 
+    # Maintained by the PoolManager: all indexes below 'free_hint' are
+    # unavailable, and 'available_count' is the number of available values.
+    free_hint = models.IntegerField(default=0, null=False)
+    available_count = models.IntegerField(null=True)
+
     class Meta:
         abstract = True
 
@@ -36,6 +36,13 @@ class PoolManager(object):
     method's in order to denote how the value will be mapped to the index in
     the bitarray.
 
+    Besides the bitarrays, the pool keeps a hint for the first available
+    index (all indexes below the hint are unavailable) and the number of
+    available values. Both are persisted in the 'free_hint' and
+    'available_count' attributes of the object, so that getting a value does
+    not require scanning the whole pool, and counting the available values of
+    the pool does not require decoding its bitarrays.
+
     Important!!: Updates on a PoolManager object are not reflected to the DB,
     until save() method is called.
 
@@ -46,10 +53,16 @@ class PoolManager(object):
         if pool_table.available_map:
             self.available = _bitarray_from_string(pool_table.available_map)
             self.reserved = _bitarray_from_string(pool_table.reserved_map)
+            self.hint = min(getattr(pool_table, "free_hint", 0) or 0,
+                            self.pool_size)
+            self._available_count = getattr(pool_table, "available_count",
+                                            None)
         else:
             self.available = self._create_empty_pool(self.pool_size)
             self.reserved = self._create_empty_pool(self.pool_size)
             self.add_padding(self.pool_size)
+            self.hint = 0
+            self._available_count = self.pool_size
 
     def _create_empty_pool(self, size):
         ba = bitarray(size)
@@ -73,12 +86,12 @@ class PoolManager(object):
     def get(self, value=None):
         """Get a value from the pool."""
         if value is None:
-            if self.empty():
-                raise EmptyPool
             # Get the first available index
-            index = int(self.pool.index(AVAILABLE))
-            assert(index < self.pool_size)
+            index = self._find_available()
+            if index is None:
+                raise EmptyPool
             self._reserve(index)
+            self.hint = index + 1
             return self.index_to_value(index)
         else:
             if not self.contains(value):
@@ -110,28 +123,55 @@ class PoolManager(object):
         """Save changes to the DB."""
         self.pool_table.available_map = _bitarray_to_string(self.available)
         self.pool_table.reserved_map = _bitarray_to_string(self.reserved)
+        self.pool_table.free_hint = self.hint
+        self.pool_table.available_count = self.count_available()
         if db:
             self.pool_table.save()
 
     def empty(self):
         """Return True when pool is empty."""
-        return not self.pool.any()
+        return self.count_available() == 0
+
+    def _is_free(self, index):
+        return self.available[index] and self.reserved[index]
+
+    def _find_available(self):
+        """Return the first available index, starting from the hint."""
+        index = self.hint
+        while index < self.pool_size:
+            try:
+                index = self.available.index(AVAILABLE, index, self.pool_size)
+            except ValueError:
+                break
+            if self.reserved[index] == AVAILABLE:
+                return index
+            index += 1
+        self.hint = self.pool_size
+        return None
 
     def size(self):
         """Return the size of the bitarray(original size + padding)."""
         return self.pool.length()
 
     def _reserve(self, index, external=False):
+        was_free = self._is_free(index)
         if external:
             self.reserved[index] = UNAVAILABLE
         else:
             self.available[index] = UNAVAILABLE
+        if was_free and self._available_count is not None:
+            self._available_count -= 1
 
     def _release(self, index, external=False):
+        was_free = self._is_free(index)
         if external:
             self.reserved[index] = AVAILABLE
         else:
             self.available[index] = AVAILABLE
+        if not was_free and self._is_free(index):
+            if self._available_count is not None:
+                self._available_count += 1
+            self.hint = min(self.hint, index)
 
     def contains(self, value, index=False):
         if index is False:
@@ -139,7 +179,10 @@ class PoolManager(object):
         return index >= 0 and index < self.pool_size
 
     def count_available(self):
-        return self.pool.count(AVAILABLE)
+        if self._available_count is None:
+            self._available_count = \
+                self.pool[:self.pool_size].count(AVAILABLE)
+        return self._available_count
 
     def count_unavailable(self):
         return self.pool_size - self.count_available()
@@ -157,7 +200,7 @@ class PoolManager(object):
             idx = self.value_to_index(value)
         else:
             idx = value
-        return self.pool[idx] == AVAILABLE
+        return bool(self._is_free(idx))
 
     def is_reserved(self, value, index=False):
         if not self.contains(value, index=index):
@@ -202,6 +245,8 @@ class PoolManager(object):
         self.pool_size = self.pool_size + bits_num
         self.add_padding(self.pool_size)
         self.pool_table.size = self.pool_size
+        self.hint = min(self.hint, self.pool_size)
+        self._available_count = None
 
     def index_to_value(self, index):
         raise NotImplementedError
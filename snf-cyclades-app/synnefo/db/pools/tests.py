@@ -138,6 +138,40 @@ class PoolManagerTestCase(TestCase):
         self.assertEqual(pool.count_reserved(), 1)
         self.assertEqual(pool.count_unreserved(), 9)
 
+    def test_free_hint(self):
+        obj = DummyObject(10)
+        pool = DummyPool(obj)
+        self.assertEqual(pool.get(), 0)
+        self.assertEqual(pool.get(), 1)
+        self.assertEqual(pool.hint, 2)
+        pool._reserve(2, external=True)
+        self.assertEqual(pool.get(), 3)
+        pool.put(1)
+        self.assertEqual(pool.hint, 1)
+        self.assertEqual(pool.get(), 1)
+        pool.save()
+        self.assertEqual(obj.free_hint, 2)
+        pool = DummyPool(obj)
+        self.assertEqual(pool.get(), 4)
+
+    def test_saved_count(self):
+        obj = DummyObject(10)
+        pool = DummyPool(obj)
+        pool.get()
+        pool.get()
+        pool._reserve(5, external=True)
+        pool.save()
+        self.assertEqual(obj.available_count, 7)
+        pool = DummyPool(obj)
+        self.assertEqual(pool.count_available(), 7)
+        pool.put(0)
+        pool.put(5, external=True)
+        self.assertEqual(pool.count_available(), 9)
+        # Rows that were saved without a counter are counted lazily
+        obj.available_count = None
+        pool = DummyPool(obj)
+        self.assertEqual(pool.count_available(), 7)
+
 
 class HelpersTestCase(TestCase):
     def test_find_padding(self):
@@ -17,7 +17,7 @@ from synnefo.db import transaction
 from django.utils import simplejson as json
 from datetime import datetime, timedelta
 
-from synnefo.db.models import (VirtualMachine, Network, Volume,
+from synnefo.db.models import (Backend, VirtualMachine, Network, Volume,
                                BackendNetwork, BACKEND_STATUSES,
                                pooled_rapi_client, VirtualMachineDiagnostic,
                                Flavor, IPAddress, IPAddressLog)
@@ -759,10 +759,13 @@ def process_create_progress(vm, etime, progress):
     if percentage < 0:
         raise ValueError("Percentage cannot be negative")
 
-    # FIXME: log a warning here, see #1033
-#   if last_update > percentage:
-#       raise ValueError("Build percentage should increase monotonically " \
-#                        "(old = %d, new = %d)" % (last_update, percentage))
+    # The build percentage only increases. Messages that would not increase
+    # it, e.g. redelivered or reordered ones, are ignored, so that
+    # processing a message more than once has no effect.
+    if percentage <= vm.buildpercentage:
+        log.debug("Ignoring build progress %d%% of VM %s, already at %d%%",
+                  percentage, vm, vm.buildpercentage)
+        return
 
     # This assumes that no message of type 'ganeti-create-progress' is going to
     # arrive once OP_INSTANCE_CREATE has succeeded for a Ganeti instance and
@@ -774,9 +777,15 @@ def process_create_progress(vm, etime, progress):
     # if not vm.operstate == 'BUILD':
     #     raise VirtualMachine.IllegalState("VM is not in building state")
 
+    # Update only the progress fields, and only if no other message has
+    # increased the percentage further in the meantime. update() does not
+    # set the 'auto_now' field, which clients poll with 'changes-since'.
+    now = datetime.now()
+    VirtualMachine.objects.filter(id=vm.id, buildpercentage__lt=percentage)\
+        .update(buildpercentage=percentage, backendtime=etime, updated=now)
     vm.buildpercentage = percentage
     vm.backendtime = etime
-    vm.save()
+    vm.updated = now
 
 
 @transaction.commit_on_success
@@ -1333,14 +1342,15 @@ def update_backend_resources(backend, resources=None):
     if not resources:
         resources = get_physical_resources(backend)
 
-    backend.mfree = resources['mfree']
-    backend.mtotal = resources['mtotal']
-    backend.dfree = resources['dfree']
-    backend.dtotal = resources['dtotal']
-    backend.pinst_cnt = resources['pinst_cnt']
-    backend.ctotal = resources['ctotal']
-    backend.updated = datetime.now()
-    backend.save()
+    fields = dict((attr, resources[attr])
+                  for attr in ['mfree', 'mtotal', 'dfree', 'dtotal',
+                               'pinst_cnt', 'ctotal'])
+    fields["updated"] = datetime.now()
+    # Update only the resource columns, in order to not overwrite concurrent
+    # changes to the rest of the backend attributes.
+    Backend.objects.filter(id=backend.id).update(**fields)
+    for attr, value in fields.items():
+        setattr(backend, attr, value)
 
 
 def get_memory_from_instances(backend):
@@ -1380,7 +1390,8 @@ def get_available_disk_templates(backend):
 def update_backend_disk_templates(backend):
     disk_templates = get_available_disk_templates(backend)
     backend.disk_templates = disk_templates
-    backend.save()
+    Backend.objects.filter(id=backend.id)\
+                   .update(disk_templates=disk_templates)
 
 
 #
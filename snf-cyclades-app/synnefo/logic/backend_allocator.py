@@ -15,14 +15,22 @@
 
 import logging
 import datetime
+import threading
+from copy import copy
 from django.utils import importlib
 
 from django.conf import settings
+from django.db import close_connection
+from django.db.models import F
 from synnefo.db.models import Backend
 from synnefo.logic import backend as backend_mod
 
 log = logging.getLogger(__name__)
 
+# Number of times to re-read the candidate backends if the reservation of
+# resources conflicts with concurrent allocations in all of them.
+ALLOCATION_ROUNDS = 3
+
 
 class BackendAllocator():
     """Wrapper class for instance allocation.
@@ -35,9 +43,10 @@ class BackendAllocator():
     def allocate(self, userid, flavor):
         """Allocate a vm of the specified flavor to a backend.
 
-        Warning!!: An explicit commit is required after calling this function,
-        in order to release the locks acquired by the get_available_backends
-        function.
+        No row locks are held while choosing the backend. The resources of
+        the selected backend are reserved with an atomic conditional UPDATE,
+        and if a concurrent allocation has modified the backend in the
+        meantime, the next best candidate is tried.
 
         """
 
@@ -54,23 +63,83 @@ class BackendAllocator():
 
         log.debug("Allocating VM: %r", vm)
 
-        # Get available backends
-        available_backends = get_available_backends(flavor)
+        for _ in range(ALLOCATION_ROUNDS):
+            # Get available backends
+            candidates = get_available_backends(flavor)
+
+            if not candidates:
+                return None
+
+            while candidates:
+                # Find the best backend to host the vm, based on the
+                # allocation strategy
+                backend = self.strategy_mod.allocate(candidates, vm)
 
-        if not available_backends:
-            return None
+                # Reduce the free resources of the selected backend by the
+                # size of the vm
+                if reduce_backend_resources(backend, vm):
+                    log.info("Allocated VM %r, in backend %s", vm, backend)
+                    return backend
 
-        # Find the best backend to host the vm, based on the allocation
-        # strategy
-        backend = self.strategy_mod.allocate(available_backends, vm)
+                log.debug("Conflict while reserving resources of backend %s."
+                          " Trying next candidate.", backend)
+                candidates = [b for b in candidates if b.id != backend.id]
+
+        log.error("Failed to reserve resources for VM %r due to concurrent"
+                  " allocations", vm)
+        return None
 
-        log.info("Allocated VM %r, in backend %s", vm, backend)
+    def allocate_many(self, userid, flavor, count):
+        """Allocate 'count' vms of the specified flavor to backends.
 
-        # Reduce the free resources of the selected backend by the size of
-        # the vm
-        reduce_backend_resources(backend, vm)
+        The vms are distributed to the candidate backends according to the
+        allocation strategy, and the resources of each selected backend are
+        reserved with a single conditional UPDATE for all the vms that it
+        will host. Returns the list with the backend of each vm, or None if
+        no backend is available.
 
-        return backend
+        """
+        backend = get_backend_for_user(userid)
+        if backend:
+            return [backend] * count
+
+        vm = {'ram': flavor.ram, 'disk': flavor_disk(flavor),
+              'cpu': flavor.cpu}
+
+        log.debug("Allocating %s VMs: %r", count, vm)
+
+        allocated = []
+        for _ in range(ALLOCATION_ROUNDS):
+            candidates = get_available_backends(flavor)
+            if not candidates:
+                return None
+
+            # Plan the allocation on copies of the candidates, updating their
+            # resources as if each vm was already allocated.
+            planned = {}
+            originals = dict((b.id, copy(b)) for b in candidates)
+            for i in range(count - len(allocated)):
+                backend = self.strategy_mod.allocate(candidates, vm)
+                _reduce_resources(backend, vm)
+                planned[backend.id] = planned.get(backend.id, 0) + 1
+
+            for backend_id, vms in planned.items():
+                backend = originals[backend_id]
+                batch_vm = {'ram': vm['ram'] * vms, 'disk': vm['disk'] * vms}
+                if reduce_backend_resources(backend, batch_vm, vms=vms):
+                    allocated.extend([backend] * vms)
+                else:
+                    log.debug("Conflict while reserving resources of backend"
+                              " %s.", backend)
+
+            if len(allocated) == count:
+                log.info("Allocated %s VMs %r, in backends %s", count, vm,
+                         planned)
+                return allocated
+
+        log.error("Failed to reserve resources for %s VMs %r due to"
+                  " concurrent allocations", count - len(allocated), vm)
+        return None
 
 
 def get_available_backends(flavor):
@@ -79,9 +148,9 @@ def get_available_backends(flavor):
     The list contains the backends that are online and that have enabled
     the disk_template of the new VM.
 
-    Also, if the new VM will be automatically connected to a public network,
-    the backends that do not have an available public IPv4 address are
-    excluded.
+    Backends are not locked. Backends whose statistics are stale are scheduled
+    for a refresh, which is performed outside of the current request when
+    BACKEND_REFRESH_ASYNC is set.
 
     """
     disk_template = flavor.volume_type.disk_template
@@ -90,8 +159,7 @@ def get_available_backends(flavor):
     if disk_template.startswith("ext_"):
         disk_template = "ext"
 
-    backends = Backend.objects.select_for_update().filter(offline=False,
-                                                          drained=False)
+    backends = Backend.objects.filter(offline=False, drained=False)
     # Update the disk_templates if there are empty.
     [backend_mod.update_backend_disk_templates(b)
      for b in backends if not b.disk_templates]
@@ -114,21 +182,43 @@ def flavor_disk(flavor):
         return flavor.disk * 1024
 
 
-def reduce_backend_resources(backend, vm):
+def reduce_backend_resources(backend, vm, vms=1):
     """ Conservatively update the resources of a backend.
 
     Reduce the free resources of the backend by the size of the of the vm that
     will host. This is an underestimation of the backend capabilities.
 
+    The update is conditional on the free resources of the backend being the
+    ones that the allocation was based on. Returns False if the backend has
+    been modified (or drained/set offline) by a concurrent transaction.
+
     """
 
+    mfree, dfree = backend.mfree, backend.dfree
+    _reduce_resources(backend, vm, vms)
+
+    updated = Backend.objects.filter(id=backend.id, offline=False,
+                                     drained=False, mfree=mfree, dfree=dfree)\
+                             .update(mfree=backend.mfree, dfree=backend.dfree,
+                                     pinst_cnt=F("pinst_cnt") + vms)
+    if not updated:
+        backend.mfree, backend.dfree = mfree, dfree
+        backend.pinst_cnt -= vms
+        return False
+    return True
+
+
+def _reduce_resources(backend, vm, vms=1):
     new_mfree = backend.mfree - vm['ram']
     new_dfree = backend.dfree - vm['disk']
     backend.mfree = 0 if new_mfree < 0 else new_mfree
     backend.dfree = 0 if new_dfree < 0 else new_dfree
-    backend.pinst_cnt += 1
+    backend.pinst_cnt += vms
 
-    backend.save()
+
+# Backends that are currently being refreshed by this process
+_refreshing = set()
+_refreshing_lock = threading.Lock()
 
 
 def refresh_backends_stats(backends):
@@ -137,15 +227,50 @@ def refresh_backends_stats(backends):
     Set db backend state to the actual state of the backend, if
     BACKEND_REFRESH_MIN time has passed.
 
+    Only one of the concurrent allocations that find a backend stale wins the
+    refresh, by atomically bumping the 'updated' timestamp of the backend.
+
     """
 
     now = datetime.datetime.now()
     delta = datetime.timedelta(minutes=settings.BACKEND_REFRESH_MIN)
     for b in backends:
         if now > b.updated + delta:
+            claimed = Backend.objects.filter(id=b.id, updated=b.updated)\
+                                     .update(updated=now)
+            if not claimed:
+                continue
             log.debug("Updating resources of backend %r. Last Updated %r",
                       b, b.updated)
-            backend_mod.update_backend_resources(b)
+            if settings.BACKEND_REFRESH_ASYNC:
+                refresh_backend_async(b.id)
+            else:
+                backend_mod.update_backend_resources(b)
+
+
+def refresh_backend_async(backend_id):
+    """Refresh the resources of a backend in a background thread."""
+    with _refreshing_lock:
+        if backend_id in _refreshing:
+            return
+        _refreshing.add(backend_id)
+    thread = threading.Thread(target=_refresh_backend, args=(backend_id,),
+                              name="backend-refresh-%s" % backend_id)
+    thread.daemon = True
+    thread.start()
+
+
+def _refresh_backend(backend_id):
+    try:
+        backend = Backend.objects.get(id=backend_id)
+        backend_mod.update_backend_resources(backend)
+    except Exception:
+        log.exception("Failed to refresh resources of backend %s",
+                      backend_id)
+    finally:
+        with _refreshing_lock:
+            _refreshing.discard(backend_id)
+        close_connection()
 
 
 def get_backend_for_user(userid):
@@ -15,8 +15,13 @@
 
 import logging
 import functools
+import threading
+from contextlib import contextmanager
+
+from django.db import DatabaseError, transaction as django_transaction
 
 from snf_django.lib.api import faults
+from snf_django.utils.db import select_db
 from synnefo.db import transaction
 from synnefo import quotas
 from synnefo.db import pools
@@ -82,6 +87,89 @@ def ip_command(action):
     return decorator
 
 
+_batch = threading.local()
+
+
+def _batch_pools():
+    return getattr(_batch, "pools", None)
+
+
+def _get_pool(pool_row):
+    pools_ = _batch_pools()
+    if pools_ is None:
+        return pool_row.pool
+    if pool_row.id not in pools_:
+        pools_[pool_row.id] = pool_row.pool
+    return pools_[pool_row.id]
+
+
+@contextmanager
+def pool_batch():
+    """Allocate a batch of IP addresses with one load/save per IP pool.
+
+    Inside this context, the IP pools that are used for allocating IP
+    addresses are decoded once and saved to DB once, when exiting the
+    context. The pool rows remain locked by the enclosing transaction for the
+    whole batch.
+
+    """
+    if _batch_pools() is not None:
+        # Nested batch
+        yield
+        return
+    _batch.pools = {}
+    try:
+        yield
+        for pool in _batch.pools.values():
+            pool.save()
+    finally:
+        _batch.pools = None
+
+
+def _lock_pool_row(pool_row, nowait=False):
+    # Do not use select_related, because it would also lock the subnet and
+    # the network of the pool.
+    locked = IPPoolTable.objects.select_for_update(nowait=nowait)\
+                                .get(id=pool_row.id)
+    locked.subnet = pool_row.subnet
+    return locked
+
+
+def _locked_pool_rows(pool_rows, skip_full=True):
+    """Lock and yield IP pool rows one at a time.
+
+    IP pools are split in fixed-size chunks, each one stored in a separate
+    row. Instead of locking all the rows of the pools, each row is locked
+    only when it is used for allocating an IP. Rows that are locked by
+    concurrent transactions are skipped, and only if no other row can be
+    used, the skipped rows are retried, waiting for the locks. Rows that are
+    known to be full are skipped if 'skip_full' is set.
+
+    """
+    using = select_db("db")
+    busy = []
+    for pool_row in pool_rows:
+        if skip_full and pool_row.available_count == 0:
+            continue
+        pools_ = _batch_pools()
+        if pools_ is not None and pool_row.id in pools_:
+            # Already locked by the current batch
+            yield pool_row
+            continue
+        sid = django_transaction.savepoint(using=using)
+        try:
+            locked = _lock_pool_row(pool_row, nowait=True)
+        except DatabaseError:
+            django_transaction.savepoint_rollback(sid, using=using)
+            busy.append(pool_row)
+            continue
+        django_transaction.savepoint_commit(sid, using=using)
+        yield locked
+    # Wait for the locks in the order of the rows, like other allocators
+    for pool_row in sorted(busy, key=lambda row: row.id):
+        yield _lock_pool_row(pool_row)
+
+
 def allocate_ip_from_pools(pool_rows, userid, address=None, floating_ip=False):
     """Try to allocate a value from a number of pools.
 
@@ -91,11 +179,13 @@ def allocate_ip_from_pools(pool_rows, userid, address=None, floating_ip=False):
     InvalidValue is raised.
 
     """
-    for pool_row in pool_rows:
-        pool = pool_row.pool
+    for pool_row in _locked_pool_rows(pool_rows,
+                                      skip_full=(address is None)):
+        pool = _get_pool(pool_row)
         try:
             value = pool.get(value=address)
-            pool.save()
+            if _batch_pools() is None:
+                pool.save()
             subnet = pool_row.subnet
             ipaddress = IPAddress.objects.create(subnet=subnet,
                                                  network=subnet.network,
@@ -125,8 +215,8 @@ def allocate_ip(network, userid, address=None, floating_ip=False):
         raise faults.Conflict("Can not allocate IP while network '%s' is in"
                               " 'SNF:DRAINED' status" % network.id)
 
-    ip_pools = IPPoolTable.objects.select_for_update()\
-        .filter(subnet__network=network).order_by('id')
+    ip_pools = IPPoolTable.objects.filter(subnet__network=network)\
+                                  .order_by('id')
     try:
         return allocate_ip_from_pools(ip_pools, userid, address=address,
                                       floating_ip=floating_ip)
@@ -150,12 +240,13 @@ def allocate_public_ip(userid, floating_ip=False, backend=None, networks=None):
     be used.
 
     """
-    ip_pool_rows = IPPoolTable.objects.select_for_update()\
+    ip_pool_rows = IPPoolTable.objects\
         .prefetch_related("subnet__network")\
         .filter(subnet__deleted=False)\
         .filter(subnet__network__deleted=False)\
         .filter(subnet__network__public=True)\
-        .filter(subnet__network__drained=False)
+        .filter(subnet__network__drained=False)\
+        .order_by('id')
     if networks is not None:
         ip_pool_rows = ip_pool_rows.filter(subnet__network__in=networks)
     if floating_ip:
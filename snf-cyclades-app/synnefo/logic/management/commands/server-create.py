@@ -65,6 +65,10 @@ class Command(SynnefoCommand):
                     default=[]),
         make_option("--floating-ips", dest="floating_ip_ids",
                     help="Comma separated list of port IDs to connect"),
+        make_option("--count", dest="count", default="1",
+                    help="Number of servers to create. The servers are named"
+                         " '<name>-<index>' and share the same password."
+                         " [Default: 1]"),
         make_option(
             '--wait',
             dest='wait',
@@ -108,16 +112,31 @@ class Command(SynnefoCommand):
         else:
             backend = None
 
+        try:
+            count = int(options["count"])
+            assert count > 0
+        except (ValueError, AssertionError):
+            raise CommandError("Invalid count: %s" % options["count"])
+
         connection_list = parse_connections(options["connections"])
         volumes_list = parse_volumes(volumes)
-        server = servers.create(user_id, name, password, flavor, image_id,
-                                networks=connection_list,
-                                volumes=volumes_list,
-                                use_backend=backend)
-        pprint.pprint_server(server, stdout=self.stdout)
+        if count == 1:
+            created = [servers.create(user_id, name, password, flavor,
+                                      image_id, networks=connection_list,
+                                      volumes=volumes_list,
+                                      use_backend=backend)]
+        else:
+            created = servers.create_many(user_id, name, count,
+                                          [password] * count, flavor,
+                                          image_id, networks=connection_list,
+                                          volumes=volumes_list,
+                                          use_backend=backend)
+        for server in created:
+            pprint.pprint_server(server, stdout=self.stdout)
 
         wait = parse_bool(options["wait"])
-        common.wait_server_task(server, wait, self.stdout)
+        for server in created:
+            common.wait_server_task(server, wait, self.stdout)
 
 
 def parse_volumes(vol_list):
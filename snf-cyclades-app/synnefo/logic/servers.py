@@ -18,7 +18,9 @@ import logging
 from datetime import datetime
 from socket import getfqdn
 from random import choice
+from multiprocessing.pool import ThreadPool
 from django import dispatch
+from django.db import close_connection
 from synnefo.db import transaction
 from django.utils import simplejson as json
 
@@ -48,6 +50,124 @@ def create(userid, name, password, flavor, image_id, metadata={},
            personality=[], networks=None, use_backend=None, project=None,
            volumes=None):
 
+    image, volumes = prepare_server(userid, name, image_id, metadata,
+                                    flavor, volumes)
+
+    if use_backend is None:
+        # Allocate server to a Ganeti backend
+        use_backend = allocate_new_server(userid, flavor)
+
+    # Create the ports for the server
+    ports = create_instance_ports(userid, networks)
+
+    if project is None:
+        project = userid
+
+    vm, server_volumes = create_server_entries(userid, name, flavor, image,
+                                               use_backend, ports, project,
+                                               volumes, metadata)
+
+    # Create the server in Ganeti.
+    vm = create_server(vm, ports, server_volumes, flavor, image, personality,
+                       password)
+
+    return vm
+
+
+@transaction.commit_on_success
+def create_many(userid, name, count, passwords, flavor, image_id, metadata={},
+                personality=[], networks=None, use_backend=None, project=None,
+                volumes=None):
+    """Create a batch of identical servers.
+
+    Create 'count' servers in one pass: the servers are allocated to Ganeti
+    backends at once, the IP pools are loaded and saved once for the whole
+    batch, and a single quota commission is issued for all servers. The
+    OP_INSTANCE_CREATE jobs are then submitted concurrently to Ganeti, using
+    up to CYCLADES_BATCH_CREATE_WORKERS threads.
+
+    The names of the servers are formed by appending the index of each server
+    to 'name'. 'passwords' is a list with the password of each server.
+
+    """
+    max_count = settings.CYCLADES_MAX_SERVERS_PER_REQUEST
+    if count < 1 or count > max_count:
+        raise faults.BadRequest("The number of servers must be between 1 and"
+                                " %s" % max_count)
+    if len(passwords) != count:
+        raise ValueError("Expected %s passwords" % count)
+    if volumes and [v for v in volumes if v["source_type"] == "volume"]:
+        raise faults.BadRequest("Cannot use an existing volume when creating"
+                                " multiple servers.")
+    if networks:
+        for network in networks:
+            if isinstance(network, dict) and\
+               ("port" in network or network.get("fixed_ip") is not None):
+                raise faults.BadRequest("Cannot use a specific port or IP"
+                                        " address when creating multiple"
+                                        " servers.")
+
+    names = ["%s-%d" % (name, index + 1) for index in range(count)]
+    for server_name in names:
+        utils.check_name_length(server_name,
+                                VirtualMachine.VIRTUAL_MACHINE_NAME_LENGTH,
+                                "Server name is too long")
+
+    image, volumes = prepare_server(userid, name, image_id, metadata,
+                                    flavor, volumes)
+
+    if use_backend is None:
+        backends = allocate_new_servers(userid, flavor, count)
+    else:
+        backends = [use_backend] * count
+
+    # Reserve the IP addresses of all servers while holding the IP pools
+    with ips.pool_batch():
+        ports = [create_instance_ports(userid, networks)
+                 for _ in range(count)]
+
+    if project is None:
+        project = userid
+
+    servers = []
+    for server_name, vm_backend, server_ports in zip(names, backends, ports):
+        vm, server_volumes = create_server_entries(userid, server_name,
+                                                   flavor, image, vm_backend,
+                                                   server_ports, project,
+                                                   volumes, metadata=None)
+        servers.append((vm, server_ports, server_volumes))
+    vms = [server[0] for server in servers]
+    VirtualMachineMetadata.objects.bulk_create(
+        [VirtualMachineMetadata(meta_key=key, meta_value=val, vm=server_vm)
+         for server_vm in vms for key, val in metadata.items()])
+
+    # Issue one commission for all servers. The commission is accepted,
+    # since the servers are stored in DB, and a commit is performed before
+    # the OP_INSTANCE_CREATE jobs are enqueued in Ganeti.
+    quotas.issue_and_accept_bulk_commission(vms, action="BUILD")
+
+    jobs = [(server[0].id, server[1], server[2], flavor, image, personality,
+             password) for server, password in zip(servers, passwords)]
+    workers = min(settings.CYCLADES_BATCH_CREATE_WORKERS, count)
+    if workers > 1:
+        pool = ThreadPool(workers)
+        try:
+            vms = pool.map(_submit_server_job, jobs)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        vms = [_send_server_job(*job) for job in jobs]
+
+    return vms
+
+
+def prepare_server(userid, name, image_id, metadata, flavor, volumes):
+    """Validate the parameters of a new server and get its image.
+
+    Returns the image of the server and the list of its volumes.
+
+    """
     utils.check_name_length(name, VirtualMachine.VIRTUAL_MACHINE_NAME_LENGTH,
                             "Server name is too long")
 
@@ -72,6 +192,11 @@ def create(userid, name, password, flavor, image_id, metadata={},
         raise faults.BadRequest("Virtual Machines cannot have more than %s "
                                 "metadata items" %
                                 settings.CYCLADES_VM_MAX_METADATA)
+    for key, val in metadata.items():
+        utils.check_name_length(key, VirtualMachineMetadata.KEY_LENGTH,
+                                "Metadata key is too long")
+        utils.check_name_length(val, VirtualMachineMetadata.VALUE_LENGTH,
+                                "Metadata value is too long")
     # Get image info
     image = util.get_image_dict(image_id, userid)
 
@@ -106,16 +231,17 @@ def create(userid, name, password, flavor, image_id, metadata={},
         # Image info is not critical. Continue if it fails for any reason
         log.warning("Failed to store image info: %s", e)
 
-    if use_backend is None:
-        # Allocate server to a Ganeti backend
-        use_backend = allocate_new_server(userid, flavor)
+    return image, volumes
 
-    # Create the ports for the server
-    ports = create_instance_ports(userid, networks)
 
-    if project is None:
-        project = userid
+def create_server_entries(userid, name, flavor, image, use_backend, ports,
+                          project, volumes, metadata):
+    """Create the DB entries of a new server.
+
+    Create the VirtualMachine, associate it with its ports and create its
+    volumes and metadata. Returns the server and the list of its volumes.
 
+    """
     # We must save the VM instance now, so that it gets a valid
     # vm.backend_vm_id.
     vm = VirtualMachine.objects.create(name=name,
@@ -160,21 +286,14 @@ def create(userid, name, password, flavor, image_id, metadata={},
         server_volumes.append(v)
 
     # Create instance metadata
-    for key, val in metadata.items():
-        utils.check_name_length(key, VirtualMachineMetadata.KEY_LENGTH,
-                                "Metadata key is too long")
-        utils.check_name_length(val, VirtualMachineMetadata.VALUE_LENGTH,
-                                "Metadata value is too long")
-        VirtualMachineMetadata.objects.create(
-            meta_key=key,
-            meta_value=val,
-            vm=vm)
+    if metadata:
+        for key, val in metadata.items():
+            VirtualMachineMetadata.objects.create(
+                meta_key=key,
+                meta_value=val,
+                vm=vm)
 
-    # Create the server in Ganeti.
-    vm = create_server(vm, ports, server_volumes, flavor, image, personality,
-                       password)
-
-    return vm
+    return vm, server_volumes
 
 
 @transaction.commit_on_success
@@ -197,8 +316,23 @@ def allocate_new_server(userid, flavor):
     return use_backend
 
 
-@commands.server_command("BUILD")
-def create_server(vm, nics, volumes, flavor, image, personality, password):
+@transaction.commit_on_success
+def allocate_new_servers(userid, flavor, count):
+    """Allocate a batch of new servers to Ganeti backends.
+
+    Returns the list with the backend of each server.
+
+    """
+    backend_allocator = BackendAllocator()
+    backends = backend_allocator.allocate_many(userid, flavor, count)
+    if backends is None:
+        log.error("No available backends for %s VMs with flavor %s", count,
+                  flavor)
+        raise faults.ServiceUnavailable("No available backends")
+    return backends
+
+
+def _create_server(vm, nics, volumes, flavor, image, personality, password):
     # dispatch server created signal needed to trigger the 'vmapi', which
     # enriches the vm object with the 'config_url' attribute which must be
     # passed to the Ganeti job.
@@ -240,6 +374,37 @@ def create_server(vm, nics, volumes, flavor, image, personality, password):
     return jobID
 
 
+create_server = commands.server_command("BUILD")(_create_server)
+
+
+def _submit_server_job(job):
+    """Send the job of a server of a batch from a worker thread."""
+    try:
+        return _send_server_job(*job)
+    finally:
+        close_connection()
+
+
+@transaction.commit_on_success
+def _send_server_job(vm_id, nics, volumes, flavor, image, personality,
+                     password):
+    """Send the OP_INSTANCE_CREATE job of a server of a batch to Ganeti.
+
+    The commission of the server has already been accepted, so the job is
+    sent without involving the quotaholder.
+
+    """
+    vm = VirtualMachine.objects.select_for_update().get(id=vm_id)
+    vm.action = "BUILD"
+    job_id = _create_server(vm, nics, volumes, flavor, image, personality,
+                            password)
+    if job_id is not None:
+        vm.task = "BUILD"
+        vm.task_job_id = job_id
+    vm.save()
+    return vm
+
+
 @commands.server_command("DESTROY")
 def destroy(vm, shutdown_timeout=None):
     # XXX: Workaround for race where OP_INSTANCE_REMOVE starts executing on
@@ -189,15 +189,26 @@ def update_subnet(sub_id, name, user_id):
 #Utility functions
 def create_ip_pools(pools, cidr, subnet):
     """Create IP Pools in the database"""
-    return [_create_ip_pool(pool, cidr, subnet) for pool in pools]
+    return [pool_row for pool in pools
+            for pool_row in _create_ip_pool(pool, cidr, subnet)]
 
 
 def _create_ip_pool(pool, cidr, subnet):
+    """Create the rows of an IP pool.
+
+    The IP pool is split in chunks of at most CYCLADES_IP_POOL_CHUNK_SIZE
+    addresses, each one stored in a separate row, so that allocations from
+    different chunks do not contend for the same row.
+
+    """
     size = int(pool[1]) - int(pool[0]) + 1
     base = str(cidr)
     offset = int(pool[0]) - int(cidr.network)
-    return IPPoolTable.objects.create(size=size, offset=offset,
-                                      base=base, subnet=subnet)
+    chunk_size = settings.CYCLADES_IP_POOL_CHUNK_SIZE
+    return [IPPoolTable.objects.create(size=min(chunk_size, size - start),
+                                       offset=offset + start,
+                                       base=base, subnet=subnet)
+            for start in xrange(0, size, chunk_size)]
 
 
 def check_number_of_subnets(network, version):
@@ -6,3 +6,4 @@ from .utils_tests import *
 from .rapi_pool_tests import *
 from .reconciliation import *
 from .callbacks import *
+from .backend_allocator import *
@@ -0,0 +1,108 @@
+# Copyright (C) 2010-2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import datetime
+
+from django.test import TestCase
+from mock import patch
+
+from synnefo.db import models_factory as mfactory
+from synnefo.db.models import Backend
+from synnefo.logic import backend_allocator
+from synnefo.logic.backend_allocator import BackendAllocator
+from snf_django.utils.testing import override_settings
+from django.conf import settings
+
+
+class BackendAllocatorTest(TestCase):
+    def setUp(self):
+        self.flavor = mfactory.FlavorFactory(
+            ram=1024, disk=1, volume_type__disk_template="plain")
+        self.allocator = BackendAllocator()
+
+    def test_allocate_reduces_resources(self):
+        backend = mfactory.BackendFactory(mfree=4096, dfree=10240,
+                                          pinst_cnt=0)
+        allocated = self.allocator.allocate("user", self.flavor)
+        self.assertEqual(allocated.id, backend.id)
+        backend = Backend.objects.get(id=backend.id)
+        self.assertEqual(backend.mfree, 3072)
+        self.assertEqual(backend.dfree, 9216)
+        self.assertEqual(backend.pinst_cnt, 1)
+
+    def test_no_negative_resources(self):
+        backend = mfactory.BackendFactory(mfree=512, dfree=512)
+        self.allocator.allocate("user", self.flavor)
+        backend = Backend.objects.get(id=backend.id)
+        self.assertEqual(backend.mfree, 0)
+        self.assertEqual(backend.dfree, 0)
+
+    def test_no_backend(self):
+        mfactory.BackendFactory(offline=True)
+        mfactory.BackendFactory(drained=True)
+        self.assertEqual(self.allocator.allocate("user", self.flavor), None)
+
+    def test_conflict_falls_back_to_next_candidate(self):
+        best = mfactory.BackendFactory(mfree=8192, dfree=102400)
+        other = mfactory.BackendFactory(mfree=4096, dfree=102400)
+        real_get = backend_allocator.get_available_backends
+
+        def get_and_conflict(flavor):
+            backends = real_get(flavor)
+            # Simulate a concurrent allocation on the best backend after
+            # the candidates have been read
+            Backend.objects.filter(id=best.id).update(mfree=7168)
+            return backends
+
+        with patch("synnefo.logic.backend_allocator.get_available_backends",
+                   side_effect=get_and_conflict):
+            allocated = self.allocator.allocate("user", self.flavor)
+        self.assertEqual(allocated.id, other.id)
+        self.assertEqual(Backend.objects.get(id=best.id).mfree, 7168)
+        self.assertEqual(Backend.objects.get(id=other.id).mfree, 3072)
+
+    def test_drained_after_read(self):
+        backend = mfactory.BackendFactory()
+        real_get = backend_allocator.get_available_backends
+
+        def get_and_drain(flavor):
+            backends = real_get(flavor)
+            Backend.objects.filter(id=backend.id).update(drained=True)
+            return backends
+
+        with patch("synnefo.logic.backend_allocator.get_available_backends",
+                   side_effect=get_and_drain):
+            allocated = self.allocator.allocate("user", self.flavor)
+        self.assertEqual(allocated, None)
+
+    @patch("synnefo.logic.backend_allocator.refresh_backend_async")
+    def test_stale_backend_refresh(self, mrefresh):
+        stale = datetime.datetime.now() - datetime.timedelta(days=1)
+        backend = mfactory.BackendFactory()
+        Backend.objects.filter(id=backend.id).update(updated=stale)
+        self.allocator.allocate("user", self.flavor)
+        mrefresh.assert_called_once_with(backend.id)
+        # The refresh is claimed only once
+        self.allocator.allocate("user", self.flavor)
+        self.assertEqual(mrefresh.call_count, 1)
+
+    @patch("synnefo.logic.backend.update_backend_resources")
+    def test_stale_backend_sync_refresh(self, mupdate):
+        stale = datetime.datetime.now() - datetime.timedelta(days=1)
+        backend = mfactory.BackendFactory()
+        Backend.objects.filter(id=backend.id).update(updated=stale)
+        with override_settings(settings, BACKEND_REFRESH_ASYNC=False):
+            self.allocator.allocate("user", self.flavor)
+        self.assertEqual(mupdate.call_count, 1)
@@ -698,10 +698,24 @@ class UpdateBuildProgressTest(TestCase):
         rprogress = randint(10, 100)
         msg = self.create_msg(progress=rprogress,
                               instance=self.vm.backend_vm_id)
+        updated = self.get_db_vm().updated
         update_build_progress(client, msg)
         self.assertTrue(client.basic_ack.called)
         vm = self.get_db_vm()
         self.assertEqual(vm.buildpercentage, rprogress)
+        # The progress is visible to 'changes-since' polling
+        self.assertTrue(vm.updated > updated)
+
+    def test_monotonic_progress(self, client):
+        now = time()
+        for i, rprogress in enumerate([50, 30, 50, 70]):
+            msg = self.create_msg(progress=rprogress,
+                                  event_time=split_time(now + i),
+                                  instance=self.vm.backend_vm_id)
+            update_build_progress(client, msg)
+            self.assertTrue(client.basic_ack.called)
+            vm = self.get_db_vm()
+            self.assertEqual(vm.buildpercentage, max(50, rprogress))
 
     def test_invalid_value(self, client):
         old = self.vm.buildpercentage
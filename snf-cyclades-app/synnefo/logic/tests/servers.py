@@ -113,6 +113,74 @@ class ServerCreationTest(TransactionTestCase):
                           "size": 1024})
 
 
+@patch('synnefo.api.util.get_image', fixed_image)
+@patch("synnefo.logic.rapi_pool.GanetiRapiClient")
+class ServerBatchCreationTest(TransactionTestCase):
+    def setUp(self):
+        self.flavor = mfactory.FlavorFactory(ram=1024, disk=1)
+        self.backend = mfactory.BackendFactory(mfree=4096)
+        self.osettings = {"CYCLADES_BATCH_CREATE_WORKERS": 1,
+                          "CYCLADES_DEFAULT_SERVER_NETWORKS": [],
+                          "CYCLADES_FORCED_SERVER_NETWORKS": []}
+
+    def create_many(self, count, **kwargs):
+        passwords = ["pass%d" % i for i in range(count)]
+        with override_settings(settings, **self.osettings):
+            return servers.create_many("test", "vm", count, passwords,
+                                       self.flavor, "safs",
+                                       metadata={"foo": "bar"}, **kwargs)
+
+    def test_create_many(self, mrapi):
+        mrapi().CreateInstance.side_effect = range(100, 110)
+        subnet = mfactory.IPv4SubnetFactory(network__userid="test")
+        with mocked_quotaholder() as m:
+            vms = self.create_many(3, networks=[{"uuid": subnet.network_id}])
+        # A single commission for all servers
+        self.assertEqual(len(m.issue_one_commission.mock_calls), 1)
+        name, args, kwargs = m.issue_one_commission.mock_calls[0]
+        provisions = args[1]
+        self.assertEqual(provisions[("test", "cyclades.vm")], 3)
+        self.assertEqual(provisions[("test", "cyclades.ram")], 3 * 1024 << 20)
+        self.assertEqual(provisions[("test", "cyclades.disk")], 3 << 30)
+
+        self.assertEqual([vm.name for vm in vms], ["vm-1", "vm-2", "vm-3"])
+        self.assertEqual([vm.task_job_id for vm in vms], [100, 101, 102])
+        self.assertEqual(mrapi().CreateInstance.call_count, 3)
+        for vm in vms:
+            self.assertEqual(vm.task, "BUILD")
+            self.assertEqual(vm.serial, None)
+            self.assertEqual(vm.metadata.get().meta_key, "foo")
+            self.assertEqual(vm.volumes.count(), 1)
+        addresses = models.IPAddress.objects.filter(subnet=subnet)\
+                                            .values_list("address", flat=True)
+        self.assertEqual(len(set(addresses)), 3)
+        # Pool is stored once, with all addresses reserved
+        pool = subnet.get_ip_pools()[0]
+        for address in addresses:
+            self.assertFalse(pool.is_available(address))
+
+        backend = models.Backend.objects.get(id=self.backend.id)
+        self.assertEqual(backend.mfree, 1024)
+        self.assertEqual(backend.pinst_cnt, self.backend.pinst_cnt + 3)
+
+    def test_create_many_invalid(self, mrapi):
+        with mocked_quotaholder():
+            self.assertRaises(faults.BadRequest, self.create_many, 0)
+            for network in [{"port": 42},
+                            {"uuid": 42, "fixed_ip": "192.168.2.2"}]:
+                self.assertRaises(faults.BadRequest, self.create_many, 2,
+                                  networks=[network])
+        self.assertEqual(models.VirtualMachine.objects.count(), 0)
+
+    def test_create_many_overlimit(self, mrapi):
+        with mocked_quotaholder() as m:
+            m.issue_one_commission.side_effect = \
+                quotas.errors.QuotaLimit("over limit")
+            self.assertRaises(faults.OverLimit, self.create_many, 3)
+        self.assertEqual(models.VirtualMachine.objects.count(), 0)
+        self.assertFalse(mrapi().CreateInstance.called)
+
+
 @patch("synnefo.logic.rapi_pool.GanetiRapiClient")
 class ServerTest(TransactionTestCase):
     def test_connect_network(self, mrapi):
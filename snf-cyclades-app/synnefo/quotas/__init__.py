@@ -288,6 +288,59 @@ def issue_and_accept_commission(resource, action="BUILD", action_fields=None):
         log.exception("Failed to accept commission: %s", resource.serial)
 
 
+@transaction.commit_on_success
+def issue_and_accept_bulk_commission(resources, action="BUILD"):
+    """Issue and accept one commission for a batch of resources.
+
+    This function implements the same workflow as
+    'issue_and_accept_commission', but the provisions of all the resources,
+    which must belong to the same user, are summed up and issued as a single
+    commission to the Quotaholder. The resources are not associated with the
+    serial of the commission, since it is accepted immediately.
+
+    """
+    provisions = defaultdict(lambda: 0)
+    for resource in resources:
+        resource_provisions = get_commission_info(resource=resource,
+                                                  action=action)
+        if resource_provisions is None:
+            continue
+        for key, quantity in resource_provisions.items():
+            provisions[key] += quantity
+
+    if not provisions:
+        return None
+
+    user = resources[0].userid
+    projects = set(p for (p, r) in provisions.keys())
+    commission_reason = ("client: api, resources: %s %s, action: %s"
+                         % (len(resources), resources[0].__class__.__name__,
+                            action))
+
+    qh = Quotaholder.get()
+    with AstakosClientExceptionHandler(user=user, projects=projects):
+        serial = qh.issue_one_commission(user, dict(provisions),
+                                         name=commission_reason)
+    if not serial:
+        raise Exception("No serial")
+
+    # Store the serial in DB as a serial to accept
+    serial = QuotaHolderSerial.objects.create(serial=serial, pending=False,
+                                              accept=True)
+    transaction.commit()
+
+    try:
+        # Accept the commission to quotaholder
+        accept_serial(serial)
+    except:
+        # Do not crash if we can not accept commission to Quotaholder. Quotas
+        # have already been reserved and the resources already exist in DB.
+        # Just log the error
+        log.exception("Failed to accept commission: %s", serial)
+
+    return serial
+
+
 def get_volume_resources(volumes):
     resources = defaultdict(lambda: 0)
     for volume in volumes:
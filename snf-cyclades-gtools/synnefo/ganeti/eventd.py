@@ -21,6 +21,11 @@
 
 A daemon to monitor the Ganeti job queue and publish job progress
 and Ganeti VM state notifications to the ganeti exchange
+
+Messages are published in batches, when EVENTD_PUBLISH_BATCH_SIZE messages
+are pending or the oldest one has waited for EVENTD_PUBLISH_MAX_DELAY
+seconds. Pending messages are kept in an on-disk spool until the broker
+confirms them, and are published again if the daemon is restarted.
 """
 
 OLD_GANETI_PATH = "/usr/share/ganeti"
@@ -53,6 +58,8 @@ except ImportError:
 
 import json
 import logging
+import time
+from collections import OrderedDict
 import pyinotify
 import daemon
 import daemon.pidlockfile
@@ -187,8 +194,128 @@ def get_field(from_, field):
         None
 
 
+class MessageSpool(object):
+    """Append-only file of the messages that are not confirmed yet
+
+    Each line holds the routing key and the body of a message as a JSON
+    list. The spool is emptied once the broker has confirmed all the
+    messages written to it.
+
+    """
+    def __init__(self, path, logger):
+        self.path = path
+        self.logger = logger
+        dirname = os.path.dirname(path)
+        if dirname and not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        self.file = open(path, "a+")
+
+    def load(self):
+        """Return the messages of the spool, in the order written"""
+        messages = []
+        self.file.seek(0)
+        for line in self.file:
+            try:
+                routekey, body = json.loads(line)
+            except ValueError:
+                # The last write before a crash may be incomplete
+                self.logger.warning("Ignoring malformed spooled message: %r",
+                                    line)
+                continue
+            messages.append((str(routekey), str(body)))
+        return messages
+
+    def append(self, messages):
+        self.file.seek(0, os.SEEK_END)
+        for routekey, body in messages:
+            self.file.write(json.dumps([routekey, body]) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def clear(self):
+        self.file.seek(0)
+        self.file.truncate()
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+
+class PublishBuffer(object):
+    """Publish messages to an exchange in confirmed batches
+
+    Messages are kept until 'batch_size' of them are pending, or until the
+    oldest one has waited for 'max_delay' seconds. They are then published
+    with one basic_publish_multi() call per routing key, which keeps the
+    order of the messages about each object, and the buffer waits for the
+    broker to confirm them. A message that is already pending is not added
+    again.
+
+    If a spool is given, the pending messages are also written to it, and
+    the messages that a previous run left in it are pending at start.
+
+    """
+    def __init__(self, client, exchange, batch_size, max_delay, spool=None,
+                 clock=None):
+        self.client = client
+        self.exchange = exchange
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.spool = spool
+        self.clock = clock or time.time
+        self.pending = OrderedDict()
+        self.deadline = None
+        if spool is not None:
+            # Rewrite the spool, dropping any incomplete line
+            messages = spool.load()
+            spool.clear()
+            self.add(messages)
+
+    def add(self, messages):
+        """Add (routekey, body) messages and publish them if needed"""
+        new = []
+        for message in messages:
+            if message not in self.pending:
+                self.pending[message] = True
+                new.append(message)
+        if not new:
+            return
+        if self.spool is not None:
+            self.spool.append(new)
+        if self.deadline is None:
+            self.deadline = self.clock() + self.max_delay
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def timeout(self):
+        """Return the seconds until the pending messages are due, or None"""
+        if self.deadline is None:
+            return None
+        return max(0, self.deadline - self.clock())
+
+    def flush_due(self):
+        """Publish the pending messages if the oldest one is due"""
+        if self.deadline is not None and self.clock() >= self.deadline:
+            self.flush()
+
+    def flush(self):
+        """Publish the pending messages and wait for their confirmation"""
+        if not self.pending:
+            return
+        batches = OrderedDict()
+        for routekey, body in self.pending:
+            batches.setdefault(routekey, []).append(body)
+        for routekey, bodies in batches.items():
+            self.client.basic_publish_multi(self.exchange, routekey, bodies)
+        # Messages resent after a reconnection are not waited for by
+        # basic_publish_multi()
+        self.client.get_confirms()
+        self.pending.clear()
+        self.deadline = None
+        if self.spool is not None:
+            self.spool.clear()
+
+
 class JobFileHandler(pyinotify.ProcessEvent):
-    def __init__(self, logger, cluster_name):
+    def __init__(self, logger, cluster_name, spool_file=None):
         pyinotify.ProcessEvent.__init__(self)
         self.logger = logger
         self.cluster_name = cluster_name
@@ -204,6 +331,16 @@ class JobFileHandler(pyinotify.ProcessEvent):
 
         self.client.exchange_declare(settings.EXCHANGE_GANETI, type='topic')
 
+        spool = MessageSpool(spool_file, logger) if spool_file else None
+        self.buffer = PublishBuffer(self.client, settings.EXCHANGE_GANETI,
+                                    settings.EVENTD_PUBLISH_BATCH_SIZE,
+                                    settings.EVENTD_PUBLISH_MAX_DELAY,
+                                    spool=spool)
+        if self.buffer.pending:
+            self.logger.info("Publishing %d spooled messages",
+                             len(self.buffer.pending))
+            self.buffer.flush()
+
         self.op_handlers = {"INSTANCE": self.process_instance_op,
                             "NETWORK": self.process_network_op,
                             "CLUSTER": self.process_cluster_op,
@@ -229,6 +366,7 @@ class JobFileHandler(pyinotify.ProcessEvent):
 
         job_id = int(job.id)
 
+        messages = []
         for op in job.ops:
             op_id = op.input.OP_ID
 
@@ -272,11 +410,10 @@ class JobFileHandler(pyinotify.ProcessEvent):
             msg = json.dumps(msg)
 
             self.logger.debug("Delivering msg: %s (key=%s)", msg, routekey)
+            messages.append((routekey, msg))
 
-            # Send the message to RabbitMQ
-            self.client.basic_publish(settings.EXCHANGE_GANETI,
-                                      routekey,
-                                      msg)
+        # Send the messages to RabbitMQ
+        self.buffer.add(messages)
 
     def process_instance_op(self, op, job_id):
         """ Process OP_INSTANCE_* opcodes.
@@ -462,6 +599,13 @@ def parse_arguments(args):
                       metavar='PIDFILE',
                       help="Save PID to file (default: %s)" %
                            "/var/run/snf-ganeti-eventd.pid")
+    parser.add_option('--spool-file', dest="spool_file",
+                      default="/var/lib/snf-ganeti-eventd/spool",
+                      metavar='FILE',
+                      help="Keep the messages that are not confirmed yet in"
+                           " FILE (default: %s). Pass an empty value to"
+                           " disable the spool." %
+                           "/var/lib/snf-ganeti-eventd/spool")
 
     return parser.parse_args(args)
 
@@ -527,7 +671,7 @@ def main():
 
     cluster_name = find_cluster_name()
 
-    handler = JobFileHandler(logger, cluster_name)
+    handler = JobFileHandler(logger, cluster_name, opts.spool_file)
     notifier = pyinotify.Notifier(wm, handler)
 
     try:
@@ -545,11 +689,17 @@ def main():
                 notifier.process_events()
             except StandardError:
                 logger.exception("Unhandled exception")
-            if notifier.check_events():
+            handler.buffer.flush_due()
+            # wait for events until the pending messages are due
+            timeout = handler.buffer.timeout()
+            if timeout is not None:
+                timeout = int(timeout * 1000)
+            if notifier.check_events(timeout):
                 # read notified events and enqeue them
                 notifier.read_events()
     except SystemExit:
         logger.info("SystemExit")
+        handler.buffer.flush()
     except:
         logger.exception("Caught exception, terminating")
     finally:
@@ -20,6 +20,12 @@
 
 A small utility that collects various monitoring messages from snf-image and
 forwards them to the rest of the Synnefo infrastructure over AMQP.
+
+Copy progress records are coalesced: a record is forwarded only when the
+progress has advanced by PROGRESS_MONITOR_MIN_DELTA percent, or when
+PROGRESS_MONITOR_MIN_INTERVAL seconds have passed, since the last forwarded
+one. All other records, e.g. errors, are always forwarded, and so is the
+final progress of the deployment.
 """
 
 import os
@@ -33,8 +39,11 @@ from synnefo.lib.utils import split_time
 
 PROGNAME = os.path.basename(sys.argv[0])
 
+PROGRESS_TYPE = "image-copy-progress"
 
-def jsonstream(file):
+
+def jsonbatches(file):
+    """Yield the lists of JSON records decoded from each read of file"""
     buf = ""
     decoder = json.JSONDecoder()
     while True:
@@ -42,14 +51,95 @@ def jsonstream(file):
         if not len(new_data):
             break
 
-        buf += new_data.strip()
+        # Strip only the whitespace between records, as a read may end in
+        # the middle of a string
+        buf = (buf + new_data).lstrip()
+        batch = []
         while 1:
             try:
                 msg, idx = decoder.raw_decode(buf)
             except ValueError:
                 break
+            batch.append(msg)
+            buf = buf[idx:].lstrip()
+        if batch:
+            yield batch
+
+
+def jsonstream(file):
+    for batch in jsonbatches(file):
+        for msg in batch:
             yield msg
-            buf = buf[idx:].strip()
+
+
+class ProgressCoalescer(object):
+    """Select the snf-image records to forward
+
+    push() returns the records to forward for each record read, in order.
+    A copy progress record that is not forwarded is kept until the next
+    record, and is forwarded before it if that is not a copy progress
+    record, or by flush() at the end of the stream.
+
+    """
+    def __init__(self, min_delta, min_interval, clock=None):
+        self.min_delta = min_delta
+        self.min_interval = min_interval
+        self.clock = clock or time.time
+        self.last_progress = None
+        self.last_time = None
+        self.pending = None
+
+    def _progress(self, msg):
+        try:
+            return float(msg.get("progress"))
+        except (TypeError, ValueError):
+            return None
+
+    def _forward_progress(self, msg, progress):
+        self.pending = None
+        self.last_progress = progress
+        self.last_time = self.clock()
+        return [msg]
+
+    def push(self, msg):
+        if msg.get("type") != PROGRESS_TYPE:
+            return self.flush() + [msg]
+
+        progress = self._progress(msg)
+        if progress is None:
+            # Let Cyclades handle the malformed record
+            return self.flush() + [msg]
+        if self.last_progress is None or progress >= 100:
+            return self._forward_progress(msg, progress)
+        if progress <= self.last_progress:
+            return []
+        if (progress - self.last_progress >= self.min_delta or
+                self.clock() - self.last_time >= self.min_interval):
+            return self._forward_progress(msg, progress)
+        self.pending = msg
+        return []
+
+    def flush(self):
+        """Return the copy progress record that has not been forwarded"""
+        if self.pending is None:
+            return []
+        msg = self.pending
+        return self._forward_progress(msg, self._progress(msg))
+
+
+def publish(amqp_client, routekey, bodies):
+    if not bodies:
+        return
+    publish_multi = getattr(amqp_client, "basic_publish_multi", None)
+    if len(bodies) == 1 or publish_multi is None:
+        for body in bodies:
+            amqp_client.basic_publish(exchange=settings.EXCHANGE_GANETI,
+                                      routing_key=routekey,
+                                      body=body)
+    else:
+        publish_multi(exchange=settings.EXCHANGE_GANETI,
+                      routing_key=routekey,
+                      bodies=bodies)
 
 
 def main():
@@ -71,17 +161,32 @@ def main():
     amqp_client.connect()
     amqp_client.exchange_declare(settings.EXCHANGE_GANETI, "topic")
 
-    for msg in jsonstream(sys.stdin):
-        msg['event_time'] = split_time(time.time())
-        msg['instance'] = instance_name
-
-        # log to stderr
-        sys.stderr.write("[MONITOR] %s\n" % json.dumps(msg))
-
-        # then send it over AMQP
-        amqp_client.basic_publish(exchange=settings.EXCHANGE_GANETI,
-                                  routing_key=routekey,
-                                  body=json.dumps(msg))
+    coalescer = ProgressCoalescer(settings.PROGRESS_MONITOR_MIN_DELTA,
+                                  settings.PROGRESS_MONITOR_MIN_INTERVAL)
+
+    def forward(msgs):
+        bodies = []
+        for msg in msgs:
+            msg['event_time'] = split_time(time.time())
+            msg['instance'] = instance_name
+
+            # log to stderr
+            sys.stderr.write("[MONITOR] %s\n" % json.dumps(msg))
+
+            body = json.dumps(msg)
+            # Identical records are sent once, as publishing keeps track
+            # of the messages by their body
+            if body not in bodies:
+                bodies.append(body)
+        # then send them over AMQP
+        publish(amqp_client, routekey, bodies)
+
+    for batch in jsonbatches(sys.stdin):
+        msgs = []
+        for msg in batch:
+            msgs.extend(coalescer.push(msg))
+        forward(msgs)
+    forward(coalescer.flush())
 
     amqp_client.close()
     return 0
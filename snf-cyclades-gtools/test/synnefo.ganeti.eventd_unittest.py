@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2010-2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import os
+import sys
+import json
+import shutil
+import logging
+import tempfile
+from mock import patch
+
+from synnefo.ganeti import eventd
+from synnefo.ganeti.eventd import (JobFileHandler, MessageSpool,
+                                   PublishBuffer)
+
+# Use backported unittest functionality if Python < 2.7
+try:
+    import unittest2 as unittest
+except ImportError:
+    if sys.version_info < (2, 7):
+        raise Exception("The unittest2 package is required for Python < 2.7")
+    import unittest
+
+log = logging.getLogger()
+
+
+class FakeAMQPClient(object):
+    """In-memory AMQP client that records the published batches"""
+    down = False
+
+    def __init__(self, *args, **kwargs):
+        self.batches = []
+
+    def connect(self):
+        pass
+
+    def exchange_declare(self, exchange, type):
+        pass
+
+    def basic_publish_multi(self, exchange, routing_key, bodies):
+        if self.down:
+            raise RuntimeError("Broker is down")
+        self.batches.append((exchange, routing_key, list(bodies)))
+
+    def get_confirms(self):
+        pass
+
+
+class PublishBufferTestCase(unittest.TestCase):
+    def setUp(self):
+        self.now = 0
+        self.client = FakeAMQPClient()
+        self.tmpdir = tempfile.mkdtemp()
+        self.spool_file = os.path.join(self.tmpdir, "spool", "messages")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def get_buffer(self, batch_size=3, max_delay=1, spool=True):
+        spool = MessageSpool(self.spool_file, log) if spool else None
+        return PublishBuffer(self.client, "ganeti", batch_size, max_delay,
+                             spool=spool, clock=lambda: self.now)
+
+    def test_batch_size(self):
+        buf = self.get_buffer(spool=False)
+        buf.add([("key1", "a"), ("key2", "b")])
+        self.assertEqual(self.client.batches, [])
+        # Pending messages are not added again
+        buf.add([("key1", "a")])
+        self.assertEqual(self.client.batches, [])
+        buf.add([("key1", "c")])
+        self.assertEqual(self.client.batches,
+                         [("ganeti", "key1", ["a", "c"]),
+                          ("ganeti", "key2", ["b"])])
+        self.assertEqual(buf.timeout(), None)
+
+    def test_max_delay(self):
+        buf = self.get_buffer(spool=False)
+        buf.flush_due()
+        buf.add([("key", "a")])
+        self.now = 0.5
+        self.assertEqual(buf.timeout(), 0.5)
+        buf.add([("key", "b")])
+        buf.flush_due()
+        self.assertEqual(self.client.batches, [])
+        self.now = 1
+        self.assertEqual(buf.timeout(), 0)
+        buf.flush_due()
+        self.assertEqual(self.client.batches, [("ganeti", "key", ["a", "b"])])
+
+    def test_spool(self):
+        buf = self.get_buffer()
+        buf.add([("key", "a"), ("key", "b")])
+        self.assertEqual(MessageSpool(self.spool_file, log).load(),
+                         [("key", "a"), ("key", "b")])
+        buf.flush()
+        self.assertEqual(MessageSpool(self.spool_file, log).load(), [])
+
+        # Messages that are not confirmed survive a restart
+        self.client.down = True
+        buf.add([("key", "c")])
+        self.assertRaises(RuntimeError, buf.add, [("key", "d"), ("key", "e")])
+        self.client.down = False
+        with open(self.spool_file, "a") as f:
+            f.write('["key", "incomplete')
+        buf = self.get_buffer(batch_size=10)
+        self.assertEqual(buf.pending.keys(),
+                         [("key", "c"), ("key", "d"), ("key", "e")])
+        buf.add([("key", "f")])
+        self.assertEqual(MessageSpool(self.spool_file, log).load(),
+                         [("key", "c"), ("key", "d"), ("key", "e"),
+                          ("key", "f")])
+        buf.flush()
+        self.assertEqual(self.client.batches[-1],
+                         ("ganeti", "key", ["c", "d", "e", "f"]))
+
+
+class Event(object):
+    def __init__(self, path, name):
+        self.path = path
+        self.name = name
+
+
+def job(job_id, instance, status="success"):
+    """Return the serialized state of a synthetic Ganeti job"""
+    timestamp = [1400000000 + job_id, 0]
+    op = {"input": {"OP_ID": "OP_INSTANCE_SHUTDOWN",
+                    "instance_name": instance},
+          "status": status,
+          "result": None,
+          "log": [[1, timestamp, "message", "Shutting down"]],
+          "priority": 0,
+          "start_timestamp": timestamp,
+          "exec_timestamp": timestamp,
+          "end_timestamp": timestamp}
+    return {"id": str(job_id),
+            "ops": [op],
+            "received_timestamp": timestamp,
+            "start_timestamp": timestamp,
+            "end_timestamp": timestamp}
+
+
+@patch("synnefo.ganeti.eventd.AMQPClient", FakeAMQPClient)
+@patch.object(eventd.settings, "EVENTD_PUBLISH_BATCH_SIZE", 2, create=True)
+class JobFileHandlerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.jobdir = tempfile.mkdtemp()
+        self.spool_file = os.path.join(self.jobdir, "spool")
+
+    def tearDown(self):
+        shutil.rmtree(self.jobdir)
+
+    def process_job(self, handler, job_id, status="success"):
+        name = "job-%d" % job_id
+        with open(os.path.join(self.jobdir, name), "w") as f:
+            json.dump(job(job_id, "snf-%d" % job_id, status), f)
+        handler.process_IN_MOVED_TO(Event(self.jobdir, name))
+
+    def published(self, handler):
+        return [(key, [json.loads(body)["instance"] for body in bodies])
+                for _, key, bodies in handler.client.batches]
+
+    def test_batches(self):
+        handler = JobFileHandler(log, "cluster", self.spool_file)
+        for job_id in range(1, 4):
+            self.process_job(handler, job_id)
+        # Not a job file
+        handler.process_IN_MOVED_TO(Event(self.jobdir, "queue.lock"))
+        self.assertEqual(self.published(handler),
+                         [("ganeti.snf.event.op", ["snf-1", "snf-2"])])
+        handler.buffer.flush()
+        self.assertEqual(self.published(handler)[-1],
+                         ("ganeti.snf.event.op", ["snf-3"]))
+
+    def test_restart(self):
+        handler = JobFileHandler(log, "cluster", self.spool_file)
+        self.process_job(handler, 1)
+        handler.client.down = True
+        self.assertRaises(RuntimeError, self.process_job, handler, 2)
+
+        # The unconfirmed messages are published after a restart
+        handler = JobFileHandler(log, "cluster", self.spool_file)
+        self.assertEqual(self.published(handler),
+                         [("ganeti.snf.event.op", ["snf-1", "snf-2"])])
+        self.assertEqual(handler.buffer.pending, {})
+        self.assertEqual(MessageSpool(self.spool_file, log).load(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2010-2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import os
+import sys
+import json
+from StringIO import StringIO
+from mock import patch
+
+from synnefo.ganeti import progress_monitor
+from synnefo.ganeti.progress_monitor import ProgressCoalescer
+
+# Use backported unittest functionality if Python < 2.7
+try:
+    import unittest2 as unittest
+except ImportError:
+    if sys.version_info < (2, 7):
+        raise Exception("The unittest2 package is required for Python < 2.7")
+    import unittest
+
+# The records of an image deployment, as written by snf-image
+RECORDED_STREAM = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               "snf-image-progress.json")
+
+
+def progress(p):
+    return {"type": "image-copy-progress", "progress": p}
+
+
+class ProgressCoalescerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.now = 0
+        self.coalescer = ProgressCoalescer(5, 2, clock=lambda: self.now)
+
+    def test_delta(self):
+        c = self.coalescer
+        self.assertEqual(c.push(progress(1)), [progress(1)])
+        self.assertEqual(c.push(progress(3)), [])
+        self.assertEqual(c.push(progress(2)), [])
+        self.assertEqual(c.push(progress(6)), [progress(6)])
+        self.assertEqual(c.push(progress(6)), [])
+        self.assertEqual(c.push(progress(8)), [])
+        self.assertEqual(c.flush(), [progress(8)])
+        self.assertEqual(c.flush(), [])
+
+    def test_interval(self):
+        c = self.coalescer
+        self.assertEqual(c.push(progress(1)), [progress(1)])
+        self.now = 1
+        self.assertEqual(c.push(progress(2)), [])
+        self.now = 3
+        self.assertEqual(c.push(progress(3)), [progress(3)])
+        # Progress that has not advanced is never forwarded
+        self.now = 10
+        self.assertEqual(c.push(progress(3)), [])
+
+    def test_always_forwarded(self):
+        c = self.coalescer
+        error = {"type": "image-error", "messages": ["Failed"]}
+        malformed = progress("a")
+        self.assertEqual(c.push(progress(1)), [progress(1)])
+        self.assertEqual(c.push(progress(2)), [])
+        # Pending progress is forwarded before other records
+        self.assertEqual(c.push(error), [progress(2), error])
+        self.assertEqual(c.push(error), [error])
+        self.assertEqual(c.push(malformed), [malformed])
+        self.assertEqual(c.push(progress(100)), [progress(100)])
+
+
+@patch("synnefo.ganeti.progress_monitor.AMQPClient")
+class ProgressMonitorTestCase(unittest.TestCase):
+    def run_monitor(self, stream):
+        argv = ["snf-progress-monitor", "snf-42"]
+        with open(stream) as stdin:
+            with patch.multiple(sys, argv=argv, stdin=stdin,
+                                stderr=StringIO()):
+                with patch.multiple(progress_monitor.settings,
+                                    PROGRESS_MONITOR_MIN_DELTA=5,
+                                    PROGRESS_MONITOR_MIN_INTERVAL=2,
+                                    EXCHANGE_GANETI="ganeti",
+                                    create=True):
+                    with patch("time.time", return_value=1000.0):
+                        return progress_monitor.main()
+
+    def published(self, client):
+        """Return the published messages, in order"""
+        msgs = []
+        for name, args, kwargs in client.return_value.method_calls:
+            if name == "basic_publish":
+                bodies = [kwargs["body"]]
+            elif name == "basic_publish_multi":
+                bodies = kwargs["bodies"]
+            else:
+                continue
+            self.assertEqual(kwargs["routing_key"],
+                             "ganeti.snf.event.progress")
+            msgs.extend(json.loads(b) for b in bodies)
+        return msgs
+
+    def test_recorded_stream(self, client):
+        self.assertEqual(self.run_monitor(RECORDED_STREAM), 0)
+        msgs = self.published(client)
+        for msg in msgs:
+            self.assertEqual(msg["instance"], "snf-42")
+            self.assertTrue("event_time" in msg)
+        self.assertEqual(
+            [m.get("progress", m["type"]) for m in msgs],
+            ["image-info", 0, 5, 10, 25, 50, 52.5, "image-info", 75, 99, 100,
+             "image-helper", "image-helper", "image-error"])
+        self.assertEqual(msgs[1]["total"], 104857600)
+        self.assertEqual(msgs[0]["messages"], ["Starting image copy..."])
+        self.assertTrue(client.return_value.close.called)
+
+    def test_bursts(self, client):
+        self.run_monitor(RECORDED_STREAM)
+        # The records of each read are published as a single burst
+        calls = [name for name, args, kwargs
+                 in client.return_value.method_calls
+                 if name.startswith("basic_publish")]
+        self.assertTrue("basic_publish_multi" in calls)
+        self.assertTrue(len(calls) < len(self.published(client)))
+
+
+if __name__ == '__main__':
+    unittest.main()
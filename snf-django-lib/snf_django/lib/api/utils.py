@@ -14,7 +14,10 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import datetime
+from hashlib import md5
 from dateutil.parser import parse as date_parse
+from django.db.models import Count, Max
+from django.http import HttpResponse
 from django.utils import simplejson as json
 
 from django.conf import settings
@@ -93,6 +96,44 @@ def get_json_body(request):
                                 content_type)
 
 
+def iterencode_json(data, chunk_size=64 * 1024):
+    """Encode data to JSON lazily.
+
+    Return an iterator over the JSON encoding of 'data', that yields chunks of
+    about 'chunk_size' bytes, so that large responses can be streamed without
+    being rendered to a single string.
+
+    """
+    chunk, size = [], 0
+    for piece in json.JSONEncoder().iterencode(data):
+        chunk.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield "".join(chunk)
+            chunk, size = [], 0
+    if chunk:
+        yield "".join(chunk)
+
+
+def get_paging_params(request, max_limit):
+    """Parse the 'limit' and 'marker' request parameters.
+
+    Return the number of objects to return, which is at most 'max_limit', and
+    the ID of the object after which the page starts, or None.
+
+    """
+    limit = request.GET.get("limit")
+    marker = request.GET.get("marker")
+    try:
+        limit = max_limit if limit is None else int(limit)
+        marker = None if marker is None else int(marker)
+    except ValueError:
+        raise faults.BadRequest("Invalid 'limit' or 'marker' parameter.")
+    if limit < 0:
+        raise faults.BadRequest("Invalid 'limit' parameter.")
+    return min(limit, max_limit), marker
+
+
 def prefix_pattern(prefix, append_slash=True):
     """Return a reliable urls.py pattern from a prefix"""
     prefix = prefix.strip('/')
@@ -116,8 +157,58 @@ def filter_modified_since(request, objects):
         if not modified_objs:
             raise faults.NotModified()
         return modified_objs
-    else:
+    elif "deleted" in objects.model._meta.get_all_field_names():
         return objects.filter(deleted=False)
+    else:
+        return objects
+
+
+def _get_changes(objects):
+    aggregates = {"count": Count("pk"), "last": Max("pk")}
+    if "updated" in [f.name for f in objects.model._meta.fields]:
+        aggregates["updated"] = Max("updated")
+    changes = objects.order_by().aggregate(**aggregates)
+    updated = changes.get("updated")
+    return [unicode(changes["count"]), unicode(changes["last"]),
+            isoformat(updated) if updated else ""]
+
+
+def get_changes_etag(request, objects, related=()):
+    """Compute the entity tag of a listing of DB objects.
+
+    The tag is derived from the number of the objects, their greatest primary
+    key and their latest 'updated' timestamp, which change whenever an object
+    is created, modified or deleted. The same goes for each queryset in
+    'related', which holds the nested objects that the listing includes. Each
+    queryset is one aggregate query, so that clients polling for changes get
+    a '304 Not Modified' response without the objects being retrieved and
+    serialized.
+
+    """
+    key = [unicode(getattr(request, "user_uniq", "")), request.path,
+           request.META.get("QUERY_STRING", ""), request.serialization]
+    for queryset in (objects,) + tuple(related):
+        key.extend(_get_changes(queryset))
+    key = u"|".join(key)
+    return '"%s"' % md5(key.encode("utf-8")).hexdigest()
+
+
+def not_modified_response(request, etag):
+    """Return a '304 Not Modified' response if the client copy is fresh.
+
+    Check the 'If-None-Match' header of the request against 'etag', and
+    return None if the client does not have the tagged version.
+
+    """
+    if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+    if if_none_match is None:
+        return None
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    if etag not in tags and "*" not in tags:
+        return None
+    response = HttpResponse(status=304)
+    response["ETag"] = etag
+    return response
 
 
 def get_attribute(request, attribute, attr_type=None, required=True,
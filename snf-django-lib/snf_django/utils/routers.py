@@ -16,24 +16,193 @@
 """
 Router for the Astakos/Cyclades app. It is used to specify which database will
 be used for each model.
+
+Reads may be served by read replicas of a database, as configured in the
+DATABASE_REPLICAS setting, but only while ReplicaPinMiddleware handles a
+request. Code outside requests, e.g. management commands and worker threads,
+always reads from the primary. Since replicas lag behind, a thread that has
+written to a database reads from the primary for the next
+DATABASE_REPLICA_PIN_SECONDS seconds. ReplicaPinMiddleware carries this in a
+cookie, so that the follow-up requests of the same client also read their
+own writes. API clients, which do not keep cookies, are pinned by their token
+in DATABASE_REPLICA_PIN_CACHE_BACKEND, a cache shared by all processes. If it
+is not set, requests with a token always read from the primary.
 """
 
+import random
+import threading
+from time import time
+from hashlib import sha1
+
+from django.conf import settings
+from django.core.cache import get_cache
+from django.db import transaction
+
 from snf_django.utils.db import select_db
 
+PIN_COOKIE = "_snf_db_pin"
+PIN_KEY = "snf:db-pin:%s"
+
+_state = threading.local()
+_pin_caches = {}
+
+
+def get_replicas(db):
+    """Return the aliases of the read replicas of a database."""
+    return getattr(settings, "DATABASE_REPLICAS", {}).get(db, [])
+
+
+def get_primary(db):
+    """Return the alias of the database that db is a replica of, or db."""
+    for primary, replicas in getattr(settings, "DATABASE_REPLICAS",
+                                     {}).iteritems():
+        if db in replicas:
+            return primary
+    return db
+
+
+def get_pin_seconds():
+    return getattr(settings, "DATABASE_REPLICA_PIN_SECONDS", 10)
+
+
+def get_last_write():
+    """Return the time this thread last wrote to a replicated database."""
+    return getattr(_state, "last_write", None)
+
+
+def set_last_write(last_write):
+    _state.last_write = last_write
+
+
+def set_primary_only(primary_only):
+    _state.primary_only = primary_only
+
+
+def get_replica_reads():
+    """Whether this thread may read from the replicas."""
+    return getattr(_state, "replica_reads", False)
+
+
+def set_replica_reads(replica_reads):
+    _state.replica_reads = replica_reads
+
+
+def get_pin_cache():
+    """Return the cache that keeps the pins of the API clients, or None."""
+    backend = getattr(settings, "DATABASE_REPLICA_PIN_CACHE_BACKEND", None)
+    if not backend:
+        return None
+    if backend not in _pin_caches:
+        _pin_caches[backend] = get_cache(backend)
+    return _pin_caches[backend]
+
+
+def get_pin_key(request):
+    """Return the pin cache key of the token of a request, or None."""
+    token = request.GET.get("X-Auth-Token") or \
+        request.META.get("HTTP_X_AUTH_TOKEN")
+    if not token:
+        return None
+    if isinstance(token, unicode):
+        token = token.encode("utf-8")
+    return PIN_KEY % sha1(token).hexdigest()
+
+
+def is_pinned():
+    """Whether reads must go to the primary because of a recent write."""
+    if getattr(_state, "primary_only", False):
+        return True
+    last_write = get_last_write()
+    return last_write is not None and time() - last_write < get_pin_seconds()
+
 
 class SynnefoRouter(object):
 
     """Router for Astakos/Cyclades models."""
 
     def db_for_read(self, model, **hints):
-        """Select db to read."""
+        """Select db to read.
+
+        Read from a replica of the db, unless there is none, this thread is
+        not handling a request, has recently written to a replicated db, or
+        is inside a transaction, which must see its own writes and lock rows
+        on the primary.
+
+        """
         app = model._meta.app_label
-        return select_db(app)
+        db = select_db(app)
+        replicas = get_replicas(db)
+        if not replicas or not get_replica_reads() or is_pinned() or \
+                transaction.is_managed(using=db):
+            return db
+        return random.choice(replicas)
 
     def db_for_write(self, model, **hints):
         """Select db to write."""
         app = model._meta.app_label
-        return select_db(app)
+        db = select_db(app)
+        if get_replicas(db):
+            set_last_write(time())
+        return db
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Allow relations between objects of a db and its replicas."""
+        return get_primary(obj1._state.db) == get_primary(obj2._state.db)
+
+    # The rest of the methods are ommited since syncing should not affect
+    # the router.
+
+
+class ReplicaPinMiddleware(object):
+
+    """Pin the follow-up requests of a client that wrote to the primary.
+
+    The time of the last write of a request is sent back in a cookie that
+    expires with the pin. If the request has a token, the time is also kept
+    in the pin cache under the token. A request with a valid cookie or a
+    pinned token reads from the primary until then. Without a pin cache,
+    requests with a token always read from the primary.
+
+    """
+
+    def process_request(self, request):
+        pins = [request.COOKIES.get(PIN_COOKIE)]
+        request._db_pin_key = get_pin_key(request)
+        if request._db_pin_key is not None:
+            pin_cache = get_pin_cache()
+            if pin_cache is None:
+                set_primary_only(True)
+            else:
+                pins.append(pin_cache.get(request._db_pin_key))
+
+        last_write = None
+        for pin in pins:
+            try:
+                pin = float(pin)
+            except (TypeError, ValueError):
+                continue
+            # Ignore pins from the future, which would pin the client
+            # forever
+            if pin <= time() and (last_write is None or pin > last_write):
+                last_write = pin
+        request._db_pin = last_write
+        set_last_write(last_write)
+        set_replica_reads(True)
 
-    # The rest of the methods are ommited since relations and syncing should
-    # not affect the router.
+    def process_response(self, request, response):
+        last_write = get_last_write()
+        set_last_write(None)
+        set_primary_only(False)
+        set_replica_reads(False)
+        if last_write is None or \
+                last_write == getattr(request, "_db_pin", None):
+            return response
+        remaining = int(last_write + get_pin_seconds() - time()) + 1
+        if remaining > 0:
+            response.set_cookie(PIN_COOKIE, repr(last_write),
+                                max_age=remaining, httponly=True)
+            pin_cache = get_pin_cache()
+            key = getattr(request, "_db_pin_key", None)
+            if pin_cache is not None and key is not None:
+                pin_cache.set(key, last_write, remaining)
+        return response
@@ -0,0 +1,208 @@
+# Copyright (C) 2010-2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+from time import time
+
+from django.conf import settings
+
+# A primary database and a replica of it, as two separate SQLite databases
+if not settings.configured:
+    settings.configure(
+        DATABASES={
+            "default": {"ENGINE": "django.db.backends.sqlite3",
+                        "NAME": ":memory:"},
+            "replica": {"ENGINE": "django.db.backends.sqlite3",
+                        "NAME": ":memory:"},
+        },
+        DATABASE_ROUTERS=["snf_django.utils.routers.SynnefoRouter"])
+
+from django.db import connections, models, transaction
+from django.http import HttpRequest, HttpResponse
+
+from snf_django.utils import routers
+from snf_django.utils.db import SYNNEFO_ROUTER
+from snf_django.utils.testing import override_settings
+
+# Use backported unittest functionality if Python < 2.7
+try:
+    import unittest2 as unittest
+except ImportError:
+    if sys.version_info < (2, 7):
+        raise Exception("The unittest2 package is required for Python < 2.7")
+    import unittest
+
+
+class Item(models.Model):
+    name = models.CharField(max_length=16)
+
+    class Meta:
+        app_label = "snf_django"
+
+
+def replicated(**kwargs):
+    return override_settings(settings,
+                             DATABASE_ROUTERS=[SYNNEFO_ROUTER],
+                             DATABASE_REPLICAS={"default": ["replica"]},
+                             DATABASE_REPLICA_PIN_SECONDS=10,
+                             **kwargs)
+
+
+class RouterTestCase(unittest.TestCase):
+    def setUp(self):
+        self.router = routers.SynnefoRouter()
+        routers.set_last_write(None)
+        routers.set_replica_reads(True)
+
+    def tearDown(self):
+        routers.set_last_write(None)
+        routers.set_replica_reads(False)
+
+    def test_no_replicas(self):
+        with override_settings(settings, DATABASE_REPLICAS={}):
+            self.assertEqual(self.router.db_for_read(Item), "default")
+            self.assertEqual(self.router.db_for_write(Item), "default")
+            self.assertEqual(routers.get_last_write(), None)
+            self.assertEqual(self.router.db_for_read(Item), "default")
+
+    def test_read_your_writes(self):
+        with replicated():
+            self.assertEqual(self.router.db_for_read(Item), "replica")
+            self.assertEqual(self.router.db_for_write(Item), "default")
+            self.assertEqual(self.router.db_for_read(Item), "default")
+            # The pin expires
+            routers.set_last_write(time() - 11)
+            self.assertEqual(self.router.db_for_read(Item), "replica")
+
+    def test_outside_requests(self):
+        # Commands and worker threads outside requests read from the primary
+        routers.set_replica_reads(False)
+        with replicated():
+            self.assertEqual(self.router.db_for_read(Item), "default")
+
+    def test_transaction(self):
+        with replicated():
+            transaction.enter_transaction_management(using="default")
+            transaction.managed(True, using="default")
+            try:
+                self.assertEqual(self.router.db_for_read(Item), "default")
+            finally:
+                transaction.leave_transaction_management(using="default")
+            self.assertEqual(self.router.db_for_read(Item), "replica")
+
+    def test_relations(self):
+        with replicated():
+            primary = Item()
+            primary._state.db = "default"
+            replica = Item()
+            replica._state.db = "replica"
+            self.assertTrue(self.router.allow_relation(primary, replica))
+        with override_settings(settings, DATABASE_REPLICAS={}):
+            self.assertFalse(self.router.allow_relation(primary, replica))
+
+    def test_databases(self):
+        for db, name in (("default", "primary"), ("replica", "stale")):
+            cursor = connections[db].cursor()
+            cursor.execute("CREATE TABLE %s (id integer PRIMARY KEY,"
+                           " name varchar(16))" % Item._meta.db_table)
+            cursor.execute("INSERT INTO %s (name) VALUES (%%s)"
+                           % Item._meta.db_table, [name])
+        try:
+            with replicated():
+                self.assertEqual(Item.objects.get().name, "stale")
+                item = Item.objects.get()
+                item.name = "new"
+                item.save()
+                self.assertEqual(Item.objects.get().name, "new")
+                self.assertEqual(
+                    Item.objects.using("default").get()._state.db, "default")
+        finally:
+            for db in ("default", "replica"):
+                connections[db].cursor().execute(
+                    "DROP TABLE %s" % Item._meta.db_table)
+
+
+class ReplicaPinMiddlewareTestCase(unittest.TestCase):
+    def setUp(self):
+        self.middleware = routers.ReplicaPinMiddleware()
+        self.router = routers.SynnefoRouter()
+
+    def tearDown(self):
+        routers.set_last_write(None)
+        routers.set_primary_only(False)
+        routers.set_replica_reads(False)
+
+    def request(self, cookie=None, write=False, token=None):
+        request = HttpRequest()
+        if cookie is not None:
+            request.COOKIES[routers.PIN_COOKIE] = cookie
+        if token is not None:
+            request.META["HTTP_X_AUTH_TOKEN"] = token
+        self.middleware.process_request(request)
+        read = self.router.db_for_read(Item)
+        if write:
+            self.router.db_for_write(Item)
+        response = self.middleware.process_response(request, HttpResponse())
+        self.assertEqual(routers.get_last_write(), None)
+        self.assertFalse(routers.get_replica_reads())
+        return read, response.cookies.get(routers.PIN_COOKIE)
+
+    def test_pin(self):
+        with replicated():
+            read, cookie = self.request()
+            self.assertEqual(read, "replica")
+            self.assertEqual(cookie, None)
+
+            read, cookie = self.request(write=True)
+            self.assertEqual(read, "replica")
+            self.assertTrue(cookie["max-age"] <= 11)
+
+            # The follow-up requests read from the primary, without
+            # renewing the pin
+            read, next_cookie = self.request(cookie=cookie.value)
+            self.assertEqual(read, "default")
+            self.assertEqual(next_cookie, None)
+
+            expired = repr(time() - 11)
+            self.assertEqual(self.request(cookie=expired)[0], "replica")
+            future = repr(time() + 3600)
+            self.assertEqual(self.request(cookie=future)[0], "replica")
+            self.assertEqual(self.request(cookie="garbage")[0], "replica")
+
+    def test_token_pin(self):
+        with replicated(DATABASE_REPLICA_PIN_CACHE_BACKEND="locmem://"):
+            self.assertEqual(self.request(token="token1")[0], "replica")
+            self.request(write=True, token="token1")
+
+            # The follow-up requests with the same token read from the
+            # primary, even without the cookie
+            self.assertEqual(self.request(token="token1")[0], "default")
+            self.assertEqual(self.request(token="token2")[0], "replica")
+            self.assertEqual(self.request()[0], "replica")
+
+    def test_token_without_pin_cache(self):
+        with replicated():
+            self.assertEqual(self.request(token="token1")[0], "default")
+            self.assertEqual(self.request()[0], "replica")
+
+    def test_no_replicas(self):
+        with override_settings(settings, DATABASE_REPLICAS={}):
+            read, cookie = self.request(write=True)
+            self.assertEqual(read, "default")
+            self.assertEqual(cookie, None)
+
+
+if __name__ == '__main__':
+    unittest.main()
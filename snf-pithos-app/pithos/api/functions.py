@@ -801,19 +801,11 @@ def _object_read(request, v_account, v_container, v_object):
         try:
             src_container, src_name = split_container_object_string(
                 '/' + meta['X-Object-Manifest'])
-            objects = request.backend.list_objects(
-                request.user_uniq, v_account,
-                src_container, prefix=src_name, virtual=False)
+            objects, hashmaps = request.backend.get_object_hashmaps_bulk(
+                request.user_uniq, v_account, src_container, src_name)
         except ValueError:
             raise faults.BadRequest('Invalid X-Object-Manifest header')
-
-        for x in objects:
-            snap, s, h = \
-                request.backend.get_object_hashmap(
-                    request.user_uniq, v_account, src_container, x[0],
-                    x[1])
-            sizes.append(s)
-            hashmaps.append(h)
+        sizes = [o[2] for o in objects]
     else:
         snap, s, h = request.backend.get_object_hashmap(
             request.user_uniq, v_account,
@@ -13,6 +13,8 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import os
+import json
 from datetime import datetime
 from django.core.management.base import CommandError
 
@@ -27,7 +29,41 @@ from astakosclient.errors import QuotaLimit, NotFound
 from snf_django.utils import reconcile
 
 backend = get_backend()
-RESOURCES = ['pithos.diskspace']
+RESOURCE = 'pithos.diskspace'
+RESOURCES = [RESOURCE]
+HEADERS = ("Type", "Holder", "Source", "Resource", "Database", "Quotaholder")
+# Users per service_get_quotas call, since their UUIDs go in the query string
+QUOTAS_USER_BATCH = 100
+
+
+def load_checkpoint(path):
+    """Return the state of an interrupted chunked run, or a fresh one"""
+    state = {"marker": None,
+             "accounts": 0,
+             "accounts_done": False,
+             "project_marker": None,
+             "projects": 0,
+             "projects_done": False,
+             "pending_exists": False,
+             "unknown_exists": False,
+             "unsynced_exists": False}
+    if path is not None and os.path.exists(path):
+        try:
+            with open(path) as f:
+                state.update(json.load(f))
+        except (IOError, ValueError) as e:
+            raise CommandError("Cannot read checkpoint file '%s': %s"
+                               % (path, e))
+    return state
+
+
+def save_checkpoint(path, state):
+    if path is None:
+        return
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.rename(tmp, path)
 
 
 class Command(SynnefoCommand):
@@ -36,6 +72,15 @@ class Command(SynnefoCommand):
     Detect unsynchronized usage between Astakos and Pithos DB resources and
     synchronize them if specified so.
 
+    With --chunk-size, the accounts are reconciled in chunks, in ascending
+    order of their path, each one in its own transaction and against the
+    quotas of only these accounts. Then the projects are reconciled in
+    chunks of the projects known to Astakos, in ascending order of their
+    UUID, against the Pithos DB usage of the projects in the same range. If
+    --checkpoint is given, the progress is recorded after every chunk, so
+    that an interrupted run can resume from the last reconciled account or
+    project. Users that have no Pithos account are not visited in this mode.
+
     """
     option_list = SynnefoCommand.option_list + (
         make_option("--user", dest="userid",
@@ -51,10 +96,39 @@ class Command(SynnefoCommand):
                     default=False,
                     action="store_true",
                     help="Override Astakos quotas. Force Astakos to impose "
-                         "the Pithos quota, independently of their value.")
+                         "the Pithos quota, independently of their value."),
+        make_option("--chunk-size", dest="chunk_size",
+                    type="int",
+                    default=None,
+                    help="Reconcile the accounts and the projects in "
+                         "chunks of that many. The quotas of a chunk of "
+                         "accounts are requested from Astakos %d users at "
+                         "a time, to keep the request URL short."
+                         % QUOTAS_USER_BATCH),
+        make_option("--checkpoint", dest="checkpoint",
+                    default=None,
+                    metavar="FILE",
+                    help="Record the progress of a chunked run in FILE and "
+                         "resume from it, if it exists. The file is removed "
+                         "when the run completes."),
     )
 
     def handle(self, **options):
+        chunk_size = options["chunk_size"]
+        if chunk_size is not None:
+            if chunk_size <= 0:
+                raise CommandError("Invalid chunk size: %s" % chunk_size)
+            if options["userid"]:
+                raise CommandError("Option --chunk-size cannot be combined"
+                                   " with --user")
+            try:
+                self.handle_chunks(chunk_size, **options)
+            finally:
+                backend.close()
+            return
+        if options["checkpoint"]:
+            raise CommandError("Option --checkpoint requires --chunk-size")
+
         write = self.stdout.write
         try:
             backend.pre_exec()
@@ -95,34 +169,15 @@ class Command(SynnefoCommand):
             pending_exists = users_pending or projects_pending
             unknown_exists = users_unknown or projects_unknown
 
-            headers = ("Type", "Holder", "Source", "Resource",
-                       "Database", "Quotaholder")
             unsynced = unsynced_users + unsynced_projects
             if unsynced:
-                utils.pprint_table(self.stdout, unsynced, headers)
+                utils.pprint_table(self.stdout, unsynced, HEADERS)
                 if options["fix"]:
-                    force = options["force"]
-                    name = ("client: reconcile-resources-pithos, time: %s"
-                            % datetime.now())
-                    user_provisions = reconcile.create_user_provisions(
-                        unsynced_users)
-                    project_provisions = reconcile.create_project_provisions(
-                        unsynced_projects)
-                    try:
-                        backend.astakosclient.issue_commission_generic(
-                            user_provisions, project_provisions, name=name,
-                            force=force, auto_accept=True)
-                    except QuotaLimit:
-                        write("Reconciling failed because a limit has been "
-                              "reached. Use --force to ignore the check.\n")
+                    if not self.fix(unsynced_users, unsynced_projects,
+                                    options["force"]):
                         return
-                    write("Fixed unsynced resources\n")
 
-            if pending_exists:
-                write("Found pending commissions. Run 'snf-manage"
-                      " reconcile-commissions-pithos'\n")
-            elif not (unsynced or unknown_exists):
-                write("Everything in sync.\n")
+            self.report(pending_exists, unsynced or unknown_exists)
         except BaseException as e:
             backend.post_exec(False)
             raise CommandError(e)
@@ -130,3 +185,143 @@ class Command(SynnefoCommand):
             backend.post_exec(True)
         finally:
             backend.close()
+
+    def handle_chunks(self, chunk_size, **options):
+        project = options["project"]
+        checkpoint = options["checkpoint"]
+        state = load_checkpoint(checkpoint)
+        if state["marker"] is not None:
+            self.stderr.write("Resuming after account '%s'.\n"
+                              % state["marker"])
+
+        while not state["accounts_done"]:
+            # Get holding of the next chunk of accounts from Pithos DB
+            try:
+                backend.pre_exec()
+                accounts = backend.node.node_account_list(
+                    marker=state["marker"], limit=chunk_size)
+                db_usage = {}
+                if accounts:
+                    db_usage = backend.node.node_account_usage(
+                        project=project, accounts=accounts)
+            except BaseException as e:
+                backend.post_exec(False)
+                raise CommandError(e)
+            else:
+                backend.post_exec(True)
+
+            if accounts:
+                # Get holding of the same accounts from Quotaholder
+                qh_result = self.get_user_quotas(accounts, project)
+
+                unsynced, pending_exists, unknown_exists =\
+                    reconcile.check_users(self.stderr, RESOURCES,
+                                          db_usage, qh_result)
+                if unsynced:
+                    utils.pprint_table(self.stdout, unsynced, HEADERS)
+                    if options["fix"]:
+                        if not self.fix(unsynced, [], options["force"]):
+                            return
+
+                state["marker"] = accounts[-1]
+                state["accounts"] += len(accounts)
+                state["pending_exists"] |= pending_exists
+                state["unknown_exists"] |= unknown_exists
+                state["unsynced_exists"] |= bool(unsynced)
+                self.stderr.write("Reconciled %d accounts, up to '%s'.\n"
+                                  % (state["accounts"], state["marker"]))
+
+            state["accounts_done"] = len(accounts) < chunk_size
+            save_checkpoint(checkpoint, state)
+
+        if state["project_marker"] is not None:
+            self.stderr.write("Resuming after project '%s'.\n"
+                              % state["project_marker"])
+
+        while not state["projects_done"]:
+            # Get holding of the next chunk of projects from Quotaholder
+            marker = state["project_marker"]
+            try:
+                if project:
+                    qh_project_result = \
+                        backend.astakosclient.service_get_project_quotas(
+                            project)
+                else:
+                    qh_project_result = \
+                        backend.astakosclient.service_get_project_quotas(
+                            marker=marker, limit=chunk_size)
+            except NotFound:
+                qh_project_result = {}
+            done = bool(project) or len(qh_project_result) < chunk_size
+            upto = None if done else max(qh_project_result)
+
+            # Get holding of the projects in the same range from Pithos DB,
+            # including those that are unknown to Quotaholder
+            try:
+                backend.pre_exec()
+                db_project_usage = backend.node.node_project_usage(
+                    project, marker=marker, upto=upto)
+            except BaseException as e:
+                backend.post_exec(False)
+                raise CommandError(e)
+            else:
+                backend.post_exec(True)
+
+            unsynced, pending_exists, unknown_exists =\
+                reconcile.check_projects(self.stderr, RESOURCES,
+                                         db_project_usage, qh_project_result)
+            if unsynced:
+                utils.pprint_table(self.stdout, unsynced, HEADERS)
+                if options["fix"]:
+                    if not self.fix([], unsynced, options["force"]):
+                        return
+            state["project_marker"] = upto
+            state["projects"] += len(set(qh_project_result) |
+                                     set(db_project_usage))
+            state["projects_done"] = done
+            state["pending_exists"] |= pending_exists
+            state["unknown_exists"] |= unknown_exists
+            state["unsynced_exists"] |= bool(unsynced)
+            self.stderr.write("Reconciled %d projects.\n" % state["projects"])
+            save_checkpoint(checkpoint, state)
+
+        if checkpoint is not None and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        self.report(state["pending_exists"],
+                    state["unsynced_exists"] or state["unknown_exists"])
+
+    def get_user_quotas(self, accounts, project):
+        qh_result = {}
+        for i in xrange(0, len(accounts), QUOTAS_USER_BATCH):
+            try:
+                qh_result.update(backend.astakosclient.service_get_quotas(
+                    accounts[i:i + QUOTAS_USER_BATCH], project_id=project))
+            except NotFound:
+                pass
+        return qh_result
+
+    def fix(self, unsynced_users, unsynced_projects, force):
+        write = self.stdout.write
+        name = ("client: reconcile-resources-pithos, time: %s"
+                % datetime.now())
+        user_provisions = reconcile.create_user_provisions(unsynced_users)
+        project_provisions = reconcile.create_project_provisions(
+            unsynced_projects)
+        try:
+            backend.astakosclient.issue_commission_generic(
+                user_provisions, project_provisions, name=name,
+                force=force, auto_accept=True)
+        except QuotaLimit:
+            write("Reconciling failed because a limit has been "
+                  "reached. Use --force to ignore the check.\n")
+            return False
+        write("Fixed unsynced resources\n")
+        return True
+
+    def report(self, pending_exists, out_of_sync):
+        write = self.stdout.write
+        if pending_exists:
+            write("Found pending commissions. Run 'snf-manage"
+                  " reconcile-commissions-pithos'\n")
+        elif not out_of_sync:
+            write("Everything in sync.\n")
@@ -0,0 +1,90 @@
+# Copyright (C) 2010-2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from django.core.management.base import CommandError
+from optparse import make_option
+from time import sleep
+
+from pithos.api.util import get_backend
+from snf_django.management.commands import SynnefoCommand
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(SynnefoCommand):
+    help = """Resolve the registered commissions of successful requests.
+
+    Accept the commissions whose serials have been registered by successful
+    Pithos requests, when PITHOS_BACKEND_ASYNC_COMMISSIONS is enabled.
+
+    """
+
+    option_list = SynnefoCommand.option_list + (
+        make_option('--batch-size',
+                    dest='batch_size',
+                    default=1000,
+                    help="Number of commissions to resolve at once"
+                         " (default: 1000)"),
+        make_option('--daemon',
+                    dest='daemon',
+                    action="store_true",
+                    default=False,
+                    help="Keep running and resolve new commissions as they"
+                         " are registered"),
+        make_option('--interval',
+                    dest='interval',
+                    default=1,
+                    help="Seconds to wait for new commissions, when running"
+                         " as a daemon (default: 1)"),
+    )
+
+    def handle(self, **options):
+        try:
+            batch_size = int(options['batch_size'])
+            interval = float(options['interval'])
+        except ValueError:
+            raise CommandError("Expecting a number.")
+
+        b = get_backend()
+        try:
+            while True:
+                try:
+                    resolved = self.resolve(b, batch_size)
+                except Exception as e:
+                    if not options['daemon']:
+                        raise CommandError(e)
+                    resolved = []
+                if resolved:
+                    self.stdout.write("Resolved commissions: %s\n" % resolved)
+                if len(resolved) < batch_size:
+                    if not options['daemon']:
+                        break
+                    sleep(interval)
+        finally:
+            b.close()
+
+    def resolve(self, b, batch_size):
+        try:
+            b.pre_exec()
+            resolved = b.resolve_commission_serials(limit=batch_size)
+        except Exception as e:
+            logger.exception(e)
+            b.post_exec(False)
+            raise
+        else:
+            b.post_exec(True)
+        return resolved
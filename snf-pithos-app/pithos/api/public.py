@@ -53,19 +53,12 @@ def public_meta(request, v_public):
 
     request.user_uniq = None
     try:
-        v_account, v_container, v_object = request.backend.get_public(
-            request.user_uniq,
-            v_public)
-        meta = request.backend.get_object_meta(request.user_uniq, v_account,
-                                               v_container, v_object, 'pithos')
-        public = request.backend.get_object_public(
-            request.user_uniq, v_account,
-            v_container, v_object)
+        v_account, v_container, v_object, meta = \
+            request.backend.get_public_object_info(request.user_uniq,
+                                                   v_public, 'pithos')
     except:
         raise faults.ItemNotFound('Object does not exist')
 
-    if not public:
-        raise faults.ItemNotFound('Object does not exist')
     update_manifest_meta(request, v_account, meta)
 
     response = HttpResponse(status=200)
@@ -86,19 +79,12 @@ def public_read(request, v_public):
 
     request.user_uniq = None
     try:
-        v_account, v_container, v_object = request.backend.get_public(
-            request.user_uniq,
-            v_public)
-        meta = request.backend.get_object_meta(request.user_uniq, v_account,
-                                               v_container, v_object, 'pithos')
-        public = request.backend.get_object_public(
-            request.user_uniq, v_account,
-            v_container, v_object)
+        v_account, v_container, v_object, meta = \
+            request.backend.get_public_object_info(request.user_uniq,
+                                                   v_public, 'pithos')
     except:
         raise faults.ItemNotFound('Object does not exist')
 
-    if not public:
-        raise faults.ItemNotFound('Object does not exist')
     update_manifest_meta(request, v_account, meta)
 
     # Evaluate conditions.
@@ -116,22 +102,11 @@ def public_read(request, v_public):
         try:
             src_container, src_name = split_container_object_string(
                 '/' + meta['X-Object-Manifest'])
-            objects = request.backend.list_objects(
-                request.user_uniq, v_account,
-                src_container, prefix=src_name, virtual=False)
-        except:
-            raise faults.ItemNotFound('Object does not exist')
-
-        try:
-            for x in objects:
-                _, s, h = request.backend.get_object_hashmap(request.user_uniq,
-                                                             v_account,
-                                                             src_container,
-                                                             x[0], x[1])
-                sizes.append(s)
-                hashmaps.append(h)
+            objects, hashmaps = request.backend.get_object_hashmaps_bulk(
+                request.user_uniq, v_account, src_container, src_name)
         except:
             raise faults.ItemNotFound('Object does not exist')
+        sizes = [o[2] for o in objects]
     else:
         try:
             _, s, h = request.backend.get_object_hashmap(
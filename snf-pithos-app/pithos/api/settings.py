@@ -155,6 +155,13 @@ PUBLIC_URL_ALPHABET = getattr(
     'PITHOS_PUBLIC_URL_ALPHABET',
     '0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ')
 
+# The maximum number of public objects whose lookups are cached by each
+# process, and the seconds they are cached for. Changes made by other
+# processes, e.g. unpublishing an object, may take up to that many seconds
+# to affect the public URLs served by a process. Set to 0 to disable.
+PUBLIC_CACHE_SIZE = getattr(settings, 'PITHOS_PUBLIC_CACHE_SIZE', 10000)
+PUBLIC_CACHE_TIMEOUT = getattr(settings, 'PITHOS_PUBLIC_CACHE_TIMEOUT', 5)
+
 # The maximum number or items returned by the listing api methods
 API_LIST_LIMIT = getattr(settings, 'PITHOS_API_LIST_LIMIT', 10000)
 
@@ -201,3 +208,9 @@ ACC_MAX_GROUPS = getattr(settings, 'PITHOS_ACC_MAX_GROUPS', 32)
 
 # The maximum allowed group members per group.
 ACC_MAX_GROUP_MEMBERS = getattr(settings, 'PITHOS_ACC_MAX_GROUP_MEMBERS', 32)
+
+# Resolve the quota commissions of successful requests in the background,
+# with 'snf-manage resolve-commissions-pithos --daemon', instead of at the end
+# of each request.
+BACKEND_ASYNC_COMMISSIONS = getattr(settings,
+                                    'PITHOS_BACKEND_ASYNC_COMMISSIONS', False)
@@ -33,6 +33,7 @@ from pithos.api.test import (PithosAPITest, DATE_FORMATS, TEST_BLOCK_SIZE,
 from pithos.api.test.util import (get_random_name, get_random_data, md5_hash,
                                   merkle)
 from pithos.api import settings as pithos_settings
+from pithos.backends.public_cache import get_public_cache
 
 merkle = partial(merkle,
                  blocksize=TEST_BLOCK_SIZE,
@@ -268,6 +269,41 @@ class TestPublic(PithosAPITest):
 
         self.assertTrue(public == public2)
 
+    def test_public_cache(self):
+        cache = get_public_cache(pithos_settings.PUBLIC_CACHE_SIZE,
+                                 pithos_settings.PUBLIC_CACHE_TIMEOUT)
+        if cache is None:
+            return
+        cname = self.create_container()[0]
+        oname, odata = self.upload_object(cname)[:-1]
+        url = join_urls(self.pithos_path, self.user, cname, oname)
+        r = self.post(url, content_type='', HTTP_X_OBJECT_PUBLIC='true')
+        self.assertEqual(r.status_code, 202)
+        public = self.get_object_info(cname, oname)['X-Object-Public']
+
+        r = self.head(public, user='user2', token=None)
+        self.assertEqual(r.status_code, 200)
+        hits = cache.hits
+        r = self.get(public, user='user2', token=None)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.content, odata)
+        self.assertEqual(cache.hits, hits + 1)
+
+        # Updating the metadata invalidates the cached lookup
+        disposition = 'attachment; filename="cached"'
+        r = self.post(url, content_type='',
+                      HTTP_CONTENT_DISPOSITION=disposition)
+        self.assertEqual(r.status_code, 202)
+        r = self.head(public, user='user2', token=None)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r['Content-Disposition'], disposition)
+
+        # So does unpublishing the object
+        r = self.post(url, content_type='', HTTP_X_OBJECT_PUBLIC='false')
+        self.assertEqual(r.status_code, 202)
+        r = self.get(public, user='user2', token=None)
+        self.assertEqual(r.status_code, 404)
+
     def test_delete_public_object(self):
         cname = get_random_name()
         self.create_container(cname)
@@ -50,9 +50,11 @@ from pithos.api.settings import (BACKEND_DB_MODULE, BACKEND_DB_CONNECTION,
                                  BACKEND_XSEG_POOL_SIZE,
                                  BACKEND_MAP_CHECK_INTERVAL,
                                  BACKEND_MAPFILE_PREFIX,
+                                 BACKEND_ASYNC_COMMISSIONS,
                                  RADOS_STORAGE, RADOS_POOL_BLOCKS,
                                  RADOS_POOL_MAPS, TRANSLATE_UUIDS,
                                  PUBLIC_URL_SECURITY, PUBLIC_URL_ALPHABET,
+                                 PUBLIC_CACHE_SIZE, PUBLIC_CACHE_TIMEOUT,
                                  BASE_HOST, UPDATE_MD5, VIEW_PREFIX,
                                  OAUTH2_CLIENT_CREDENTIALS, UNSAFE_DOMAIN,
                                  RESOURCE_MAX_METADATA, ACC_MAX_GROUPS,
@@ -271,13 +273,10 @@ def update_manifest_meta(request, v_account, meta):
         try:
             src_container, src_name = split_container_object_string(
                 '/' + meta['X-Object-Manifest'])
-            objects = request.backend.list_objects(
+            objects = request.backend.list_object_meta(
                 request.user_uniq, v_account,
                 src_container, prefix=src_name, virtual=False)
-            for x in objects:
-                src_meta = request.backend.get_object_meta(
-                    request.user_uniq, v_account, src_container, x[0],
-                    'pithos', x[1])
+            for src_meta in objects:
                 etag += (src_meta['hash'] if not UPDATE_MD5 else
                          src_meta['checksum'])
                 bytes += src_meta['bytes']
@@ -1028,7 +1027,10 @@ BACKEND_KWARGS = dict(
     mapfile_prefix=BACKEND_MAPFILE_PREFIX,
     resource_max_metadata=RESOURCE_MAX_METADATA,
     acc_max_groups=ACC_MAX_GROUPS,
-    acc_max_group_members=ACC_MAX_GROUP_MEMBERS)
+    acc_max_group_members=ACC_MAX_GROUP_MEMBERS,
+    async_commissions=BACKEND_ASYNC_COMMISSIONS,
+    public_cache_size=PUBLIC_CACHE_SIZE,
+    public_cache_timeout=PUBLIC_CACHE_TIMEOUT)
 
 _pithos_backend_pool = PithosBackendPool(size=BACKEND_POOL_SIZE,
                                          **BACKEND_KWARGS)
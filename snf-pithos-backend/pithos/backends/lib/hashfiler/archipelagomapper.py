@@ -52,13 +52,7 @@ class ArchipelagoMapper(object):
         self.dst_port = int(cfg.getint('mapperd', 'blockerm_port'))
         self.mapperd_port = int(cfg.getint('vlmcd', 'mapper_port'))
 
-    def map_retr(self, maphash, size):
-        """Return as a list, part of the hashes map of an object
-           at the given block offset.
-           By default, return the whole hashes map.
-        """
-        hashes = ()
-        ioctx = self.ioctx_pool.pool_get()
+    def _map_read_request(self, ioctx, maphash, size):
         req = Request.get_mapr_request(ioctx, self.mapperd_port,
                                        maphash, offset=0, size=size)
         flags = req.get_flags()
@@ -66,31 +60,75 @@ class ArchipelagoMapper(object):
         req.set_flags(flags)
         req.set_v0_size(size)
         req.submit()
+        return req
+
+    def _map_hashes(self, req):
+        data = req.get_data(xseg_reply_map)
+        Segsarray = xseg_reply_map_scatterlist * data.contents.cnt
+        segs = Segsarray.from_address(ctypes.addressof(data.contents.segs))
+        return [string_at(segs[idx].target, segs[idx].targetlen)
+                for idx in xrange(len(segs))]
+
+    def _map_close(self, ioctx, maphashes):
+        reqs = [Request.get_close_request(ioctx, self.mapperd_port, maphash)
+                for maphash in maphashes]
+        for req in reqs:
+            req.submit()
+        for maphash, req in zip(maphashes, reqs):
+            req.wait()
+            ret = req.success()
+            if ret is False:
+                logger.warning("Could not close map %s" % maphash)
+            req.put()
+
+    def map_retr(self, maphash, size):
+        """Return as a list, part of the hashes map of an object
+           at the given block offset.
+           By default, return the whole hashes map.
+        """
+        hashes = ()
+        ioctx = self.ioctx_pool.pool_get()
+        req = self._map_read_request(ioctx, maphash, size)
         req.wait()
         ret = req.success()
         if ret:
-            data = req.get_data(xseg_reply_map)
-            Segsarray = xseg_reply_map_scatterlist * data.contents.cnt
-            segs = Segsarray.from_address(ctypes.addressof(data.contents.segs))
-            hashes = [string_at(segs[idx].target, segs[idx].targetlen)
-                      for idx in xrange(len(segs))]
+            hashes = self._map_hashes(req)
             req.put()
         else:
             req.put()
             self.ioctx_pool.pool_put(ioctx)
             raise Exception("Could not retrieve Archipelago mapfile.")
-        req = Request.get_close_request(ioctx, self.mapperd_port,
-                                        maphash)
-        req.submit()
-        req.wait()
-        ret = req.success()
-        if ret is False:
-            logger.warning("Could not close map %s" % maphash)
-            pass
-        req.put()
+        self._map_close(ioctx, [maphash])
         self.ioctx_pool.pool_put(ioctx)
         return hashes
 
+    def map_retr_bulk(self, maps):
+        """Return the hashes maps of many objects, given as a list
+           of (maphash, size) tuples.
+           The requests for all maps are submitted before waiting
+           for any of them.
+        """
+        ioctx = self.ioctx_pool.pool_get()
+        reqs = [self._map_read_request(ioctx, maphash, size)
+                for maphash, size in maps]
+        hashes = []
+        opened = []
+        failed = False
+        for (maphash, size), req in zip(maps, reqs):
+            req.wait()
+            if req.success():
+                opened.append(maphash)
+                if not failed:
+                    hashes.append(self._map_hashes(req))
+            else:
+                failed = True
+            req.put()
+        self._map_close(ioctx, opened)
+        self.ioctx_pool.pool_put(ioctx)
+        if failed:
+            raise Exception("Could not retrieve Archipelago mapfile.")
+        return hashes
+
     def map_stor(self, maphash, hashes, size, block_size):
         """Store hashes in the given hashes map."""
         objects = list()
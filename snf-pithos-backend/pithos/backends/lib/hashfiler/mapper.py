@@ -32,6 +32,12 @@ class Mapper(object):
         """
         return self.archip_map.map_retr(maphash, size)
 
+    def map_retr_bulk(self, maps):
+        """Return the hashes maps of many objects, given as a list
+           of (maphash, size) tuples.
+        """
+        return self.archip_map.map_retr_bulk(maps)
+
     def map_stor(self, maphash, hashes, size, blocksize):
         """Store hashes in the given hashes map."""
         self.archip_map.map_stor(maphash, hashes, size, blocksize)
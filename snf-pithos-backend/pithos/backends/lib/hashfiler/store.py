@@ -39,6 +39,9 @@ class Store(object):
     def map_get(self, name, size):
         return self.mapper.map_retr(name, size)
 
+    def map_get_bulk(self, maps):
+        return self.mapper.map_retr_bulk(maps)
+
     def map_put(self, name, map, size, block_size):
         self.mapper.map_stor(name, map, size, block_size)
 
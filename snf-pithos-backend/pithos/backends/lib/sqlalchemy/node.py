@@ -519,6 +519,27 @@ class Node(DBWorker):
         r.close()
         return rows
 
+    def node_account_list(self, marker=None, limit=None):
+        """Return the paths of the accounts in ascending order.
+
+        Keyword arguments:
+        marker -- return only the accounts after this path (default None)
+        limit -- return at most that many accounts (default None: no limit)
+        """
+
+        s = select([self.nodes.c.path])
+        s = s.where(and_(self.nodes.c.node != 0,
+                         self.nodes.c.parent == 0))
+        if marker is not None:
+            s = s.where(self.nodes.c.path > marker)
+        s = s.order_by(self.nodes.c.path)
+        if limit:
+            s = s.limit(limit)
+        r = self.conn.execute(s)
+        rows = r.fetchall()
+        r.close()
+        return [row[0] for row in rows]
+
     def node_account_quotas(self):
         s = select([self.nodes.c.path, self.policy.c.value])
         s = s.where(and_(self.nodes.c.node != 0,
@@ -530,13 +551,15 @@ class Node(DBWorker):
         r.close()
         return dict(rows)
 
-    def node_account_usage(self, account=None, project=None, cluster=0):
+    def node_account_usage(self, account=None, project=None, cluster=0,
+                           accounts=None):
         """Return a dict of dicts with the project usage for a specific account
 
         Keyword arguments:
         account -- (default None: list usage for all accounts)
         project -- (default None: list usage for all projects)
         cluster -- list current, history or deleted usage (default 0: normal)
+        accounts -- list usage only for these accounts (default None)
         """
 
         n1 = self.nodes.alias('n1')
@@ -556,6 +579,8 @@ class Node(DBWorker):
         s = s.group_by(n3.c.path, self.policy.c.value)
         if account:
             s = s.where(n3.c.path == account)
+        if accounts is not None:
+            s = s.where(n3.c.path.in_(accounts))
         if project:
             s = s.where(self.policy.c.value == project)
         r = self.conn.execute(s)
@@ -566,12 +591,15 @@ class Node(DBWorker):
             d[account][project][DEFAULT_DISKSPACE_RESOURCE] = usage
         return d
 
-    def node_project_usage(self, project=None, cluster=0):
+    def node_project_usage(self, project=None, cluster=0, marker=None,
+                           upto=None):
         """Return a dict of dicts with the project usage for a specific account
 
         Keyword arguments:
         project -- (default None: list usage for all projects)
         cluster -- list current, history or deleted usage (default 0: normal)
+        marker -- list usage only for the projects after this one
+        upto -- list usage only for the projects up to this one
         """
 
         n1 = self.nodes.alias('n1')
@@ -591,6 +619,10 @@ class Node(DBWorker):
         s = s.group_by(self.policy.c.value)
         if project:
             s = s.where(self.policy.c.value == project)
+        if marker is not None:
+            s = s.where(self.policy.c.value > marker)
+        if upto is not None:
+            s = s.where(self.policy.c.value <= upto)
         r = self.conn.execute(s)
         rows = r.fetchall()
         r.close()
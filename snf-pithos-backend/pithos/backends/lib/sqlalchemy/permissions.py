@@ -14,7 +14,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from sqlalchemy.sql import select, literal, or_, and_
-from sqlalchemy.sql.expression import join, union
+from sqlalchemy.sql.expression import join, outerjoin, union
 
 from xfeatures import XFeatures
 from groups import Groups
@@ -260,3 +260,39 @@ class Permissions(XFeatures, Groups, Public, Node):
         l = [row[0] for row in r.fetchall()]
         r.close()
         return l
+
+    def public_object_lookup(self, public, cluster=0, domain='pithos'):
+        """Lookup the object with the given public id in a single query.
+           Return None if the public id is not active or the current version
+           of the object is not in the given cluster.
+           Otherwise, return the path of the object, the properties of its
+           current version, in the order of Node.version_lookup, and the
+           (key, value) attributes of the version in the given domain.
+        """
+
+        p = self.public
+        n = self.nodes
+        v = self.versions
+        a = self.attributes
+        cols = [v.c.serial, v.c.node, v.c.hash,
+                v.c.size, v.c.type, v.c.source,
+                v.c.mtime, v.c.muser, v.c.uuid,
+                v.c.checksum, v.c.cluster,
+                v.c.available, v.c.map_check_timestamp,
+                v.c.mapfile, v.c.is_snapshot]
+        j = join(p, n, n.c.path == p.c.path)
+        j = join(j, v, v.c.serial == n.c.latest_version)
+        j = outerjoin(j, a, and_(a.c.serial == v.c.serial,
+                                 a.c.domain == domain))
+        s = select([p.c.path] + cols + [a.c.key, a.c.value], from_obj=[j])
+        s = s.where(and_(p.c.url == public,
+                         p.c.active == True,
+                         v.c.cluster == cluster))
+        r = self.conn.execute(s)
+        rows = r.fetchall()
+        r.close()
+        if not rows:
+            return None
+        props = tuple(rows[0][1:-2])
+        attrs = [(row[-2], row[-1]) for row in rows if row[-2] is not None]
+        return rows[0][0], props, attrs
@@ -54,6 +54,18 @@ class QuotaholderSerial(DBWorker):
         r.close()
         return rows
 
+    def get_serials(self, limit=None):
+        """Return the registered serials, in ascending order."""
+
+        s = select([self.qh_serials.c.serial])
+        s = s.order_by(self.qh_serials.c.serial)
+        if limit is not None:
+            s = s.limit(limit)
+        r = self.conn.execute(s)
+        rows = r.fetchall()
+        r.close()
+        return [row[0] for row in rows]
+
     def lookup(self, serials):
         """Return the registered serials."""
 
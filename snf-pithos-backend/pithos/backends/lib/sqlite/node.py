@@ -16,10 +16,11 @@
 from time import time
 from operator import itemgetter
 from itertools import groupby
+from collections import defaultdict
 
 from dbworker import DBWorker
 
-from pithos.backends.modular import MAP_AVAILABLE
+from pithos.backends.modular import MAP_AVAILABLE, DEFAULT_DISKSPACE_RESOURCE
 from pithos.backends.filter import parse_filters
 
 
@@ -400,23 +401,48 @@ class Node(DBWorker):
             args += accounts
         return self.execute(q, args).fetchall()
 
+    def node_account_list(self, marker=None, limit=None):
+        """Return the paths of the accounts in ascending order.
+
+        Keyword arguments:
+        marker -- return only the accounts after this path (default None)
+        limit -- return at most that many accounts (default None: no limit)
+        """
+
+        q = "select path from nodes where node != 0 and parent = 0 "
+        args = []
+        if marker is not None:
+            q += "and path > ? "
+            args.append(marker)
+        q += "order by path"
+        if limit:
+            q += " limit ?"
+            args.append(limit)
+        self.execute(q, args)
+        return [row[0] for row in self.fetchall()]
+
     def node_account_quotas(self):
         q = ("select n.path, p.value from nodes n, policy p "
              "where n.node != 0 and n.parent = 0 "
              "and n.node = p.node and p.key = 'quota'")
         return dict(self.execute(q).fetchall())
 
-    def node_account_usage(self, account=None, cluster=0):
-        """Return usage for a specific account.
+    def node_account_usage(self, account=None, project=None, cluster=0,
+                           accounts=None):
+        """Return a dict of dicts with the project usage for a specific account
 
         Keyword arguments:
-        account -- (default None: list usage for all the accounts)
+        account -- (default None: list usage for all accounts)
+        project -- (default None: list usage for all projects)
         cluster -- list current, history or deleted usage (default 0: normal)
+        accounts -- list usage only for these accounts (default None)
         """
 
-        q = ("select n3.path, sum(v.size) from "
-             "versions v, nodes n1, nodes n2, nodes n3 "
-             "where v.node = n1.node "
+        q = ("select n3.path, p.value, sum(v.size) from "
+             "versions v, policy p, nodes n1, nodes n2, nodes n3 "
+             "where p.key = 'project' "
+             "and p.node = n2.node "
+             "and v.node = n1.node "
              "and v.cluster = ? "
              "and n1.parent = n2.node "
              "and n2.parent = n3.node "
@@ -426,11 +452,56 @@ class Node(DBWorker):
         if account:
             q += ("and n3.path = ? ")
             args += [account]
-        q += ("group by n3.path")
+        if accounts is not None:
+            placeholders = ','.join('?' for a in accounts)
+            q += ("and n3.path in (%s) " % placeholders)
+            args += accounts
+        if project:
+            q += ("and p.value = ? ")
+            args += [project]
+        q += ("group by n3.path, p.value")
 
-        print '###', q, args
         self.execute(q, args)
-        return dict(self.fetchall())
+        d = defaultdict(lambda: defaultdict(dict))
+        for account, project, usage in self.fetchall():
+            d[account][project][DEFAULT_DISKSPACE_RESOURCE] = usage
+        return d
+
+    def node_project_usage(self, project=None, cluster=0, marker=None,
+                           upto=None):
+        """Return a dict of dicts with the usage of the projects
+
+        Keyword arguments:
+        project -- (default None: list usage for all projects)
+        cluster -- list current, history or deleted usage (default 0: normal)
+        marker -- list usage only for the projects after this one
+        upto -- list usage only for the projects up to this one
+        """
+
+        q = ("select p.value, sum(v.size) from "
+             "versions v, policy p, nodes n1, nodes n2 "
+             "where p.key = 'project' "
+             "and p.node = n2.node "
+             "and v.node = n1.node "
+             "and v.cluster = ? "
+             "and n1.parent = n2.node ")
+        args = [cluster]
+        if project:
+            q += ("and p.value = ? ")
+            args += [project]
+        if marker is not None:
+            q += ("and p.value > ? ")
+            args += [marker]
+        if upto is not None:
+            q += ("and p.value <= ? ")
+            args += [upto]
+        q += ("group by p.value")
+
+        self.execute(q, args)
+        d = defaultdict(dict)
+        for project, usage in self.fetchall():
+            d[project][DEFAULT_DISKSPACE_RESOURCE] = usage
+        return d
 
     def policy_get(self, node):
         q = "select key, value from policy where node = ?"
@@ -236,3 +236,30 @@ class Permissions(XFeatures, Groups, Public, Node):
         p = tuple(self.escape_like(path) + '%' for path in paths)
         self.execute(q, p)
         return [r[0] for r in self.fetchall()]
+
+    def public_object_lookup(self, public, cluster=0, domain='pithos'):
+        """Lookup the object with the given public id in a single query.
+           Return None if the public id is not active or the current version
+           of the object is not in the given cluster.
+           Otherwise, return the path of the object, the properties of its
+           current version, in the order of Node.version_lookup, and the
+           (key, value) attributes of the version in the given domain.
+        """
+
+        q = ("select p.path, v.serial, v.node, v.hash, v.size, v.type, "
+             "v.source, v.mtime, v.muser, v.uuid, v.checksum, v.cluster, "
+             "v.available, v.map_check_timestamp, v.mapfile, "
+             "v.is_snapshot, a.key, a.value "
+             "from public p "
+             "join nodes n on n.path = p.path "
+             "join versions v on v.serial = n.latest_version "
+             "left join attributes a "
+             "on a.serial = v.serial and a.domain = ? "
+             "where p.url = ? and p.active = 1 and v.cluster = ?")
+        self.execute(q, (domain, public, cluster))
+        rows = self.fetchall()
+        if not rows:
+            return None
+        props = tuple(rows[0][1:-2])
+        attrs = [(row[-2], row[-1]) for row in rows if row[-2] is not None]
+        return rows[0][0], props, attrs
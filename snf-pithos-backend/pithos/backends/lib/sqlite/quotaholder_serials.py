@@ -33,6 +33,16 @@ class QuotaholderSerial(DBWorker):
         self.execute(q, (serial,))
         return self.fetchall()
 
+    def get_serials(self, limit=None):
+        """Return the registered serials, in ascending order."""
+
+        q = "select serial from qh_serials order by serial"
+        args = ()
+        if limit is not None:
+            q += " limit ?"
+            args = (limit,)
+        return [i[0] for i in self.execute(q, args).fetchall()]
+
     def lookup(self, serials):
         """Return the registered serials."""
 
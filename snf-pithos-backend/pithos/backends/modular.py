@@ -33,6 +33,7 @@ try:
 except ImportError:
     AstakosClient = None
 
+from pithos.backends.public_cache import get_public_cache
 from pithos.backends.exceptions import (
     NotAllowedError, QuotaError,
     AccountExists, ContainerExists, AccountNotEmpty,
@@ -81,6 +82,36 @@ class HashMap(list):
             h = [self._hash_raw(h[x] + h[x + 1]) for x in range(0, len(h), 2)]
         return h[0]
 
+
+class LazyHashmaps(object):
+    """A sequence of object hashmaps, read from the store when accessed.
+
+    Each item is either a hashmap or the (mapfile, size) of the map to read.
+    Accessing an unread map reads it along with the next unread ones, up to
+    'batch_size' maps, in a single call to the store.
+    """
+
+    def __init__(self, store, items, batch_size):
+        self.store = store
+        self.items = items
+        self.batch_size = batch_size
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, index):
+        item = self.items[index]
+        if isinstance(item, tuple):
+            index = index % len(self.items)
+            unread = [i for i in xrange(index, len(self.items))
+                      if isinstance(self.items[i], tuple)][:self.batch_size]
+            maps = self.store.map_get_bulk([self.items[i] for i in unread])
+            for i, hashmap in zip(unread, maps):
+                self.items[i] = hashmap
+            item = self.items[index]
+        return item
+
+
 # Default modules and settings.
 DEFAULT_DB_MODULE = 'pithos.backends.lib.sqlalchemy'
 DEFAULT_DB_CONNECTION = 'sqlite:///backend.db'
@@ -99,6 +130,7 @@ DEFAULT_PUBLIC_URL_ALPHABET = ('0123456789'
                                'ABCDEFGHIJKLMNOPQRSTUVWXYZ')
 DEFAULT_PUBLIC_URL_SECURITY = 16
 DEFAULT_ARCHIPELAGO_CONF_FILE = '/etc/archipelago/archipelago.conf'
+DEFAULT_PUBLIC_CACHE_TIMEOUT = 5  # seconds
 
 (CLUSTER_NORMAL, CLUSTER_HISTORY, CLUSTER_DELETED) = range(3)
 
@@ -120,6 +152,12 @@ DEFAULT_RESOURCE_MAX_METADATA = 32
 DEFAULT_ACC_MAX_GROUPS = 32
 DEFAULT_ACC_MAX_GROUP_MEMBERS = 32
 
+# Maximum number of journaled commission serials resolved at once
+DEFAULT_COMMISSION_BATCH_SIZE = 1000
+
+# Number of object maps read at once by get_object_hashmaps_bulk
+DEFAULT_MAP_BATCH_SIZE = 32
+
 logger = logging.getLogger(__name__)
 
 _propnames = ('serial', 'node', 'hash', 'size', 'type', 'source', 'mtime',
@@ -248,7 +286,10 @@ class ModularBackend(object):
                  mapfile_prefix=DEFAULT_MAPFILE_PREFIX,
                  resource_max_metadata=DEFAULT_RESOURCE_MAX_METADATA,
                  acc_max_groups=DEFAULT_ACC_MAX_GROUPS,
-                 acc_max_group_members=DEFAULT_ACC_MAX_GROUP_MEMBERS):
+                 acc_max_group_members=DEFAULT_ACC_MAX_GROUP_MEMBERS,
+                 async_commissions=False,
+                 public_cache_size=0,
+                 public_cache_timeout=DEFAULT_PUBLIC_CACHE_TIMEOUT):
 
         not_nullable = ('block_size', 'hash_algorithm', 'block_params',
                         'public_url_security', 'public_url_alphabet',
@@ -281,6 +322,12 @@ class ModularBackend(object):
         self.resource_max_metadata = resource_max_metadata
         self.acc_max_groups = acc_max_groups
         self.acc_max_group_members = acc_max_group_members
+        self.async_commissions = async_commissions
+        self.public_cache = get_public_cache(public_cache_size,
+                                             public_cache_timeout)
+        # Nodes of the objects changed in the transaction, whose public
+        # lookups are invalidated when it commits
+        self.public_changed_nodes = set()
 
         def load_module(m):
             __import__(m)
@@ -351,6 +398,7 @@ class ModularBackend(object):
         self.wrapper.execute()
         self.serials = []
         self._reset_allowed_paths()
+        self.public_changed_nodes = set()
         self.in_transaction = True
 
     def post_exec(self, success_status=True):
@@ -360,6 +408,9 @@ class ModularBackend(object):
                 self.commission_serials.insert_many(
                     self.serials)
 
+            # With asynchronous commissions the registered serials are
+            # resolved later on by resolve_commission_serials
+            if self.serials and not self.async_commissions:
                 # commit to ensure that the serials are registered
                 # even if resolve commission fails
                 self.wrapper.commit()
@@ -374,6 +425,8 @@ class ModularBackend(object):
                     r['accepted'])
 
             self.wrapper.commit()
+            if self.public_cache is not None and self.public_changed_nodes:
+                self.public_cache.invalidate(self.public_changed_nodes)
         else:
             if self.serials:
                 r = self.astakosclient.resolve_commissions(
@@ -382,8 +435,34 @@ class ModularBackend(object):
                 self.commission_serials.delete_many(
                     r['rejected'])
             self.wrapper.rollback()
+        self.public_changed_nodes = set()
         self.in_transaction = False
 
+    def resolve_commission_serials(self,
+                                   limit=DEFAULT_COMMISSION_BATCH_SIZE):
+        """Accept the commissions of the registered serials.
+
+        Accept up to 'limit' of the serials registered by successful requests
+        and unregister the ones that have been resolved, either now or
+        earlier. Return the unregistered serials.
+
+        Must be called between pre_exec and post_exec.
+        """
+        serials = self.commission_serials.get_serials(limit=limit)
+        if not serials:
+            return []
+        r = self.astakosclient.resolve_commissions(
+            accept_serials=serials,
+            reject_serials=[])
+        resolved = list(r['accepted'])
+        for serial, fault in r['failed']:
+            # The commission does not exist any more, e.g. it was resolved
+            # by reconcile-commissions-pithos
+            if 'itemNotFound' in fault:
+                resolved.append(serial)
+        self.commission_serials.delete_many(resolved)
+        return resolved
+
     def close(self):
         """Close the backend connection."""
         self.wrapper.close()
@@ -1177,22 +1256,25 @@ class ModularBackend(object):
                     'user defined metadata')
             meta.update(
                 dict(self.node.attribute_get(props[self.SERIAL], domain)))
-        meta.update({'name': name,
-                     'bytes': props[self.SIZE],
-                     'type': props[self.TYPE],
-                     'hash': props[self.HASH],
-                     'version': props[self.SERIAL],
-                     'version_timestamp': props[self.MTIME],
-                     'modified': modified,
-                     'modified_by': props[self.MUSER],
-                     'uuid': props[self.UUID],
-                     'checksum': props[self.CHECKSUM],
-                     'available': props[self.AVAILABLE],
-                     'map_check_timestamp': props[self.MAP_CHECK_TIMESTAMP],
-                     'mapfile': props[self.MAPFILE],
-                     'is_snapshot': props[self.IS_SNAPSHOT]})
+        meta.update(self._object_system_meta(name, props, modified))
         return meta
 
+    def _object_system_meta(self, name, props, modified):
+        return {'name': name,
+                'bytes': props[self.SIZE],
+                'type': props[self.TYPE],
+                'hash': props[self.HASH],
+                'version': props[self.SERIAL],
+                'version_timestamp': props[self.MTIME],
+                'modified': modified,
+                'modified_by': props[self.MUSER],
+                'uuid': props[self.UUID],
+                'checksum': props[self.CHECKSUM],
+                'available': props[self.AVAILABLE],
+                'map_check_timestamp': props[self.MAP_CHECK_TIMESTAMP],
+                'mapfile': props[self.MAPFILE],
+                'is_snapshot': props[self.IS_SNAPSHOT]}
+
     @debug_method
     @backend_method
     def update_object_meta(self, user, account, container, name, domain, meta,
@@ -1346,8 +1428,9 @@ class ModularBackend(object):
         """
 
         self._can_write_object(user, account, container, name)
-        path = self._lookup_object(account, container, name,
-                                   lock_container=True)[0]
+        path, node = self._lookup_object(account, container, name,
+                                         lock_container=True)
+        self.public_changed_nodes.add(node)
         if not public:
             self.permissions.public_unset(path)
         else:
@@ -1414,6 +1497,37 @@ class ModularBackend(object):
         return props[self.IS_SNAPSHOT], props[self.SIZE], \
             self._get_object_hashmap(props, update_available=True)
 
+    @debug_method
+    @backend_method
+    def get_object_hashmaps_bulk(self, user, account, container, prefix,
+                                 batch_size=DEFAULT_MAP_BATCH_SIZE):
+        """Return the sizes and the hashmaps of the objects under prefix.
+
+        The objects are the ones that list_objects returns for the prefix
+        with virtual=False, looked up in a single query. Return a list with
+        the (name, version, size) of each object and a sequence with their
+        hashmaps, which reads the maps from the store in batches of
+        'batch_size', as they are accessed.
+
+        Raises:
+            NotAllowedError: Operation not permitted
+            ItemNotExists: Container does not exist
+        """
+
+        objects = []
+        items = []
+        for p in self._list_objects(user, account, container, prefix, None,
+                                    None, 10000, False, None, [], False,
+                                    None, None, True, False):
+            name, props = p[0], p[1:]
+            objects.append((name, props[self.SERIAL], props[self.SIZE]))
+            if (props[self.HASH] is None or props[self.IS_SNAPSHOT] or
+                    props[self.SIZE] == 0):
+                items.append(self._get_object_hashmap(props))
+            else:
+                items.append((props[self.MAPFILE], props[self.SIZE]))
+        return objects, LazyHashmaps(self.store, items, batch_size)
+
     def _copy_metadata(self, src_version, dest_version, dest_node,
                        exclude_domain, src_node=None):
         domains = self.node.attribute_get_domains(src_version,
@@ -1559,6 +1673,8 @@ class ModularBackend(object):
         if info is None:
             raise NameError("No object found for this UUID.")
         _, serial = info
+        self.public_changed_nodes.add(
+            self.node.version_get_properties(serial, keys=('node',))[0])
         self.node.version_put_property(serial, 'available', state)
 
     @debug_method
@@ -1633,6 +1749,7 @@ class ModularBackend(object):
         path, node = self._lookup_object(account, container, name,
                                          lock_container=True)
         props = self._get_version(node, version)
+        self.public_changed_nodes.add(node)
         versions = self.node.node_get_versions(node)
         for x in versions:
             if (x[self.SERIAL] >= int(version) and
@@ -1857,6 +1974,7 @@ class ModularBackend(object):
         if until is not None:
             if node is None:
                 return
+            self.public_changed_nodes.add(node)
             hashes = []
             size = 0
             h, s, _ = self.node.node_purge(node, until, CLUSTER_NORMAL,
@@ -2058,6 +2176,60 @@ class ModularBackend(object):
         self._can_read_object(user, account, container, name)
         return (account, container, name)
 
+    @debug_method
+    @backend_method
+    def get_public_object_info(self, user, public, domain='pithos'):
+        """Return the (account, container, name, meta) of a public object.
+
+        The meta is a dictionary with the object metadata for the domain,
+        as returned by get_object_meta for the latest version.
+
+        The object is looked up in a single query and, if the backend has a
+        public cache, the result is cached until the object changes. The
+        user is allowed to read the object for the rest of the transaction.
+
+        Raises:
+            NameError: Public id does not exist or is not active
+        """
+
+        cache = self.public_cache
+        if self.public_changed_nodes:
+            # Do not serve or store what this transaction has not committed
+            cache = None
+        if cache is not None:
+            info = cache.get(public)
+            if info is not None:
+                self._allow_public_read(user, info)
+                return info
+            generation = cache.generation
+
+        r = self.permissions.public_object_lookup(public, CLUSTER_NORMAL,
+                                                  domain)
+        if r is None:
+            raise NameError("No object found associated with this public path")
+        path, props, attrs = r
+        account, container, name = path.split('/', 2)
+        if props[self.AVAILABLE] == MAP_UNAVAILABLE:
+            # The meta of unavailable snapshots may change without a new
+            # version, so they are not cached
+            info = (account, container, name,
+                    self.get_object_meta(account, account, container, name,
+                                         domain))
+            self._allow_public_read(user, info)
+            return info
+
+        meta = dict(attrs)
+        meta.update(self._object_system_meta(name, props, props[self.MTIME]))
+        info = (account, container, name, meta)
+        if cache is not None:
+            cache.put(public, props[self.NODE], info, generation)
+        self._allow_public_read(user, info)
+        return account, container, name, dict(meta)
+
+    def _allow_public_read(self, user, info):
+        # Public objects are readable by everyone
+        self.read_allowed_paths[user].add('/'.join(info[:3]))
+
     def get_block(self, hash):
         """Return a block's data.
 
@@ -2297,6 +2469,7 @@ class ModularBackend(object):
             raise ValueError("New object version creation has been failed.")
 
         self.node.attribute_unset_is_latest(node, dest_version_id)
+        self.public_changed_nodes.add(node)
 
         return pre_version_id, dest_version_id, mapfile
 
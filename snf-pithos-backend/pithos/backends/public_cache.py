@@ -0,0 +1,119 @@
+# Copyright (C) 2010-2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+In-process cache of the objects resolved from public ids
+"""
+
+import threading
+from collections import OrderedDict
+from time import time
+
+
+class PublicObjectCache(object):
+    """A bounded cache of public object lookups
+
+    Each entry maps a public id to the (account, container, name, meta)
+    of the object and is kept for at most 'timeout' seconds. The entries
+    of an object are dropped when the backend of the process commits a
+    change to it. Changes committed by other processes are seen when the
+    entries expire.
+
+    A lookup that started before an invalidation may have read the old
+    state of the object, so its result is not stored. Callers take the
+    generation of the cache before the lookup and pass it to put().
+
+    """
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        # Entries by public id, least recently stored first
+        self.entries = OrderedDict()
+        # Public ids by node of the object
+        self.nodes = {}
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _remove(self, public):
+        expires, node, info = self.entries.pop(public)
+        publics = self.nodes.get(node)
+        if publics is not None:
+            publics.discard(public)
+            if not publics:
+                del self.nodes[node]
+
+    def get(self, public):
+        """Return a copy of the cached info of the public id, or None"""
+        with self.lock:
+            entry = self.entries.get(public)
+            if entry is not None and entry[0] < time():
+                self._remove(public)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        account, container, name, meta = entry[2]
+        return account, container, name, dict(meta)
+
+    def put(self, public, node, info, generation):
+        """Store the info that a lookup of the given generation found"""
+        with self.lock:
+            if generation != self.generation:
+                return
+            if public in self.entries:
+                self._remove(public)
+            while len(self.entries) >= self.size:
+                self._remove(next(iter(self.entries)))
+            account, container, name, meta = info
+            self.entries[public] = (time() + self.timeout, node,
+                                    (account, container, name, dict(meta)))
+            self.nodes.setdefault(node, set()).add(public)
+
+    def invalidate(self, nodes):
+        """Drop the entries of the objects with the given nodes"""
+        with self.lock:
+            self.generation += 1
+            for node in nodes:
+                for public in list(self.nodes.get(node, ())):
+                    self._remove(public)
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+            self.nodes.clear()
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_public_cache(size, timeout):
+    """Return the cache of the process for the given parameters
+
+    Return None if caching is disabled, i.e. size or timeout is zero.
+
+    """
+    if not size or not timeout:
+        return None
+    key = (size, timeout)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = PublicObjectCache(size, timeout)
+    return cache
@@ -17,6 +17,9 @@ from pithos.backends.test.common import CommonMixin
 from pithos.backends.test.quota import TestQuotaMixin
 from pithos.backends.test.delete_by_uuid import TestDeleteByUUIDMixin
 from pithos.backends.test.snapshots import TestSnapshotsMixin
+from pithos.backends.test.commissions import TestCommissionsMixin
+from pithos.backends.test.public import TestPublicMixin
+from pithos.backends.test.hashmaps import TestHashmapsBulkMixin
 
 from sqlalchemy import create_engine
 
@@ -25,7 +28,9 @@ import time
 
 
 class TestSQLAlchemyBackend(CommonMixin, TestDeleteByUUIDMixin,
-                            TestQuotaMixin, TestSnapshotsMixin):
+                            TestQuotaMixin, TestSnapshotsMixin,
+                            TestCommissionsMixin, TestPublicMixin,
+                            TestHashmapsBulkMixin):
     db_module = 'pithos.backends.lib.sqlalchemy'
     db_connection_str = \
         '%(scheme)s://%(user)s:%(pwd)s@%(host)s:%(port)s/%(name)s'
@@ -63,7 +68,8 @@ class TestSQLAlchemyBackend(CommonMixin, TestDeleteByUUIDMixin,
 
 
 class TestSQLiteBackend(CommonMixin, TestDeleteByUUIDMixin, TestQuotaMixin,
-                        TestSnapshotsMixin):
+                        TestSnapshotsMixin, TestCommissionsMixin,
+                        TestPublicMixin, TestHashmapsBulkMixin):
     db_module = 'pithos.backends.lib.sqlite'
     db_connection = location = '/tmp/test_pithos_backend.db'
     mapfile_prefix = 'snf_test_pithos_backend_sqlite_%s_' % \
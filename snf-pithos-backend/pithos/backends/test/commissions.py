@@ -0,0 +1,115 @@
+# Copyright (C) 2010-2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+class StubAstakosClient(object):
+    """Astakos client that keeps the pending commissions in memory."""
+
+    def __init__(self):
+        self.serial = 0
+        self.pending = set()
+        self.resolve_calls = []
+
+    def issue_one_commission(self, *args, **kwargs):
+        self.serial += 1
+        self.pending.add(self.serial)
+        return self.serial
+
+    def resolve_commissions(self, accept_serials, reject_serials):
+        self.resolve_calls.append((list(accept_serials),
+                                   list(reject_serials)))
+        result = {'accepted': [], 'rejected': [], 'failed': []}
+        for key, serials in (('accepted', accept_serials),
+                             ('rejected', reject_serials)):
+            for serial in serials:
+                if serial in self.pending:
+                    self.pending.remove(serial)
+                    result[key].append(serial)
+                else:
+                    fault = {'itemNotFound': {'code': 404}}
+                    result['failed'].append((serial, fault))
+        return result
+
+
+class TestCommissionsMixin(object):
+    """Challenge the resolution of quota commissions."""
+
+    def setup_commissions(self, async_commissions):
+        self.astakos = StubAstakosClient()
+        self.b.astakosclient = self.astakos
+        self.b.commission_serials = self.b.db_module.QuotaholderSerial(
+            wrapper=self.b.wrapper)
+        self.b.async_commissions = async_commissions
+
+    def issue(self, count=1):
+        self.b.pre_exec()
+        for i in range(count):
+            self.b.serials.append(self.b.astakosclient.issue_one_commission())
+
+    def registered(self):
+        return self.b.commission_serials.get_serials()
+
+    def test_sync_commissions(self):
+        self.setup_commissions(async_commissions=False)
+        self.issue(2)
+        self.b.post_exec(True)
+        self.assertEqual(self.astakos.resolve_calls, [([1, 2], [])])
+        self.assertEqual(self.astakos.pending, set())
+        self.assertEqual(self.registered(), [])
+
+    def test_async_commissions(self):
+        self.setup_commissions(async_commissions=True)
+        self.issue(2)
+        self.b.post_exec(True)
+        self.issue(1)
+        self.b.post_exec(True)
+        # Nothing is resolved at the end of the requests
+        self.assertEqual(self.astakos.resolve_calls, [])
+        self.assertEqual(self.registered(), [1, 2, 3])
+
+        self.b.pre_exec()
+        self.assertEqual(self.b.resolve_commission_serials(limit=2), [1, 2])
+        self.b.post_exec(True)
+        self.assertEqual(self.registered(), [3])
+        self.assertEqual(self.astakos.pending, set([3]))
+
+        self.b.pre_exec()
+        self.assertEqual(self.b.resolve_commission_serials(limit=2), [3])
+        self.assertEqual(self.b.resolve_commission_serials(limit=2), [])
+        self.b.post_exec(True)
+        self.assertEqual(self.astakos.resolve_calls, [([1, 2], []),
+                                                      ([3], [])])
+        self.assertEqual(self.registered(), [])
+
+    def test_async_commissions_failed_request(self):
+        self.setup_commissions(async_commissions=True)
+        self.issue(2)
+        self.b.post_exec(False)
+        # Commissions of failed requests are rejected right away
+        self.assertEqual(self.astakos.resolve_calls, [([], [1, 2])])
+        self.assertEqual(self.registered(), [])
+
+    def test_async_commissions_resolved_elsewhere(self):
+        self.setup_commissions(async_commissions=True)
+        self.issue(2)
+        self.b.post_exec(True)
+        # e.g. by reconcile-commissions-pithos
+        self.astakos.resolve_commissions(accept_serials=[1],
+                                         reject_serials=[])
+        self.b.pre_exec()
+        self.assertEqual(self.b.resolve_commission_serials(), [2, 1])
+        self.b.post_exec(True)
+        self.assertEqual(self.astakos.pending, set())
+        self.assertEqual(self.registered(), [])
@@ -0,0 +1,71 @@
+# Copyright (C) 2010-2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from pithos.backends.modular import LazyHashmaps
+
+
+class CountingStore(object):
+    """Store that returns fake maps and records the bulk calls."""
+
+    def __init__(self):
+        self.calls = []
+
+    def map_get_bulk(self, maps):
+        self.calls.append(list(maps))
+        return [[mapfile] for mapfile, size in maps]
+
+
+class TestHashmapsBulkMixin(object):
+    """Challenge the bulk lookup of the hashmaps of manifest segments."""
+
+    def test_get_object_hashmaps_bulk(self):
+        account = self.account
+        container = 'segments'
+        self.b.put_container(account, account, container)
+        for i in range(5):
+            self.upload_object(account, account, container, 'seg/%d' % i,
+                               length=[0, 1, self.block_size][i % 3])
+        self.upload_object(account, account, container, 'other', length=1)
+
+        objects, hashmaps = self.b.get_object_hashmaps_bulk(
+            account, account, container, 'seg/', batch_size=2)
+        listed = self.b.list_objects(account, account, container,
+                                     prefix='seg/', virtual=False)
+        self.assertEqual([o[:2] for o in objects], listed)
+        self.assertEqual(len(hashmaps), len(objects))
+        for (name, version, size), hashmap in zip(objects, hashmaps):
+            _, s, h = self.b.get_object_hashmap(account, account, container,
+                                                name, version)
+            self.assertEqual(size, s)
+            self.assertEqual(hashmap, h)
+
+    def test_lazy_hashmaps(self):
+        store = CountingStore()
+        items = [('a', 1), [], ('b', 1), ('c', 1), ('d', 1)]
+        hashmaps = LazyHashmaps(store, items, batch_size=2)
+        self.assertEqual(store.calls, [])
+        self.assertEqual(hashmaps[1], [])
+        self.assertEqual(store.calls, [])
+
+        self.assertEqual(hashmaps[0], ['a'])
+        self.assertEqual(store.calls, [[('a', 1), ('b', 1)]])
+        self.assertEqual(hashmaps[2], ['b'])
+        self.assertEqual(len(store.calls), 1)
+
+        self.assertEqual(hashmaps[-1], ['d'])
+        self.assertEqual(store.calls[-1], [('d', 1)])
+        self.assertEqual(hashmaps[3], ['c'])
+        self.assertEqual(len(store.calls), 3)
+        self.assertEqual(len(hashmaps), 5)
@@ -0,0 +1,98 @@
+# Copyright (C) 2010-2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from pithos.backends.public_cache import PublicObjectCache
+
+
+class TestPublicMixin(object):
+    """Challenge the lookup of public objects and its cache."""
+
+    def _publish(self, container='public', name='obj', data='data'):
+        account = self.account
+        self.b.put_container(account, account, container)
+        self.upload_object(account, account, container, name, data=data,
+                           length=len(data))
+        self.b.update_object_meta(account, account, container, name,
+                                  'pithos', {'foo': 'bar'})
+        self.b.update_object_public(account, account, container, name, True)
+        return self.b.get_object_public(account, account, container, name)
+
+    def test_public_object_info(self):
+        account = self.account
+        public = self._publish()
+        info = self.b.get_public_object_info(None, public)
+        self.assertEqual(info[:3], (account, 'public', 'obj'))
+        meta = self.b.get_object_meta(account, account, 'public', 'obj',
+                                      'pithos')
+        self.assertEqual(info[3], meta)
+
+        self.b.update_object_public(account, account, 'public', 'obj', False)
+        self.assertRaises(NameError, self.b.get_public_object_info, None,
+                          public)
+        self.assertRaises(NameError, self.b.get_public_object_info, None,
+                          'nonexistent')
+
+    def test_public_object_cache(self):
+        account = self.account
+        self.b.public_cache = cache = PublicObjectCache(10, 60)
+        public = self._publish()
+        info = self.b.get_public_object_info(None, public)
+        self.assertEqual(self.b.get_public_object_info(None, public), info)
+        self.assertEqual(cache.hits, 1)
+
+        # A new version invalidates the cached lookup
+        self.b.update_object_meta(account, account, 'public', 'obj',
+                                  'pithos', {'foo': 'baz'})
+        info = self.b.get_public_object_info(None, public)
+        self.assertEqual(info[3]['foo'], 'baz')
+        self.assertEqual(cache.hits, 1)
+
+        # So does unpublishing the object
+        self.b.get_public_object_info(None, public)
+        self.assertEqual(cache.hits, 2)
+        self.b.update_object_public(account, account, 'public', 'obj', False)
+        self.assertRaises(NameError, self.b.get_public_object_info, None,
+                          public)
+
+        # Or deleting it
+        public = self._publish(name='obj2')
+        self.b.get_public_object_info(None, public)
+        self.b.delete_object(account, account, 'public', 'obj2')
+        self.assertRaises(NameError, self.b.get_public_object_info, None,
+                          public)
+
+    def test_public_cache_generation(self):
+        cache = PublicObjectCache(2, 60)
+        info = ('account', 'container', 'name', {'hash': 'abc'})
+        generation = cache.generation
+        # An invalidation during the lookup prevents storing its result
+        cache.invalidate([1])
+        cache.put('public', 1, info, generation)
+        self.assertEqual(cache.get('public'), None)
+
+        cache.put('public', 1, info, cache.generation)
+        self.assertEqual(cache.get('public'), info)
+        # Callers get copies of the cached meta
+        cache.get('public')[3]['hash'] = 'def'
+        self.assertEqual(cache.get('public'), info)
+
+        # The least recently stored entries are evicted
+        cache.put('public2', 2, info, cache.generation)
+        cache.put('public3', 3, info, cache.generation)
+        self.assertEqual(cache.get('public'), None)
+        self.assertEqual(cache.get('public3'), info)
+        cache.invalidate([3])
+        self.assertEqual(cache.get('public3'), None)
+        self.assertEqual(cache.nodes, {2: set(['public2'])})
@@ -785,3 +785,41 @@ class TestQuotaMixin(object):
                 holder=account,
                 provisions={(project, 'pithos.diskspace'): -len(data)},
                 name='/'.join([account, container, folder, '']))]
+
+    def test_account_usage_chunks(self):
+        prefix = get_random_name()
+        accounts = [prefix + suffix for suffix in ('a', 'b', 'c')]
+        for account in accounts:
+            container = get_random_name()
+            self.b.put_container(account, account, container)
+            self.upload_object(account, account, container, get_random_name())
+
+        listed = self.b.node.node_account_list()
+        self.assertEqual(listed, sorted(listed))
+        self.assertTrue(set(accounts) <= set(listed))
+        self.assertEqual(self.b.node.node_account_list(marker=accounts[0],
+                                                       limit=1),
+                         accounts[1:2])
+
+        usage = self.b.node.node_account_usage(accounts=accounts[1:])
+        self.assertEqual(sorted(usage.keys()), accounts[1:])
+        for account in accounts[1:]:
+            self.assertEqual(usage[account],
+                             self.b.node.node_account_usage(account)[account])
+
+    def test_project_usage_range(self):
+        account = get_random_name()
+        projects = sorted(unicode(uuidlib.uuid4()) for i in range(3))
+        for project in projects:
+            container = get_random_name()
+            self.b.put_container(account, account, container,
+                                 policy={'project': project})
+            self.upload_object(account, account, container, get_random_name())
+
+        usage = self.b.node.node_project_usage(marker=projects[0],
+                                               upto=projects[1])
+        self.assertTrue(projects[1] in usage)
+        self.assertFalse(projects[0] in usage)
+        self.assertFalse(projects[2] in usage)
+        usage = self.b.node.node_account_usage(account, projects[2])
+        self.assertEqual(usage[account].keys(), [projects[2]])
@@ -0,0 +1,38 @@
+# Copyright (C) 2010-2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""View of the counters of the database connection pool of a process."""
+
+import json
+
+from django import http
+
+from synnefo.lib.db import pooled_psycopg2
+
+
+def pool_stats(request):
+    """Return the counters of the connection pool of the serving process.
+
+    Each worker process of the web server has its own pool, so consecutive
+    requests may be served by different pools.
+
+    """
+    if request.method != "GET":
+        return http.HttpResponseNotAllowed(["GET"])
+    stats = pooled_psycopg2.pool_stats()
+    if stats is None:
+        raise http.Http404("No database connection pool in this process")
+    return http.HttpResponse(json.dumps(stats),
+                             content_type="application/json")
@@ -0,0 +1,72 @@
+# Copyright (C) 2010-2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import urllib2
+
+from snf_django.management.commands import SynnefoCommand, CommandError
+from snf_django.management.utils import pprint_table
+
+COUNTERS = ("pid", "size", "in_use", "idle", "checkouts", "waits",
+            "timeouts", "wait_time", "created", "recycled", "broken")
+
+
+class Command(SynnefoCommand):
+    args = "<url> [<url> ...]"
+    help = """Show the counters of the database connection pools.
+
+The counters are read from the WEBPROJECT_DB_POOL_STATS_PATH endpoint of the
+given web servers. Each request is served by the pool of one web server
+process.
+
+ * in_use, idle: connections checked out and kept in the pool
+ * checkouts: connections checked out of the pool
+ * waits, wait_time: checkouts that found all connections in use, and the
+   seconds they waited
+ * timeouts: waits that reached synnefo_pool_timeout
+ * created, recycled, broken: connections opened, replaced due to their age
+   or idle time, and found dead
+"""
+
+    def handle(self, *args, **options):
+        if not args:
+            raise CommandError("Please provide the URL of a pool endpoint")
+
+        pools = []
+        for url in args:
+            try:
+                pools.append(json.load(urllib2.urlopen(url, timeout=10)))
+            except (urllib2.URLError, ValueError) as e:
+                raise CommandError("Cannot get the counters from %s: %s"
+                                   % (url, e))
+
+        output_format = options["output_format"]
+        if output_format == "json":
+            self.stdout.write(json.dumps(pools, indent=4) + "\n")
+            return
+
+        table = [[pool[c] for c in COUNTERS] for pool in pools]
+        pprint_table(self.stdout, table, COUNTERS, output_format,
+                     title="Connection pools")
+
+        self.stdout.write("\n")
+        # The last bucket of the histograms has no upper bound
+        bounds = [b for b, _ in pools[0]["wait_histogram"][:-1]]
+        headers = (["pid"] + ["<= %gs" % b for b in bounds] +
+                   ["> %gs" % bounds[-1]])
+        table = [[pool["pid"]] + [n for _, n in pool["wait_histogram"]]
+                 for pool in pools]
+        pprint_table(self.stdout, table, headers, output_format,
+                     title="Checkout wait times")
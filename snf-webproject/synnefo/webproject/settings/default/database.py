@@ -29,3 +29,18 @@ DATABASES = {
         #}
     }
 }
+
+# Read replicas of the databases, by the alias of the primary database, e.g.
+# {'astakos': ['astakos_replica']}. Each replica must also be defined in
+# DATABASES and DATABASE_ROUTERS must include the Synnefo router. Only the
+# reads of web and API requests go to the replicas.
+DATABASE_REPLICAS = {}
+
+# Seconds for which a client that wrote to a database reads from the primary
+# instead of its replicas. Keep it above the replication lag.
+DATABASE_REPLICA_PIN_SECONDS = 10
+
+# Django cache backend, shared by all processes, that pins the API clients,
+# which do not keep cookies, by their token. If not set, requests with a
+# token always read from the primary.
+DATABASE_REPLICA_PIN_CACHE_BACKEND = None
@@ -14,6 +14,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import re
 
 
 # Import * in order to import the http exception handlers: handler*
@@ -40,6 +41,12 @@ urlpatterns += patterns(
     (r'^lang/$', 'synnefo.webproject.i18n.set_language')
 )
 
+DB_POOL_STATS_PATH = getattr(settings, 'WEBPROJECT_DB_POOL_STATS_PATH', None)
+if DB_POOL_STATS_PATH:
+    urlpatterns += patterns(
+        '', url(r'^%s$' % re.escape(DB_POOL_STATS_PATH.strip("/")),
+                'synnefo.webproject.db_pool.pool_stats'))
+
 if getattr(settings, 'WEBPROJECT_SERVE_STATIC', settings.DEBUG):
 
     for module_name, ns in settings.STATIC_FILES.iteritems():